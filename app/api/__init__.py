@@ -5,10 +5,24 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from matrx_utils import vcprint
+from matrx_utils.core.sio_app import sio
 from matrx_utils.core.task_queue import get_task_queue
 
 from app.api.v1 import create_v1_app
 from core import settings
+from core.database.pool import close_pools, warm_up_pools
+from core.database.query_instrumentation import begin_request_stats, end_request_stats
+from core.database.reference_cache import preload_reference_tables, start_reference_refresh, stop_reference_refresh
+from core.http.admission import AdmissionMiddleware, get_admission_controller
+from core.http.profiling import ProfileMiddleware
+from core.http.response_cache import cache_response
+from core.socket.client_manager import close_client_manager, start_client_manager
+from core.socket.core.session_registry import get_session_registry
+from core.tasks.drain import get_drain_controller
+from core.tasks.job_store import get_job_store
+from core.tasks.lanes import get_lane_queue
+from src.scraper.archive import close_scrape_archive
+from src.scraper.fetcher import get_fetcher
 
 logger = logging.getLogger('app')
 
@@ -21,8 +35,24 @@ def create_app() -> FastAPI:
         # --- startup block ---
 
         logger.info("FastAPI startup complete.")
+        start_client_manager(sio)
+        get_admission_controller().start()
+        get_session_registry().start()
         task_queue = get_task_queue()
         logger.info("[create_app] Task Queue Initialized.")
+        lane_queue = get_lane_queue()
+        lane_queue.start()
+        logger.info("[create_app] Task Lanes Started.")
+        drain_controller = get_drain_controller()
+        await drain_controller.resume()
+        drain_controller.start_recovery()
+
+        if settings.DB_POOL_WARMUP:
+            await warm_up_pools()
+            logger.info("[create_app] Database pools warmed.")
+
+        await preload_reference_tables()
+        start_reference_refresh()
 
         # Startup related things go here.
         ##################################
@@ -35,8 +65,18 @@ def create_app() -> FastAPI:
         yield
         # --- shutdown block ---
         logger.info("Shutting down gracefully...")
+        await stop_reference_refresh()
+        await get_admission_controller().stop()
+        await get_session_registry().stop()
+        await drain_controller.drain()
         await task_queue.shutdown()
+        await lane_queue.shutdown()
         logger.info("Task Queue Shutdown complete.")
+        await get_job_store().close()
+        await close_pools()
+        await get_fetcher().close()
+        await close_scrape_archive()
+        await close_client_manager(sio)
 
     # Main app - no docs at root level
     main_app = FastAPI(
@@ -60,6 +100,7 @@ def create_app() -> FastAPI:
     # main_app.mount("/api/v2", v2_app)
 
     @main_app.get("/", include_in_schema=False)
+    @cache_response(ttl=300)
     async def root():
         return {
             "message": f"Welcome to {settings.APP_NAME} API",
@@ -69,6 +110,10 @@ def create_app() -> FastAPI:
             # "v2_docs": "/api/v2/docs"
         }
 
+    # Innermost: log_requests below runs the app in a task of its own, and a profile follows the request's task
+    if settings.PROFILE_REQUEST_HEADER:
+        main_app.add_middleware(ProfileMiddleware)
+
     # Add logging middleware
     @main_app.middleware("http")
     async def log_requests(request, call_next):
@@ -78,17 +123,32 @@ def create_app() -> FastAPI:
         method = request.method
 
         logger.info(f"Request started: {method} {path}")
+        stats_token, query_stats = begin_request_stats()
 
         try:
             response = await call_next(request)
             process_time = (time.time() - start_time) * 1000
             status_code = response.status_code
 
-            logger.info(f"Request completed: {method} {path} - Status: {status_code} - Time: {process_time:.2f}ms")
+            logger.info(
+                f"Request completed: {method} {path} - Status: {status_code} - Time: {process_time:.2f}ms"
+                f" - Queries: {query_stats.queries} ({query_stats.total_ms:.2f}ms, {query_stats.cache_hits} cached)"
+            )
+            repeated = query_stats.repeated(settings.DB_REPEATED_QUERY_THRESHOLD)
+            if repeated:
+                logger.warning(f"Possible N+1 in {method} {path}: {repeated}")
             response.headers["X-Process-Time"] = f"{process_time:.2f}ms"
+            response.headers["X-DB-Query-Count"] = str(query_stats.queries)
+            response.headers["X-DB-Query-Time"] = f"{query_stats.total_ms:.2f}ms"
+            response.headers["X-DB-Cache-Hits"] = str(query_stats.cache_hits)
             return response
         except Exception as e:
             logger.error(f"Request failed: {method} {path} - Error: {str(e)}", exc_info=True)
             raise
+        finally:
+            end_request_stats(stats_token)
+
+    # Outermost, so requests over the limit are refused before any other work is done for them
+    main_app.add_middleware(AdmissionMiddleware)
 
     return main_app
@@ -1,15 +1,50 @@
 # app\api\v1\endpoints.py
+import asyncio
 import logging
+import time
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from matrx_utils.core.sio_app import sio
 
 from core import settings
+from core.database.pool import pool_metrics_snapshot
+from core.database.query_cache import get_query_cache
+from core.database.query_instrumentation import get_query_instrumentation
+from core.database.reference_cache import reference_cache_stats
+from core.http.admin import admin_key_error
+from core.http.admission import get_admission_controller
+from core.http.identity import authenticated_user_id
+from core.http.response_cache import cache_response, get_response_cache
+from core.http.static_files import get_static_files
+from core.http.task_stream import choose_media_type, stream_task
+from core.profiling import get_stack_sampler
+from core.socket.client_manager import client_manager_stats
+from core.socket.core.session_registry import get_session_registry
+from core.tasks.drain import get_drain_controller
+from core.tasks.job_store import get_job_store
+from core.tasks.job_streams import owns_job
+from core.tasks.lanes import get_lane_queue
+from models.request_models import ScrapeStreamRequest
+from models.response_models import HealthResponse
+from src.scraper.archive import get_scrape_archive
+from src.scraper.hedging import get_hedged_fetcher
+from src.scraper.incremental import get_incremental_scraper
+from src.scraper_service import ScrapeService, run_scrape_job
 
 router = APIRouter()
 logger = logging.getLogger("app")
 
 
+async def require_admin_key(x_admin_key: str | None = Header(default=None)):
+    """Admin endpoints need X-Admin-Key to match Settings.ADMIN_API_KEY; see admin_key_error"""
+    error = admin_key_error(x_admin_key)
+    if error is not None:
+        raise HTTPException(status_code=403, detail=error)
+
+
 @router.get("/", tags=["v1"])
+@cache_response(ttl=300)
 async def root():
     """Root endpoint"""
     logger.debug("Root endpoint called")
@@ -20,3 +55,219 @@ async def root():
     }
 
 
+@router.get("/metrics/queries", tags=["metrics"])
+async def query_metrics(limit: int = 50, order_by: str = "total_ms"):
+    """Per-fingerprint ORM query stats, slowest first by default"""
+    return get_query_instrumentation().snapshot(limit=limit, order_by=order_by)
+
+
+@router.get("/metrics/query-cache", tags=["metrics"])
+async def query_cache_metrics():
+    """Compiled query and prepared statement cache stats"""
+    return get_query_cache().stats()
+
+
+@router.get("/metrics/db-pool", tags=["metrics"])
+async def db_pool_metrics():
+    """Connection pool utilization and acquire latency per database"""
+    return {"pools": pool_metrics_snapshot()}
+
+
+@router.get("/metrics/reference-cache", tags=["metrics"])
+async def reference_cache_metrics():
+    """In-memory reference table sizes, local hits and database fallbacks"""
+    return reference_cache_stats()
+
+
+@router.get("/metrics/task-lanes", tags=["metrics"])
+async def task_lane_metrics():
+    """Queue depth, rejections and queue wait / run time per task lane"""
+    return get_lane_queue().stats()
+
+
+@router.get("/metrics/socketio-bus", tags=["metrics"])
+async def socketio_bus_metrics():
+    """Cross-process Socket.IO fan-out: batches, publish errors and bus latency"""
+    return client_manager_stats(sio)
+
+
+@router.get("/metrics/sessions", tags=["metrics"])
+async def session_metrics():
+    """User session counts, idle evictions and estimated bytes per session"""
+    return get_session_registry().memory_report()
+
+
+@router.get("/metrics/static", tags=["metrics"])
+async def static_file_metrics():
+    """Static file cache size, 304s, ranges, precompressed and zero-copy responses"""
+    return get_static_files().stats()
+
+
+@router.get("/metrics/response-cache", tags=["metrics"])
+async def response_cache_metrics():
+    """Cached route responses: hit ratio, stale serves, 304s, bytes saved and per-route hits"""
+    return get_response_cache().stats()
+
+
+@router.get("/metrics/admission", tags=["metrics"])
+async def admission_metrics():
+    """Concurrency limit, in-flight, rejections and latency per route group, plus event loop lag"""
+    return get_admission_controller().stats()
+
+
+@router.get("/metrics/scraper", tags=["metrics"])
+async def scraper_metrics():
+    """Incremental re-scrape outcomes, fetch totals, per-host latency, hedges and timeouts, and archive size"""
+    archive = get_scrape_archive()
+    return {**get_incremental_scraper().stats(), "hedging": get_hedged_fetcher().stats(),
+            "archive": await archive.stats() if archive is not None else None}
+
+
+@router.get("/health", tags=["v1"], response_model=HealthResponse)
+async def health():
+    """Readiness check; returns 503 once the instance starts draining so load balancers stop routing to it"""
+    drain = get_drain_controller()
+    body = HealthResponse(
+        status=drain.accepting,
+        timestamp=time.time(),
+        service=settings.APP_NAME,
+        version=settings.APP_VERSION,
+        environment=settings.ENVIRONMENT,
+        checks={"drain": drain.state, "task_lanes": {lane["lane"]: lane["depth"] for lane in get_lane_queue().stats()["lanes"]}},
+    )
+    if not drain.accepting:
+        return JSONResponse(body.model_dump(), status_code=503, headers={"Retry-After": str(settings.DRAIN_RETRY_AFTER_SECONDS)})
+    return body
+
+
+async def _owned_job(job_id, request):
+    """The job if the request's authenticated user started it; anyone else (including unauthenticated callers and
+    anonymous jobs) gets the same 404 as for a job that doesn't exist"""
+    job = await get_job_store().get(job_id)
+    if not owns_job(job, authenticated_user_id(request.scope)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", tags=["jobs"])
+async def get_job(job_id: str, request: Request):
+    """State, progress and result of a durable job started by the authenticated user"""
+    return await _owned_job(job_id, request)
+
+
+@router.get("/jobs/{job_id}/events", tags=["jobs"])
+async def get_job_events(job_id: str, request: Request, after_seq: int = 0, limit: int = 1000):
+    """Logged stream events of a job after `after_seq`, for clients catching up without a socket"""
+    await _owned_job(job_id, request)
+    return {"job_id": job_id, "events": await get_job_store().events(job_id, after_seq=after_seq, limit=limit)}
+
+
+@router.post("/scrape/stream", tags=["scrape"])
+async def scrape_stream(body: ScrapeStreamRequest, request: Request, format: str | None = None):
+    """Run a ScrapeService task and stream its events as NDJSON (default) or SSE (`format=sse` or Accept: text/event-stream).
+
+    Each line / event carries the same types the Socket.IO stream sends: chunk, status_update, data, data_final,
+    error and end. Disconnecting cancels the task.
+    """
+    if body.task not in ScrapeService.streamable_tasks:
+        raise HTTPException(status_code=400, detail=f"Unknown task '{body.task}'")
+
+    return await stream_task(ScrapeService.service_name, run_scrape_job,
+                             choose_media_type(format, request.headers.get("accept")),
+                             user_id=authenticated_user_id(request.scope),
+                             payload={"task": body.task, "task_context": body.task_context})
+
+
+@router.get("/archive/page", tags=["scrape"])
+async def archived_page(url: str | None = None, unique_page_name: str | None = None, content_hash: str | None = None):
+    """An archived scrape result by url, unique_page_name or hash ("sha256:..." / "content:..."), served as stored"""
+    archive = get_scrape_archive()
+    if archive is None:
+        raise HTTPException(status_code=503, detail="The scrape archive is disabled")
+    if url is None and unique_page_name is None and content_hash is None:
+        raise HTTPException(status_code=400, detail="Pass url, unique_page_name or content_hash")
+    data = await archive.get_json(url=url, unique_page_name=unique_page_name, content_hash=content_hash)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Page not archived")
+    return Response(data, media_type="application/json")
+
+
+@router.get("/drain", tags=["admin"])
+async def drain_status():
+    """Drain state, deadline and in-flight task counts"""
+    return get_drain_controller().status()
+
+
+@router.post("/admin/drain", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def start_drain(timeout: float | None = None):
+    """Stop accepting new work and hand off in-flight tasks; call from a preStop hook before SIGTERM"""
+    drain = get_drain_controller()
+    drain.begin(timeout)
+    return drain.status()
+
+
+@router.post("/admin/response-cache/invalidate", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def invalidate_response_cache(tag: list[str] | None = Query(default=None), path_prefix: str | None = None):
+    """Drop cached responses by tag (e.g. model:Job) and/or path prefix; without either, drop everything"""
+    cache = get_response_cache()
+    if not tag and path_prefix is None:
+        return {"dropped": cache.clear()}
+    return {"dropped": cache.invalidate(tags=tag or (), path_prefix=path_prefix)}
+
+
+@router.post("/admin/archive/compact", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def compact_archive(max_live_ratio: float | None = None):
+    """Rewrite archive segments that are mostly superseded records (default SCRAPER_ARCHIVE_COMPACT_RATIO)"""
+    archive = get_scrape_archive()
+    if archive is None:
+        raise HTTPException(status_code=503, detail="The scrape archive is disabled")
+    reclaimed = await archive.compact(max_live_ratio)
+    return {"reclaimed_bytes": reclaimed, **await archive.stats()}
+
+
+@router.get("/admin/profile", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def profile_status():
+    """Running and kept profiles (process-wide and per request / task) and the sampler's own cost per tick"""
+    return get_stack_sampler().stats()
+
+
+@router.post("/admin/profile/start", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def start_profile(seconds: float = 30.0):
+    """Sample every thread for `seconds` (at most PROFILE_MAX_SECONDS), or until /admin/profile/stop"""
+    session = get_stack_sampler().start(seconds)
+    if session is None:
+        raise HTTPException(status_code=409, detail="A process profile is already running")
+    return session.summary()
+
+
+@router.post("/admin/profile/stop", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def stop_profile():
+    """End the running process profile early"""
+    session = get_stack_sampler().stop()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No process profile is running")
+    return session.summary()
+
+
+@router.get("/admin/profile/capture", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def capture_profile(seconds: float = 10.0):
+    """Sample every thread for `seconds` and return the collapsed stacks (flamegraph.pl / speedscope input)"""
+    sampler = get_stack_sampler()
+    session = sampler.start(seconds)
+    if session is None:
+        raise HTTPException(status_code=409, detail="A process profile is already running")
+    try:
+        await asyncio.sleep(min(seconds, settings.PROFILE_MAX_SECONDS))
+    finally:
+        sampler.stop(session.id)
+    return PlainTextResponse(session.collapsed(), headers={"X-Profile-Id": str(session.id)})
+
+
+@router.get("/admin/profile/collapsed", tags=["admin"], dependencies=[Depends(require_admin_key)])
+async def collapsed_profile(id: int | None = None):
+    """Collapsed stacks of profile `id` (see X-Profile-Id), by default the running or last process profile"""
+    sampler = get_stack_sampler()
+    session = sampler.get(id) if id is not None else sampler.latest()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(session.collapsed(), headers={"X-Profile-Id": str(session.id)})
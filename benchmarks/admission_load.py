@@ -0,0 +1,182 @@
+# benchmarks\admission_load.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+from matrx_utils import vcprint
+
+# Open-loop overload test against a local uvicorn instance running the admission middleware. Interactive
+# requests (~1ms of CPU) and bulk requests (~10ms of CPU) are sent at fixed rates, together more than one
+# event loop can serve, once with admission control and once without, and latency of the interactive
+# requests that succeeded is compared.
+#
+#   python -m benchmarks.admission_load --duration 15 --interactive-rps 300 --bulk-rps 120
+#
+# The server process is a minimal FastAPI app (no database) so the run only measures admission.
+
+
+def _burn(ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def _server_app():
+    from contextlib import asynccontextmanager
+
+    from fastapi import FastAPI
+
+    from core.http.admission import AdmissionMiddleware, get_admission_controller
+
+    @asynccontextmanager
+    async def lifespan(app):
+        get_admission_controller().start()
+        yield
+        await get_admission_controller().stop()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/api/v1/interactive")
+    async def interactive():
+        _burn(1)
+        return {"ok": True}
+
+    @app.get("/api/v1/bulk/report")
+    async def bulk():
+        for _ in range(5):
+            _burn(2)
+            await asyncio.sleep(0)
+        return {"ok": True}
+
+    @app.get("/api/v1/health")
+    async def health():
+        return {"ok": True}
+
+    @app.get("/api/v1/metrics/admission")
+    async def admission():
+        return get_admission_controller().stats()
+
+    app.add_middleware(AdmissionMiddleware)
+    return app
+
+
+def run_server(port):
+    import uvicorn
+
+    uvicorn.run(_server_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+async def _wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def _drive(client, url, rps, duration, results):
+    async def one():
+        start = time.perf_counter()
+        try:
+            status = (await client.get(url)).status_code
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError:
+            status = "error"
+        results.append((status, (time.perf_counter() - start) * 1000))
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rps * duration)):
+        # Fixed schedule: requests go out on time no matter how slow earlier ones are
+        delay = start + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one()))
+    await asyncio.gather(*tasks)
+
+
+def _summarize(label, results, duration):
+    ok = [latency for status, latency in results if status == 200]
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    vcprint(
+        f"  {label:<12} {len(ok) / duration:>7.0f} ok/s  p50 {_percentile(ok, 0.5):>8.1f}ms  "
+        f"p99 {_percentile(ok, 0.99):>8.1f}ms  statuses {statuses}",
+        color="bright_teal",
+    )
+    return {"ok_per_second": len(ok) / duration, "p50_ms": _percentile(ok, 0.5), "p99_ms": _percentile(ok, 0.99),
+            "statuses": {str(k): v for k, v in statuses.items()}}
+
+
+async def run_case(args, admission):
+    env = dict(os.environ, ADMISSION_ENABLED=str(admission).lower(),
+               ADMISSION_ROUTE_GROUPS=json.dumps({"/api/v1/bulk": "bulk", "/api/v1/metrics": "ops"}))
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.admission_load", "--server-port", str(args.port)],
+                              env=env)
+    try:
+        await _wait_for_port(args.port)
+        # No connection limit: an open-loop test must not queue requests client-side
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            base = f"http://127.0.0.1:{args.port}/api/v1"
+            interactive, bulk, health = [], [], []
+            await asyncio.gather(
+                _drive(client, f"{base}/interactive", args.interactive_rps, args.duration, interactive),
+                _drive(client, f"{base}/bulk/report", args.bulk_rps, args.duration, bulk),
+                _drive(client, f"{base}/health", 2, args.duration, health),
+            )
+            vcprint(f"admission {'on' if admission else 'off'}:", color="yellow")
+            summary = {
+                "interactive": _summarize("interactive", interactive, args.duration),
+                "bulk": _summarize("bulk", bulk, args.duration),
+                "health": _summarize("health", health, args.duration),
+            }
+            if admission:
+                summary["admission"] = (await client.get(f"{base}/metrics/admission")).json()
+            return summary
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main(args):
+    results = {}
+    for admission in (True, False):
+        results["admission_on" if admission else "admission_off"] = await run_case(args, admission)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interactive latency under overload with and without admission control")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--interactive-rps", type=float, default=300.0)
+    parser.add_argument("--bulk-rps", type=float, default=120.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=8720)
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    parser.add_argument("--server-port", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.server_port is not None:
+        run_server(args.server_port)
+    else:
+        asyncio.run(main(args))
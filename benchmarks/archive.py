@@ -0,0 +1,170 @@
+# benchmarks\archive.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import FixtureSite
+from src.scraper.archive import HEADER, ScrapeArchive, _segment_name
+from src.scraper.parser import parse_page
+
+# Fills a scrape archive in a temporary directory with --pages results (parsed fixture pages, one URL and
+# hash set per page) in batches like scrape_urls sends, then:
+#   - times random lookups by url, unique_page_name and hash: straight from the mmapped segments, through the
+#     async API, and reading the same records with open/seek/read per lookup;
+#   - re-archives a batch unchanged (no new bytes) and --rewrite of the pages with new content, compacts, and
+#     checks every sampled lookup still returns the newest result;
+#   - appends a torn record and checks that reopening the archive cuts it off.
+# Exits non-zero on a wrong lookup.
+#
+#   python -m benchmarks.archive --pages 100000
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def make_result(templates, i, version=0):
+    result = copy.copy(templates[i % len(templates)])
+    url = f"https://site{i % 97}.example/articles/{i}"
+    result["url"] = url
+    result["overview"] = {**result["overview"], "url": url, "unique_page_name": f"site{i % 97}_example_articles_{i}"}
+    digest = hashlib.sha256(f"{i}:{version}".encode()).hexdigest()
+    result["hashes"] = [f"sha256:{digest}", f"content:{digest[:32]}"]
+    return result
+
+
+def time_lookups(fn, keys):
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        fn(key)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def read_with_seek(archive, url):
+    segment, offset, length = archive._conn.execute(
+        "SELECT segment, offset, length FROM records WHERE url = ?", (url,)).fetchone()
+    with open(archive.path / _segment_name(segment), "rb") as f:
+        f.seek(offset)
+        record = f.read(length)
+    payload = record[HEADER.size:]
+    if zlib.crc32(payload) != HEADER.unpack_from(record)[2]:
+        raise ValueError(f"Corrupt record for {url}")
+    return zlib.decompress(payload)
+
+
+async def main(args):
+    site = FixtureSite(pages=args.templates)
+    templates = [parse_page(f"https://fixture.example/page/{i}", site.render(i).decode()) for i in range(args.templates)]
+    rng = random.Random(args.seed)
+    failures = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ScrapeArchive(directory, segment_bytes=args.segment_mib * 1024 * 1024)
+        raw_bytes = 0
+        start = time.perf_counter()
+        for first in range(0, args.pages, args.batch):
+            batch = [make_result(templates, i) for i in range(first, min(args.pages, first + args.batch))]
+            raw_bytes += sum(len(json.dumps(result, separators=(",", ":"))) for result in batch)
+            await archive.archive(batch)
+        write_seconds = time.perf_counter() - start
+        stats = await archive.stats()
+        index_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                          if name.startswith("index"))
+        vcprint(f"archived {args.pages:,} pages in {write_seconds:.1f}s ({args.pages / write_seconds:,.0f} pages/s): "
+                f"{stats['bytes'] / 2 ** 20:,.1f} MiB in {stats['segments']} segments for {raw_bytes / 2 ** 20:,.1f} MiB "
+                f"of JSON, index {index_bytes / 2 ** 20:,.1f} MiB", color="yellow")
+
+        sample = [rng.randrange(args.pages) for _ in range(args.lookups)]
+        urls = [make_result(templates, i)["url"] for i in sample]
+        names = [make_result(templates, i)["overview"]["unique_page_name"] for i in sample]
+        hashes = [make_result(templates, i)["hashes"][i % 2] for i in sample]
+        for label, timings in (
+                ("url (mmap)", time_lookups(lambda url: archive._read("url", url), urls)),
+                ("url (open/seek/read)", time_lookups(lambda url: read_with_seek(archive, url), urls)),
+                ("unique_page_name", time_lookups(lambda name: archive._read("unique_page_name", name), names)),
+                ("hash", time_lookups(archive._read_hash, hashes)),
+        ):
+            vcprint(f"  lookup by {label:<22} p50 {percentile(timings, 0.5):>7.1f} us   "
+                    f"p99 {percentile(timings, 0.99):>7.1f} us", color="bright_teal")
+        timings = []
+        for url in urls[:1000]:
+            start = time.perf_counter()
+            await archive.get_json(url=url)
+            timings.append((time.perf_counter() - start) * 1e6)
+        vcprint(f"  lookup by {'url (async get_json)':<22} p50 {percentile(timings, 0.5):>7.1f} us   "
+                f"p99 {percentile(timings, 0.99):>7.1f} us", color="bright_teal")
+
+        for i, url, name, value in list(zip(sample, urls, names, hashes))[:200]:
+            expected = make_result(templates, i)
+            for found in (await archive.get(url=url), await archive.get(unique_page_name=name),
+                          await archive.get(content_hash=value)):
+                if found != expected:
+                    failures.append(f"lookup for page {i} returned {found and found['url']}")
+
+        before = (await archive.stats())["bytes"]
+        await archive.archive([make_result(templates, i) for i in range(args.batch)])
+        if (await archive.stats())["bytes"] != before:
+            failures.append("re-archiving unchanged pages wrote new records")
+
+        changed = rng.sample(range(args.pages), int(args.pages * args.rewrite))
+        for first in range(0, len(changed), args.batch):
+            await archive.archive([make_result(templates, i, version=1) for i in changed[first:first + args.batch]])
+        stats = await archive.stats()
+        start = time.perf_counter()
+        reclaimed = await archive.compact()
+        compact_seconds = time.perf_counter() - start
+        after = await archive.stats()
+        vcprint(f"rewrote {len(changed):,} pages: {stats['bytes'] / 2 ** 20:,.1f} MiB ({stats['live_bytes'] / 2 ** 20:,.1f} "
+                f"live); compaction reclaimed {reclaimed / 2 ** 20:,.1f} MiB in {compact_seconds:.1f}s, "
+                f"{after['segments']} segments left", color="yellow")
+        changed_set = set(changed)
+        for i in sample[:500]:
+            expected = make_result(templates, i, version=int(i in changed_set))
+            if await archive.get(url=expected["url"]) != expected:
+                failures.append(f"page {i} wrong after compaction")
+
+        # A record cut off mid-write must not survive a restart
+        active, size = archive._active, archive._size
+        await archive.close()
+        with open(os.path.join(directory, _segment_name(active)), "ab") as f:
+            f.write(HEADER.pack(b"SRA1", 1000, 0) + b"partial")
+        archive = ScrapeArchive(directory, segment_bytes=args.segment_mib * 1024 * 1024)
+        if os.path.getsize(os.path.join(directory, _segment_name(active))) != size:
+            failures.append("torn record was not cut off on reopen")
+        if await archive.get(url=urls[0]) is None or (await archive.stats())["records"] != args.pages:
+            failures.append("reopened archive lost records")
+        await archive.close()
+
+    for failure in failures[:10]:
+        vcprint(f"FAILED: {failure}", color="red")
+    if failures:
+        return 1
+    vcprint("OK", color="green")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape result archive: write, lookup and compaction")
+    parser.add_argument("--pages", type=int, default=100_000)
+    parser.add_argument("--templates", type=int, default=200, help="distinct parsed fixture pages the results reuse")
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--rewrite", type=float, default=0.6, help="fraction of pages re-archived with new content")
+    parser.add_argument("--segment-mib", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=3)
+    sys.exit(asyncio.run(main(parser.parse_args())))
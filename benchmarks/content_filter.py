@@ -0,0 +1,174 @@
+# benchmarks\content_filter.py
+from core.settings import settings
+
+import argparse
+import random
+import sys
+import time
+from html.parser import HTMLParser
+from pathlib import Path
+
+from matrx_utils import vcprint
+
+from src.scraper.content_filter import ContentFilter, normalize_rule, rule_matches
+from src.scraper.parser import parse_page
+
+# Compares the compiled content filter with testing every rule against every element in turn, over HTML files
+# (--html-dir, e.g. saved pages) or generated pages with class-heavy markup, and a large rule set: the usual
+# tags and ad / promo / social class fragments plus generated vendor widget rules. Reports matching time alone
+# (every start tag of every page) and whole-page parse time, and checks that both give identical
+# content_filter_removal_details. Exits non-zero on a difference.
+#
+#   python -m benchmarks.content_filter --rules 600 --pages 10
+#   python -m benchmarks.content_filter --html-dir saved_pages/
+
+BASE_RULES = (
+    [{"attribute": "tag", "match_type": "exact", "trigger_value": tag}
+     for tag in ("aside", "iframe", "form", "dialog", "noscript")]
+    + [{"attribute": "class", "match_type": "partial", "trigger_value": value}
+       for value in ("ad-", "advert", "banner", "promo", "sponsor", "cookie", "newsletter", "social", "share-",
+                     "related-", "popup", "modal", "subscribe", "outbrain", "taboola", "paywall")]
+    + [{"attribute": "class", "match_type": "exact", "trigger_value": value}
+       for value in ("sidebar", "comments", "breadcrumbs", "tags", "author-bio")]
+    + [{"attribute": "id", "match_type": "partial", "trigger_value": value}
+       for value in ("google_ads", "disqus", "onetrust", "gpt-")]
+    + [{"attribute": "role", "match_type": "exact", "trigger_value": value} for value in ("complementary", "banner")]
+    + [{"attribute": "data-testid", "match_type": "partial", "trigger_value": "ad"}]
+)
+
+CLASS_WORDS = ("article", "body", "content", "main", "text", "wrapper", "container", "row", "col", "grid", "card",
+               "header", "title", "summary", "lead", "caption", "figure", "media", "image", "meta", "byline",
+               "date", "link", "list", "item", "nav", "menu", "button", "icon", "flex", "inner", "outer", "section")
+
+
+def build_rules(count, seed):
+    rng = random.Random(seed)
+    rules = list(BASE_RULES)
+    attributes = ("class", "class", "class", "id", "data-component")
+    while len(rules) < count:
+        vendor = f"vendor{len(rules)}-{rng.choice(('widget', 'slot', 'unit', 'embed'))}"
+        rules.append({"attribute": rng.choice(attributes), "match_type": rng.choice(("exact", "partial")),
+                      "trigger_value": vendor})
+    return rules
+
+
+def build_page(index, elements, rules, rng):
+    hits = [rule for rule in rules if rule["attribute"] in ("class", "id") or rule["attribute"] == "tag"]
+    parts = [f"<html><head><title>Fixture {index}</title></head><body><main class='article-body'>"]
+    for i in range(elements):
+        classes = " ".join(rng.sample(CLASS_WORDS, 3)) + f" {rng.choice(CLASS_WORDS)}-{i % 50}"
+        if rng.random() < 0.02:
+            rule = rng.choice(hits)
+            if rule["attribute"] == "tag":
+                parts.append(f"<{rule['trigger_value']}><p>Filtered {i} by tag</p></{rule['trigger_value']}>")
+                continue
+            if rule["attribute"] == "class":
+                classes += f" x{rule['trigger_value']}y" if rule["match_type"] == "partial" else f" {rule['trigger_value']}"
+            else:
+                parts.append(f"<div id='{rule['trigger_value']}'><p>Filtered {i} by id</p></div>")
+                continue
+        tag = rng.choice(("div", "section", "p", "span", "li"))
+        parts.append(f"<{tag} class='{classes}' data-index='{i}'>Element {i} with some text content "
+                     f"<a href='/page/{i}'>link {i}</a></{tag}>")
+    parts.append("</main></body></html>")
+    return "".join(parts)
+
+
+class LinearFilter:
+    """Reference: every rule against every element, in rule order"""
+
+    def __init__(self, rules):
+        self.rules = [normalize_rule(rule) for rule in rules]
+
+    def match(self, tag, attrs):
+        for rule in self.rules:
+            if rule_matches(rule, tag, attrs):
+                return rule
+        return None
+
+
+class _StartTags(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.tags = []
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.append((tag, dict(attrs)))
+
+
+def _best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(args):
+    rules = build_rules(args.rules, args.seed)
+    if args.html_dir:
+        pages = [path.read_text(errors="replace") for path in sorted(Path(args.html_dir).glob("*.htm*"))]
+    else:
+        rng = random.Random(args.seed)
+        pages = [build_page(i, args.elements, rules, rng) for i in range(args.pages)]
+    if not pages:
+        vcprint(f"FAILED: no HTML files in {args.html_dir}", color="red")
+        return 1
+
+    elements = []
+    for html in pages:
+        collector = _StartTags()
+        collector.feed(html)
+        elements.extend(collector.tags)
+
+    linear, compiled = LinearFilter(rules), ContentFilter(rules)
+    start = time.perf_counter()
+    ContentFilter(rules)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    errors = []
+    linear_hits = [linear.match(tag, attrs) for tag, attrs in elements]
+    compiled_hits = [compiled.match(tag, attrs) for tag, attrs in elements]
+    if linear_hits != compiled_hits:
+        errors.append(f"{sum(a != b for a, b in zip(linear_hits, compiled_hits))} elements matched differently")
+    for i, html in enumerate(pages):
+        expected = parse_page(f"https://fixture.test/{i}", html, content_filter=linear)
+        actual = parse_page(f"https://fixture.test/{i}", html, content_filter=compiled)
+        if expected["content_filter_removal_details"] != actual["content_filter_removal_details"]:
+            errors.append(f"page {i}: removal details differ")
+        elif expected["text_data"] != actual["text_data"] or expected["links"] != actual["links"]:
+            errors.append(f"page {i}: text or links differ")
+
+    results = {}
+    for label, content_filter in (("linear", linear), ("compiled", compiled)):
+        match_ms = _best_of(args.repeat, lambda: [content_filter.match(tag, attrs) for tag, attrs in elements])
+        parse_ms = _best_of(args.repeat, lambda: [parse_page(f"https://fixture.test/{i}", html,
+                                                             content_filter=content_filter)
+                                                  for i, html in enumerate(pages)])
+        results[label] = (match_ms, parse_ms)
+
+    removed = sum(hit is not None for hit in compiled_hits)
+    vcprint(f"{len(rules)} rules, {len(pages)} pages, {len(elements):,} elements ({removed:,} matched), "
+            f"compile {compile_ms:.1f} ms", color="yellow")
+    for label, (match_ms, parse_ms) in results.items():
+        vcprint(f"{label:<10} match {match_ms:>9.1f} ms ({match_ms * 1000 / len(elements):>6.2f} us/element)  "
+                f"parse {parse_ms:>9.1f} ms", color="bright_teal")
+    if errors:
+        for error in errors[:20]:
+            vcprint(f"FAILED: {error}", color="red")
+        return 1
+    vcprint("OK: compiled and linear filters give identical removal details", color="green")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiled vs linear content filter rules")
+    parser.add_argument("--rules", type=int, default=600)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--elements", type=int, default=3000, help="elements per generated page")
+    parser.add_argument("--html-dir", default=None, help="benchmark these .html files instead of generated pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,166 @@
+# benchmarks\crawl.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from urllib.robotparser import RobotFileParser
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import FixtureSite, serve_fixture_site
+from src.scraper.crawl import STOP_EXHAUSTED, STOP_MAX_PAGES, STOP_TIME, BloomFilter, Crawler, canonicalize_url
+from src.scraper.fetcher import Fetcher
+
+# Crawls a local multi-page fixture site (benchmarks/fixture_site.py) whose pages link to each other, to "/"
+# (a 404), to a PDF and to a page through a tracking-parameter URL, behind a robots.txt that disallows a prefix.
+# Checks that the crawl reaches exactly the pages a breadth-first walk of the link graph reaches, fetches every
+# page and robots.txt once, keeps depths within bounds, and stops on page count, depth and time limits, both
+# with the exact seen-URL set and with it folded into the Bloom filter. Then compares memory and false
+# positives of a set and a Bloom filter over many URLs. Exits non-zero on a failed check.
+#
+#   python -m benchmarks.crawl --pages 400 --urls 1000000
+
+
+def _expected(site, robots_text, base, max_depth):
+    """Page -> link depth for a breadth-first walk from page 0, and the pages robots.txt blocks"""
+    robots = RobotFileParser()
+    robots.parse(robots_text.splitlines())
+    blocked = {page for page in range(site.pages) if not robots.can_fetch("*", f"{base}/page/{page}")}
+    depths = {0: 0}
+    queue = deque([0])
+    while queue:
+        page = queue.popleft()
+        if page in blocked or depths[page] >= max_depth:
+            continue
+        for linked in site.links(page):
+            if linked not in depths:
+                depths[linked] = depths[page] + 1
+                queue.append(linked)
+    return depths, blocked
+
+
+async def crawl_site(args, label, max_pages=None, max_depth=None, max_seconds=None, host_delay=None,
+                     exact_limit=None):
+    robots_text = f"User-agent: *\nDisallow: /page/{args.blocked_prefix}\n"
+    site = FixtureSite(pages=args.pages, paragraphs=args.paragraphs, kinds=("static", "plain", "noisy"),
+                       robots=robots_text)
+    saved = (settings.SCRAPER_CRAWL_HOST_DELAY_SECONDS, settings.SCRAPER_CRAWL_EXACT_SEEN_LIMIT)
+    if host_delay is not None:
+        settings.SCRAPER_CRAWL_HOST_DELAY_SECONDS = host_delay
+    if exact_limit is not None:
+        settings.SCRAPER_CRAWL_EXACT_SEEN_LIMIT = exact_limit
+    errors = []
+    try:
+        async with serve_fixture_site(site, args.port) as base:
+            fetcher = Fetcher()
+            crawler = Crawler(fetcher, concurrency=args.concurrency)
+            results = []
+            start = time.perf_counter()
+            async for result in crawler.crawl([f"{base}/page/0?utm_campaign=seed"], max_pages=max_pages or 10 ** 9,
+                                              max_depth=max_depth if max_depth is not None else 10 ** 9,
+                                              max_seconds=max_seconds or 600):
+                results.append(result)
+            elapsed = time.perf_counter() - start
+            await fetcher.close()
+    finally:
+        settings.SCRAPER_CRAWL_HOST_DELAY_SECONDS, settings.SCRAPER_CRAWL_EXACT_SEEN_LIMIT = saved
+
+    stats = crawler.stats()
+    pages = {int(r["crawl_url"].rsplit("/", 1)[1]): r["depth"] for r in results
+             if r["status"] == "success" and "/page/" in r["crawl_url"]}
+    depths, blocked = _expected(site, robots_text, base, max_depth if max_depth is not None else 10 ** 9)
+    if site.robots_requests != 1:
+        errors.append(f"robots.txt fetched {site.robots_requests} times")
+    if max(site.page_requests.values(), default=0) > 1:
+        errors.append(f"pages fetched more than once: {[p for p, n in site.page_requests.items() if n > 1][:10]}")
+    if any(r["status"] == "skipped" and int(r["crawl_url"].rsplit("/", 1)[1]) not in blocked for r in results):
+        errors.append("page outside the disallowed prefix reported as blocked")
+    if any(page in blocked for page in site.page_requests):
+        errors.append("fetched a page robots.txt disallows")
+    for page, depth in pages.items():
+        if page not in depths or depth < depths[page] or (max_depth is not None and depth > max_depth):
+            errors.append(f"page {page} at depth {depth}, breadth-first depth {depths.get(page)}")
+            break
+    if max_pages is None and max_seconds is None:
+        expected = set(depths) - blocked
+        if max_depth is None and set(pages) != expected:
+            errors.append(f"crawled {len(pages)} pages, expected {len(expected)}: "
+                          f"missing {sorted(expected - set(pages))[:10]}")
+        if stats["stop_reason"] != STOP_EXHAUSTED:
+            errors.append(f"stop reason {stats['stop_reason']}, expected {STOP_EXHAUSTED}")
+    if max_pages is not None and (stats["stop_reason"] != STOP_MAX_PAGES or stats["pages"] + stats["failed"] != max_pages):
+        errors.append(f"max_pages {max_pages}: {stats['pages']} pages + {stats['failed']} failed, "
+                      f"stop reason {stats['stop_reason']}")
+    if max_seconds is not None and (stats["stop_reason"] != STOP_TIME or elapsed > max_seconds + 1):
+        errors.append(f"max_seconds {max_seconds}: stopped after {elapsed:.1f}s, reason {stats['stop_reason']}")
+
+    vcprint(f"{label:<32} {stats['pages']:>5} pages  {stats['blocked_by_robots']:>3} blocked  "
+            f"{stats['failed']:>2} failed  {stats['duplicates']:>6} duplicate links  "
+            f"{len(results) / elapsed:>7.0f} results/s  seen={stats['seen']['mode']}  stop={stats['stop_reason']}",
+            color="bright_teal" if not errors else "red")
+    return errors
+
+
+def compare_seen(count, error_rate):
+    rng = random.Random(3)
+    urls = [canonicalize_url(f"https://site{rng.randrange(1000)}.example/articles/{i}/slug-{rng.random():.8f}")
+            for i in range(count)]
+    unseen = [f"https://other.example/{i}" for i in range(count)]
+
+    tracemalloc.start()
+    exact = set(urls)
+    set_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del exact
+
+    start = time.perf_counter()
+    bloom = BloomFilter(count, error_rate)
+    for url in urls:
+        bloom.add(url)
+    add_us = (time.perf_counter() - start) * 1e6 / count
+    missed = sum(url not in bloom for url in urls)
+    false_positives = sum(url in bloom for url in unseen) / count
+    vcprint(f"{count:,} URLs: set {set_bytes / 2 ** 20:,.1f} MiB (table only, the URL strings come on top)  "
+            f"bloom {bloom.nbytes / 2 ** 20:,.1f} MiB, {bloom.hashes} hashes, "
+            f"{add_us:.1f} us/add, false positives {false_positives:.4%} (target {error_rate:.2%})",
+            color="bright_teal")
+    errors = []
+    if missed:
+        errors.append(f"Bloom filter lost {missed} added URLs")
+    if false_positives > error_rate * 2:
+        errors.append(f"false positive rate {false_positives:.4%} over twice the target")
+    return errors
+
+
+async def main(args):
+    errors = []
+    errors += await crawl_site(args, "full crawl")
+    errors += await crawl_site(args, "full crawl, Bloom seen set", exact_limit=10)
+    errors += await crawl_site(args, f"max_depth {args.max_depth}", max_depth=args.max_depth)
+    errors += await crawl_site(args, f"max_pages {args.max_pages}", max_pages=args.max_pages)
+    errors += await crawl_site(args, "max_seconds 1, 0.2s host delay", max_seconds=1, host_delay=0.2)
+    errors += compare_seen(args.urls, settings.SCRAPER_CRAWL_BLOOM_ERROR_RATE)
+    if errors:
+        for error in errors:
+            vcprint(f"FAILED: {error}", color="red")
+        return 1
+    vcprint("OK: crawls matched the link graph and stopped on every limit", color="green")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl a local multi-page site and check frontier, dedup and limits")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--paragraphs", type=int, default=6, help="paragraphs per page")
+    parser.add_argument("--blocked-prefix", default="29", help="robots.txt disallows /page/<prefix>")
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--max-pages", type=int, default=25)
+    parser.add_argument("--concurrency", type=int, default=settings.SCRAPER_CONCURRENCY_PER_TASK)
+    parser.add_argument("--urls", type=int, default=200_000, help="URLs for the set vs Bloom filter comparison")
+    parser.add_argument("--port", type=int, default=8760)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,209 @@
+# benchmarks\fixture_site.py
+import asyncio
+import collections
+import contextlib
+import hashlib
+import math
+import pathlib
+import random
+import time
+from email.utils import formatdate
+
+# Local website for scraper benchmarks. Pages come in kinds that exercise each change-detection path:
+#
+#   static      never changes, answers conditional requests with 304
+#   plain       never changes, sends no validators (full body every time)
+#   noisy       body changes every round (timestamp in a script and a comment), text and links don't
+#   mutating    gains a paragraph and a link every round
+#
+# Call site.advance() to move every page to the next round. With `robots`, that text is served as /robots.txt.
+#
+# CorpusSite serves a fixed list of recorded pages (e.g. saved .html files) at /page/<n>, wrapping around, with
+# per-request latency and a share of 500 / 429 answers. Which requests fail and how long each one takes follow
+# from the path and the seed alone, so runs against the same corpus and settings are comparable.
+
+KINDS = ("static", "plain", "noisy", "mutating")
+
+
+class FixtureSite:
+    def __init__(self, pages=40, paragraphs=30, kinds=KINDS, robots=None):
+        self.pages = pages
+        self.paragraphs = paragraphs
+        self.kinds = kinds
+        self.robots = robots
+        self.robots_requests = 0
+        self.page_requests = collections.Counter()
+        self.round = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+
+    def kind(self, page):
+        return self.kinds[page % len(self.kinds)]
+
+    def urls(self, base):
+        return [f"{base}/page/{i}" for i in range(self.pages)]
+
+    def links(self, page):
+        """Pages `page` links to, in the order the rendered HTML does"""
+        return [(page + section + 1) % self.pages for section in range(3)] + [(page * 7 + 3) % self.pages]
+
+    def advance(self):
+        self.round += 1
+
+    def render(self, page):
+        kind = self.kind(page)
+        sections = []
+        for section in range(3):
+            body = "".join(
+                f"<p>Page {page} section {section} paragraph {p}: lorem ipsum dolor sit amet, consectetur "
+                f"adipiscing elit, sed do eiusmod tempor incididunt ut labore.</p>"
+                for p in range(self.paragraphs // 3)
+            )
+            sections.append(f"<h2>Section {section}</h2>{body}<a href='/page/{(page + section + 1) % self.pages}'>next</a>")
+        extra = ""
+        if kind == "mutating":
+            extra = "".join(f"<p>Update {r} for page {page}, <a href='/updates/{page}/{r}'>details</a>.</p>"
+                            for r in range(1, self.round + 1))
+        noise = ""
+        if kind == "noisy":
+            noise = f"<script>window.renderedAt = {self.round};</script><!-- build {self.round} -->"
+        modified = f"2025-01-01T00:{self.round if kind == 'mutating' else 0:02d}:00Z"
+        return (
+            f"<!doctype html><html><head><title>Fixture page {page}</title>"
+            f"<meta property='article:modified_time' content='{modified}'>"
+            f"<link rel='canonical' href='/page/{page}'>{noise}</head>"
+            f"<body><nav><a href='/'>Home</a> <a href='/page/{(page * 7 + 3) % self.pages}?utm_source=fixture#top'>"
+            f"Featured</a></nav><h1>Fixture page {page}</h1>"
+            f"{''.join(sections)}<h2>Updates</h2>{extra}<footer><a href='/about.pdf'>About</a></footer></body></html>"
+        ).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        path = scope["path"]
+        if path == "/robots.txt" and self.robots is not None:
+            self.robots_requests += 1
+            body = self.robots.encode()
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            page = int(path.rsplit("/", 1)[1]) if path.startswith("/page/") else -1
+        except ValueError:
+            page = -1
+        if not 0 <= page < self.pages:
+            await send({"type": "http.response.start", "status": 404, "headers": [(b"content-length", b"0")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        self.requests += 1
+        self.page_requests[page] += 1
+        body = self.render(page)
+        headers = [(b"content-type", b"text/html; charset=utf-8")]
+        if self.kind(page) in ("static", "mutating"):
+            etag = f'"{hashlib.md5(body).hexdigest()}"'.encode()
+            last_modified = formatdate(1735689600 + (self.round if self.kind(page) == "mutating" else 0) * 60,
+                                       usegmt=True).encode()
+            headers += [(b"etag", etag), (b"last-modified", last_modified)]
+            request_headers = dict(scope["headers"])
+            if request_headers.get(b"if-none-match") == etag:
+                self.not_modified += 1
+                await send({"type": "http.response.start", "status": 304, "headers": headers[1:]})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        self.bytes_sent += len(body)
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self):
+        return {"round": self.round, "requests": self.requests, "not_modified": self.not_modified,
+                "bytes_sent": self.bytes_sent}
+
+
+class CorpusSite:
+    def __init__(self, pages, latency_ms=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=1):
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self.statuses = collections.Counter()
+        self.bytes_sent = 0
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        """Every *.html file under `directory`, in name order"""
+        return cls([path.read_bytes() for path in sorted(pathlib.Path(directory).rglob("*.html"))], **kwargs)
+
+    def plan(self, path):
+        """(status, delay in seconds) for a request to `path`"""
+        rng = random.Random(f"{self.seed}:{path}")
+        roll = rng.random()
+        status = 500 if roll < self.error_rate else 429 if roll < self.error_rate + self.throttle_rate else 200
+        # Log-normal spread around latency_ms: most requests near it, a long tail above
+        delay = self.latency_ms * math.exp(rng.gauss(0.0, self.jitter) - self.jitter ** 2 / 2) / 1000
+        return status, delay
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        path = scope["path"]
+        try:
+            page = int(path.rsplit("/", 1)[1]) if path.startswith("/page/") else -1
+        except ValueError:
+            page = -1
+        status, delay = self.plan(f"{path}?{scope.get('query_string', b'').decode()}")
+        if page < 0:
+            status = 404
+        if delay:
+            await asyncio.sleep(delay)
+        self.statuses[status] += 1
+        if status != 200:
+            headers = [(b"content-length", b"0")] + ([(b"retry-after", b"1")] if status == 429 else [])
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        body = self.pages[page % len(self.pages)]
+        self.bytes_sent += len(body)
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self):
+        return {"statuses": dict(self.statuses), "bytes_sent": self.bytes_sent}
+
+
+@contextlib.asynccontextmanager
+async def serve_fixture_site(site, port):
+    """Run `site` on 127.0.0.1:`port` in this event loop for the duration of the block"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(site, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def wait_for_port(port, timeout=20.0):
+    """Wait until something (e.g. a fixture site started in a subprocess) accepts connections on `port`"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
@@ -0,0 +1,118 @@
+# benchmarks\incremental_scrape.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import FixtureSite, serve_fixture_site
+from src.scraper.fetcher import Fetcher
+from src.scraper.incremental import CHANGED, NEW, NOT_MODIFIED, SAME_BODY, SAME_CONTENT, UNCHANGED, \
+    IncrementalScraper, ScrapeStateStore
+
+# Re-scrapes a local fixture site (benchmarks/fixture_site.py) whose pages change between rounds, once
+# recomputing everything and once incrementally, and checks that the incremental run classifies every page
+# correctly: 304 for validated static pages, body hash for plain ones, content hash for markup-only changes,
+# and a diff holding exactly the new paragraph and link for mutating pages. Exits non-zero on a mismatch.
+#
+#   python -m benchmarks.incremental_scrape --pages 200 --rounds 5
+#
+# The fixture server runs in this process, so wall time includes serving.
+
+EXPECTED_REASON = {"static": NOT_MODIFIED, "plain": SAME_BODY, "noisy": SAME_CONTENT}
+
+
+def _check(site, page, result):
+    kind = site.kind(page)
+    if kind in EXPECTED_REASON:
+        if result["change"] != UNCHANGED or result.get("reason") != EXPECTED_REASON[kind]:
+            return f"{kind} page {page}: expected unchanged/{EXPECTED_REASON[kind]}, got {result['change']}/{result.get('reason')}"
+        return None
+    if result["change"] != CHANGED:
+        return f"mutating page {page}: expected changed, got {result['change']}"
+    expected = {
+        "organized_data": {"added": {"H2: Updates": [f"Update {site.round} for page {page}, details."]}, "removed": {}},
+        "links": {"added": {"internal": [f"{result['url'].rsplit('/page/', 1)[0]}/updates/{page}/{site.round}"]},
+                  "removed": {}},
+    }
+    if result["diff"] != expected:
+        return f"mutating page {page}: unexpected diff {result['diff']}"
+    return None
+
+
+async def _round(scraper, urls, full, concurrency):
+    results = {}
+    async for result in scraper.scrape_many(urls, concurrency=concurrency, full=full):
+        results[result["url"]] = result
+    return results
+
+
+async def run_mode(args, full):
+    site = FixtureSite(pages=args.pages, paragraphs=args.paragraphs)
+    async with serve_fixture_site(site, args.port) as base:
+        urls = site.urls(base)
+        fetcher = Fetcher()
+        scraper = IncrementalScraper(fetcher, ScrapeStateStore(tempfile.mktemp(suffix=".sqlite3")))
+        first = await _round(scraper, urls, full, args.concurrency)
+        if not full and any(r["change"] != NEW for r in first.values()):
+            vcprint("FAILED: first round should report every page as new", color="red")
+            return None
+
+        errors = []
+        bytes_before, parsed_before, parse_ms_before = site.bytes_sent, scraper.metrics.parsed, scraper.metrics.parse_ms
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        for _ in range(args.rounds):
+            site.advance()
+            results = await _round(scraper, urls, full, args.concurrency)
+            if not full:
+                for page, url in enumerate(urls):
+                    error = _check(site, page, results[url])
+                    if error:
+                        errors.append(error)
+        summary = {
+            "bytes_per_round": (site.bytes_sent - bytes_before) / args.rounds,
+            "parsed_per_round": (scraper.metrics.parsed - parsed_before) / args.rounds,
+            "parse_ms_per_round": (scraper.metrics.parse_ms - parse_ms_before) / args.rounds,
+            "cpu_ms_per_round": (time.process_time() - cpu_start) * 1000 / args.rounds,
+            "wall_ms_per_round": (time.perf_counter() - wall_start) * 1000 / args.rounds,
+            "errors": errors,
+            "metrics": scraper.metrics.snapshot(),
+        }
+        await fetcher.close()
+        return summary
+
+
+async def main(args):
+    full = await run_mode(args, full=True)
+    incremental = await run_mode(args, full=False)
+    if full is None or incremental is None:
+        return 1
+    for label, summary in (("full re-scrape", full), ("incremental", incremental)):
+        vcprint(
+            f"{label:<16} {summary['bytes_per_round'] / 1024:>9,.0f} KiB/round  "
+            f"{summary['parsed_per_round']:>6.0f} parsed  {summary['parse_ms_per_round']:>8.1f} ms parsing  "
+            f"{summary['cpu_ms_per_round']:>8.1f} ms CPU  {summary['wall_ms_per_round']:>8.1f} ms wall",
+            color="bright_teal",
+        )
+    vcprint(incremental["metrics"], title="Incremental scraper counters", color="yellow", pretty=True)
+    if incremental["errors"]:
+        for error in incremental["errors"][:20]:
+            vcprint(error, color="red")
+        vcprint(f"FAILED: {len(incremental['errors'])} misclassified pages", color="red")
+        return 1
+    vcprint(f"OK: {args.pages} pages x {args.rounds} rounds classified correctly", color="green")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental re-scrape against a local site with mutating pages")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=30, help="paragraphs per page")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=settings.SCRAPER_CONCURRENCY_PER_TASK)
+    parser.add_argument("--port", type=int, default=8740)
+    sys.exit(asyncio.run(main(parser.parse_args())))
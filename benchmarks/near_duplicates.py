@@ -0,0 +1,150 @@
+# benchmarks\near_duplicates.py
+from core.settings import settings
+
+import argparse
+import random
+import sys
+import time
+
+from matrx_utils import vcprint
+
+import src.scraper.dedup as dedup
+from src.scraper.dedup import MinHasher, NearDuplicateDetector
+
+# Near-duplicate detection on a synthetic corpus: --originals documents drawn from a Zipf-like vocabulary, plus
+# --copies syndicated copies of random originals with --edit-rate of their words replaced, a passage cut and a
+# "originally published" line added. Each document has a search-style description (its first words; copies
+# get one word changed in half of the cases).
+#
+# Reports MinHash signature throughput with numpy batches and with the pure-Python fallback, LSH lookup time
+# against comparing each signature with every earlier one, and precision / recall against exact shingle
+# Jaccard similarity (outside a --margin band around the threshold, where MinHash estimates may fall either
+# way) for text_data, plus how many copies are caught by description alone. Exits non-zero below --min-recall / --min-precision.
+#
+#   python -m benchmarks.near_duplicates --originals 4000 --copies 1000
+
+
+def build_corpus(args):
+    rng = random.Random(args.seed)
+    vocabulary = [f"w{i}" for i in range(args.vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(args.vocabulary)]
+    documents, origin = [], {}
+    for _ in range(args.originals):
+        documents.append(rng.choices(vocabulary, weights, k=rng.randint(200, 600)))
+    for i in range(args.copies):
+        source = rng.randrange(args.originals)
+        words = [rng.choice(vocabulary) if rng.random() < args.edit_rate else word for word in documents[source]]
+        cut = rng.randrange(len(words))
+        del words[cut:cut + len(words) // 20]
+        words += ["originally", "published", "at", f"site{i}", "reprinted", "with", "permission"]
+        origin[len(documents)] = source
+        documents.append(words)
+    descriptions = []
+    for index, words in enumerate(documents):
+        description = list(words[:25])
+        if index in origin and rng.random() < 0.5:
+            description[rng.randrange(len(description))] = rng.choice(vocabulary)
+        descriptions.append(" ".join(description))
+    return [" ".join(words) for words in documents], descriptions, origin
+
+
+def jaccard(first, second):
+    first, second = set(first), set(second)
+    return len(first & second) / len(first | second) if first or second else 0.0
+
+
+def score(flagged, text_shingles, threshold, origin, margin):
+    """Precision of flagged (copy, original) pairs with exact Jaccard >= threshold - margin, and recall of copies
+    with exact Jaccard >= threshold + margin: MinHash only estimates similarity, so pairs within `margin` of the
+    threshold may land on either side"""
+    true_flags = sum(jaccard(text_shingles[doc], text_shingles[original]) >= threshold - margin
+                     for doc, original in flagged.items())
+    should = [doc for doc, source in origin.items()
+              if jaccard(text_shingles[doc], text_shingles[source]) >= threshold + margin]
+    found = sum(doc in flagged for doc in should)
+    return (true_flags / len(flagged) if flagged else 1.0), (found / len(should) if should else 1.0), len(should)
+
+
+def main(args):
+    texts, descriptions, origin = build_corpus(args)
+    hasher = MinHasher()
+    start = time.perf_counter()
+    shingles = [hasher.shingles(text) for text in texts]
+    shingle_ms = (time.perf_counter() - start) * 1000
+
+    timings = {}
+    if dedup.np is not None:
+        start = time.perf_counter()
+        signatures = hasher.signatures(shingles)
+        timings["numpy"] = (time.perf_counter() - start) / len(texts)
+    numpy, dedup.np = dedup.np, None
+    try:
+        sample = [[int(x) for x in item] for item in shingles[:args.python_sample]]
+        start = time.perf_counter()
+        python_signatures = MinHasher().signatures(sample)
+        timings["python"] = (time.perf_counter() - start) / len(sample)
+    finally:
+        dedup.np = numpy
+    if dedup.np is None:
+        signatures = MinHasher().signatures(shingles)
+    elif python_signatures != signatures[:len(sample)]:
+        vcprint("FAILED: numpy and pure-Python signatures differ", color="red")
+        return 1
+
+    # Index lookups vs comparing every new signature with all earlier ones
+    detector = NearDuplicateDetector()
+    start = time.perf_counter()
+    verdicts = detector.add_signatures(list(range(len(texts))), signatures)
+    lsh_ms = (time.perf_counter() - start) * 1000
+    flagged = {doc: original for doc, (original, _) in enumerate(verdicts) if original is not None}
+    brute_ms = None
+    if dedup.np is not None:
+        matrix = dedup.np.asarray(signatures, dtype=dedup.np.uint32)
+        start = time.perf_counter()
+        for i in range(1, len(texts)):
+            (matrix[:i] == matrix[i]).mean(axis=1).max()
+        brute_ms = (time.perf_counter() - start) * 1000
+
+    text_shingles = [[int(x) for x in item] for item in shingles]
+    precision, recall, expected = score(flagged, text_shingles, detector.threshold, origin, args.margin)
+
+    description_detector = NearDuplicateDetector()
+    start = time.perf_counter()
+    description_flags = {}
+    for i, description in enumerate(descriptions):
+        original = description_detector.check_description(i, description)
+        if original is not None:
+            description_flags[i] = original
+    description_ms = (time.perf_counter() - start) * 1000
+    description_hits = sum(doc in origin and origin[doc] == original for doc, original in description_flags.items())
+    description_false = len(description_flags) - description_hits
+
+    vcprint(f"{len(texts):,} documents ({args.copies:,} copies), shingling {shingle_ms:,.0f} ms", color="yellow")
+    for label, seconds in timings.items():
+        vcprint(f"MinHash signatures ({label:<6}) {seconds * 1e6:>9.1f} us/document", color="bright_teal")
+    vcprint(f"LSH lookups for the corpus    {lsh_ms:>9.1f} ms"
+            + (f"   (all-pairs signature scan {brute_ms:,.1f} ms)" if brute_ms is not None else ""), color="bright_teal")
+    vcprint(f"text_data: {len(flagged)} flagged, {expected} copies with Jaccard >= {detector.threshold + args.margin:.2f}: "
+            f"precision {precision:.3f}, recall {recall:.3f}", color="bright_teal")
+    vcprint(f"descriptions: {description_hits} of {args.copies} copies caught before fetching, "
+            f"{description_false} false matches, {description_ms:.1f} ms", color="bright_teal")
+    if recall < args.min_recall or precision < args.min_precision:
+        vcprint(f"FAILED: precision {precision:.3f} / recall {recall:.3f} below {args.min_precision} / "
+                f"{args.min_recall}", color="red")
+        return 1
+    vcprint("OK", color="green")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate detection on a synthetic corpus")
+    parser.add_argument("--originals", type=int, default=4000)
+    parser.add_argument("--copies", type=int, default=1000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--edit-rate", type=float, default=0.01, help="fraction of words replaced in a copy")
+    parser.add_argument("--python-sample", type=int, default=200, help="documents timed on the pure-Python path")
+    parser.add_argument("--margin", type=float, default=0.05, help="Jaccard band around the threshold not scored")
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--min-precision", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=5)
+    sys.exit(main(parser.parse_args()))
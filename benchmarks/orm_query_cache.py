@@ -0,0 +1,80 @@
+# benchmarks\orm_query_cache.py
+from core.settings import settings
+import core.scripts.initialize_db_models
+
+import argparse
+import asyncio
+import time
+
+from matrx_utils import vcprint
+from matrx_utils.database.orm.models import DataBroker
+from matrx_utils.database.query.executor import QueryExecutor
+from matrx_utils.database.query.builder import QueryBuilder
+
+from core.database.query_cache import get_query_cache
+
+# Measures DataBroker get-by-id throughput with and without the compiled query cache.
+# Runs against the database configured for the ORM (point your .env at a local database).
+#
+#   python -m benchmarks.orm_query_cache --broker-id <uuid> --iterations 5000 --concurrency 20
+#   python -m benchmarks.orm_query_cache --build-only
+
+
+async def _run_lookups(broker_id, iterations, concurrency):
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await DataBroker.get(use_cache=False, id=broker_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - start
+
+
+def _run_builds(broker_id, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        QueryExecutor(QueryBuilder(model=DataBroker).filter(id=broker_id)._build_query())
+    return time.perf_counter() - start
+
+
+def _report(label, iterations, elapsed):
+    vcprint(
+        f"{label:<32} {iterations / elapsed:>10.0f} ops/s   {elapsed / iterations * 1_000_000:>8.1f} us/op",
+        color="bright_teal",
+    )
+
+
+async def main(args):
+    cache = get_query_cache()
+    modes = [("uncached", False, False), ("compiled SQL", True, False)]
+    if args.prepared:
+        modes.append(("compiled SQL + prepared", True, True))
+
+    for label, cache_enabled, prepared in modes:
+        cache.enabled = cache_enabled
+        cache.clear()
+        settings.DB_PREPARED_STATEMENTS = prepared
+
+        if args.build_only:
+            _run_builds(args.broker_id, 1000)
+            _report(f"build {label}", args.iterations, _run_builds(args.broker_id, args.iterations))
+            continue
+
+        await _run_lookups(args.broker_id, min(200, args.iterations), args.concurrency)
+        _report(f"get_by_id {label}", args.iterations, await _run_lookups(args.broker_id, args.iterations, args.concurrency))
+
+    vcprint(cache.stats(), title="Query cache stats", color="yellow", pretty=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DataBroker get-by-id with and without the compiled query cache")
+    parser.add_argument("--broker-id", default="109e838c-f285-48fc-91ad-39bc41261eeb")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--prepared", action="store_true", help="Also run with server-side prepared statements")
+    parser.add_argument("--build-only", action="store_true", help="Only time SQL construction, no database round trips")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,164 @@
+# benchmarks\profiling.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import FixtureSite
+from core.http.profiling import ProfileMiddleware
+from core.profiling import StackSampler
+from src.scraper.parser import parse_page
+
+# Stack sampler cost and attribution:
+#   - parses fixture pages (benchmarks/fixture_site.py) on the event loop and in the thread pool, alternating
+#     --rounds of --seconds with no profile and under a process profile, and reports median throughput and the
+#     sampler thread's CPU time as a share of the profiled wall time. Throughput is only indicative: on a
+#     small or shared machine rounds vary by 10-20% on their own, so --max-overhead applies to the CPU share;
+#   - ProfileMiddleware's cost for requests that don't ask for a profile, against calling the app directly;
+#   - runs a profiled and an unprofiled task side by side and checks that the task profile holds the profiled
+#     task's loop and thread pool work but none of the other task's, while the process profile holds both.
+# Exits non-zero above --max-overhead or on an attribution mismatch.
+#
+#   python -m benchmarks.profiling --rounds 5
+
+
+def profiled_work(html):
+    return parse_page("https://fixture.example/profiled", html)
+
+
+def profiled_thread_work(html):
+    return parse_page("https://fixture.example/profiled-thread", html)
+
+
+def other_work(html):
+    return parse_page("https://fixture.example/other", html)
+
+
+async def parse_for(seconds, pages):
+    """Pages parsed in `seconds`: one loop task and one thread pool job at a time"""
+    deadline = time.perf_counter() + seconds
+    count = 0
+
+    async def in_threads():
+        nonlocal count
+        while time.perf_counter() < deadline:
+            await asyncio.to_thread(parse_page, "https://fixture.example/t", pages[count % len(pages)])
+            count += 1
+
+    worker = asyncio.create_task(in_threads())
+    while time.perf_counter() < deadline:
+        parse_page("https://fixture.example/l", pages[count % len(pages)])
+        count += 1
+        await asyncio.sleep(0)
+    await worker
+    return count
+
+
+async def middleware_cost(requests):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/",
+             "headers": [(b"host", b"localhost"), (b"accept", b"application/json"), (b"user-agent", b"bench")]}
+    middleware = ProfileMiddleware(app, StackSampler())
+    timings = {}
+    for label, target in (("direct", app), ("middleware", middleware)):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await target(scope, None, send)
+        timings[label] = (time.perf_counter() - start) / requests * 1e6
+    return timings
+
+
+async def attribution(sampler, html, seconds):
+    stop = time.perf_counter() + seconds
+
+    async def profiled():
+        with sampler.profile_task("profiled") as session:
+            async def child():
+                while time.perf_counter() < stop:
+                    await asyncio.to_thread(profiled_thread_work, html)
+
+            helper = asyncio.create_task(child())
+            while time.perf_counter() < stop:
+                profiled_work(html)
+                await asyncio.sleep(0)
+            await helper
+        return session
+
+    async def other():
+        while time.perf_counter() < stop:
+            other_work(html)
+            await asyncio.sleep(0)
+
+    process = sampler.start(seconds + 1)
+    session, _ = await asyncio.gather(profiled(), other())
+    sampler.stop(process.id)
+    return session.collapsed(), process.collapsed()
+
+
+async def main(args):
+    site = FixtureSite(pages=20, paragraphs=120)
+    pages = [site.render(i).decode() for i in range(site.pages)]
+    await asyncio.to_thread(parse_page, "https://fixture.example/warmup", pages[0])
+    sampler = StackSampler()
+    failures = []
+
+    idle, sampled = [], []
+    for _ in range(args.rounds):
+        idle.append(await parse_for(args.seconds, pages) / args.seconds)
+        session = sampler.start(args.seconds + 5)
+        sampled.append(await parse_for(args.seconds, pages) / args.seconds)
+        sampler.stop(session.id)
+    baseline, profiled = statistics.median(idle), statistics.median(sampled)
+    stats = sampler.stats()
+    share = stats["cpu_ms"] / (args.rounds * args.seconds * 1000)
+    vcprint(f"parsed {baseline:,.0f} pages/s idle, {profiled:,.0f} pages/s under a {settings.PROFILE_INTERVAL_MS:g}ms "
+            f"process profile (medians of {args.rounds} rounds, {1 - profiled / baseline:+.1%})", color="yellow")
+    vcprint(f"sampler thread CPU: {stats['avg_tick_ms']:.3f} ms per tick, {share:.1%} of profiled wall time",
+            color="yellow")
+    if share > args.max_overhead:
+        failures.append(f"sampler CPU {share:.1%} of wall time, above {args.max_overhead:.0%}")
+
+    timings = await middleware_cost(args.requests)
+    vcprint(f"request without {settings.PROFILE_REQUEST_HEADER}: {timings['direct']:.2f} us direct, "
+            f"{timings['middleware']:.2f} us through ProfileMiddleware", color="yellow")
+
+    task_profile, process_profile = await attribution(sampler, pages[0], args.seconds / 2)
+    checks = (
+        ("task profile", task_profile, "profiled_work", True),
+        ("task profile", task_profile, "(thread pool);", True),
+        ("task profile", task_profile, "profiled_thread_work", True),
+        ("task profile", task_profile, "other_work", False),
+        ("process profile", process_profile, "profiled_work", True),
+        ("process profile", process_profile, "other_work", True),
+    )
+    for label, profile, needle, expected in checks:
+        if (needle in profile) != expected:
+            failures.append(f"{label} {'lacks' if expected else 'contains'} {needle}")
+    vcprint(f"task profile: {sum(int(line.rsplit(' ', 1)[1]) for line in task_profile.splitlines()):,} samples, "
+            f"{len(task_profile.splitlines())} stacks", color="bright_teal")
+
+    for failure in failures:
+        vcprint(f"FAILED: {failure}", color="red")
+    if failures:
+        return 1
+    vcprint("OK", color="green")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stack sampler overhead and per-task attribution")
+    parser.add_argument("--seconds", type=float, default=2.0, help="per round and mode")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--max-overhead", type=float, default=0.03, help="sampler CPU share of wall time")
+    sys.exit(asyncio.run(main(parser.parse_args())))
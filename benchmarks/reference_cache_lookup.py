@@ -0,0 +1,66 @@
+# benchmarks\reference_cache_lookup.py
+from core.settings import settings
+import core.scripts.initialize_db_models
+
+import argparse
+import asyncio
+import time
+
+from matrx_utils import vcprint
+from matrx_utils.database.orm.models import DataInputComponent, DataOutputComponent
+
+from core.database.reference_cache import preload_reference_tables, reference_cache_stats
+
+# Compares reference-table lookups answered from the preloaded in-memory indexes against the
+# uncached database path. Runs against the database configured for the ORM.
+#
+#   python -m benchmarks.reference_cache_lookup --iterations 2000 --concurrency 10
+
+LOOKUPS = [
+    (DataInputComponent, {"name": "Simple Select Dropdown"}),
+    (DataOutputComponent, {"component_type": "chatResponse"}),
+]
+
+
+async def _run(iterations, concurrency):
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            model, filters = LOOKUPS[remaining % len(LOOKUPS)]
+            await model.filter(**filters).first()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - start
+
+
+def _report(label, iterations, elapsed):
+    vcprint(
+        f"{label:<24} {iterations / elapsed:>12.0f} lookups/s   {elapsed / iterations * 1_000_000:>10.1f} us/lookup",
+        color="bright_teal",
+    )
+
+
+async def main(args):
+    settings.REFERENCE_CACHE_ENABLED = False
+    uncached_iterations = min(args.iterations, args.uncached_iterations)
+    _report("uncached (database)", uncached_iterations, await _run(uncached_iterations, args.concurrency))
+
+    settings.REFERENCE_CACHE_ENABLED = True
+    start = time.perf_counter()
+    await preload_reference_tables()
+    vcprint(f"Preload took {(time.perf_counter() - start) * 1000:.0f}ms", color="yellow")
+    _report("reference cache", args.iterations, await _run(args.iterations, args.concurrency))
+
+    vcprint(reference_cache_stats(), title="Reference cache stats", color="yellow", pretty=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reference-table lookups from the in-memory indexes vs the database")
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--uncached-iterations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,332 @@
+# benchmarks\scrape_throughput.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import CorpusSite, FixtureSite, wait_for_port
+
+# End-to-end throughput of the scraper's main workload: ScrapeService.process_task("scrape_urls") against a
+# local site (benchmarks/fixture_site.py CorpusSite, run in a subprocess) serving a corpus of recorded pages
+# (--corpus, a directory of saved .html files; generated fixture pages without one) with --latency-ms per
+# request, log-normal --jitter, and --error-rate 500s / --throttle-rate 429s.
+#
+# Each concurrency level runs in a fresh process (so peak RSS and the per-host latency state are its own):
+# `level` tasks at a time, --tasks in all, each scraping --pages-per-task URLs, with a stream_handler that
+# records when each event arrives. Per level it reports pages/s, time to first result per task, p50/p99
+# per-page latency (fetch and parse, timed around scrape_page), event loop lag, CPU per page and peak RSS.
+#
+# Results go to --output as JSON (commit, machine and settings included); --compare with an earlier file
+# prints the change per metric. Exits non-zero when a level fails to run or scrapes no pages.
+#
+#   python -m benchmarks.scrape_throughput --levels 1,4,16 --compare temp/benchmarks/scrape_throughput-abc1234.json
+
+# (metric, label, higher is better)
+METRICS = (
+    ("pages_per_second", "pages/s", True),
+    ("first_result_p50_ms", "first result p50 ms", False),
+    ("page_p50_ms", "page p50 ms", False),
+    ("page_p99_ms", "page p99 ms", False),
+    ("loop_lag_p99_ms", "loop lag p99 ms", False),
+    ("cpu_ms_per_page", "CPU ms/page", False),
+    ("peak_rss_mib", "peak RSS MiB", False),
+)
+
+
+class RecordingStreamHandler:
+    """stream_handler keeping the arrival time and type of every event, and the page statuses of results"""
+
+    def __init__(self):
+        self.events = []
+        self.statuses = []
+
+    def _record(self, event_type):
+        self.events.append((time.perf_counter(), event_type))
+
+    async def send_chunk(self, chunk):
+        self._record("chunk")
+
+    async def send_status_update(self, status, system_message=None, user_visible_message=None, metadata=None):
+        self._record("status_update")
+
+    async def send_data(self, data):
+        self._record("data")
+        for result in data.get("results", ()) if isinstance(data, dict) else ():
+            self.statuses.append(result["status"] if result["status"] != "error" else result["error"])
+
+    async def send_data_final(self, data):
+        self._record("data_final")
+
+    async def send_error(self, error_type=None, message=None, user_visible_message=None, details=None, **kwargs):
+        self._record("error")
+
+    async def send_end(self):
+        self._record("end")
+
+    def first(self, event_type):
+        return next((at for at, kind in self.events if kind == event_type), None)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _round(value, digits=1):
+    return None if value is None else round(value, digits)
+
+
+async def _watch_loop_lag(samples, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        before = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, (loop.time() - before - interval) * 1000))
+
+
+def _error_kind(error):
+    if error.startswith("HTTP "):
+        return error.split(" ", 2)[0] + " " + error.split(" ", 2)[1]
+    return error.split(":", 1)[0]
+
+
+async def run_level(args):
+    """One concurrency level, in this process; returns its measurements"""
+    from src.scraper import pages
+    from src.scraper.archive import close_scrape_archive
+    from src.scraper.fetcher import get_fetcher
+    from src.scraper_service import ScrapeService
+
+    page_ms = []
+    scrape_page = pages.scrape_page
+
+    async def timed_scrape_page(url, fetcher=None):
+        start = time.perf_counter()
+        try:
+            return await scrape_page(url, fetcher)
+        finally:
+            page_ms.append((time.perf_counter() - start) * 1000)
+
+    pages.scrape_page = timed_scrape_page
+    base = f"http://127.0.0.1:{args.port}"
+
+    async def task(index):
+        handler = RecordingStreamHandler()
+        urls = [f"{base}/page/{index * args.pages_per_task + i}?task={index}" for i in range(args.pages_per_task)]
+        start = time.perf_counter()
+        await ScrapeService(stream_handler=handler).process_task("scrape_urls", {"urls": urls})
+        first = handler.first("data")
+        return {"seconds": time.perf_counter() - start, "statuses": handler.statuses,
+                "first_result_ms": None if first is None else (first - start) * 1000}
+
+    with tempfile.TemporaryDirectory() as archive_path:
+        settings.SCRAPER_ARCHIVE_PATH = archive_path
+        for i in range(args.warmup):
+            await task(args.tasks + i)
+        page_ms.clear()
+
+        lag = []
+        watcher = asyncio.create_task(_watch_loop_lag(lag))
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        queue = iter(range(args.tasks))
+        tasks = []
+
+        async def worker():
+            for index in queue:
+                tasks.append(await task(index))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.level)))
+        seconds = time.perf_counter() - start
+        after = resource.getrusage(resource.RUSAGE_SELF)
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+        await close_scrape_archive()
+        await get_fetcher().close()
+
+    statuses = [status for result in tasks for status in result["statuses"]]
+    scraped = statuses.count("success")
+    errors = {}
+    for status in statuses:
+        if status != "success":
+            errors[_error_kind(status)] = errors.get(_error_kind(status), 0) + 1
+    cpu_ms = (after.ru_utime - usage.ru_utime + after.ru_stime - usage.ru_stime) * 1000
+    first_results = [result["first_result_ms"] for result in tasks if result["first_result_ms"] is not None]
+    return {
+        "level": args.level,
+        "tasks": len(tasks),
+        "pages": len(statuses),
+        "scraped": scraped,
+        "errors": errors,
+        "seconds": _round(seconds, 3),
+        "pages_per_second": _round(scraped / seconds, 2),
+        "first_result_p50_ms": _round(_percentile(first_results, 0.5)),
+        "first_result_p99_ms": _round(_percentile(first_results, 0.99)),
+        "task_p50_ms": _round(_percentile([result["seconds"] * 1000 for result in tasks], 0.5)),
+        "page_p50_ms": _round(_percentile(page_ms, 0.5)),
+        "page_p99_ms": _round(_percentile(page_ms, 0.99)),
+        "loop_lag_p50_ms": _round(_percentile(lag, 0.5), 2),
+        "loop_lag_p99_ms": _round(_percentile(lag, 0.99), 2),
+        "loop_lag_max_ms": _round(max(lag, default=0.0), 2),
+        "cpu_percent": _round(cpu_ms / (seconds * 10)),
+        "cpu_ms_per_page": _round(cpu_ms / max(1, len(statuses)), 2),
+        # ru_maxrss is the peak, in KiB on Linux
+        "rss_before_mib": _round(rss_before / 1024),
+        "peak_rss_mib": _round(after.ru_maxrss / 1024),
+    }
+
+
+def _git(*command):
+    try:
+        return subprocess.run(["git", *command], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                              timeout=30).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(previous, current):
+    before = {level["level"]: level for level in previous["levels"]}
+    vcprint(f"compared with {previous.get('commit')} ({previous.get('created_at')}):", color="yellow")
+    for level in current["levels"]:
+        old = before.get(level["level"])
+        if old is None:
+            continue
+        changes = []
+        for metric, label, higher_is_better in METRICS:
+            if not old.get(metric) or level.get(metric) is None:
+                continue
+            change = (level[metric] - old[metric]) / old[metric] * 100
+            better = change > 0 if higher_is_better else change < 0
+            changes.append(f"{label} {old[metric]:g} -> {level[metric]:g} ({change:+.1f}%{'' if better else ' worse'})")
+        vcprint(f"  {level['level']:>3} at a time: " + ", ".join(changes), color="bright_teal")
+
+
+def main(args):
+    levels = [int(level) for level in args.levels.split(",")]
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.scrape_throughput", "--server-port", str(args.port),
+                               *_server_arguments(args)], env=dict(os.environ))
+    results = []
+    failed = []
+    try:
+        asyncio.run(wait_for_port(args.port))
+        for level in levels:
+            with tempfile.NamedTemporaryFile("r", suffix=".json") as result_file:
+                completed = subprocess.run([sys.executable, "-m", "benchmarks.scrape_throughput", "--run-level",
+                                            str(level), "--result-file", result_file.name, "--port", str(args.port),
+                                            "--tasks", str(args.tasks), "--pages-per-task", str(args.pages_per_task),
+                                            "--warmup", str(args.warmup)], env=dict(os.environ))
+                text = result_file.read()
+            if completed.returncode or not text:
+                failed.append(f"level {level} exited with {completed.returncode}")
+                continue
+            result = json.loads(text)
+            if not result["scraped"]:
+                failed.append(f"level {level} scraped no pages: {result['errors']}")
+            results.append(result)
+            vcprint(f"{level:>3} at a time: {result['pages_per_second']:>7.1f} pages/s   first result p50 "
+                    f"{result['first_result_p50_ms']:>7.0f} ms   page p50 {result['page_p50_ms']:>6.0f} / p99 "
+                    f"{result['page_p99_ms']:>6.0f} ms   loop lag p99 {result['loop_lag_p99_ms']:>6.1f} ms   "
+                    f"CPU {result['cpu_percent']:>5.1f}% ({result['cpu_ms_per_page']:.1f} ms/page)   "
+                    f"peak RSS {result['peak_rss_mib']:>6.1f} MiB   errors {result['errors']}", color="bright_teal")
+    finally:
+        server.terminate()
+        server.wait()
+
+    commit = _git("rev-parse", "--short", "HEAD")
+    report = {
+        "benchmark": "scrape_throughput",
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "task": "scrape_urls",
+            "tasks": args.tasks,
+            "pages_per_task": args.pages_per_task,
+            "corpus": args.corpus or f"fixture pages ({args.paragraphs} paragraphs)",
+            "latency_ms": args.latency_ms,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "throttle_rate": args.throttle_rate,
+            "seed": args.seed,
+            "per_task_concurrency": settings.SCRAPER_CONCURRENCY_PER_TASK,
+            "max_connections": settings.SCRAPER_MAX_CONNECTIONS,
+        },
+        "levels": results,
+    }
+    output = args.output or settings.TEMP_DIR / "benchmarks" / f"scrape_throughput-{commit or 'unknown'}.json"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    vcprint(f"results written to {output}", color="yellow")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+    for failure in failed:
+        vcprint(f"FAILED: {failure}", color="red")
+    return 1 if failed else 0
+
+
+def _server_arguments(args):
+    arguments = ["--latency-ms", str(args.latency_ms), "--jitter", str(args.jitter), "--error-rate",
+                 str(args.error_rate), "--throttle-rate", str(args.throttle_rate), "--seed", str(args.seed),
+                 "--paragraphs", str(args.paragraphs)]
+    return arguments + (["--corpus", args.corpus] if args.corpus else [])
+
+
+def run_server(args):
+    import uvicorn
+
+    options = dict(latency_ms=args.latency_ms, jitter=args.jitter, error_rate=args.error_rate,
+                   throttle_rate=args.throttle_rate, seed=args.seed)
+    if args.corpus:
+        site = CorpusSite.from_directory(args.corpus, **options)
+    else:
+        fixture = FixtureSite(pages=40, paragraphs=args.paragraphs, kinds=("plain",))
+        site = CorpusSite([fixture.render(page) for page in range(fixture.pages)], **options)
+    uvicorn.run(site, host="127.0.0.1", port=args.server_port, log_level="warning", lifespan="off")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end scrape_urls throughput against a local corpus site")
+    parser.add_argument("--levels", default="1,4,16", help="comma separated numbers of tasks run at a time")
+    parser.add_argument("--tasks", type=int, default=32, help="tasks per level")
+    parser.add_argument("--pages-per-task", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=1, help="tasks run before measuring")
+    parser.add_argument("--corpus", default=None, help="directory of recorded .html pages")
+    parser.add_argument("--paragraphs", type=int, default=120, help="paragraphs per generated page without --corpus")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter", type=float, default=0.5, help="sigma of the log-normal latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.03, help="share of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="JSON results file (default temp/benchmarks/...)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare with")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--server-port", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--run-level", dest="level", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.server_port is not None:
+        run_server(args)
+    elif args.level is not None:
+        measured = asyncio.run(run_level(args))
+        with open(args.result_file, "w") as f:
+            json.dump(measured, f)
+    else:
+        sys.exit(main(args))
@@ -0,0 +1,123 @@
+# benchmarks\session_memory.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import gc
+import json
+import tracemalloc
+
+import socketio
+from matrx_utils import vcprint
+
+from core.socket.core.session_registry import get_session_registry, install_session_tracking, process_rss_bytes
+from src.scraper_service import ScrapeService
+
+# Opens many simulated user-session connections in-process and reports memory per connection:
+# idle, after each session ran a scrape task (service state held), and after idle eviction.
+# Connections are driven through the Socket.IO packet layer, so Engine.IO transport buffers are not included.
+#
+#   python -m benchmarks.session_memory --connections 20000
+#   python -m benchmarks.session_memory --connections 20000 --legacy-state
+
+NAMESPACE = "/bench"
+
+TASK_CONTEXT = {
+    "keywords": ["giorgia meloni trump", "us politics"],
+    "country_code": "US",
+    "total_results_per_keyword": 10,
+    "search_type": "all",
+    "max_page_read": 5,
+    "get_links": True,
+    "get_main_image": True,
+    "get_text_data": True,
+    "get_organized_data": True,
+    "get_overview": True,
+    "include_media": False,
+}
+
+
+class LegacyScrapeService(ScrapeService):
+    """Per-instance attribute defaults, as ScrapeService stored them before they moved to class level"""
+
+    def __init__(self, stream_handler=None):
+        super().__init__(stream_handler)
+        for name in ("keyword", "max_page_read", "keywords", "country_code", "total_results_per_keyword",
+                     "search_type", "mic_check_message", "stream", "urls", "get_content_filter_removal_details",
+                     "get_links", "get_main_image", "get_text_data", "get_organized_data", "get_structured_data",
+                     "get_overview", "include_highlighting_markers", "include_media", "include_media_links",
+                     "include_media_description", "include_anchors", "anchor_size"):
+            setattr(self, name, None)
+
+    def release_state(self):
+        return False
+
+
+class BenchNamespace(socketio.AsyncNamespace):
+    """Keeps one service per session, the way a service factory holds per-connection services"""
+
+    def __init__(self, namespace, service_class):
+        super().__init__(namespace)
+        self.service_class = service_class
+        self.services = {}
+
+    async def on_connect(self, sid, environ, auth=None):
+        return True
+
+    async def on_task(self, sid, data):
+        service = self.service_class(stream_handler=None)
+        for key, value in data.items():
+            setattr(service, key, value)
+        self.services[sid] = service
+
+    async def on_disconnect(self, sid, reason=None):
+        self.services.pop(sid, None)
+
+
+def _measure():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0], process_rss_bytes()
+
+
+def _report(label, before, after, connections):
+    traced = (after[0] - before[0]) / connections
+    rss = (after[1] - before[1]) / connections
+    vcprint(f"{label:<34} {traced:>9.0f} B/conn (python heap)   {rss:>9.0f} B/conn (RSS)", color="bright_teal")
+
+
+async def main(args):
+    sio = socketio.AsyncServer(async_mode="asgi", async_handlers=False)
+    namespace = BenchNamespace(NAMESPACE, LegacyScrapeService if args.legacy_state else ScrapeService)
+    sio.register_namespace(namespace)
+    install_session_tracking(namespace)
+    registry = get_session_registry()
+
+    tracemalloc.start()
+    baseline = _measure()
+
+    for i in range(args.connections):
+        eio_sid = f"eio{i}"
+        await sio._handle_eio_connect(eio_sid, {"REMOTE_ADDR": "127.0.0.1"})
+        await sio._handle_eio_message(eio_sid, f"0{NAMESPACE}," + json.dumps({"user_id": f"user-{i % args.users}"}))
+    connected = _measure()
+    _report("connected, idle", baseline, connected, args.connections)
+
+    payload = json.dumps(["task", TASK_CONTEXT])
+    for i in range(args.connections):
+        await sio._handle_eio_message(f"eio{i}", f"2{NAMESPACE},{payload}")
+    with_state = _measure()
+    _report("with service state", baseline, with_state, args.connections)
+
+    evicted = registry.evict_idle(idle_seconds=0)
+    after_eviction = _measure()
+    _report(f"after idle eviction ({evicted} sessions)", baseline, after_eviction, args.connections)
+
+    vcprint(registry.memory_report(), title="Session memory report", color="yellow", pretty=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory per simulated user-session connection")
+    parser.add_argument("--connections", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--legacy-state", action="store_true", help="store service defaults per instance")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,174 @@
+# benchmarks\socketio_fanout.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import socketio
+from matrx_utils import vcprint
+
+from core.socket.client_manager import close_client_manager, install_client_manager, start_client_manager
+
+# Multi-process fan-out check on localhost: starts N Socket.IO worker processes sharing the configured
+# client manager, connects clients to every worker, has one worker emit a burst to a room and verifies
+# that every client on every worker receives every event. Exits non-zero if anything is lost.
+#
+#   python -m benchmarks.socketio_fanout --workers 4 --clients 5 --events 2000
+#   python -m benchmarks.socketio_fanout --manager redis --url redis://localhost:6379/0
+#
+# Workers are plain Socket.IO apps (no database) so the run only measures the bus.
+
+ROOM = "fanout"
+
+
+def _worker_app():
+    sio = socketio.AsyncServer(async_mode="asgi")
+    install_client_manager(sio)
+
+    @sio.on("join")
+    async def join(sid):
+        await sio.enter_room(sid, ROOM)
+        return True
+
+    @sio.on("burst")
+    async def burst(sid, data):
+        padding = "x" * data.get("size", 0)
+        for i in range(data["count"]):
+            await sio.emit("tick", {"i": i, "t": time.time(), "pad": padding}, room=ROOM)
+            if i % 100 == 99:
+                await asyncio.sleep(0)
+        return True
+
+    @sio.on("bus_stats")
+    async def bus_stats(sid):
+        stats = sio.manager.stats() if hasattr(sio.manager, "stats") else {"manager": "memory"}
+        return {k: v for k, v in stats.items() if k != "broker"}
+
+    async def on_startup():
+        start_client_manager(sio)
+
+    async def on_shutdown():
+        await close_client_manager(sio)
+
+    return socketio.ASGIApp(sio, on_startup=on_startup, on_shutdown=on_shutdown)
+
+
+def run_worker(port):
+    import uvicorn
+
+    uvicorn.run(_worker_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+async def run(args):
+    env = dict(os.environ, SOCKETIO_MANAGER=args.manager, SOCKETIO_BUS_BATCH_MS=str(args.batch_ms))
+    if args.url:
+        env["SOCKETIO_MANAGER_URL"] = args.url
+    elif args.manager == "unix":
+        env["SOCKETIO_MANAGER_URL"] = f"unix://{tempfile.mkdtemp()}/socketio.sock"
+
+    ports = [args.port + i for i in range(args.workers)]
+    workers = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.socketio_fanout", "--worker-port", str(port)], env=env)
+        for port in ports
+    ]
+    clients = []
+    try:
+        await asyncio.gather(*[_wait_for_port(port) for port in ports])
+
+        received = []
+        latencies = []
+        done = asyncio.Event()
+        expected = args.events * args.workers * args.clients
+
+        for port in ports:
+            for _ in range(args.clients):
+                client = socketio.AsyncClient()
+                counter = {"n": 0}
+                received.append(counter)
+
+                @client.on("tick")
+                async def tick(data, counter=counter):
+                    counter["n"] += 1
+                    latencies.append((time.time() - data["t"]) * 1000)
+                    if len(latencies) == expected:
+                        done.set()
+
+                await client.connect(f"http://127.0.0.1:{port}", transports=args.transports.split(","))
+                await client.call("join")
+                clients.append(client)
+
+        start = time.perf_counter()
+        await clients[0].call("burst", {"count": args.events, "size": args.size}, timeout=120)
+        try:
+            await asyncio.wait_for(done.wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - start
+
+        delivered = sum(c["n"] for c in received)
+        vcprint(
+            f"{args.manager}: {args.workers} workers x {args.clients} clients, {args.events} events -> "
+            f"{delivered}/{expected} delivered in {elapsed:.2f}s ({delivered / elapsed:,.0f} deliveries/s)",
+            color="bright_teal",
+        )
+        vcprint(
+            f"end-to-end latency ms: p50 {_percentile(latencies, 0.5):.2f}  p99 {_percentile(latencies, 0.99):.2f}  "
+            f"max {max(latencies, default=0.0):.2f}",
+            color="bright_teal",
+        )
+        for port, client in zip(ports, clients[::args.clients]):
+            vcprint(await client.call("bus_stats"), title=f"Worker :{port} bus stats", color="yellow", pretty=True)
+
+        if delivered != expected:
+            vcprint(f"FAILED: {expected - delivered} deliveries missing", color="red")
+            return 1
+        return 0
+    finally:
+        for client in clients:
+            await client.disconnect()
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-process Socket.IO fan-out on localhost")
+    parser.add_argument("--manager", default="unix", help='"unix", "redis" or a dotted manager class path')
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=4, help="clients per worker")
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=200, help="payload padding in bytes")
+    parser.add_argument("--batch-ms", type=float, default=settings.SOCKETIO_BUS_BATCH_MS)
+    parser.add_argument("--port", type=int, default=8710)
+    parser.add_argument("--transports", default="websocket")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--worker-port", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker_port is not None:
+        run_worker(args.worker_port)
+    else:
+        sys.exit(asyncio.run(run(args)))
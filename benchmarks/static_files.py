@@ -0,0 +1,120 @@
+# benchmarks\static_files.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import gzip
+import os
+import random
+import tempfile
+import time
+
+from matrx_utils import vcprint
+
+from core.http.static_files import StaticFiles
+
+# Throughput of the static file handler against Starlette's StaticFiles and the Engine.IO static_files
+# path it replaced, driven in-process over ASGI (no sockets), on a mixed set of asset sizes.
+#
+#   python -m benchmarks.static_files --requests 20000 --revisit-ratio 0.5
+#   python -m benchmarks.static_files --max-size 65536 --revisit-ratio 0
+
+ASSETS = [
+    # (name, size, weight)
+    ("app.css", 8 * 1024, 30),
+    ("app.js", 64 * 1024, 30),
+    ("icon.svg", 1024, 20),
+    ("hero.jpg", 512 * 1024, 15),
+    ("report.pdf", 4 * 1024 * 1024, 5),
+]
+
+
+def _make_assets(directory):
+    for name, size, _ in ASSETS:
+        text_like = name.endswith((".css", ".js", ".svg"))
+        data = (b"body{margin:0}\n" * (size // 15 + 1))[:size] if text_like else os.urandom(size)
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        if text_like:
+            with open(os.path.join(directory, name + ".gz"), "wb") as f:
+                f.write(gzip.compress(data))
+
+
+async def _request(app, path, headers, prefix=""):
+    status = None
+    sent = 0
+    response_headers = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, sent
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    scope = {
+        "type": "http", "method": "GET", "path": prefix + path, "raw_path": (prefix + path).encode(),
+        "root_path": prefix, "query_string": b"", "headers": headers, "http_version": "1.1", "scheme": "http",
+        "server": ("127.0.0.1", 8000), "client": ("127.0.0.1", 5000),
+    }
+    await app(scope, receive, send)
+    return status, sent, response_headers
+
+
+async def _run(label, app, requests, revisit_ratio, max_size, prefix=""):
+    assets = [asset for asset in ASSETS if asset[1] <= max_size]
+    names = [name for name, _, _ in assets]
+    weights = [weight for _, _, weight in assets]
+    rng = random.Random(42)
+    etags = {}
+    statuses = {}
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        name = rng.choices(names, weights)[0]
+        headers = [(b"accept-encoding", b"gzip")]
+        if name in etags and rng.random() < revisit_ratio:
+            headers.append((b"if-none-match", etags[name]))
+        status, sent, response_headers = await _request(app, f"/{name}", headers, prefix)
+        statuses[status] = statuses.get(status, 0) + 1
+        total_bytes += sent
+        if b"etag" in response_headers:
+            etags[name] = response_headers[b"etag"]
+    elapsed = time.perf_counter() - start
+    vcprint(
+        f"{label:<24} {requests / elapsed:>8,.0f} req/s  {total_bytes / elapsed / 1e6:>8,.1f} MB/s  statuses {statuses}",
+        color="bright_teal",
+    )
+
+
+async def main(args):
+    directory = tempfile.mkdtemp()
+    _make_assets(directory)
+
+    await _run("core.http.StaticFiles", StaticFiles(directory), args.requests, args.revisit_ratio, args.max_size,
+               prefix="/static")
+
+    try:
+        from starlette.staticfiles import StaticFiles as StarletteStaticFiles
+
+        await _run("starlette StaticFiles", StarletteStaticFiles(directory=directory), args.requests,
+                   args.revisit_ratio, args.max_size, prefix="/static")
+    except ImportError:
+        pass
+
+    import socketio
+
+    engineio_app = socketio.ASGIApp(socketio.AsyncServer(async_mode="asgi"), static_files={"/": directory})
+    await _run("engineio static_files", engineio_app, args.requests, args.revisit_ratio, args.max_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Static file serving throughput on mixed asset sizes")
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--max-size", type=int, default=8 * 1024 * 1024, help="only request assets up to this size")
+    parser.add_argument("--revisit-ratio", type=float, default=0.5, help="share of repeat requests sent with If-None-Match")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,152 @@
+# benchmarks\streaming_parse.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import wait_for_port
+from src.scraper.fetcher import Fetcher
+from src.scraper.parser import PageStream, parse_page
+from tests.scraper.page_generator import PageGenerator, first_difference
+
+# Times the streaming page parser (PageStream: PageParser fed while the body downloads). A fixture server
+# (subprocess) sends --big-kib pages in --chunk-kib chunks, throttled to --mib-per-second each, and --fetches of
+# them are scraped buffered (fetch, then parse_page in a thread) and streamed (fetch with a PageStream sink).
+# Reports pages/s, time per page and peak Python allocations; exits non-zero when the two results differ.
+# Pages come from tests/scraper/page_generator.py, the generator tests/scraper/test_parser.py checks PageStream
+# and parse_page with.
+#
+#   python -m benchmarks.streaming_parse --big-kib 2048 --mib-per-second 4
+
+# ---- throughput and memory ---------------------------------------------------------------------------
+
+async def _traced(run):
+    tracemalloc.start()
+    try:
+        await run()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+async def scrape_buffered(fetcher, url):
+    fetched = await fetcher.fetch(url)
+    return await asyncio.to_thread(parse_page, fetched.final_url, fetched.text)
+
+
+async def scrape_streamed(fetcher, url):
+    fetched = await fetcher.fetch(url, sink=PageStream)
+    return await fetched.sink.finish()
+
+
+async def measure(scrape, url, fetches, concurrency):
+    fetcher = Fetcher()
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one(index):
+        async with semaphore:
+            start = time.perf_counter()
+            page = await scrape(fetcher, f"{url}?n={index}")
+            timings.append((time.perf_counter() - start) * 1000)
+            return page
+
+    async def run():
+        return await asyncio.gather(*(one(index) for index in range(fetches)))
+
+    await one(-1)  # connection and code path warm-up
+    timings.clear()
+    start = time.perf_counter()
+    pages = await run()
+    seconds = time.perf_counter() - start
+    per_page = sorted(timings)
+    peak = await _traced(lambda: one(-2))
+    await fetcher.close()
+    return pages[0], {"pages_per_second": fetches / seconds, "p50_ms": per_page[len(per_page) // 2],
+                      "peak_mib": peak}
+
+
+async def main(args):
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.streaming_parse", "--server-port", str(args.port),
+                               "--big-kib", str(args.big_kib), "--chunk-kib", str(args.chunk_kib),
+                               "--mib-per-second", str(args.mib_per_second), "--seed", str(args.seed)],
+                              env=dict(os.environ))
+    try:
+        await wait_for_port(args.port)
+        url = f"http://127.0.0.1:{args.port}/big"
+        buffered_page, buffered = await measure(scrape_buffered, url, args.fetches, args.concurrency)
+        streamed_page, streamed = await measure(scrape_streamed, url, args.fetches, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+    vcprint(f"big page: {args.big_kib:,} KiB in {args.chunk_kib} KiB chunks at {args.mib_per_second:g} MiB/s, "
+            f"{args.fetches} fetches, {args.concurrency} at a time "
+            f"(parse buffer {settings.SCRAPER_PARSE_BUFFER_BYTES // 1024} KiB)", color="yellow")
+    for label, stats in (("buffered", buffered), ("streamed", streamed)):
+        vcprint(f"  {label:<10} {stats['pages_per_second']:>7.2f} pages/s   p50 {stats['p50_ms']:>8.1f} ms/page   "
+                f"peak {stats['peak_mib']:>7.1f} MiB per page", color="bright_teal")
+
+    if streamed_page != buffered_page:
+        vcprint(f"FAILED: big page: streamed vs buffered at {first_difference(buffered_page, streamed_page)}",
+                color="red")
+        return 1
+    vcprint("OK: streamed result matches parse_page", color="green")
+    return 0
+
+
+def run_server(args):
+    import uvicorn
+
+    generator = PageGenerator(random.Random(args.seed))
+    parts = []
+    size = 0
+    while size < args.big_kib * 1024:
+        part = generator.block() + "\n"
+        if generator.rng.random() < 0.1:
+            part = f"<h2>{generator.words(1, 4)}</h2>" + part
+        parts.append(part)
+        size += len(part.encode())
+    body = ("<!doctype html><html><head><title>Big page</title></head><body>" + "".join(parts) +
+            "</body></html>").encode()
+    chunk = args.chunk_kib * 1024
+    pause = chunk / (args.mib_per_second * 2 ** 20)
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())]})
+        for offset in range(0, len(body), chunk):
+            await send({"type": "http.response.body", "body": body[offset:offset + chunk],
+                        "more_body": offset + chunk < len(body)})
+            await asyncio.sleep(pause)
+
+    uvicorn.run(app, host="127.0.0.1", port=args.server_port, log_level="warning", lifespan="off")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming page parser: throughput and peak memory against "
+                                                 "buffered parsing")
+    parser.add_argument("--big-kib", type=int, default=2048, help="size of the page served for the timing runs")
+    parser.add_argument("--chunk-kib", type=int, default=16)
+    parser.add_argument("--mib-per-second", type=float, default=4.0, help="download rate per response")
+    parser.add_argument("--fetches", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--port", type=int, default=8760)
+    parser.add_argument("--server-port", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.server_port is not None:
+        run_server(args)
+    else:
+        sys.exit(asyncio.run(main(args)))
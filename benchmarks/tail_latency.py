@@ -0,0 +1,180 @@
+# benchmarks\tail_latency.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import contextlib
+import math
+import random
+import sys
+import time
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import serve_fixture_site
+from src.scraper.fetcher import Fetcher
+from src.scraper.hedging import HedgedFetcher
+from src.scraper.pages import scrape_pages
+
+# Test harness for tail latency: local hosts (one port each) answer after a latency drawn from a log-normal
+# distribution, with a fraction of straggler responses of 1-3 s, plus one host that never answers (it holds
+# the request until the client hangs up). Tasks scrape a batch of pages across the healthy hosts and, for
+# every other task, one page on the hung host.
+#
+#   fixed     plain Fetcher, SCRAPER_TIMEOUT_SECONDS for every host, no task deadline
+#   adaptive  HedgedFetcher (per-host timeouts, hedged GETs) and scrape_pages' task deadline
+#
+# Checks that in adaptive mode every page on the hung host comes back with status "error", that failed pages
+# keep the scrape result shape, and that at most --max-healthy-failures of healthy pages fail (a straggler
+# whose hedge straggles too is cut off by design). Exits non-zero otherwise.
+#
+#   python -m benchmarks.tail_latency --tasks 40 --straggler-rate 0.03
+
+
+class LatencySite:
+    def __init__(self, median_ms, sigma, straggler_rate, hung=False, seed=0):
+        self.median = median_ms / 1000
+        self.sigma = sigma
+        self.straggler_rate = straggler_rate
+        self.hung = hung
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    def delay(self):
+        if self.rng.random() < self.straggler_rate:
+            return self.rng.uniform(1.0, 3.0)
+        return self.median * math.exp(self.rng.gauss(0, self.sigma))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        if self.hung:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            return
+        await asyncio.sleep(self.delay())
+        body = (f"<html><head><title>{scope['path']}</title></head><body><h1>Page {scope['path']}</h1>"
+                f"<p>Content of {scope['path']}.</p></body></html>").encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+class TimedFetcher:
+    """Records how long each fetch took, per URL"""
+
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+        self.timings = []
+
+    async def fetch(self, url, etag=None, last_modified=None, sink=None):
+        start = time.perf_counter()
+        result = await self.fetcher.fetch(url, etag, last_modified, sink)
+        self.timings.append((url, time.perf_counter() - start, result.ok))
+        return result
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(fraction * len(values)) - 1)] if values else 0.0
+
+
+async def run_mode(args, adaptive, bases, hung_base, sites):
+    rng = random.Random(args.seed)
+    plain = Fetcher()
+    fetcher = TimedFetcher(HedgedFetcher(plain) if adaptive else plain)
+    deadline = args.deadline if adaptive else 10 ** 6
+
+    async def task(index):
+        urls = [f"{rng.choice(bases)}/page/{index}-{i}" for i in range(args.pages_per_task)]
+        if index % 2:
+            urls.append(f"{hung_base}/page/{index}")
+        start = time.perf_counter()
+        results = await scrape_pages(urls, deadline_seconds=deadline, fetcher=fetcher)
+        return time.perf_counter() - start, results
+
+    for i in range(args.warmup):
+        await task(-1 - i)
+    fetcher.timings.clear()
+    requests_before = sum(site.requests for site in sites)
+
+    durations, errors, healthy_failures = [], [], []
+    for index in range(args.tasks):
+        duration, results = await task(index)
+        durations.append(duration)
+        for result in results:
+            on_hung = result["url"].startswith(hung_base)
+            if adaptive and on_hung and result["status"] != "error":
+                errors.append(f"{result['url']} on the hung host came back as {result['status']}")
+            if not on_hung and result["status"] != "success":
+                healthy_failures.append(f"{result['url']}: {result['error']}")
+            if result["status"] == "error" and set(result) != {"status", "url", "error", "overview", "structured_data",
+                                                                "organized_data", "text_data", "main_image", "hashes",
+                                                                "content_filter_removal_details", "links"}:
+                errors.append(f"error result for {result['url']} is not in the scrape result shape")
+
+    healthy_pages = args.tasks * args.pages_per_task
+    if adaptive and len(healthy_failures) > args.max_healthy_failures * healthy_pages:
+        errors += [f"{len(healthy_failures)} of {healthy_pages} healthy pages failed"] + healthy_failures
+    healthy = [seconds for url, seconds, _ in fetcher.timings if not url.startswith(hung_base)]
+    logical = args.tasks * args.pages_per_task + args.tasks // 2
+    summary = {
+        "task_p50_s": _percentile(durations, 0.5),
+        "task_p99_s": _percentile(durations, 0.99),
+        "task_max_s": max(durations),
+        "fetch_p50_ms": _percentile(healthy, 0.5) * 1000,
+        "fetch_p99_ms": _percentile(healthy, 0.99) * 1000,
+        "extra_requests": (sum(site.requests for site in sites) - requests_before) / logical - 1,
+        "healthy_failures": len(healthy_failures),
+        "errors": errors,
+    }
+    if adaptive:
+        summary["hedging"] = fetcher.fetcher.stats()
+    await plain.close()
+    return summary
+
+
+async def main(args):
+    settings.SCRAPER_TIMEOUT_SECONDS = args.timeout
+    sites = [LatencySite(args.median_ms, args.sigma, args.straggler_rate, seed=i) for i in range(args.hosts)]
+    hung = LatencySite(0, 0, 0, hung=True)
+    async with contextlib.AsyncExitStack() as stack:
+        bases = [await stack.enter_async_context(serve_fixture_site(site, args.port + i)) for i, site in enumerate(sites)]
+        hung_base = await stack.enter_async_context(serve_fixture_site(hung, args.port + args.hosts))
+        fixed = await run_mode(args, False, bases, hung_base, sites + [hung])
+        adaptive = await run_mode(args, True, bases, hung_base, sites + [hung])
+
+    for label, summary in (("fixed", fixed), ("adaptive", adaptive)):
+        vcprint(f"{label:<9} task p50 {summary['task_p50_s']:>6.2f}s  p99 {summary['task_p99_s']:>6.2f}s  "
+                f"max {summary['task_max_s']:>6.2f}s   healthy fetch p50 {summary['fetch_p50_ms']:>7.1f}ms  "
+                f"p99 {summary['fetch_p99_ms']:>7.1f}ms   extra requests {summary['extra_requests']:>6.1%}  "
+                f"healthy pages failed {summary['healthy_failures']}",
+                color="bright_teal")
+    stats = adaptive["hedging"]
+    vcprint(f"hedges {stats['hedges']} (won {stats['hedge_wins']}), retries {stats['retries']}, timeouts {stats['timeouts']}, per-host timeouts "
+            f"{sorted({host['timeout_s'] for host in stats['hosts'].values()})}", color="yellow")
+    if adaptive["errors"]:
+        for error in adaptive["errors"][:20]:
+            vcprint(f"FAILED: {error}", color="red")
+        return 1
+    vcprint("OK: hung pages reported as errors, healthy pages scraped", color="green")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Task latency with fixed timeouts vs adaptive timeouts and hedging")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--tasks", type=int, default=40)
+    parser.add_argument("--warmup", type=int, default=5, help="tasks run before measuring, to collect latencies")
+    parser.add_argument("--pages-per-task", type=int, default=20)
+    parser.add_argument("--median-ms", type=float, default=20.0)
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-normal spread of the latency")
+    parser.add_argument("--straggler-rate", type=float, default=0.03)
+    parser.add_argument("--timeout", type=float, default=5.0, help="fixed / maximum timeout in seconds")
+    parser.add_argument("--deadline", type=float, default=2.0, help="task deadline in adaptive mode")
+    parser.add_argument("--max-healthy-failures", type=float, default=0.01,
+                        help="fraction of healthy pages allowed to fail in adaptive mode")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--port", type=int, default=8770)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,153 @@
+# benchmarks\text_stream.py
+from core.settings import settings
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from matrx_utils import vcprint
+
+from benchmarks.fixture_site import FixtureSite, wait_for_port
+from src.scraper.fetcher import Fetcher
+from src.scraper.parser import parse_page
+from src.scraper.text_stream import BLOCK_SEPARATOR, stream_page_text
+
+# Scrapes one very long page from a fixture site (benchmarks/fixture_site.py, run in a subprocess so its memory
+# and CPU stay out of the numbers) twice: buffered (whole body, parse_page, one result) and streamed
+# (stream_page_text, text_data as heading-aligned chunks while parsing). Reports time to the first text,
+# total time and peak Python allocations, and checks that the chunks reassemble to the buffered text_data
+# with the same char_count and sha256. A last run checks that --max-chars stops extraction early.
+# Times come from runs without tracemalloc; the peak from a separate traced run.
+#
+#   python -m benchmarks.text_stream --paragraphs 30000
+
+
+def _reassemble(chunks):
+    parts = []
+    for i, chunk in enumerate(chunks):
+        if i and not chunks[i - 1]["partial"]:
+            parts.append(BLOCK_SEPARATOR)
+        parts.append(chunk["text"])
+    return "".join(parts)
+
+
+async def _traced(run):
+    tracemalloc.start()
+    try:
+        await run()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+async def buffered(url):
+    fetcher = Fetcher()
+
+    async def run():
+        start = time.perf_counter()
+        fetched = await fetcher.fetch(url)
+        page = parse_page(fetched.final_url, fetched.text)
+        return page, (time.perf_counter() - start) * 1000
+
+    page, elapsed = await run()
+    peak = await _traced(run)
+    await fetcher.close()
+    return page, {"first_text_ms": elapsed, "total_ms": elapsed, "peak_mib": peak}
+
+
+async def streamed(url, max_tokens, max_chars=None, keep=True):
+    fetcher = Fetcher()
+    chunks = []
+    sizes = []
+
+    async def send_chunk(chunk):
+        # Stands in for a stream handler: only the chunks' sizes are kept unless reassembly is checked
+        sizes.append(chunk["chars"])
+        if keep:
+            chunks.append(chunk)
+
+    async def run():
+        chunks.clear()
+        sizes.clear()
+        return await stream_page_text(url, send_chunk, fetcher=fetcher, max_tokens=max_tokens, max_chars=max_chars)
+
+    peak = await _traced(run)
+    page = await run()
+    await fetcher.close()
+    return page, chunks, sizes, {"first_text_ms": page["text_stream"]["first_chunk_ms"],
+                                 "total_ms": page["text_stream"]["total_ms"], "peak_mib": peak}
+
+
+async def main(args):
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.text_stream", "--server-port", str(args.port),
+                               "--paragraphs", str(args.paragraphs)], env=dict(os.environ))
+    errors = []
+    try:
+        await wait_for_port(args.port)
+        url = f"http://127.0.0.1:{args.port}/page/0"
+        await buffered(url)  # warm up the server and the code paths
+
+        page, buffered_stats = await buffered(url)
+        # No document limit here, so the streamed text can be compared with text_data
+        unlimited = 2 ** 62
+        _, _, sizes, streamed_stats = await streamed(url, args.chunk_tokens, max_chars=unlimited, keep=False)
+        streamed_page, chunks, _, _ = await streamed(url, args.chunk_tokens, max_chars=unlimited)
+
+        text_data = page["text_data"]
+        if _reassemble(chunks) != text_data:
+            errors.append("reassembled chunks differ from text_data")
+        if streamed_page["overview"]["char_count"] != page["overview"]["char_count"]:
+            errors.append(f"char_count {streamed_page['overview']['char_count']} != {page['overview']['char_count']}")
+        if streamed_page["hashes"][0] != page["hashes"][0]:
+            errors.append("sha256 of the streamed text differs from text_data's")
+        max_chunk_chars = args.chunk_tokens * settings.SCRAPER_CHARS_PER_TOKEN
+        if max(sizes) > max_chunk_chars:
+            errors.append(f"chunk of {max(sizes)} chars exceeds {max_chunk_chars:.0f}")
+        outline = set(page["overview"]["outline"])
+        if any(chunk["heading"] not in outline for chunk in chunks):
+            errors.append("chunk heading missing from the outline")
+
+        limited, _, _, limited_stats = await streamed(url, args.chunk_tokens, max_chars=args.max_chars, keep=False)
+        if not limited["text_stream"]["truncated"] or limited["overview"]["char_count"] > args.max_chars:
+            errors.append(f"--max-chars {args.max_chars} did not stop extraction: {limited['text_stream']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    vcprint(f"page text: {len(text_data):,} chars, {len(sizes)} chunks of <= {args.chunk_tokens} est. tokens",
+            color="yellow")
+    for label, stats in (("buffered", buffered_stats), ("streamed", streamed_stats),
+                         (f"max {args.max_chars:,} chars", limited_stats)):
+        vcprint(f"{label:<20} first text {stats['first_text_ms']:>8.1f} ms  total {stats['total_ms']:>8.1f} ms  "
+                f"peak {stats['peak_mib']:>7.1f} MiB", color="bright_teal")
+    if errors:
+        for error in errors:
+            vcprint(f"FAILED: {error}", color="red")
+        return 1
+    vcprint("OK: chunks reassemble to text_data with matching char_count and sha256", color="green")
+    return 0
+
+
+def run_server(port, paragraphs):
+    import uvicorn
+
+    uvicorn.run(FixtureSite(pages=1, paragraphs=paragraphs, kinds=("static",)), host="127.0.0.1", port=port,
+                log_level="warning", lifespan="off")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to first text and peak memory, buffered vs streamed text_data")
+    parser.add_argument("--paragraphs", type=int, default=30000, help="paragraphs on the page (~140 bytes each)")
+    parser.add_argument("--chunk-tokens", type=int, default=settings.SCRAPER_TEXT_CHUNK_TOKENS)
+    parser.add_argument("--max-chars", type=int, default=200_000)
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--server-port", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.server_port is not None:
+        run_server(args.server_port, args.paragraphs)
+    else:
+        sys.exit(asyncio.run(main(args)))
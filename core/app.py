@@ -4,10 +4,18 @@ import logging
 from dotenv import load_dotenv
 from socketio import ASGIApp
 from core import settings
+from core.http.static_files import get_static_files
+from core.tasks.drain import DrainAwareASGI, get_drain_controller
+from core.socket.client_manager import install_client_manager
+from core.socket.core.session_registry import install_session_tracking
+from core.tasks.job_streams import register_job_socket_handlers
 from matrx_utils import vcprint
 
 from matrx_utils.core.sio_app import sio
 
+# Must be in place before any client connects
+install_client_manager(sio)
+
 # Initialize database models
 vcprint("---- Initializing Database Models ----", color="bright_teal")
 import core.scripts.initialize_db_models
@@ -35,10 +43,14 @@ vcprint("[APP.py] Created Fast API app", color="green")
 
 # Configure Socket.IO
 logger = logging.getLogger("app")
-socketio_app = ASGIApp(sio, static_files={"/static/": settings.STATIC_ROOT})
+socketio_app = ASGIApp(sio)
 vcprint("[APP.py] Started socket app", color="green")
 user_session_namespace = get_user_session_namespace()
 sio.register_namespace(user_session_namespace)
-app.mount("/socket.io", socketio_app)
+register_job_socket_handlers(sio, user_session_namespace.namespace)
+install_session_tracking(user_session_namespace)
+# New Socket.IO connections are refused while draining; existing sessions keep streaming until they finish
+app.mount("/socket.io", DrainAwareASGI(socketio_app, get_drain_controller()))
+app.mount("/static", get_static_files())
 
 # The `app` object is now defined at the module level for Uvicorn to import
@@ -0,0 +1,254 @@
+# core\database\pool.py
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import wraps
+
+import asyncpg
+from matrx_utils import vcprint
+
+from core import settings
+from core.database.query_cache import PreparedStatementConnection
+
+logger = logging.getLogger("app")
+
+
+class PoolMetrics:
+    """Acquire latency and contention counters for one database pool"""
+
+    def __init__(self, config_name, window=1000):
+        self.config_name = config_name
+        self.acquires = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.waiters = 0
+        self.max_waiters = 0
+        self.acquire_ms_total = 0.0
+        self.acquire_ms_max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def acquire_started(self):
+        self.waiters += 1
+        if self.waiters > self.max_waiters:
+            self.max_waiters = self.waiters
+
+    def acquire_finished(self, duration_ms, timed_out=False):
+        self.waiters -= 1
+        if timed_out:
+            self.timeouts += 1
+            return
+        self.acquires += 1
+        self.acquire_ms_total += duration_ms
+        if duration_ms > self.acquire_ms_max:
+            self.acquire_ms_max = duration_ms
+        self._recent.append(duration_ms)
+
+    def _percentile(self, samples, pct):
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+    def snapshot(self, pool=None):
+        recent = sorted(self._recent)
+        data = {
+            "database": self.config_name,
+            "acquires": self.acquires,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+            "waiters": self.waiters,
+            "max_waiters": self.max_waiters,
+            "acquire_ms_avg": round(self.acquire_ms_total / self.acquires, 3) if self.acquires else 0.0,
+            "acquire_ms_p50": round(self._percentile(recent, 0.50), 3),
+            "acquire_ms_p99": round(self._percentile(recent, 0.99), 3),
+            "acquire_ms_max": round(self.acquire_ms_max, 3),
+        }
+        if pool is not None:
+            size = pool.get_size()
+            idle = pool.get_idle_size()
+            data.update({
+                "min_size": pool.get_min_size(),
+                "max_size": pool.get_max_size(),
+                "size": size,
+                "idle": idle,
+                "in_use": size - idle,
+            })
+        return data
+
+
+_metrics = {}
+
+
+def get_pool_metrics(config_name) -> PoolMetrics:
+    metrics = _metrics.get(config_name)
+    if metrics is None:
+        metrics = _metrics[config_name] = PoolMetrics(config_name)
+    return metrics
+
+
+async def create_pool(config_name):
+    """Create the asyncpg pool for a configured database, sized and timed from Settings"""
+    from matrx_utils.database.core.config import get_database_config, DatabaseConfigError
+    from matrx_utils.database.exceptions import ConfigurationError, ConnectionError, AdapterError
+
+    try:
+        config = get_database_config(config_name)
+    except DatabaseConfigError as e:
+        raise ConfigurationError(
+            model=None,
+            config_key=config_name,
+            reason=f"Invalid or missing configuration: {str(e)}",
+        )
+
+    server_settings = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+
+    try:
+        return await asyncpg.create_pool(
+            host=config["host"],
+            port=config["port"],
+            database=config["database_name"],
+            user=config["user"],
+            password=config["password"],
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=settings.DB_POOL_MAX_IDLE_SECONDS,
+            command_timeout=settings.DB_COMMAND_TIMEOUT,
+            server_settings=server_settings,
+            ssl="require",
+            statement_cache_size=0,
+            connection_class=PreparedStatementConnection,
+        )
+    except (asyncpg.exceptions.ConnectionFailureError, asyncpg.exceptions.InvalidAuthorizationSpecificationError) as e:
+        raise ConnectionError(
+            model=None,
+            db_url=f"{config.get('host')}:{config.get('port')}/{config.get('database_name')}",
+            original_error=e,
+        )
+    except Exception as e:
+        raise AdapterError(model=None, adapter_name="asyncpg", original_error=e)
+
+
+def _get_pool(get_pool):
+    @wraps(get_pool)
+    async def wrapper(cls, config_name):
+        pool = cls._pools.get(config_name)
+        if pool is not None:
+            return pool
+        lock = cls._locks.setdefault(config_name, asyncio.Lock())
+        async with lock:
+            if config_name not in cls._pools:
+                cls._pools[config_name] = await create_pool(config_name)
+            return cls._pools[config_name]
+
+    return wrapper
+
+
+def _get_connection(get_connection):
+    @asynccontextmanager
+    async def wrapper(cls, config_name, timeout=None):
+        """Acquire a pooled connection; `timeout` bounds the acquire, queries are bounded by the statement timeout"""
+        from matrx_utils.database.exceptions import DatabaseError, StateError
+
+        timeout = settings.DB_POOL_ACQUIRE_TIMEOUT if timeout is None else min(timeout, settings.DB_POOL_ACQUIRE_TIMEOUT)
+        pool = await cls.get_pool(config_name)
+        metrics = get_pool_metrics(config_name)
+
+        metrics.acquire_started()
+        start = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            metrics.acquire_finished(0.0, timed_out=True)
+            raise DatabaseError(
+                model=None,
+                message=f"Timeout acquiring connection after {timeout}s",
+                details={"config_name": config_name, "timeout": timeout, "pool": metrics.snapshot(pool)},
+            )
+        except asyncpg.exceptions.InterfaceError as e:
+            metrics.acquire_finished(0.0, timed_out=True)
+            raise StateError(
+                model=None,
+                operation="acquire_connection",
+                reason="Connection pool issue",
+                details={"config_name": config_name},
+                original_error=e,
+            )
+        metrics.acquire_finished((time.perf_counter() - start) * 1000)
+
+        try:
+            yield conn
+        finally:
+            created_at = getattr(conn, "created_at", None)
+            if settings.DB_POOL_MAX_LIFETIME_SECONDS and created_at is not None \
+                    and time.monotonic() - created_at > settings.DB_POOL_MAX_LIFETIME_SECONDS:
+                # The pool replaces closed connections on the next acquire.
+                metrics.recycled += 1
+                await conn.close(timeout=5)
+            # release() is a no-op for a connection closed above
+            await pool.release(conn)
+
+    return wrapper
+
+
+def _pool_database_names():
+    if settings.DB_POOL_WARMUP_DATABASES:
+        return list(settings.DB_POOL_WARMUP_DATABASES)
+    from matrx_utils.database.core.config import get_all_database_project_names
+    return get_all_database_project_names()
+
+
+async def warm_up_pools():
+    """Open every configured pool at its minimum size so the first requests don't pay connection setup"""
+    from matrx_utils.database.core.async_db_manager import AsyncDatabaseManager
+
+    async def warm(config_name):
+        start = time.perf_counter()
+        try:
+            pool = await AsyncDatabaseManager.get_pool(config_name)
+            # create_pool() already opened min_size connections; run a round trip on each.
+            await asyncio.gather(*[pool.fetchval("SELECT 1") for _ in range(pool.get_min_size())])
+            logger.info(
+                f"[pool] Warmed {config_name}: {pool.get_size()} connections in {(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+        except Exception as e:
+            logger.error(f"[pool] Warmup failed for {config_name}: {e}")
+
+    await asyncio.gather(*[warm(name) for name in _pool_database_names()])
+
+
+async def close_pools():
+    from matrx_utils.database.core.async_db_manager import AsyncDatabaseManager
+
+    await AsyncDatabaseManager.cleanup()
+    logger.info("[pool] Database pools closed.")
+
+
+def pool_metrics_snapshot():
+    from matrx_utils.database.core.async_db_manager import AsyncDatabaseManager
+
+    names = set(_metrics) | set(AsyncDatabaseManager._pools)
+    return [get_pool_metrics(name).snapshot(AsyncDatabaseManager._pools.get(name)) for name in sorted(names)]
+
+
+_installed = False
+
+
+def install_pool_factory():
+    """Route AsyncDatabaseManager pool creation and connection acquisition through this module"""
+    global _installed
+    if _installed:
+        return
+
+    from matrx_utils.database.core.async_db_manager import AsyncDatabaseManager
+
+    AsyncDatabaseManager.get_pool = classmethod(_get_pool(AsyncDatabaseManager.get_pool))
+    AsyncDatabaseManager.get_connection = classmethod(_get_connection(AsyncDatabaseManager.get_connection))
+
+    _installed = True
+    vcprint(
+        f"[pool] Installed connection pool factory (size {settings.DB_POOL_MIN_SIZE}-{settings.DB_POOL_MAX_SIZE})",
+        color="bright_teal",
+    )
@@ -0,0 +1,239 @@
+# core\database\query_cache.py
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import asyncpg
+from matrx_utils import vcprint
+
+from core import settings
+
+
+class CompiledQuery:
+    __slots__ = ("sql", "filter_keys", "has_limit", "has_offset", "hits")
+
+    def __init__(self, sql, filter_keys, has_limit, has_offset):
+        self.sql = sql
+        self.filter_keys = filter_keys
+        self.has_limit = has_limit
+        self.has_offset = has_offset
+        self.hits = 0
+
+    def bind(self, query_dict):
+        """Build the positional parameters for this query shape from a QueryBuilder query dict"""
+        params = list(query_dict["filters"].values())
+        if self.has_limit:
+            params.append(query_dict["limit"])
+        if self.has_offset:
+            params.append(query_dict["offset"])
+        return params
+
+
+def _value_kind(value):
+    """The part of a filter value that can change the SQL: None (IS NULL) and the length of a list (IN (...))"""
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return len(value)
+    if isinstance(value, dict):
+        return tuple((key, _value_kind(item)) for key, item in value.items())
+    return "value"
+
+
+class CompiledQueryCache:
+    """Bounded LRU of built SELECT statements keyed on (model, filter fields and value kinds, select, ordering,
+    paging)"""
+
+    def __init__(self, max_size=None):
+        self.max_size = settings.DB_COMPILED_QUERY_CACHE_SIZE if max_size is None else max_size
+        self.enabled = self.max_size > 0
+        self._entries = OrderedDict()
+        self._compiled_sql = {}
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self.prepared_hits = 0
+        self.prepared_misses = 0
+        self.prepared_fallbacks = 0
+
+    @staticmethod
+    def shape_key(query_dict):
+        order_by = query_dict["order_by"]
+        if order_by:
+            for term in order_by:
+                if not isinstance(term, str):
+                    return None
+        # model implies table and database
+        return (
+            query_dict["model"],
+            tuple((field, _value_kind(value)) for field, value in query_dict["filters"].items()),
+            tuple(query_dict["select"]),
+            tuple(order_by),
+            query_dict["limit"] is not None,
+            query_dict["offset"] is not None,
+        )
+
+    def get(self, key):
+        compiled = self._entries.get(key)
+        if compiled is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        compiled.hits += 1
+        self.hits += 1
+        return compiled
+
+    def put(self, key, compiled):
+        self._entries[key] = compiled
+        self._compiled_sql[compiled.sql] = self._compiled_sql.get(compiled.sql, 0) + 1
+        if len(self._entries) > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self.evictions += 1
+            remaining = self._compiled_sql[evicted.sql] - 1
+            if remaining:
+                self._compiled_sql[evicted.sql] = remaining
+            else:
+                del self._compiled_sql[evicted.sql]
+
+    def is_compiled(self, sql):
+        return sql in self._compiled_sql
+
+    def clear(self):
+        self._entries.clear()
+        self._compiled_sql.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "uncacheable": self.uncacheable,
+            "evictions": self.evictions,
+            "prepared_statements": settings.DB_PREPARED_STATEMENTS,
+            "prepared_hits": self.prepared_hits,
+            "prepared_misses": self.prepared_misses,
+            "prepared_fallbacks": self.prepared_fallbacks,
+            "top_queries": [
+                {"model": key[0].__name__, "filters": [field for field, _ in key[1]], "hits": compiled.hits}
+                for key, compiled in sorted(self._entries.items(), key=lambda item: item[1].hits, reverse=True)[:10]
+            ],
+        }
+
+
+class PreparedStatementConnection(asyncpg.Connection):
+    """asyncpg connection that keeps a bounded LRU of server-side prepared statements for compiled queries"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self._prepared_statements = OrderedDict()
+
+    async def fetch_prepared(self, sql, *args):
+        cache = get_query_cache()
+        statement = self._prepared_statements.get(sql)
+        if statement is None:
+            cache.prepared_misses += 1
+            statement = await self.prepare(sql)
+            self._prepared_statements[sql] = statement
+            if len(self._prepared_statements) > settings.DB_PREPARED_STATEMENTS_PER_CONNECTION:
+                self._prepared_statements.popitem(last=False)
+        else:
+            cache.prepared_hits += 1
+            self._prepared_statements.move_to_end(sql)
+        return await statement.fetch(*args)
+
+    def forget_prepared(self, sql):
+        self._prepared_statements.pop(sql, None)
+
+
+_query_cache = None
+
+
+def get_query_cache() -> CompiledQueryCache:
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = CompiledQueryCache()
+    return _query_cache
+
+
+def _cached_build_query(build_query):
+    @wraps(build_query)
+    def wrapper(self):
+        cache = get_query_cache()
+        if not cache.enabled:
+            return build_query(self)
+        key = cache.shape_key(self._full_query_dict)
+        if key is None:
+            cache.uncacheable += 1
+            return build_query(self)
+        compiled = cache.get(key)
+        if compiled is None:
+            sql, params = build_query(self)
+            compiled = CompiledQuery(
+                sql,
+                tuple(self._full_query_dict["filters"]),
+                self._full_query_dict["limit"] is not None,
+                self._full_query_dict["offset"] is not None,
+            )
+            # Only shapes whose parameters are the filter values in order (then limit, offset) can be re-bound
+            if compiled.bind(self._full_query_dict) != list(params):
+                cache.uncacheable += 1
+            else:
+                cache.put(key, compiled)
+            return sql, params
+        return compiled.sql, compiled.bind(self._full_query_dict)
+
+    return wrapper
+
+
+def _prepared_execute_query(execute_query):
+    @wraps(execute_query)
+    async def wrapper(cls, config_name, query, *args, **kwargs):
+        cache = get_query_cache()
+        if not settings.DB_PREPARED_STATEMENTS or not cache.is_compiled(query):
+            return await execute_query(config_name, query, *args, **kwargs)
+
+        # Compiled queries are plain SELECTs, so falling back to the regular path on any
+        # driver error is safe and keeps the ORM's own error translation.
+        async with cls.get_connection(config_name, kwargs.get("timeout", 10.0)) as conn:
+            fetch_prepared = getattr(conn, "fetch_prepared", None)
+            if fetch_prepared is not None:
+                try:
+                    return await fetch_prepared(query, *args)
+                except (asyncpg.PostgresError, asyncpg.InterfaceError):
+                    conn.forget_prepared(query)
+            cache.prepared_fallbacks += 1
+        return await execute_query(config_name, query, *args, **kwargs)
+
+    return wrapper
+
+
+_installed = False
+
+
+def install_query_cache():
+    """Reuse built SQL for repeated query shapes and, when enabled, server-side prepared statements.
+
+    Must be installed before the query instrumentation so prepared executions are still timed.
+    """
+    global _installed
+    if _installed:
+        return
+
+    from matrx_utils.database.core.async_db_manager import AsyncDatabaseManager
+    from matrx_utils.database.query.executor import QueryExecutor
+
+    QueryExecutor._build_query = _cached_build_query(QueryExecutor._build_query)
+    AsyncDatabaseManager.execute_query = classmethod(_prepared_execute_query(AsyncDatabaseManager.execute_query))
+
+    _installed = True
+    vcprint(
+        f"[query_cache] Installed (size {settings.DB_COMPILED_QUERY_CACHE_SIZE}, "
+        f"prepared statements {'on' if settings.DB_PREPARED_STATEMENTS else 'off'})",
+        color="bright_teal",
+    )
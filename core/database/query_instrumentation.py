@@ -0,0 +1,264 @@
+# core\database\query_instrumentation.py
+import logging
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+
+from matrx_utils import vcprint
+
+from core import settings
+
+logger = logging.getLogger("app")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\$\d+")
+_VALUES_LIST = re.compile(r"VALUES\s*(?:\([^()]*\)\s*,?\s*)+", re.IGNORECASE)
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+([\w.\"]+)", re.IGNORECASE)
+
+# Set for the duration of a QueryExecutor call so raw SQL can be attributed to a model.
+_current_model: ContextVar = ContextVar("db_current_model", default=None)
+# Set by the request middleware; holds a RequestQueryStats that every query in the request adds to.
+_request_stats: ContextVar = ContextVar("db_request_stats", default=None)
+# Set while a StateManager lookup is running; flipped to True if the lookup had to hit the database.
+_cache_probe: ContextVar = ContextVar("db_cache_probe", default=None)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint_sql(sql: str) -> str:
+    """Normalize SQL so queries that differ only by literal values share a fingerprint"""
+    normalized = _STRING_LITERAL.sub("?", sql)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _VALUES_LIST.sub("VALUES (...) ", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def _table_from_sql(sql: str):
+    match = _TABLE.search(sql)
+    return match.group(1).strip('"') if match else None
+
+
+class FingerprintStats:
+    __slots__ = ("fingerprint", "model", "calls", "total_ms", "max_ms", "rows", "cache_hits", "slow_calls", "last_seen")
+
+    def __init__(self, fingerprint, model):
+        self.fingerprint = fingerprint
+        self.model = model
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.cache_hits = 0
+        self.slow_calls = 0
+        self.last_seen = 0.0
+
+    def to_dict(self):
+        db_calls = self.calls - self.cache_hits
+        return {
+            "fingerprint": self.fingerprint,
+            "model": self.model,
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "cache_hit_ratio": round(self.cache_hits / self.calls, 4) if self.calls else 0.0,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / db_calls, 3) if db_calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "slow_calls": self.slow_calls,
+        }
+
+
+class RequestQueryStats:
+    __slots__ = ("queries", "total_ms", "cache_hits", "fingerprints")
+
+    def __init__(self):
+        self.queries = 0
+        self.total_ms = 0.0
+        self.cache_hits = 0
+        self.fingerprints = {}
+
+    def repeated(self, threshold=3):
+        """Fingerprints executed at least `threshold` times in this request (likely N+1s)"""
+        return {fp: count for fp, count in self.fingerprints.items() if count >= threshold}
+
+
+class QueryInstrumentation:
+    """Aggregates per-fingerprint query stats and logs slow queries to the app logger"""
+
+    def __init__(self, slow_query_ms=None, max_fingerprints=None):
+        self.slow_query_ms = settings.DB_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self.max_fingerprints = settings.DB_QUERY_STATS_MAX_FINGERPRINTS if max_fingerprints is None else max_fingerprints
+        self._stats = OrderedDict()
+        self.total_queries = 0
+        self.total_cache_hits = 0
+        self.total_ms = 0.0
+        self.started_at = time.time()
+
+    def _stats_for(self, fingerprint, model):
+        key = (fingerprint, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = FingerprintStats(fingerprint, model)
+            if len(self._stats) > self.max_fingerprints:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        return stats
+
+    def record_query(self, sql, duration_ms, rows, model=None):
+        fingerprint = fingerprint_sql(sql)
+        model = model or _table_from_sql(sql)
+        stats = self._stats_for(fingerprint, model)
+        stats.calls += 1
+        stats.total_ms += duration_ms
+        stats.rows += rows
+        stats.last_seen = time.time()
+        if duration_ms > stats.max_ms:
+            stats.max_ms = duration_ms
+        self.total_queries += 1
+        self.total_ms += duration_ms
+
+        request_stats = _request_stats.get()
+        if request_stats is not None:
+            request_stats.queries += 1
+            request_stats.total_ms += duration_ms
+            request_stats.fingerprints[fingerprint] = request_stats.fingerprints.get(fingerprint, 0) + 1
+
+        if duration_ms >= self.slow_query_ms:
+            stats.slow_calls += 1
+            logger.warning(
+                f"Slow query: {duration_ms:.2f}ms - Model: {model} - Rows: {rows} - SQL: {fingerprint}"
+            )
+
+    def record_cache_hit(self, model, operation):
+        fingerprint = f"CACHE {operation}"
+        stats = self._stats_for(fingerprint, model)
+        stats.calls += 1
+        stats.cache_hits += 1
+        stats.rows += 1
+        stats.last_seen = time.time()
+        self.total_cache_hits += 1
+
+        request_stats = _request_stats.get()
+        if request_stats is not None:
+            request_stats.cache_hits += 1
+
+    def snapshot(self, limit=50, order_by="total_ms"):
+        rows = sorted((s.to_dict() for s in self._stats.values()), key=lambda s: s[order_by], reverse=True)
+        return {
+            "since": self.started_at,
+            "total_queries": self.total_queries,
+            "total_cache_hits": self.total_cache_hits,
+            "total_ms": round(self.total_ms, 3),
+            "slow_query_ms": self.slow_query_ms,
+            "fingerprints": rows[:limit],
+        }
+
+    def reset(self):
+        self._stats.clear()
+        self.total_queries = 0
+        self.total_cache_hits = 0
+        self.total_ms = 0.0
+        self.started_at = time.time()
+
+
+_instrumentation = None
+
+
+def get_query_instrumentation() -> QueryInstrumentation:
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = QueryInstrumentation()
+    return _instrumentation
+
+
+def begin_request_stats():
+    """Start collecting query counts for the current request. Returns (token, stats); pass the token to end_request_stats()"""
+    stats = RequestQueryStats()
+    return _request_stats.set(stats), stats
+
+
+def end_request_stats(token):
+    _request_stats.reset(token)
+
+
+def _instrument_execute_query(execute_query):
+    @wraps(execute_query)
+    async def wrapper(cls, config_name, query, *args, **kwargs):
+        probe = _cache_probe.get()
+        if probe is not None:
+            probe[0] = True
+        start = time.perf_counter()
+        results = await execute_query(config_name, query, *args, **kwargs)
+        duration_ms = (time.perf_counter() - start) * 1000
+        get_query_instrumentation().record_query(
+            query,
+            duration_ms,
+            len(results) if results is not None else 0,
+            model=_current_model.get(),
+        )
+        return results
+
+    return wrapper
+
+
+def _bind_model(method):
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        token = _current_model.set(self.model.__name__)
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            _current_model.reset(token)
+
+    return wrapper
+
+
+def _probe_cache(method, operation):
+    @wraps(method)
+    async def wrapper(cls, model_class, *args, **kwargs):
+        probe = [False]
+        token = _cache_probe.set(probe)
+        try:
+            record = await method(model_class, *args, **kwargs)
+        finally:
+            _cache_probe.reset(token)
+        if record is not None and not probe[0]:
+            get_query_instrumentation().record_cache_hit(model_class.__name__, operation)
+        return record
+
+    return wrapper
+
+
+_installed = False
+
+
+def install_query_instrumentation():
+    """Wrap the ORM's query execution path so every query is timed and attributed"""
+    global _installed
+    if _installed or not settings.DB_QUERY_INSTRUMENTATION:
+        return
+
+    from matrx_utils.database.core.async_db_manager import AsyncDatabaseManager
+    from matrx_utils.database.query.executor import QueryExecutor
+    from matrx_utils.database.state import StateManager
+
+    AsyncDatabaseManager.execute_query = classmethod(_instrument_execute_query(AsyncDatabaseManager.execute_query))
+
+    for name in ("_execute", "insert", "bulk_insert", "update", "delete", "count"):
+        setattr(QueryExecutor, name, _bind_model(getattr(QueryExecutor, name)))
+
+    for name in ("get", "get_or_none"):
+        setattr(StateManager, name, classmethod(_probe_cache(getattr(StateManager, name), f"StateManager.{name}")))
+
+    _installed = True
+    vcprint(
+        f"[query_instrumentation] Installed (slow query threshold {settings.DB_SLOW_QUERY_MS}ms)",
+        color="bright_teal",
+    )
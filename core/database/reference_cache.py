@@ -0,0 +1,287 @@
+# core\database\reference_cache.py
+import asyncio
+import logging
+import time
+
+from matrx_utils import vcprint
+
+from core import settings
+from core.database.write_hooks import BULK_OPERATIONS, register_write_hook
+
+logger = logging.getLogger("app")
+
+
+class ReferenceTable:
+    """Whole-table in-memory copy of a reference model with hash indexes on chosen fields.
+
+    Lookups whose filter fields are all indexed are answered locally; everything else goes to the database.
+    If `watermark_field` is set (e.g. "updated_at"), scheduled refreshes only load rows changed since the
+    last refresh and a full reload runs every REFERENCE_CACHE_FULL_RELOAD_EVERY cycles to pick up deletes.
+
+    Each record's indexed values are remembered when it is indexed: lookups hand out the cached objects, and
+    Model.update() changes one in place before the write hook runs, so its old buckets can't be read off it.
+    """
+
+    def __init__(self, model, index_fields, watermark_field=None):
+        self.model = model
+        self.primary_keys = tuple(model._meta.primary_keys)
+        self.index_fields = tuple(dict.fromkeys((*self.primary_keys, *index_fields)))
+        self.watermark_field = watermark_field
+        self.loaded = False
+        self.loaded_at = None
+        self.watermark = None
+        self._records = {}
+        self._indexes = {field: {} for field in self.index_fields}
+        self._indexed = {}
+        self._refresh_count = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.refreshes = 0
+        self.write_updates = 0
+
+    def _key(self, record):
+        return tuple(getattr(record, pk) for pk in self.primary_keys)
+
+    def _index(self, key, record):
+        values = {field: getattr(record, field, None) for field in self._indexes}
+        self._indexed[key] = values
+        for field, index in self._indexes.items():
+            index.setdefault(values[field], []).append(record)
+
+    def _unindex(self, key):
+        values = self._indexed.pop(key, None)
+        if values is None:
+            return
+        for field, index in self._indexes.items():
+            bucket = index.get(values[field])
+            if bucket is None:
+                continue
+            bucket[:] = [r for r in bucket if self._key(r) != key]
+            if not bucket:
+                del index[values[field]]
+
+    def _advance_watermark(self, record):
+        if self.watermark_field is None:
+            return
+        value = getattr(record, self.watermark_field, None)
+        if value is not None and (self.watermark is None or value > self.watermark):
+            self.watermark = value
+
+    def upsert(self, record):
+        key = self._key(record)
+        if key in self._records:
+            self._unindex(key)
+        self._records[key] = record
+        self._index(key, record)
+        self._advance_watermark(record)
+
+    def remove(self, record):
+        key = self._key(record)
+        if self._records.pop(key, None) is not None:
+            self._unindex(key)
+
+    def replace_all(self, records):
+        self._records = {}
+        self._indexes = {field: {} for field in self.index_fields}
+        self._indexed = {}
+        self.watermark = None
+        for record in records:
+            self.upsert(record)
+        self.loaded = True
+        self.loaded_at = time.time()
+
+    async def load(self):
+        from matrx_utils.database.query.builder import QueryBuilder
+
+        start = time.perf_counter()
+        records = await QueryBuilder(model=self.model).all()
+        self.replace_all(records)
+        logger.info(
+            f"[reference_cache] Loaded {len(self._records)} {self.model.__name__} rows in "
+            f"{(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+
+    async def refresh(self):
+        self._refresh_count += 1
+        self.refreshes += 1
+        full_reload = (
+            not self.loaded
+            or self.watermark_field is None
+            or self.watermark is None
+            or self._refresh_count % settings.REFERENCE_CACHE_FULL_RELOAD_EVERY == 0
+        )
+        if full_reload:
+            await self.load()
+            return
+
+        from matrx_utils.database.core.async_db_manager import AsyncDatabaseManager
+
+        rows = await AsyncDatabaseManager.execute_query(
+            self.model.get_database_name(),
+            f"SELECT * FROM {self.model._meta.table_name} WHERE {self.watermark_field} > $1",
+            self.watermark,
+        )
+        for row in rows:
+            self.upsert(self.model(**row))
+        if rows:
+            logger.info(f"[reference_cache] Refreshed {len(rows)} changed {self.model.__name__} rows")
+
+    def can_answer(self, filters):
+        return self.loaded and bool(filters) and all(field in self._indexes for field in filters)
+
+    def lookup(self, filters):
+        """Records matching all equality filters, in load order"""
+        items = iter(filters.items())
+        field, value = next(items)
+        candidates = self._indexes[field].get(value, ())
+        for field, value in items:
+            candidates = [r for r in candidates if getattr(r, field, None) == value]
+        self.hits += 1
+        return list(candidates)
+
+    def stats(self):
+        return {
+            "model": self.model.__name__,
+            "rows": len(self._records),
+            "index_fields": list(self.index_fields),
+            "loaded_at": self.loaded_at,
+            "watermark": str(self.watermark) if self.watermark is not None else None,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "refreshes": self.refreshes,
+            "write_updates": self.write_updates,
+        }
+
+
+class ReferenceQuery:
+    """Stands in for QueryBuilder on indexed lookups; anything beyond plain filters falls back to the database"""
+
+    def __init__(self, table, filters):
+        self._table = table
+        self._filters = filters
+
+    def _builder(self):
+        from matrx_utils.database.query.builder import QueryBuilder
+
+        self._table.fallbacks += 1
+        return QueryBuilder(model=self._table.model).filter(**self._filters)
+
+    def filter(self, **kwargs):
+        filters = {**self._filters, **kwargs}
+        if self._table.can_answer(filters):
+            return ReferenceQuery(self._table, filters)
+        return self._builder().filter(**kwargs)
+
+    def __getattr__(self, name):
+        # order_by, limit, exclude, select, values... are delegated to a real query
+        return getattr(self._builder(), name)
+
+    async def all(self):
+        return self._table.lookup(self._filters)
+
+    async def first(self):
+        results = self._table.lookup(self._filters)
+        return results[0] if results else None
+
+    async def get(self):
+        from matrx_utils.database.exceptions import DoesNotExist, MultipleObjectsReturned
+
+        results = self._table.lookup(self._filters)
+        if not results:
+            raise DoesNotExist(model=self._table.model, filters=self._filters)
+        if len(results) > 1:
+            raise MultipleObjectsReturned(model=self._table.model, count=len(results), filters=self._filters)
+        return results[0]
+
+    async def get_or_none(self):
+        results = self._table.lookup(self._filters)
+        return results[0] if len(results) == 1 else None
+
+    async def count(self):
+        return len(self._table.lookup(self._filters))
+
+    async def exists(self):
+        return bool(self._table.lookup(self._filters))
+
+
+_tables = {}
+_refresh_task = None
+
+
+def register_reference_model(model, index_fields, watermark_field=None):
+    """Serve `model.filter(...)` on the given fields from memory once preload_reference_tables() has run"""
+    table = ReferenceTable(model, index_fields, watermark_field)
+    _tables[model] = table
+    original_filter = model.filter
+
+    def filter(cls, **kwargs):
+        if settings.REFERENCE_CACHE_ENABLED and table.can_answer(kwargs):
+            return ReferenceQuery(table, kwargs)
+        if table.loaded:
+            table.fallbacks += 1
+        return original_filter(**kwargs)
+
+    model.filter = classmethod(filter)
+    return table
+
+
+def get_reference_table(model):
+    return _tables.get(model)
+
+
+async def _on_write(model_class, operation, instance):
+    table = _tables.get(model_class)
+    if table is None or not table.loaded or (instance is None and operation not in BULK_OPERATIONS):
+        return
+    table.write_updates += 1
+    if operation in BULK_OPERATIONS:
+        # Rows changed by filter or in bulk aren't known one by one: reload the table
+        await table.load()
+    elif operation == "delete":
+        table.remove(instance)
+    else:
+        table.upsert(instance)
+
+
+register_write_hook(_on_write)
+
+
+async def preload_reference_tables():
+    if not settings.REFERENCE_CACHE_ENABLED or not _tables:
+        return
+    results = await asyncio.gather(*[table.load() for table in _tables.values()], return_exceptions=True)
+    for table, result in zip(_tables.values(), results):
+        if isinstance(result, Exception):
+            logger.error(f"[reference_cache] Preload failed for {table.model.__name__}: {result}")
+
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(settings.REFERENCE_CACHE_REFRESH_SECONDS)
+        for table in list(_tables.values()):
+            try:
+                await table.refresh()
+            except Exception as e:
+                logger.error(f"[reference_cache] Refresh failed for {table.model.__name__}: {e}")
+
+
+def start_reference_refresh():
+    global _refresh_task
+    if _refresh_task is None and _tables and settings.REFERENCE_CACHE_ENABLED and settings.REFERENCE_CACHE_REFRESH_SECONDS > 0:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+        vcprint(f"[reference_cache] Refreshing every {settings.REFERENCE_CACHE_REFRESH_SECONDS}s", color="bright_teal")
+
+
+async def stop_reference_refresh():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+
+
+def reference_cache_stats():
+    return {"enabled": settings.REFERENCE_CACHE_ENABLED, "tables": [t.stats() for t in _tables.values()]}
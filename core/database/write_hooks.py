@@ -0,0 +1,103 @@
+# core\database\write_hooks.py
+import inspect
+import logging
+from functools import wraps
+
+from matrx_utils import vcprint
+
+logger = logging.getLogger("app")
+
+# Callbacks receive (model_class, operation, instance) after a successful ORM write.
+# operation is one of "create", "save", "update", "update_fields", "delete" with the instance written, or one of
+# BULK_OPERATIONS with instance None: a write by filter or in bulk, where the rows affected are not known.
+BULK_OPERATIONS = ("bulk_create", "bulk_update", "bulk_delete", "query_update", "query_delete")
+_hooks = []
+
+
+def register_write_hook(callback):
+    """Register a sync or async callback to run after every ORM write"""
+    if callback not in _hooks:
+        _hooks.append(callback)
+    return callback
+
+
+def unregister_write_hook(callback):
+    if callback in _hooks:
+        _hooks.remove(callback)
+
+
+async def notify_write(model_class, operation, instance):
+    for callback in list(_hooks):
+        try:
+            result = callback(model_class, operation, instance)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            # A failing listener must never fail the write that already happened.
+            logger.error(f"[write_hooks] {getattr(callback, '__name__', callback)} failed for "
+                         f"{model_class.__name__}.{operation}: {e}", exc_info=True)
+
+
+def _hook_classmethod(method, operation):
+    @wraps(method)
+    async def wrapper(cls, *args, **kwargs):
+        instance = await method.__func__(cls, *args, **kwargs)
+        await notify_write(cls, operation, instance)
+        return instance
+
+    return wrapper
+
+
+def _hook_bulk_classmethod(method, operation):
+    @wraps(method)
+    async def wrapper(cls, *args, **kwargs):
+        result = await method.__func__(cls, *args, **kwargs)
+        await notify_write(cls, operation, None)
+        return result
+
+    return wrapper
+
+
+def _hook_query_method(method, operation):
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        result = await method(self, *args, **kwargs)
+        await notify_write(self.model, operation, None)
+        return result
+
+    return wrapper
+
+
+def _hook_method(method, operation):
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        result = await method(self, *args, **kwargs)
+        await notify_write(type(self), operation, self)
+        return result
+
+    return wrapper
+
+
+_installed = False
+
+
+def install_write_hooks():
+    """Wrap the ORM write methods (Model and QueryBuilder) so registered hooks see every write"""
+    global _installed
+    if _installed:
+        return
+
+    from matrx_utils.database.core.base import Model
+    from matrx_utils.database.query.builder import QueryBuilder
+
+    Model.create = classmethod(_hook_classmethod(Model.__dict__["create"], "create"))
+    Model.update_fields = classmethod(_hook_classmethod(Model.__dict__["update_fields"], "update_fields"))
+    for name in ("bulk_create", "bulk_update", "bulk_delete"):
+        setattr(Model, name, classmethod(_hook_bulk_classmethod(Model.__dict__[name], name)))
+    for name in ("save", "update", "delete"):
+        setattr(Model, name, _hook_method(getattr(Model, name), name))
+    QueryBuilder.update = _hook_query_method(QueryBuilder.update, "query_update")
+    QueryBuilder.delete = _hook_query_method(QueryBuilder.delete, "query_delete")
+
+    _installed = True
+    vcprint("[write_hooks] Installed ORM write hooks", color="bright_teal")
@@ -0,0 +1,17 @@
+# core\http\admin.py
+import hmac
+
+from core import settings
+
+
+def admin_key_error(key):
+    """Why a request sending X-Admin-Key `key` may not use admin features, or None when it may.
+
+    With ADMIN_API_KEY set the key has to match it. Without one admin features are off, unless a local setup
+    opts in with ADMIN_OPEN_IN_DEBUG while DEBUG is on.
+    """
+    if settings.ADMIN_API_KEY:
+        if key is None or not hmac.compare_digest(key.encode(), settings.ADMIN_API_KEY.encode()):
+            return "Invalid admin key"
+        return None
+    return None if settings.DEBUG and settings.ADMIN_OPEN_IN_DEBUG else "Admin endpoints are disabled"
@@ -0,0 +1,201 @@
+# core\http\admission.py
+import asyncio
+import logging
+import math
+import time
+
+from matrx_utils import vcprint
+
+from core import settings
+from core.metrics import Timings
+
+logger = logging.getLogger("app")
+
+
+class AdaptiveLimit:
+    """Concurrency limit for one route group, adjusted from observed latency (gradient style).
+
+    A slow moving average of response latency stands in for the no-load latency. While the short average
+    stays within ADMISSION_LATENCY_TOLERANCE of it the limit grows by about sqrt(limit) per update; once
+    latency rises past that, the limit shrinks in proportion. The limit only grows while at least half of it
+    is in use, so an idle group does not drift up to ADMISSION_MAX_LIMIT.
+    """
+
+    def __init__(self, group, initial=None, min_limit=None, max_limit=None):
+        self.group = group
+        self.limit = float(settings.ADMISSION_INITIAL_LIMIT if initial is None else initial)
+        self.min_limit = settings.ADMISSION_MIN_LIMIT if min_limit is None else min_limit
+        self.max_limit = settings.ADMISSION_MAX_LIMIT if max_limit is None else max_limit
+        self.inflight = 0
+        self.short_rtt = None
+        self.long_rtt = None
+        self.admitted = 0
+        self.rejected = 0
+        self.shed_for_priority = 0
+        self.latency_ms = Timings()
+
+    def try_acquire(self):
+        if self.inflight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        self.admitted += 1
+        return True
+
+    def release(self, rtt):
+        self.inflight -= 1
+        if rtt is None:
+            return
+        self.latency_ms.add(rtt * 1000)
+        if self.long_rtt is None:
+            self.short_rtt = self.long_rtt = rtt
+            return
+        self.short_rtt += (rtt - self.short_rtt) * 0.2
+        self.long_rtt += (rtt - self.long_rtt) * 0.01
+        if self.long_rtt > 2 * self.short_rtt:
+            # Latency recovered; let the baseline follow it down quickly
+            self.long_rtt *= 0.95
+
+        gradient = max(0.5, min(1.0, settings.ADMISSION_LATENCY_TOLERANCE * self.long_rtt / self.short_rtt))
+        if gradient == 1.0 and self.inflight + 1 < self.limit / 2:
+            return
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * 0.8 + target * 0.2
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+
+    def stats(self):
+        return {
+            "group": self.group,
+            "limit": round(self.limit, 1),
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "shed_for_priority": self.shed_for_priority,
+            "short_rtt_ms": round(self.short_rtt * 1000, 3) if self.short_rtt is not None else None,
+            "long_rtt_ms": round(self.long_rtt * 1000, 3) if self.long_rtt is not None else None,
+            "latency_ms": self.latency_ms.summary(),
+        }
+
+
+class AdmissionController:
+    """Per route group admission with event loop lag based shedding of low-priority groups.
+
+    Paths map to groups by longest prefix in ADMISSION_ROUTE_GROUPS (default ADMISSION_DEFAULT_GROUP).
+    Groups in ADMISSION_LOW_PRIORITY_GROUPS are also refused while the event loop lags more than
+    ADMISSION_LOOP_LAG_MS, so bulk work backs off before interactive requests start queueing.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.exempt = 0
+        self.loop_lag_ms = 0.0
+        self._prefixes = sorted(settings.ADMISSION_ROUTE_GROUPS.items(), key=lambda item: len(item[0]), reverse=True)
+        self._low_priority = set(settings.ADMISSION_LOW_PRIORITY_GROUPS)
+        self._lag_task = None
+
+    def group_for(self, path):
+        for prefix in settings.ADMISSION_EXEMPT_PATHS:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return None
+        for prefix, group in self._prefixes:
+            if path.startswith(prefix):
+                return group
+        return settings.ADMISSION_DEFAULT_GROUP
+
+    def limiter(self, group):
+        limiter = self.groups.get(group)
+        if limiter is None:
+            limiter = self.groups[group] = AdaptiveLimit(group)
+        return limiter
+
+    def try_admit(self, group):
+        limiter = self.limiter(group)
+        if group in self._low_priority and self.loop_lag_ms > settings.ADMISSION_LOOP_LAG_MS:
+            limiter.shed_for_priority += 1
+            limiter.rejected += 1
+            return None
+        return limiter if limiter.try_acquire() else None
+
+    async def _lag_loop(self, interval=0.05):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(interval)
+            lag_ms = max(0.0, (loop.time() - before - interval) * 1000)
+            self.loop_lag_ms += (lag_ms - self.loop_lag_ms) * 0.3
+
+    def start(self):
+        if self._lag_task is None and settings.ADMISSION_ENABLED:
+            self._lag_task = asyncio.create_task(self._lag_loop())
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+            self._lag_task = None
+
+    def stats(self):
+        return {
+            "enabled": settings.ADMISSION_ENABLED,
+            "loop_lag_ms": round(self.loop_lag_ms, 3),
+            "exempt": self.exempt,
+            "groups": [limiter.stats() for limiter in self.groups.values()],
+        }
+
+
+_admission_controller = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
+
+
+class AdmissionMiddleware:
+    """Refuses HTTP requests over their group's limit with an immediate 503 and Retry-After.
+
+    Latency is measured to the start of the response, so long streaming responses hold a slot for their
+    whole duration but only their time to first byte feeds the limit.
+    """
+
+    def __init__(self, app, controller=None):
+        self.app = app
+        self.controller = controller or get_admission_controller()
+        vcprint("[admission] Admission control enabled" if settings.ADMISSION_ENABLED
+                else "[admission] Admission control disabled", color="bright_teal")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        group = self.controller.group_for(scope["path"])
+        if group is None:
+            self.controller.exempt += 1
+            await self.app(scope, receive, send)
+            return
+        limiter = self.controller.try_admit(group)
+        if limiter is None:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+                            (b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server overloaded, retry later"}'})
+            return
+
+        start = time.perf_counter()
+        rtt = None
+
+        async def timed_send(message):
+            nonlocal rtt
+            if rtt is None and message["type"] == "http.response.start":
+                rtt = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            limiter.release(rtt)
@@ -0,0 +1,13 @@
+# core\http\identity.py
+
+
+def authenticated_user_id(scope):
+    """The authenticated user of an ASGI request scope, or None.
+
+    Reads scope["user"] as set by an authentication middleware (Starlette's AuthenticationMiddleware convention).
+    Never a user_id the client sends in a query parameter, body or socket auth dict: those are claims, not identity.
+    """
+    user = (scope or {}).get("user")
+    if user is None or not getattr(user, "is_authenticated", False):
+        return None
+    return user.display_name or None
@@ -0,0 +1,51 @@
+# core\http\profiling.py
+from matrx_utils import vcprint
+
+from core import settings
+from core.http.admin import admin_key_error
+from core.profiling import get_stack_sampler
+
+DISABLED_VALUES = (b"", b"0", b"false", b"off")
+
+
+class ProfileMiddleware:
+    """Profiles single requests that ask for it with PROFILE_REQUEST_HEADER and a valid X-Admin-Key.
+
+    The request's task, the tasks it creates and its thread pool jobs are sampled (StackSampler.profile_task);
+    the response carries X-Profile-Id for GET /api/v1/admin/profile/collapsed?id=... Other requests only pay
+    for a scan of their headers. Add it inside any BaseHTTPMiddleware, which runs the app in a separate task.
+    """
+
+    def __init__(self, app, sampler=None):
+        self.app = app
+        self.sampler = sampler or get_stack_sampler()
+        self.header = settings.PROFILE_REQUEST_HEADER.lower().encode()
+        vcprint(f"[profile] Requests with {settings.PROFILE_REQUEST_HEADER} and an admin key are profiled",
+                color="bright_teal")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested, key = None, None
+        for name, value in scope["headers"]:
+            if name == self.header:
+                requested = value
+            elif name == b"x-admin-key":
+                key = value.decode("latin-1")
+        if requested is None or requested.lower() in DISABLED_VALUES or admin_key_error(key) is not None:
+            await self.app(scope, receive, send)
+            return
+
+        with self.sampler.profile_task(f"{scope['method']} {scope['path']}") as session:
+            if session is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def tagged_send(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message.get("headers", ()),
+                                                      (b"x-profile-id", str(session.id).encode())]}
+                await send(message)
+
+            await self.app(scope, receive, tagged_send)
@@ -0,0 +1,325 @@
+# core\http\response_cache.py
+import asyncio
+import hashlib
+import inspect
+import logging
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from core import settings
+from core.database.write_hooks import register_write_hook
+
+logger = logging.getLogger("app")
+
+
+class _CachedResponse:
+    __slots__ = ("key", "body", "status", "headers", "etag", "fresh_until", "stale_until", "tags", "route", "call")
+
+    def __init__(self, key, response, etag, ttl, stale, tags, route, call):
+        now = time.monotonic()
+        self.key = key
+        self.body = response.body
+        self.status = response.status_code
+        # Raw (name, value) pairs so repeated headers keep every value; content-length is recomputed by
+        # Response, etag and x-cache are set per reply
+        self.headers = [(name, value) for name, value in response.raw_headers
+                        if name not in (b"content-length", b"etag", b"x-cache")]
+        self.etag = etag
+        self.fresh_until = now + ttl
+        self.stale_until = self.fresh_until + stale
+        self.tags = tags
+        self.route = route
+        # (handler, args, kwargs, ttl, stale) to re-run for stale-while-revalidate
+        self.call = call
+
+    @property
+    def size(self):
+        return len(self.body) + 256
+
+
+class ResponseCacheMetrics:
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.revalidations = 0
+        self.revalidation_errors = 0
+        # body bytes answered from memory instead of re-running the handler, and bytes not sent thanks to 304s
+        self.bytes_saved = 0
+        self.bytes_not_sent = 0
+
+    def snapshot(self):
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {**vars(self), "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0}
+
+
+class ResponseCache:
+    """Byte-bounded LRU of rendered GET responses, keyed on path, query string and selected request headers.
+
+    Entries are fresh for `ttl` seconds, then served stale for up to `stale` more while one background call
+    re-runs the handler. Entries carry tags ("model:<ModelName>" for the models a route reads, plus route
+    specific ones) so ORM writes and explicit calls to invalidate() drop exactly the affected responses.
+    """
+
+    def __init__(self, max_bytes=None, max_entry_bytes=None):
+        self.max_bytes = settings.RESPONSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_entry_bytes = settings.RESPONSE_CACHE_MAX_ENTRY_BYTES if max_entry_bytes is None else max_entry_bytes
+        self.metrics = ResponseCacheMetrics()
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._inflight = {}
+        self._revalidating = set()
+        # Bumped by every invalidation; a response computed across one is not stored
+        self._generation = 0
+        self._routes = {}
+
+    # ---- storage -----------------------------------------------------------------------------------
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, entry):
+        if entry.size > self.max_entry_bytes:
+            self.metrics.uncacheable += 1
+            return
+        self._discard(entry.key)
+        self._entries[entry.key] = entry
+        self._bytes += entry.size
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(entry.key)
+        self.metrics.stores += 1
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.metrics.evictions += 1
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def invalidate(self, tags=(), path_prefix=None):
+        """Drop entries carrying any of `tags` and/or whose path starts with `path_prefix`; returns the count"""
+        self._generation += 1
+        keys = set()
+        for tag in tags:
+            keys.update(self._tags.get(tag, ()))
+        if path_prefix is not None:
+            keys.update(key for key in self._entries if key[0].startswith(path_prefix))
+        dropped = sum(1 for key in keys if self._discard(key))
+        self.metrics.invalidations += dropped
+        return dropped
+
+    def invalidate_model(self, model):
+        name = model if isinstance(model, str) else model.__name__
+        return self.invalidate(tags=(f"model:{name}",))
+
+    def clear(self):
+        dropped = len(self._entries)
+        self._generation += 1
+        self.metrics.invalidations += dropped
+        self._entries.clear()
+        self._tags.clear()
+        self._bytes = 0
+        return dropped
+
+    # ---- request handling --------------------------------------------------------------------------
+
+    @staticmethod
+    def _key(request, vary):
+        query = tuple(sorted(request.query_params.multi_items()))
+        return request.url.path, query, tuple(request.headers.get(name, "") for name in vary)
+
+    @staticmethod
+    def _render(result):
+        if isinstance(result, Response):
+            # Streaming and file responses have no body to keep
+            return result if isinstance(getattr(result, "body", None), bytes) else None
+        return JSONResponse(jsonable_encoder(result))
+
+    def _reply(self, request, entry, state, vary):
+        headers = [(name, value) for name, value in entry.headers if not (vary and name == b"vary")]
+        headers += [(b"etag", entry.etag.encode()), (b"x-cache", state.encode())]
+        if vary:
+            headers.append((b"vary", ", ".join(vary).encode()))
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and entry.etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+            self.metrics.not_modified += 1
+            self.metrics.bytes_not_sent += len(entry.body)
+            response = Response(status_code=304)
+            response.raw_headers += [(name, value) for name, value in headers if name != b"content-type"]
+            return response
+        # The stored headers include the original content-type, so none is derived from a media type here
+        response = Response(content=entry.body, status_code=entry.status)
+        response.raw_headers += headers
+        return response
+
+    async def _compute(self, key, handler, args, kwargs, ttl, stale, tags, route):
+        generation = self._generation
+        result = await handler(*args, **kwargs)
+        response = self._render(result)
+        if response is None or response.status_code != 200 or "set-cookie" in response.headers:
+            # A cookie set for one client must not be replayed to the others
+            self.metrics.uncacheable += 1
+            return None, result
+        etag = f'"{hashlib.blake2b(response.body, digest_size=12).hexdigest()}"'
+        entry = _CachedResponse(key, response, etag, ttl, stale, tags, route, (handler, args, kwargs, ttl, stale))
+        if generation == self._generation:
+            self.put(entry)
+        return entry, result
+
+    async def _revalidate(self, entry):
+        handler, args, kwargs, ttl, stale = entry.call
+        try:
+            self.metrics.revalidations += 1
+            await self._compute(entry.key, handler, args, kwargs, ttl, stale, entry.tags, entry.route)
+        except Exception as e:
+            self.metrics.revalidation_errors += 1
+            logger.error(f"[response_cache] Revalidating {entry.route} failed: {e}")
+        finally:
+            self._revalidating.discard(entry.key)
+
+    async def respond(self, request, handler, args, kwargs, ttl, stale, vary, tags, route):
+        if not settings.RESPONSE_CACHE_ENABLED or request.method != "GET" or (
+            "authorization" in request.headers and "authorization" not in vary
+        ):
+            # Per-user responses are only cached when the route varies on the credential
+            self.metrics.bypassed += 1
+            return await handler(*args, **kwargs)
+
+        route_stats = self._routes.setdefault(route, {"hits": 0, "misses": 0})
+        key = self._key(request, vary)
+        entry = self.get(key)
+        now = time.monotonic()
+        if entry is not None and now < entry.fresh_until:
+            self.metrics.hits += 1
+            self.metrics.bytes_saved += len(entry.body)
+            route_stats["hits"] += 1
+            return self._reply(request, entry, "HIT", vary)
+        if entry is not None and now < entry.stale_until:
+            self.metrics.stale_hits += 1
+            self.metrics.bytes_saved += len(entry.body)
+            route_stats["hits"] += 1
+            if key not in self._revalidating:
+                self._revalidating.add(key)
+                asyncio.create_task(self._revalidate(entry))
+            return self._reply(request, entry, "STALE", vary)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # Same response already being computed by another request
+            self.metrics.coalesced += 1
+            route_stats["hits"] += 1
+            entry = await asyncio.shield(pending)
+            if entry is not None:
+                self.metrics.bytes_saved += len(entry.body)
+                return self._reply(request, entry, "HIT", vary)
+            return await handler(*args, **kwargs)
+
+        self.metrics.misses += 1
+        route_stats["misses"] += 1
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = pending
+        try:
+            entry, result = await self._compute(key, handler, args, kwargs, ttl, stale, tags, route)
+        except BaseException:
+            pending.set_result(None)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if not pending.done():
+            pending.set_result(entry)
+        if entry is None:
+            return result
+        return self._reply(request, entry, "MISS", vary)
+
+    def stats(self):
+        return {
+            "enabled": settings.RESPONSE_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "tags": len(self._tags),
+            **self.metrics.snapshot(),
+            "routes": self._routes,
+        }
+
+
+_response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def cache_response(ttl=None, stale=None, vary=(), tags=(), models=()):
+    """Cache the rendered response of a GET route; goes between @router.get(...) and the function.
+
+    `vary` lists request headers that select different responses, `tags` may use path parameters
+    ("job:{job_id}") and `models` are ORM models (or names) whose writes invalidate the route's entries.
+    Return values are rendered with jsonable_encoder, so cached routes should return their final shape.
+    """
+    vary = tuple(name.lower() for name in vary)
+    static_tags = tuple(f"model:{m if isinstance(m, str) else m.__name__}" for m in models)
+
+    def decorator(handler):
+        signature = inspect.signature(handler)
+        request_param = next(
+            (name for name, p in signature.parameters.items() if p.annotation is Request), None
+        )
+        route = handler.__qualname__
+
+        @wraps(handler)
+        async def wrapper(*args, **kwargs):
+            request = kwargs[request_param] if request_param else kwargs.pop("_cache_request")
+            entry_tags = static_tags + tuple(tag.format(**request.path_params) for tag in tags)
+            return await get_response_cache().respond(
+                request, handler, args, kwargs,
+                settings.RESPONSE_CACHE_TTL_SECONDS if ttl is None else ttl,
+                settings.RESPONSE_CACHE_STALE_SECONDS if stale is None else stale,
+                vary, entry_tags, route,
+            )
+
+        if request_param is None:
+            # FastAPI injects the Request through this extra keyword-only parameter
+            parameters = [*signature.parameters.values(),
+                          inspect.Parameter("_cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)]
+            wrapper.__signature__ = signature.replace(parameters=parameters)
+        return wrapper
+
+    return decorator
+
+
+async def _on_write(model_class, operation, instance):
+    if _response_cache is not None:
+        _response_cache.invalidate_model(model_class)
+
+
+register_write_hook(_on_write)
@@ -0,0 +1,318 @@
+# core\http\static_files.py
+import asyncio
+import mimetypes
+import os
+import stat as stat_module
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from core import settings
+
+# Precompressed siblings checked in preference order, e.g. app.js.br then app.js.gz
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Variant:
+    __slots__ = ("path", "size", "etag", "content")
+
+    def __init__(self, path, size, etag, content=None):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.content = content
+
+
+class _Entry:
+    __slots__ = ("path", "mtime_ns", "size", "checked_at", "content_type", "last_modified", "mtime", "variants")
+
+    def __init__(self, path, stat, checked_at):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+        self.checked_at = checked_at
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        self.content_type = content_type.encode()
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True).encode()
+        # encoding -> _Variant; "identity" is the file itself
+        self.variants = {}
+
+    def cached_bytes(self):
+        return sum(len(v.content) for v in self.variants.values() if v.content is not None)
+
+
+class StaticFilesMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.not_modified = 0
+        self.partial = 0
+        self.compressed = 0
+        self.zero_copy = 0
+        self.not_found = 0
+        self.bytes_sent = 0
+
+    def snapshot(self):
+        return dict(vars(self))
+
+
+class StaticFiles:
+    """ASGI app serving files under `directory`.
+
+    Small files (<= STATIC_CACHE_MAX_FILE_BYTES) are kept in memory, bounded by STATIC_CACHE_MAX_BYTES, and
+    re-validated with a stat() at most every STATIC_REVALIDATE_SECONDS. Responses carry ETag / Last-Modified
+    and answer conditional requests with 304. Precompressed .br / .gz siblings are served when the client
+    accepts them, single byte ranges get 206, and large files go out through the zero-copy send extension
+    when the server offers one, otherwise in CHUNK_SIZE reads off the event loop.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory).resolve()
+        self.metrics = StaticFilesMetrics()
+        self._entries = OrderedDict()
+        self._cached_bytes = 0
+
+    # ---- file lookup -------------------------------------------------------------------------------
+
+    def _resolve(self, path):
+        candidate = os.path.normpath(os.path.join(self.directory, path.lstrip("/")))
+        if candidate != str(self.directory) and not candidate.startswith(str(self.directory) + os.sep):
+            return None
+        return candidate
+
+    def _load_variant(self, path, stat, suffix):
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'.encode()
+        content = None
+        if stat.st_size <= settings.STATIC_CACHE_MAX_FILE_BYTES:
+            with open(path, "rb") as f:
+                content = f.read()
+        return _Variant(path, stat.st_size, etag, content)
+
+    def _build_entry(self, path, stat, now):
+        entry = _Entry(path, stat, now)
+        entry.variants["identity"] = self._load_variant(path, stat, "")
+        for encoding, extension in ENCODINGS:
+            try:
+                variant_stat = os.stat(path + extension)
+            except OSError:
+                continue
+            if variant_stat.st_mtime_ns >= stat.st_mtime_ns:
+                entry.variants[encoding] = self._load_variant(path + extension, variant_stat, f"-{extension[1:]}")
+        return entry
+
+    async def _lookup(self, path):
+        """Entry for `path`, from memory when still fresh; None if the file does not exist"""
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry is not None and now - entry.checked_at < settings.STATIC_REVALIDATE_SECONDS:
+            self._entries.move_to_end(path)
+            self.metrics.cache_hits += 1
+            return entry
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._forget(path)
+            return None
+        if not stat_module.S_ISREG(stat.st_mode):
+            return None
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            entry.checked_at = now
+            self._entries.move_to_end(path)
+            self.metrics.cache_hits += 1
+            return entry
+        # Reading the file (and its precompressed siblings) happens off the event loop
+        entry = await asyncio.to_thread(self._build_entry, path, stat, now)
+        self._forget(path)
+        self._remember(entry)
+        return entry
+
+    def _remember(self, entry):
+        self._entries[entry.path] = entry
+        self._cached_bytes += entry.cached_bytes()
+        while self._cached_bytes > settings.STATIC_CACHE_MAX_BYTES and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._cached_bytes -= evicted.cached_bytes()
+
+    def _forget(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._cached_bytes -= entry.cached_bytes()
+
+    # ---- request handling --------------------------------------------------------------------------
+
+    @staticmethod
+    def _route_path(scope):
+        # Mounted apps see the full path with the mount prefix in root_path
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            return path[len(root_path):]
+        return path
+
+    @staticmethod
+    def _headers(scope):
+        return {name: value for name, value in scope["headers"]}
+
+    @staticmethod
+    def _choose_encoding(entry, accept_encoding):
+        if len(entry.variants) == 1 or not accept_encoding:
+            return "identity"
+        accepted = {token.split(b";")[0].strip() for token in accept_encoding.split(b",")}
+        for encoding, _ in ENCODINGS:
+            if encoding in entry.variants and encoding.encode() in accepted:
+                return encoding
+        return "identity"
+
+    @staticmethod
+    def _not_modified(entry, variant, headers):
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix(b"W/") for tag in if_none_match.split(b",")}
+            return b"*" in tags or variant.etag in tags
+        if_modified_since = headers.get(b"if-modified-since")
+        if if_modified_since is not None:
+            try:
+                return entry.mtime <= int(parsedate_to_datetime(if_modified_since.decode()).timestamp())
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _parse_range(header, size):
+        """(start, end) inclusive for a single satisfiable range, "unsatisfiable", or None to send everything"""
+        if not header.startswith(b"bytes=") or b"," in header:
+            return None
+        first, _, last = header[6:].strip().partition(b"-")
+        try:
+            if not first:
+                length = int(last)
+                if length <= 0:
+                    return "unsatisfiable"
+                return max(0, size - length), size - 1
+            start = int(first)
+            end = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if start >= size or end < start:
+            return "unsatisfiable"
+        return start, min(end, size - 1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.metrics.requests += 1
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await self._send_simple(send, 405, b"Method Not Allowed", [(b"allow", b"GET, HEAD")])
+            return
+
+        path = self._resolve(self._route_path(scope))
+        entry = await self._lookup(path) if path else None
+        if entry is None:
+            self.metrics.not_found += 1
+            await self._send_simple(send, 404, b"Not Found")
+            return
+
+        headers = self._headers(scope)
+        range_header = headers.get(b"range")
+        # Byte ranges refer to the identity representation
+        encoding = "identity" if range_header else self._choose_encoding(entry, headers.get(b"accept-encoding"))
+        variant = entry.variants[encoding]
+
+        response_headers = [
+            (b"content-type", entry.content_type),
+            (b"etag", variant.etag),
+            (b"last-modified", entry.last_modified),
+            (b"cache-control", settings.STATIC_CACHE_CONTROL.encode()),
+            (b"accept-ranges", b"bytes"),
+        ]
+        vary = [(b"vary", b"Accept-Encoding")] if len(entry.variants) > 1 else []
+        response_headers += vary
+        if encoding != "identity":
+            response_headers.append((b"content-encoding", encoding.encode()))
+            self.metrics.compressed += 1
+
+        if self._not_modified(entry, variant, headers):
+            self.metrics.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": response_headers[1:4] + vary})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        start, end, status = 0, variant.size - 1, 200
+        if range_header is not None:
+            if_range = headers.get(b"if-range")
+            if if_range is None or if_range in (variant.etag, entry.last_modified):
+                byte_range = self._parse_range(range_header, variant.size)
+                if byte_range == "unsatisfiable":
+                    await self._send_simple(send, 416, b"Range Not Satisfiable",
+                                            [(b"content-range", f"bytes */{variant.size}".encode())])
+                    return
+                if byte_range is not None:
+                    start, end = byte_range
+                    status = 206
+                    self.metrics.partial += 1
+                    response_headers.append((b"content-range", f"bytes {start}-{end}/{variant.size}".encode()))
+
+        length = end - start + 1 if variant.size else 0
+        response_headers.append((b"content-length", str(length).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        if method == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        self.metrics.bytes_sent += length
+        if variant.content is not None:
+            await send({"type": "http.response.body", "body": variant.content[start:end + 1]})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            self.metrics.zero_copy += 1
+            with open(variant.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(), "offset": start, "count": length})
+        else:
+            await self._stream(variant.path, start, length, send)
+
+    @staticmethod
+    async def _stream(path, start, length, send):
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank under us; close the response rather than hang the client
+                await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _send_simple(send, status, body, headers=()):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode()), *headers],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self):
+        return {
+            "directory": str(self.directory),
+            "cached_files": len(self._entries),
+            "cached_bytes": self._cached_bytes,
+            **self.metrics.snapshot(),
+        }
+
+
+_static_files = None
+
+
+def get_static_files() -> StaticFiles:
+    global _static_files
+    if _static_files is None:
+        _static_files = StaticFiles(settings.STATIC_ROOT)
+    return _static_files
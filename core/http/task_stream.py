@@ -0,0 +1,141 @@
+# core\http\task_stream.py
+import asyncio
+import json
+import logging
+
+import anyio
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from core import settings
+from core.tasks.lanes import QueueFullError, get_lane_queue
+
+logger = logging.getLogger("app")
+
+NDJSON = "application/x-ndjson"
+SSE = "text/event-stream"
+
+_CLOSED = object()
+
+
+class HttpStreamHandler:
+    """stream_handler that queues a task's events for one streaming HTTP response.
+
+    Event types and payloads match JobStream, so services don't know whether they are streaming to a
+    Socket.IO session or to an HTTP client.
+    """
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+        self.seq = 0
+
+    def _emit(self, event_type, data):
+        self.seq += 1
+        self._queue.put_nowait({"seq": self.seq, "type": event_type, "data": data})
+
+    async def send_chunk(self, chunk):
+        self._emit("chunk", chunk)
+
+    async def send_status_update(self, status, system_message=None, user_visible_message=None, metadata=None):
+        self._emit("status_update", {"status": status, "system_message": system_message,
+                                     "user_visible_message": user_visible_message, "metadata": metadata})
+
+    async def send_data(self, data):
+        self._emit("data", data)
+
+    async def send_data_final(self, data):
+        self._emit("data_final", data)
+
+    async def send_error(self, error_type=None, message=None, user_visible_message=None, details=None, **kwargs):
+        self._emit("error", {"error_type": error_type, "message": message,
+                             "user_visible_message": user_visible_message, "details": details, **kwargs})
+
+    async def send_end(self):
+        self._emit("end", None)
+
+    def close(self):
+        self._queue.put_nowait(_CLOSED)
+
+    async def next_event(self, timeout):
+        """Next event, None after `timeout` seconds without one, or _CLOSED once the task has finished"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class TaskStreamingResponse(StreamingResponse):
+    """StreamingResponse that always listens for http.disconnect.
+
+    With ASGI spec 2.4 Starlette only notices a gone client when a write fails, but uvicorn drops writes
+    to a closed connection silently, so the stream (and the task behind it) would run to the end.
+    """
+
+    async def __call__(self, scope, receive, send):
+        async with anyio.create_task_group() as task_group:
+            async def stream():
+                await self.stream_response(send)
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(stream)
+            await self.listen_for_disconnect(receive)
+            task_group.cancel_scope.cancel()
+        if self.background is not None:
+            await self.background()
+
+
+def format_ndjson(event):
+    return json.dumps(event, default=str, separators=(",", ":")).encode() + b"\n"
+
+
+def format_sse(event):
+    data = json.dumps(event["data"], default=str, separators=(",", ":"))
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n".encode()
+
+
+def choose_media_type(fmt, accept):
+    if fmt:
+        return SSE if fmt.lower() == "sse" else NDJSON
+    return SSE if accept and SSE in accept else NDJSON
+
+
+async def stream_task(service, runner, media_type=NDJSON, user_id=None, payload=None):
+    """Run `runner(task)` on the service's task lane and stream its stream_handler events as NDJSON or SSE.
+
+    The runner reports through task.stream. When the client goes away the response generator is closed
+    and the task is cancelled, so abandoned requests free their lane slot instead of finishing unseen.
+    """
+    handler = HttpStreamHandler()
+    try:
+        task = await get_lane_queue().submit(service, runner, user_id=user_id, payload=payload, persist=False,
+                                             stream=handler)
+    except QueueFullError as e:
+        return JSONResponse({"detail": str(e)}, status_code=503,
+                            headers={"Retry-After": str(settings.DRAIN_RETRY_AFTER_SECONDS if e.draining else 1)})
+    task.future.add_done_callback(lambda _: handler.close())
+    encode = format_sse if media_type == SSE else format_ndjson
+
+    async def body():
+        finished = False
+        try:
+            while True:
+                event = await handler.next_event(settings.HTTP_STREAM_KEEPALIVE_SECONDS)
+                if event is _CLOSED:
+                    break
+                if event is None:
+                    # Keeps proxies from timing out idle streams, and a write is how a gone client is noticed
+                    yield b": keepalive\n\n" if media_type == SSE else format_ndjson({"type": "keepalive"})
+                    continue
+                yield encode(event)
+            finished = True
+            if task.future.cancelled():
+                yield encode({"seq": handler.seq + 1, "type": "error",
+                              "data": {"error_type": "cancelled", "message": "Task was cancelled"}})
+            elif task.future.exception() is not None:
+                yield encode({"seq": handler.seq + 1, "type": "error",
+                              "data": {"error_type": "task_error", "message": str(task.future.exception())}})
+        finally:
+            if not finished and get_lane_queue().cancel(task):
+                logger.info(f"[task_stream] Client disconnected; cancelled {service} task {task.id}")
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Task-Id": task.id}
+    return TaskStreamingResponse(body(), media_type=media_type, headers=headers)
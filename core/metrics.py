@@ -0,0 +1,24 @@
+# core\metrics.py
+from collections import deque
+
+
+class Timings:
+    """Sliding window of recent samples with percentile summaries"""
+
+    __slots__ = ("_samples",)
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+
+    def add(self, value):
+        self._samples.append(value)
+
+    def summary(self):
+        samples = sorted(self._samples)
+        if not samples:
+            return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "p50": round(samples[int(len(samples) * 0.50)], 3),
+            "p99": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+            "max": round(samples[-1], 3),
+        }
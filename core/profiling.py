@@ -0,0 +1,293 @@
+# core\profiling.py
+import asyncio
+import collections
+import contextlib
+import contextvars
+import functools
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import thread as futures_thread
+
+from core import settings
+
+logger = logging.getLogger("app")
+
+MAX_DEPTH = 128
+# Frame running a thread pool job; its `self` is the work item, whose fn carries the submitting context
+_WORK_ITEM_RUN = futures_thread._WorkItem.run.__code__
+# Task running on each event loop; private in asyncio, so task-scoped profiles degrade to nothing without it
+_current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+
+_session = contextvars.ContextVar("profile_session", default=None)
+_ids = itertools.count(1)
+
+
+class ProfileSession:
+    """Stack sample counts for one profile.
+
+    A process profile samples every thread. A task profile only counts the event loop thread while one of its
+    tasks runs (the task it was started in, and tasks created in its context) and thread pool jobs submitted
+    from that context (asyncio.to_thread, run_in_executor with a context copy).
+    """
+
+    def __init__(self, label, loop=None, max_seconds=None):
+        self.id = next(_ids)
+        self.label = label
+        self.loop = loop
+        self.loop_thread = threading.get_ident() if loop is not None else None
+        self.tasks = set()
+        self.counts = collections.Counter()
+        self.ticks = 0
+        self.started_at = time.time()
+        self.ended_at = None
+        self.deadline = time.monotonic() + (max_seconds or settings.PROFILE_MAX_SECONDS)
+
+    @property
+    def running(self):
+        return self.ended_at is None
+
+    def collapsed(self):
+        """Collapsed stacks ("root;caller;callee count" per line), as read by flamegraph.pl, inferno and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    def summary(self):
+        end = self.ended_at or time.time()
+        return {
+            "id": self.id,
+            "label": self.label,
+            "scope": "task" if self.loop is not None else "process",
+            "running": self.running,
+            "started_at": self.started_at,
+            "seconds": round(end - self.started_at, 3),
+            "ticks": self.ticks,
+            "samples": sum(self.counts.values()),
+            "stacks": len(self.counts),
+        }
+
+
+class StackSampler:
+    """Statistical profiler: a daemon thread reads sys._current_frames() every PROFILE_INTERVAL_MS while at least
+    one session is running, and exits when the last one ends.
+
+    Nothing is installed while idle. A task session additionally sets a loop task factory (chaining to any
+    existing one) that adds tasks created in the session's context to it, removed again with the last task
+    session on that loop. Finished sessions are kept for download, the last PROFILE_KEEP of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = []
+        self._thread = None
+        self._factories = {}
+        self.finished = collections.OrderedDict()
+        self.ticks = 0
+        self.cpu_ms = 0.0
+        self._labels = {}
+        self._base = str(settings.BASE_DIR) + os.sep
+
+    # Sessions
+
+    def start(self, seconds, label="process"):
+        """Start a process profile ending after `seconds`; None while another process profile is running"""
+        with self._lock:
+            if any(session.loop is None for session in self._sessions):
+                return None
+            session = ProfileSession(label, max_seconds=min(seconds, settings.PROFILE_MAX_SECONDS))
+            self._add(session)
+        logger.info(f"[profile] Sampling all threads every {settings.PROFILE_INTERVAL_MS:g}ms for up to "
+                    f"{min(seconds, settings.PROFILE_MAX_SECONDS):g}s (profile {session.id})")
+        return session
+
+    def stop(self, session_id=None):
+        """End the running process profile (or the session `session_id`); returns it, or None"""
+        with self._lock:
+            for session in self._sessions:
+                if session.id == session_id or (session_id is None and session.loop is None):
+                    self._end(session)
+                    return session
+        return None
+
+    def _add(self, session):
+        self._sessions.append(session)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def _end(self, session):
+        session.ended_at = time.time()
+        self._sessions.remove(session)
+        self.finished[session.id] = session
+        while len(self.finished) > settings.PROFILE_KEEP:
+            self.finished.popitem(last=False)
+
+    def get(self, session_id):
+        with self._lock:
+            for session in self._sessions:
+                if session.id == session_id:
+                    return session
+            return self.finished.get(session_id)
+
+    def latest(self):
+        """The running process profile, else the most recently finished one"""
+        with self._lock:
+            for session in itertools.chain(self._sessions, reversed(self.finished.values())):
+                if session.loop is None:
+                    return session
+            return None
+
+    @contextlib.contextmanager
+    def profile_task(self, label):
+        """Profile the current asyncio task (and what it starts) for the duration of the block.
+
+        Yields the session, or None when PROFILE_MAX_SESSIONS are already running or this interpreter's asyncio
+        does not expose the running task.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        with self._lock:
+            if _current_tasks is None or len(self._sessions) >= settings.PROFILE_MAX_SESSIONS:
+                session = None
+            else:
+                session = ProfileSession(label, loop=loop)
+                session.tasks.add(task)
+                self._install_factory(loop)
+                self._add(session)
+        if session is None:
+            yield None
+            return
+        token = _session.set(session)
+        try:
+            yield session
+        finally:
+            _session.reset(token)
+            with self._lock:
+                if session.running:
+                    self._end(session)
+                self._remove_factory(loop)
+
+    def _install_factory(self, loop):
+        if loop in self._factories:
+            return
+        previous = loop.get_task_factory()
+
+        def factory(loop, coro, context=None):
+            if previous is not None:
+                task = previous(loop, coro) if context is None else previous(loop, coro, context=context)
+            else:
+                task = asyncio.Task(coro, loop=loop, context=context)
+            session = _session.get() if context is None else context.get(_session)
+            if session is not None and session.running:
+                session.tasks.add(task)
+                task.add_done_callback(session.tasks.discard)
+            return task
+
+        self._factories[loop] = previous
+        loop.set_task_factory(factory)
+
+    def _remove_factory(self, loop):
+        if loop in self._factories and not any(session.loop is loop for session in self._sessions):
+            loop.set_task_factory(self._factories.pop(loop))
+
+    # Sampling
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        cpu = time.thread_time()
+        while True:
+            time.sleep(settings.PROFILE_INTERVAL_MS / 1000)
+            with self._lock:
+                now = time.monotonic()
+                for session in [session for session in self._sessions if now >= session.deadline]:
+                    self._end(session)
+                if not self._sessions:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                frames.pop(own, None)
+                if len(names) != threading.active_count():
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stacks = {}
+                for session in self._sessions:
+                    self._sample(session, frames, stacks, names)
+                self.ticks += 1
+                # CPU time of this thread, wake-ups included: what sampling takes away from the app
+                self.cpu_ms += (time.thread_time() - cpu) * 1000
+                cpu = time.thread_time()
+
+    def _sample(self, session, frames, stacks, names):
+        session.ticks += 1
+        for ident, frame in frames.items():
+            if session.loop is None:
+                root = names.get(ident, f"thread-{ident}")
+            elif ident == session.loop_thread:
+                if _current_tasks.get(session.loop) not in session.tasks:
+                    continue
+                root = session.label
+            elif self._job_session(frame) is session:
+                root = f"{session.label};(thread pool)"
+            else:
+                continue
+            stack = stacks.get(ident)
+            if stack is None:
+                stack = stacks[ident] = self._stack(frame)
+            session.counts[f"{root};{stack}"] += 1
+
+    @staticmethod
+    def _job_session(frame):
+        """Profile session of the context a thread pool job was submitted from, if the thread is running one"""
+        while frame is not None:
+            if frame.f_code is _WORK_ITEM_RUN:
+                item = frame.f_locals.get("self")
+                fn = getattr(item, "fn", None)
+                if isinstance(fn, functools.partial):
+                    context = getattr(fn.func, "__self__", None)
+                    if isinstance(context, contextvars.Context):
+                        return context.get(_session)
+                return None
+            frame = frame.f_back
+        return None
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(self._base):
+                filename = filename[len(self._base):]
+            else:
+                marker = filename.rfind("site-packages" + os.sep)
+                filename = filename[marker + 14:] if marker >= 0 else os.path.basename(filename)
+            label = self._labels[code] = f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        return label
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": [session.summary() for session in self._sessions],
+                "finished": [session.summary() for session in reversed(self.finished.values())],
+                "interval_ms": settings.PROFILE_INTERVAL_MS,
+                "ticks": self.ticks,
+                "cpu_ms": round(self.cpu_ms, 1),
+                "avg_tick_ms": round(self.cpu_ms / self.ticks, 3) if self.ticks else 0.0,
+            }
+
+
+_sampler = None
+
+
+def get_stack_sampler() -> StackSampler:
+    global _sampler
+    if _sampler is None:
+        _sampler = StackSampler()
+    return _sampler
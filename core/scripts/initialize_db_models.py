@@ -2,8 +2,25 @@
 from matrx_utils.core.initialize_database import init
 from matrx_utils.conf import settings
 
+from core.database.pool import install_pool_factory
+from core.database.query_cache import install_query_cache
+from core.database.query_instrumentation import install_query_instrumentation
+from core.database.reference_cache import register_reference_model
+from core.database.write_hooks import install_write_hooks
+
 DATABASE_CONFIGURED = False
 
 if not DATABASE_CONFIGURED:
     init()
-    DATABASE_CONFIGURED = True
\ No newline at end of file
+    install_pool_factory()
+    install_query_cache()
+    install_query_instrumentation()
+    install_write_hooks()
+
+    # Reference data: loaded whole at startup, filter() on these fields is answered from memory.
+    from matrx_utils.database.orm.models import DataInputComponent, DataOutputComponent
+
+    register_reference_model(DataInputComponent, index_fields=["name"])
+    register_reference_model(DataOutputComponent, index_fields=["component_type"])
+
+    DATABASE_CONFIGURED = True
@@ -33,10 +33,173 @@ class Settings(BaseSettings):
     LOG_VCPRINT: bool = True
 
     STATIC_ROOT: Path = Path(BASE_DIR) / "staticfiles"
+    # Files up to STATIC_CACHE_MAX_FILE_BYTES are served from memory (LRU bounded by STATIC_CACHE_MAX_BYTES)
+    # and re-checked on disk at most every STATIC_REVALIDATE_SECONDS
+    STATIC_CACHE_MAX_FILE_BYTES: int = 256 * 1024
+    STATIC_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    STATIC_REVALIDATE_SECONDS: float = 2.0
+    STATIC_CACHE_CONTROL: str = "public, max-age=3600"
     PORT: int = 8000
 
+    # Route response cache (core/http/response_cache.py): responses stay fresh for RESPONSE_CACHE_TTL_SECONDS,
+    # then are served stale for up to RESPONSE_CACHE_STALE_SECONDS while one request refreshes them
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: float = 30.0
+    RESPONSE_CACHE_STALE_SECONDS: float = 60.0
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024
+
+    # Admission control: each route group (longest matching prefix in ADMISSION_ROUTE_GROUPS) has a concurrency
+    # limit adapted to its latency; requests over it get an immediate 503. Low-priority groups are also refused
+    # while event loop lag is above ADMISSION_LOOP_LAG_MS.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_ROUTE_GROUPS: dict[str, str] = {"/api/v1/metrics": "ops", "/api/v1/jobs": "bulk", "/api/v1/scrape": "bulk"}
+    ADMISSION_DEFAULT_GROUP: str = "interactive"
+    ADMISSION_LOW_PRIORITY_GROUPS: list[str] = ["bulk"]
+    ADMISSION_EXEMPT_PATHS: list[str] = ["/api/v1/health", "/api/v1/drain", "/socket.io", "/static"]
+    ADMISSION_INITIAL_LIMIT: int = 64
+    ADMISSION_MIN_LIMIT: int = 4
+    ADMISSION_MAX_LIMIT: int = 1000
+    ADMISSION_LATENCY_TOLERANCE: float = 2.0
+    ADMISSION_LOOP_LAG_MS: float = 50.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Scraper (src/scraper): page fetches and incremental re-scrape state
+    SCRAPER_USER_AGENT: str = "Mozilla/5.0 (compatible; MatrxScraper/1.0)"
+    SCRAPER_TIMEOUT_SECONDS: float = 15.0
+    SCRAPER_MAX_CONNECTIONS: int = 50
+    SCRAPER_MAX_BODY_BYTES: int = 10 * 1024 * 1024
+    SCRAPER_CONCURRENCY_PER_TASK: int = 8
+    SCRAPER_STATE_PATH: Path | None = None
+    # Pages are parsed while they download; undecoded bytes waiting for the parser beyond this hold the download
+    SCRAPER_PARSE_BUFFER_BYTES: int = 1024 * 1024
+    # Tail latency: per-host timeouts from observed latency, hedged GETs, and a deadline for multi-page tasks
+    SCRAPER_MIN_TIMEOUT_SECONDS: float = 1.0
+    SCRAPER_TIMEOUT_P99_MULTIPLIER: float = 3.0
+    SCRAPER_LATENCY_WINDOW: int = 200
+    SCRAPER_LATENCY_MIN_SAMPLES: int = 20
+    SCRAPER_HEDGE_PERCENTILE: float = 0.95
+    SCRAPER_HEDGE_MIN_DELAY_MS: float = 50.0
+    SCRAPER_HEDGE_BUDGET: float = 0.1
+    SCRAPER_HEDGE_BURST: int = 10
+    SCRAPER_TASK_DEADLINE_SECONDS: float = 30.0
+    # Near-duplicate pages (src/scraper/dedup.py): MinHash over word shingles of text_data, LSH bands, and
+    # SimHash distance for search result descriptions. NEAR_DUPLICATES is "drop", "group" or None (off)
+    SCRAPER_NEAR_DUPLICATES: str | None = None
+    SCRAPER_DEDUP_THRESHOLD: float = 0.8
+    SCRAPER_DEDUP_NUM_PERM: int = 128
+    SCRAPER_DEDUP_BANDS: int = 32
+    SCRAPER_DEDUP_SHINGLE_WORDS: int = 5
+    SCRAPER_DEDUP_DESCRIPTION_DISTANCE: int = 3
+    # Crawl mode: stop conditions, frontier and seen-URL bounds, politeness per host, robots.txt cache lifetime
+    SCRAPER_CRAWL_MAX_PAGES: int = 100
+    SCRAPER_CRAWL_MAX_DEPTH: int = 3
+    SCRAPER_CRAWL_MAX_SECONDS: float = 300.0
+    SCRAPER_CRAWL_MAX_FRONTIER: int = 100_000
+    SCRAPER_CRAWL_EXACT_SEEN_LIMIT: int = 50_000
+    SCRAPER_CRAWL_BLOOM_CAPACITY: int = 2_000_000
+    SCRAPER_CRAWL_BLOOM_ERROR_RATE: float = 0.001
+    SCRAPER_CRAWL_HOST_CONCURRENCY: int = 2
+    SCRAPER_CRAWL_HOST_DELAY_SECONDS: float = 0.0
+    SCRAPER_ROBOTS_TTL_SECONDS: float = 3600.0
+    # Elements dropped from scraped pages, e.g. {"attribute": "class", "match_type": "partial", "trigger_value": "ad-"};
+    # each one removed is reported in content_filter_removal_details
+    SCRAPER_CONTENT_FILTER_RULES: list[dict] = []
+    # Streamed text (stream_scrape): chunk size in estimated tokens, and where a page's text is cut off
+    SCRAPER_TEXT_CHUNK_TOKENS: int = 512
+    SCRAPER_CHARS_PER_TOKEN: float = 4.0
+    SCRAPER_MAX_TEXT_CHARS: int = 2_000_000
+    # Result archive (src/scraper/archive.py): compressed segment files plus a SQLite index, under
+    # TEMP_DIR/scrape_archive unless ARCHIVE_PATH is set. Sealed segments at most COMPACT_RATIO live get rewritten
+    SCRAPER_ARCHIVE_ENABLED: bool = True
+    SCRAPER_ARCHIVE_PATH: Path | None = None
+    SCRAPER_ARCHIVE_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    SCRAPER_ARCHIVE_COMPRESSION_LEVEL: int = 6
+    SCRAPER_ARCHIVE_COMPACT_RATIO: float = 0.5
+
+    # Streaming HTTP task responses (NDJSON / SSE) send a keepalive after this long without an event
+    HTTP_STREAM_KEEPALIVE_SECONDS: float = 15.0
+
+    # Names as registered with the service factory (core/socket/core/app_factory.py)
     LONG_RUNNING_SERVICES: list[str] = ["transcription_service",
-                                        "scrape_service"]
+                                        "scraper_service_v2"]
+
+    # Task lanes: services in LONG_RUNNING_SERVICES run in the "long_running" lane, everything else
+    # in "interactive". Limits are per lane / per service; a full lane rejects new tasks.
+    TASK_LANE_WORKERS: dict[str, int] = {"long_running": 4, "interactive": 16}
+    TASK_LANE_MAX_DEPTH: dict[str, int] = {"long_running": 100, "interactive": 1000}
+    TASK_SERVICE_MAX_CONCURRENCY: dict[str, int] = {"scraper_service_v2": 3, "transcription_service": 2}
+
+    # Socket.IO client manager. "memory" keeps events in this process; "unix" fans out to the other workers
+    # on this host through a Unix-socket broker (hosted by the first worker unless SOCKETIO_EMBEDDED_BROKER
+    # is off); "redis" uses Redis pub/sub. SOCKETIO_MANAGER may also be a dotted AsyncManager class path.
+    SOCKETIO_MANAGER: str = "memory"
+    SOCKETIO_MANAGER_URL: str | None = None
+    SOCKETIO_CHANNEL: str = "socketio"
+    SOCKETIO_EMBEDDED_BROKER: bool = True
+    SOCKETIO_BUS_BATCH_MS: float = 2.0
+    SOCKETIO_BUS_BATCH_MAX: int = 256
+
+    # User session state: service state of sessions idle this long is released (the socket stays open)
+    SOCKET_SESSION_IDLE_SECONDS: float = 600.0
+    SOCKET_SESSION_SWEEP_SECONDS: float = 60.0
+
+    # Durable jobs: tasks for LONG_RUNNING_SERVICES are recorded with state, progress, result and an event
+    # log so clients can re-attach by job ID. JOB_STORE_BACKEND is "sqlite" or a dotted JobStore class path.
+    JOB_STORE_BACKEND: str = "sqlite"
+    JOB_STORE_PATH: Path | None = None
+    JOB_HEARTBEAT_SECONDS: float = 5.0
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_RETENTION_SECONDS: float = 86400.0
+    JOB_ATTACH_POLL_SECONDS: float = 1.0
+
+    # Graceful drain: on shutdown (or POST /api/v1/admin/drain) stop accepting work, let running tasks
+    # finish until the deadline, then mark the rest interrupted in the job store for the next start.
+    DRAIN_TIMEOUT_SECONDS: float = 25.0
+    DRAIN_RETRY_AFTER_SECONDS: int = 5
+
+    # Admin endpoints (drain, profiling, cache and archive maintenance) require this key in the X-Admin-Key header.
+    # Without a key they are off; ADMIN_OPEN_IN_DEBUG opens them with no key, and only while DEBUG is on.
+    ADMIN_API_KEY: str | None = None
+    ADMIN_OPEN_IN_DEBUG: bool = False
+
+    # Sampling profiler (core/profiling.py, /api/v1/admin/profile). Requests sending PROFILE_REQUEST_HEADER: 1 with
+    # a valid X-Admin-Key are profiled on their own (None removes the middleware), as are ScrapeService tasks
+    # with "profile": true in their task_context when PROFILE_TASKS is on. The last PROFILE_KEEP results are kept.
+    PROFILE_INTERVAL_MS: float = 10.0
+    PROFILE_MAX_SECONDS: float = 300.0
+    PROFILE_REQUEST_HEADER: str | None = "X-Profile"
+    PROFILE_TASKS: bool = False
+    PROFILE_MAX_SESSIONS: int = 8
+    PROFILE_KEEP: int = 20
+
+    # Database instrumentation
+    DB_QUERY_INSTRUMENTATION: bool = True
+    DB_SLOW_QUERY_MS: float = 200.0
+    DB_QUERY_STATS_MAX_FINGERPRINTS: int = 500
+    DB_REPEATED_QUERY_THRESHOLD: int = 10
+
+    # Compiled query cache. Prepared statements are off by default because the Supabase
+    # transaction pooler does not keep server-side statements between transactions.
+    DB_COMPILED_QUERY_CACHE_SIZE: int = 512
+    DB_PREPARED_STATEMENTS: bool = False
+    DB_PREPARED_STATEMENTS_PER_CONNECTION: int = 100
+
+    # Connection pool (one pool per configured database)
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = 20
+    DB_POOL_ACQUIRE_TIMEOUT: float = 10.0
+    DB_POOL_MAX_LIFETIME_SECONDS: float = 1800.0
+    DB_POOL_MAX_IDLE_SECONDS: float = 300.0
+    DB_COMMAND_TIMEOUT: float = 10.0
+    DB_STATEMENT_TIMEOUT_MS: int = 10000
+    DB_POOL_WARMUP: bool = True
+    DB_POOL_WARMUP_DATABASES: list[str] = []
+
+    # Reference tables preloaded into memory (registered in core/scripts/initialize_db_models.py)
+    REFERENCE_CACHE_ENABLED: bool = True
+    REFERENCE_CACHE_REFRESH_SECONDS: float = 300.0
+    REFERENCE_CACHE_FULL_RELOAD_EVERY: int = 12
 
 
 
@@ -0,0 +1,112 @@
+# core\socket\broker.py
+import argparse
+import asyncio
+import logging
+import os
+import struct
+
+from matrx_utils import vcprint
+
+logger = logging.getLogger("app")
+
+_HEADER = struct.Struct("!I")
+
+# A subscriber that falls this far behind is disconnected instead of growing the broker's memory
+MAX_CLIENT_BUFFER_BYTES = 16 * 1024 * 1024
+
+
+async def read_frame(reader):
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return await reader.readexactly(length)
+
+
+def write_frame(writer, payload):
+    writer.write(_HEADER.pack(len(payload)) + payload)
+
+
+class UnixSocketBroker:
+    """Relays length-prefixed frames from each connected process to every other one.
+
+    Frames are opaque to the broker, so a published batch costs one read and one write per subscriber.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._server = None
+        self._clients = set()
+        self.frames = 0
+        self.bytes = 0
+        self.dropped_clients = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.path)
+        os.chmod(self.path, 0o600)
+        logger.info(f"[socketio_broker] Listening on {self.path}")
+
+    async def _handle_client(self, reader, writer):
+        self._clients.add(writer)
+        try:
+            while True:
+                payload = await read_frame(reader)
+                self.frames += 1
+                self.bytes += len(payload)
+                frame = _HEADER.pack(len(payload)) + payload
+                for client in list(self._clients):
+                    if client is writer:
+                        continue
+                    if client.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER_BYTES:
+                        self.dropped_clients += 1
+                        logger.warning("[socketio_broker] Dropping a subscriber that stopped reading")
+                        self._clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "clients": len(self._clients),
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "dropped_clients": self.dropped_clients,
+        }
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for client in list(self._clients):
+                client.close()
+            await self._server.wait_closed()
+            self._server = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def serve(path):
+    broker = UnixSocketBroker(path)
+    await broker.start()
+    vcprint(f"[socketio_broker] Relaying Socket.IO events on {path}", color="green")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await broker.close()
+
+
+if __name__ == "__main__":
+    # Standalone broker for SOCKETIO_MANAGER="unix" with SOCKETIO_EMBEDDED_BROKER=False:
+    #   python -m core.socket.broker --path /run/matrx/socketio.sock
+    parser = argparse.ArgumentParser(description="Unix-socket event bus for Socket.IO workers on one host")
+    parser.add_argument("--path", required=True)
+    try:
+        asyncio.run(serve(parser.parse_args().path))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,340 @@
+# core\socket\client_manager.py
+import asyncio
+import base64
+import fcntl
+import importlib
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from matrx_utils import vcprint
+from socketio import AsyncManager
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from core import settings
+from core.metrics import Timings
+from core.socket.broker import UnixSocketBroker, read_frame, write_frame
+
+logger = logging.getLogger("app")
+
+
+def _encode_value(value):
+    # Binary emit data (sent to clients as Socket.IO attachments) crosses the bus as base64
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Object of type {type(value).__name__} can't be sent over the socket bus")
+
+
+def _decode_object(obj):
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"], validate=True)
+    return obj
+
+
+def encode_batch(batch):
+    """A batch of pub/sub messages as a JSON frame. Never pickle: anything that can publish to the bus could
+    then run code in every worker.
+
+    Tuple emit data means several event arguments to Socket.IO (a list is one argument), so it is flagged.
+    """
+    messages = [{**message, "data": list(message["data"]), "data_args": True}
+                if isinstance(message.get("data"), tuple) else message for message in batch]
+    return json.dumps(messages, separators=(",", ":"), default=_encode_value).encode()
+
+
+def decode_batch(payload):
+    batch = json.loads(payload, object_hook=_decode_object)
+    if not isinstance(batch, list) or not all(isinstance(message, dict) for message in batch):
+        raise ValueError("Not a list of messages")
+    for message in batch:
+        if message.pop("data_args", False):
+            message["data"] = tuple(message["data"])
+    return batch
+
+
+class BusMetrics:
+    def __init__(self):
+        self.published = 0
+        self.batches_sent = 0
+        self.received = 0
+        self.batches_received = 0
+        self.publish_errors = 0
+        self.reconnects = 0
+        self.latency_ms = Timings()
+        self.batch_sizes = Timings()
+
+    def snapshot(self):
+        return {
+            "published": self.published,
+            "batches_sent": self.batches_sent,
+            "avg_batch_size": round(self.published / self.batches_sent, 2) if self.batches_sent else 0.0,
+            "batch_size": self.batch_sizes.summary(),
+            "received": self.received,
+            "batches_received": self.batches_received,
+            "publish_errors": self.publish_errors,
+            "reconnects": self.reconnects,
+            "bus_latency_ms": self.latency_ms.summary(),
+        }
+
+
+class BatchingPubSubManager(AsyncPubSubManager, ABC):
+    """Pub/sub client manager that coalesces cross-process messages into batches.
+
+    Messages published within SOCKETIO_BUS_BATCH_MS of each other (up to SOCKETIO_BUS_BATCH_MAX) go out as
+    one frame, so a burst of stream chunks costs one bus round trip instead of one per emit. Local clients
+    are still served immediately by AsyncPubSubManager. Subclasses provide _send_batch and _receive_batches.
+    """
+
+    name = "batching-pubsub"
+
+    def __init__(self, channel="socketio", batch_ms=2.0, batch_max=256, write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.batch_ms = batch_ms
+        self.batch_max = batch_max
+        self.metrics = BusMetrics()
+        self._pending = []
+        self._batch_full = asyncio.Event()
+        self._flush_task = None
+
+    async def _publish(self, data):
+        data["sent_at"] = time.time()
+        self._pending.append(data)
+        self.metrics.published += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+        elif len(self._pending) >= self.batch_max:
+            self._batch_full.set()
+
+    async def _flush(self):
+        while self._pending:
+            if self.batch_ms > 0 and len(self._pending) < self.batch_max:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.batch_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_full.clear()
+            batch, self._pending = self._pending[:self.batch_max], self._pending[self.batch_max:]
+            try:
+                await self._send_batch(encode_batch(batch))
+            except Exception as e:
+                self.metrics.publish_errors += 1
+                logger.error(f"[socketio_bus] Dropped a batch of {len(batch)} messages: {e}")
+                continue
+            self.metrics.batches_sent += 1
+            self.metrics.batch_sizes.add(len(batch))
+
+    async def _listen(self):
+        async for payload in self._receive_batches():
+            try:
+                batch = decode_batch(payload)
+            except Exception as e:
+                logger.error(f"[socketio_bus] Undecodable batch: {e}")
+                continue
+            now = time.time()
+            self.metrics.batches_received += 1
+            for message in batch:
+                if message.get("host_id") != self.host_id:
+                    self.metrics.received += 1
+                    sent_at = message.get("sent_at")
+                    if sent_at is not None:
+                        self.metrics.latency_ms.add((now - sent_at) * 1000)
+                yield message
+
+    @abstractmethod
+    async def _send_batch(self, payload):
+        """Publish one encoded batch to every other process"""
+
+    @abstractmethod
+    def _receive_batches(self):
+        """Async iterator over encoded batches published by any process"""
+
+    async def close(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            self._batch_full.set()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        thread = getattr(self, "thread", None)
+        if thread is not None:
+            thread.cancel()
+            await asyncio.gather(thread, return_exceptions=True)
+
+    def stats(self):
+        return {"manager": self.name, "host_id": self.host_id, **self.metrics.snapshot()}
+
+
+class UnixSocketManager(BatchingPubSubManager):
+    """Fans out between worker processes on one host through a Unix-socket broker.
+
+    With embedded_broker the first worker to take the lock file runs the broker in-process; if it exits,
+    the lock is released and another worker takes over on its next reconnect.
+    """
+
+    name = "unix"
+
+    def __init__(self, url=None, embedded_broker=True, **kwargs):
+        super().__init__(**kwargs)
+        url = url or f"unix://{Path(settings.TEMP_DIR) / 'socketio.sock'}"
+        self.path = url[len("unix://"):] if url.startswith("unix://") else url
+        self.embedded_broker = embedded_broker
+        self.broker = None
+        self._lock_fd = None
+        self._reader = None
+        self._writer = None
+        self._connect_lock = asyncio.Lock()
+
+    def _try_become_broker(self):
+        fd = os.open(f"{self.path}.lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            delay = 0.05
+            while True:
+                try:
+                    self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                    return
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if self.embedded_broker and self.broker is None and self._try_become_broker():
+                        self.broker = UnixSocketBroker(self.path)
+                        await self.broker.start()
+                        vcprint(f"[socketio_bus] This worker hosts the event broker at {self.path}", color="bright_teal")
+                        continue
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 2.0)
+
+    def _disconnected(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        self.metrics.reconnects += 1
+
+    async def _send_batch(self, payload):
+        for attempt in range(2):
+            await self._connect()
+            try:
+                write_frame(self._writer, payload)
+                await self._writer.drain()
+                return
+            except ConnectionError:
+                self._disconnected()
+                if attempt:
+                    raise
+
+    async def _receive_batches(self):
+        while True:
+            await self._connect()
+            reader = self._reader
+            try:
+                yield await read_frame(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                if reader is self._reader:
+                    self._disconnected()
+
+    async def close(self):
+        await super().close()
+        if self._writer is not None:
+            self._writer.close()
+        if self.broker is not None:
+            await self.broker.close()
+            self.broker = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self):
+        stats = super().stats()
+        stats["path"] = self.path
+        stats["broker"] = self.broker.stats() if self.broker is not None else None
+        return stats
+
+
+class RedisBusManager(BatchingPubSubManager):
+    """Batched fan-out over Redis pub/sub (or any server speaking its protocol); needs the `redis` package"""
+
+    name = "redis"
+
+    def __init__(self, url=None, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError('SOCKETIO_MANAGER="redis" requires the redis package (pip install redis)') from e
+        self.redis = aioredis.Redis.from_url(url or "redis://localhost:6379/0")
+
+    async def _send_batch(self, payload):
+        await self.redis.publish(self.channel, payload)
+
+    async def _receive_batches(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        yield message["data"]
+            except (ConnectionError, OSError) as e:
+                logger.error(f"[socketio_bus] Redis subscription lost: {e}")
+                self.metrics.reconnects += 1
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        await super().close()
+        await self.redis.aclose()
+
+
+def create_client_manager():
+    """Client manager for SOCKETIO_MANAGER: "memory", "unix", "redis" or a dotted AsyncManager class path"""
+    kind = settings.SOCKETIO_MANAGER
+    if kind == "memory":
+        return AsyncManager()
+    options = {
+        "channel": settings.SOCKETIO_CHANNEL,
+        "batch_ms": settings.SOCKETIO_BUS_BATCH_MS,
+        "batch_max": settings.SOCKETIO_BUS_BATCH_MAX,
+    }
+    if kind == "unix":
+        return UnixSocketManager(settings.SOCKETIO_MANAGER_URL, embedded_broker=settings.SOCKETIO_EMBEDDED_BROKER, **options)
+    if kind == "redis":
+        return RedisBusManager(settings.SOCKETIO_MANAGER_URL, **options)
+    module_name, _, class_name = kind.rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)(url=settings.SOCKETIO_MANAGER_URL, **options)
+
+
+def install_client_manager(sio):
+    """Swap the server's client manager; must run before the first client connects"""
+    manager = create_client_manager()
+    sio.manager = manager
+    manager.set_server(sio)
+    sio.manager_initialized = False
+    vcprint(f"[socketio_bus] Client manager: {settings.SOCKETIO_MANAGER}", color="bright_teal")
+    return manager
+
+
+def start_client_manager(sio):
+    """Start the bus listener now rather than on the first connection, so server-side emits fan out immediately"""
+    if not sio.manager_initialized:
+        sio.manager_initialized = True
+        sio.manager.initialize()
+
+
+async def close_client_manager(sio):
+    if isinstance(sio.manager, BatchingPubSubManager):
+        await sio.manager.close()
+
+
+def client_manager_stats(sio):
+    if isinstance(sio.manager, BatchingPubSubManager):
+        return sio.manager.stats()
+    return {"manager": getattr(sio.manager, "name", type(sio.manager).__name__)}
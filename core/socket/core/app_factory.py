@@ -1,14 +1,18 @@
 # core\socket\core\app_factory.py
 from matrx_utils.socket.core.service_factory import ServiceFactory
-from src.scraper_service import ScrapeService
+from core.tasks.drain import register_resumable
+from src.scraper_service import ScrapeService, run_scrape_job
 from matrx_utils.socket.core.app_factory import configure_factory
 
 class AppServiceFactory(ServiceFactory):
     def __init__(self):
         super().__init__()
-        self.register_service("scraper_service_v2", ScrapeService)
+        self.register_service(ScrapeService.service_name, ScrapeService)
 
         # Register YOUR app's services using the inherited methods
         # self.register_multi_instance_service...
 
-configure_factory(AppServiceFactory)
\ No newline at end of file
+configure_factory(AppServiceFactory)
+
+# Scrape jobs interrupted by a drain (or a dead worker) are picked up again from their saved progress
+register_resumable(ScrapeService.service_name, run_scrape_job)
\ No newline at end of file
@@ -0,0 +1,226 @@
+# core\socket\core\session_registry.py
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import time
+import weakref
+
+from matrx_utils import vcprint
+
+from core import settings
+from core.http.identity import authenticated_user_id
+
+logger = logging.getLogger("app")
+
+# sid of the Socket.IO event being handled; services created while handling it are tracked under that session
+current_sid = contextvars.ContextVar("current_sid", default=None)
+
+
+class SessionRecord:
+    """Per-connection metadata; slotted so an idle connection costs a few hundred bytes here"""
+
+    __slots__ = ("sid", "user_id", "identity", "connected_at", "last_active", "events", "inflight", "services",
+                 "evicted")
+
+    def __init__(self, sid, user_id, now, identity=None):
+        self.sid = sid
+        self.user_id = sys.intern(user_id) if isinstance(user_id, str) else user_id
+        self.identity = identity
+        self.connected_at = now
+        self.last_active = now
+        self.events = 0
+        self.inflight = 0
+        self.services = None
+        self.evicted = False
+
+
+def _deep_size(obj, seen, depth=0):
+    if id(obj) in seen or depth > 4:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen, depth + 1) + _deep_size(v, seen, depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen, depth + 1) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += _deep_size(vars(obj), seen, depth + 1)
+    return size
+
+
+def process_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+class SessionRegistry:
+    """Tracks user-session connections and evicts per-session service state after SOCKET_SESSION_IDLE_SECONDS.
+
+    The socket stays connected; evicted services fall back to their class-level defaults and are rebuilt
+    by the next event. Services are held weakly so the registry never extends their lifetime.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self.connects = 0
+        self.disconnects = 0
+        self.evictions = 0
+        self.evicted_services = 0
+        self._sweep_task = None
+
+    def connect(self, sid, user_id=None, identity=None):
+        self._sessions[sid] = SessionRecord(sid, user_id, time.monotonic(), identity)
+        self.connects += 1
+
+    def disconnect(self, sid):
+        if self._sessions.pop(sid, None) is not None:
+            self.disconnects += 1
+
+    def begin_event(self, sid):
+        record = self._sessions.get(sid)
+        if record is not None:
+            record.last_active = time.monotonic()
+            record.events += 1
+            record.inflight += 1
+            record.evicted = False
+        return record
+
+    @staticmethod
+    def end_event(record):
+        if record is not None:
+            record.inflight -= 1
+            record.last_active = time.monotonic()
+
+    def user_id(self, sid=None):
+        """user_id the session connected with (sid defaults to the session of the event being handled)"""
+        record = self._sessions.get(sid or current_sid.get())
+        return record.user_id if record is not None else None
+
+    def identity(self, sid=None):
+        """Authenticated user of the session's connection (see authenticated_user_id), None when unauthenticated.
+
+        Unlike user_id, which the client picks in its auth dict, this can decide who owns what.
+        """
+        record = self._sessions.get(sid or current_sid.get())
+        return record.identity if record is not None else None
+
+    def attach_service(self, service, sid=None):
+        record = self._sessions.get(sid or current_sid.get())
+        if record is None:
+            return
+        if record.services is None:
+            record.services = weakref.WeakSet()
+        record.services.add(service)
+
+    def _evict(self, record):
+        released = 0
+        for service in list(record.services or ()):
+            release = getattr(service, "release_state", None)
+            if release is not None and release():
+                released += 1
+        record.services = None
+        record.evicted = True
+        self.evictions += 1
+        self.evicted_services += released
+
+    def evict_idle(self, idle_seconds=None):
+        idle_seconds = settings.SOCKET_SESSION_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        cutoff = time.monotonic() - idle_seconds
+        evicted = 0
+        for record in list(self._sessions.values()):
+            if record.services and not record.inflight and record.last_active < cutoff:
+                self._evict(record)
+                evicted += 1
+        return evicted
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(settings.SOCKET_SESSION_SWEEP_SECONDS)
+            evicted = self.evict_idle()
+            if evicted:
+                logger.info(f"[sessions] Released service state for {evicted} idle sessions")
+
+    def start(self):
+        if self._sweep_task is None and settings.SOCKET_SESSION_IDLE_SECONDS > 0:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+            self._sweep_task = None
+
+    def memory_report(self, sample=200):
+        """Session counts plus an estimate of bytes held per session, from a sample of records and their services"""
+        records = list(self._sessions.values())
+        step = max(1, len(records) // sample)
+        sampled = records[::step][:sample]
+        seen = set()
+        record_bytes = sum(sys.getsizeof(r) for r in sampled)
+        service_bytes = sum(_deep_size(s, seen) for r in sampled for s in (r.services or ()))
+        per_session = (record_bytes + service_bytes) / len(sampled) if sampled else 0.0
+        return {
+            "sessions": len(records),
+            "with_service_state": sum(1 for r in records if r.services),
+            "evicted_idle": sum(1 for r in records if r.evicted),
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "evictions": self.evictions,
+            "evicted_services": self.evicted_services,
+            "bytes_per_session_estimate": round(per_session),
+            "total_bytes_estimate": round(per_session * len(records)),
+            "process_rss_bytes": process_rss_bytes(),
+        }
+
+
+_registry = None
+
+
+def get_session_registry() -> SessionRegistry:
+    global _registry
+    if _registry is None:
+        _registry = SessionRegistry()
+    return _registry
+
+
+def install_session_tracking(namespace):
+    """Wrap the namespace's event dispatch to record connects, activity and the sid services are created for"""
+    registry = get_session_registry()
+    original = namespace.trigger_event
+
+    async def trigger_event(event, *args):
+        sid = args[0] if args else None
+        if event == "connect":
+            environ = args[1] if len(args) > 1 and isinstance(args[1], dict) else {}
+            auth = args[2] if len(args) > 2 else None
+            registry.connect(sid, auth.get("user_id") if isinstance(auth, dict) else None,
+                             identity=authenticated_user_id(environ.get("asgi.scope")))
+        elif event == "disconnect":
+            registry.disconnect(sid)
+            return await original(event, *args)
+        record = registry.begin_event(sid)
+        token = current_sid.set(sid)
+        try:
+            result = await original(event, *args)
+        except ConnectionRefusedError:
+            registry.disconnect(sid)
+            raise
+        finally:
+            current_sid.reset(token)
+            registry.end_event(record)
+        if event == "connect" and result is False:
+            registry.disconnect(sid)
+        return result
+
+    namespace.trigger_event = trigger_event
+    vcprint(f"[sessions] Tracking sessions on {namespace.namespace}", color="bright_teal")
+    return registry
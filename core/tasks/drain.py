@@ -0,0 +1,216 @@
+# core\tasks\drain.py
+import asyncio
+import logging
+import time
+
+from core import settings
+from core.tasks import job_store as jobs
+from core.tasks.lanes import QueueFullError, get_lane_queue
+
+logger = logging.getLogger("app")
+
+RUNNING = "running"
+DRAINING = "draining"
+DRAINED = "drained"
+
+
+# service name -> async runner(task); a resumable runner reads task.payload and task.progress and
+# reports through task.stream. Registered services also accept jobs from the submit_job socket event.
+_resumable_runners = {}
+
+
+def register_resumable(service, runner):
+    """Allow interrupted jobs of `service` to be resubmitted with `runner` on this or another worker"""
+    _resumable_runners[service] = runner
+
+
+def get_resumable_runner(service):
+    return _resumable_runners.get(service)
+
+
+class DrainController:
+    def __init__(self, store=None):
+        self.store = store or jobs.get_job_store()
+        self.state = RUNNING
+        self.started_at = None
+        self.deadline = None
+        self.finished_at = None
+        self.in_flight_at_start = 0
+        self.completed_during_drain = 0
+        self.checkpointed = 0
+        self.rejected_connections = 0
+        self.resumed = 0
+        self._drain_task = None
+        self._recovery_task = None
+
+    @property
+    def accepting(self):
+        return self.state == RUNNING
+
+    def _outstanding(self):
+        queue = get_lane_queue()
+        running = [t for lane in queue.lanes.values() for t in lane.running_tasks()]
+        pending = [t for lane in queue.lanes.values() for t in lane.pending_tasks()]
+        return running, pending
+
+    def begin(self, timeout=None):
+        """Start draining in the background; safe to call more than once"""
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain(timeout))
+        return self._drain_task
+
+    async def drain(self, timeout=None):
+        await self.begin(timeout)
+
+    async def _drain(self, timeout):
+        timeout = settings.DRAIN_TIMEOUT_SECONDS if timeout is None else timeout
+        queue = get_lane_queue()
+        self.state = DRAINING
+        self.started_at = time.time()
+        self.deadline = self.started_at + timeout
+        await self.stop_recovery()
+        for lane in queue.lanes.values():
+            lane.accepting = False
+
+        running, pending = self._outstanding()
+        self.in_flight_at_start = len(running) + len(pending)
+        logger.info(f"[drain] Draining: {len(running)} running, {len(pending)} queued, deadline {timeout}s")
+
+        # Queued work has not started; checkpoint it right away so it is not started on a dying instance.
+        for lane in queue.lanes.values():
+            for task in lane.take_pending():
+                await self._checkpoint(task)
+                task.future.cancel()
+
+        while running and time.time() < self.deadline:
+            await asyncio.sleep(min(0.25, max(0.0, self.deadline - time.time())))
+            still_running, _ = self._outstanding()
+            self.completed_during_drain += len(running) - len(still_running)
+            running = still_running
+
+        for task in running:
+            await self._checkpoint(task)
+            if not task.future.done():
+                task.future.cancel()
+        await queue.shutdown()
+
+        self.state = DRAINED
+        self.finished_at = time.time()
+        logger.info(
+            f"[drain] Drained in {self.finished_at - self.started_at:.1f}s: "
+            f"{self.completed_during_drain} finished, {self.checkpointed} checkpointed"
+        )
+
+    async def _checkpoint(self, task):
+        try:
+            if get_resumable_runner(task.service) is None:
+                logger.warning(f"[drain] Dropping {task.service} task {task.id}: service is not resumable")
+                if task.persistent:
+                    await self.store.update(task.id, state=jobs.FAILED, error="Interrupted by shutdown", owner=None)
+                return
+            await self.store.save(task, jobs.INTERRUPTED, owner=None)
+            self.checkpointed += 1
+        except Exception as e:
+            logger.error(f"[drain] Failed to checkpoint task {task.id}: {e}")
+
+    async def resume(self):
+        """Resubmit interrupted jobs and jobs abandoned by a worker that stopped heartbeating"""
+        await self.store.purge(time.time() - settings.JOB_RETENTION_SECONDS)
+        queue = get_lane_queue()
+        resumed = 0
+        for record in await self.store.claim_resumable(jobs.WORKER_ID, settings.JOB_LEASE_SECONDS):
+            runner = get_resumable_runner(record["service"])
+            try:
+                if runner is None:
+                    raise LookupError(f"no resumable runner for {record['service']}")
+                await queue.submit(
+                    record["service"],
+                    runner,
+                    user_id=record.get("user_id"),
+                    payload=record.get("payload"),
+                    progress=record.get("progress"),
+                    task_id=record["id"],
+                    persist=True,
+                )
+                resumed += 1
+            except (LookupError, QueueFullError) as e:
+                # Hand the job back so this or another worker can pick it up later
+                logger.warning(f"[drain] Not resuming job {record['id']}: {e}")
+                await self.store.update(record["id"], state=jobs.INTERRUPTED, owner=None)
+        if resumed:
+            self.resumed += resumed
+            logger.info(f"[drain] Resumed {resumed} interrupted jobs")
+
+    async def _recovery_loop(self):
+        while self.accepting:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS)
+            try:
+                await self.resume()
+            except Exception as e:
+                logger.error(f"[drain] Job recovery failed: {e}")
+
+    def start_recovery(self):
+        """Periodically take over jobs whose worker died without draining"""
+        if self._recovery_task is None:
+            self._recovery_task = asyncio.create_task(self._recovery_loop())
+
+    async def stop_recovery(self):
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            await asyncio.gather(self._recovery_task, return_exceptions=True)
+            self._recovery_task = None
+
+    def status(self):
+        running, pending = self._outstanding()
+        return {
+            "state": self.state,
+            "started_at": self.started_at,
+            "deadline": self.deadline,
+            "seconds_remaining": max(0.0, round(self.deadline - time.time(), 1)) if self.deadline and self.state == DRAINING else None,
+            "finished_at": self.finished_at,
+            "in_flight_at_start": self.in_flight_at_start,
+            "running": len(running),
+            "queued": len(pending),
+            "completed_during_drain": self.completed_during_drain,
+            "checkpointed": self.checkpointed,
+            "rejected_connections": self.rejected_connections,
+            "resumed_on_start": self.resumed,
+        }
+
+
+class DrainAwareASGI:
+    """Wraps the Socket.IO ASGI app so new connections are refused with 503 while draining.
+
+    Requests carrying a `sid` belong to an existing Engine.IO session and are let through so open streams can finish.
+    """
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and not self.controller.accepting \
+                and b"sid=" not in scope.get("query_string", b""):
+            self.controller.rejected_connections += 1
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1013})
+                return
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"retry-after", str(settings.DRAIN_RETRY_AFTER_SECONDS).encode()),
+                            (b"content-type", b"text/plain")],
+            })
+            await send({"type": "http.response.body", "body": b"Server is draining"})
+            return
+        await self.app(scope, receive, send)
+
+
+_drain_controller = None
+
+
+def get_drain_controller() -> DrainController:
+    global _drain_controller
+    if _drain_controller is None:
+        _drain_controller = DrainController()
+    return _drain_controller
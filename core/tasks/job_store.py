@@ -0,0 +1,299 @@
+# core\tasks\job_store.py
+import asyncio
+import importlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from matrx_utils import vcprint
+
+from core import settings
+
+logger = logging.getLogger("app")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# Identifies this process as the owner of the jobs it runs; other workers only take a job over once
+# its heartbeat is older than JOB_LEASE_SECONDS.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _dumps(value):
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+class JobStore(ABC):
+    """Durable job state, progress, results and an ordered event log per job.
+
+    Records are plain dicts: id, service, user_id, state, payload, progress, result, error, owner,
+    created_at, updated_at, heartbeat_at, last_seq. Events are dicts: job_id, seq, type, data, created_at.
+    A shared backend (e.g. Redis: a hash per job plus a stream per event log) implements the same methods
+    so jobs can be claimed and re-attached from any worker.
+    """
+
+    @abstractmethod
+    async def save(self, task, state, owner=WORKER_ID):
+        """Insert or replace the job for a LaneTask"""
+
+    @abstractmethod
+    async def update(self, job_id, **fields):
+        """Update state, progress, result, error or owner"""
+
+    @abstractmethod
+    async def get(self, job_id):
+        """The job record or None"""
+
+    @abstractmethod
+    async def list_jobs(self, states=None, user_id=None, limit=100):
+        """Most recent jobs first"""
+
+    @abstractmethod
+    async def heartbeat(self, owner, progress_by_job=None):
+        """Renew the lease on every active job of `owner` and persist changed progress"""
+
+    @abstractmethod
+    async def claim_resumable(self, owner, stale_after):
+        """Atomically take over interrupted jobs and active jobs whose owner stopped heartbeating"""
+
+    @abstractmethod
+    async def append_event(self, job_id, event_type, data):
+        """Append to the job's event log and return the event's sequence number"""
+
+    @abstractmethod
+    async def events(self, job_id, after_seq=0, limit=1000):
+        """Events with seq > after_seq in order"""
+
+    @abstractmethod
+    async def purge(self, older_than):
+        """Delete finished jobs (and their events) last updated before `older_than`; returns the count"""
+
+    async def close(self):
+        pass
+
+
+class SQLiteJobStore(JobStore):
+    """Single-node job store in a WAL-mode SQLite file; safe to share between worker processes on one host"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or settings.JOB_STORE_PATH or Path(settings.TEMP_DIR) / "jobs.sqlite3")
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                service TEXT NOT NULL,
+                user_id TEXT,
+                state TEXT NOT NULL,
+                payload TEXT,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL,
+                last_seq INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, heartbeat_at);
+            CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id, created_at);
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                data TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+            """
+        )
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(*args)
+
+    @staticmethod
+    def _record(row):
+        if row is None:
+            return None
+        record = dict(row)
+        for field in ("payload", "progress", "result"):
+            record[field] = json.loads(record[field]) if record[field] is not None else None
+        return record
+
+    def _save(self, task, state, owner):
+        now = time.time()
+        self._conn.execute(
+            """
+            INSERT INTO jobs (id, service, user_id, state, payload, progress, owner, created_at, updated_at, heartbeat_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET state = excluded.state, progress = excluded.progress,
+                owner = excluded.owner, updated_at = excluded.updated_at, heartbeat_at = excluded.heartbeat_at
+            """,
+            (task.id, task.service, task.user_id, state, _dumps(task.payload), _dumps(task.progress), owner,
+             now, now, now),
+        )
+
+    async def save(self, task, state, owner=WORKER_ID):
+        await self._run(self._save, task, state, owner)
+
+    def _update(self, job_id, fields):
+        columns = []
+        values = []
+        for name, value in fields.items():
+            columns.append(f"{name} = ?")
+            values.append(_dumps(value) if name in ("payload", "progress", "result") and value is not None else value)
+        now = time.time()
+        self._conn.execute(
+            f"UPDATE jobs SET {', '.join(columns)}, updated_at = ?, heartbeat_at = ? WHERE id = ?",
+            (*values, now, now, job_id),
+        )
+
+    async def update(self, job_id, **fields):
+        await self._run(self._update, job_id, fields)
+
+    async def get(self, job_id):
+        row = await self._run(lambda: self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        return self._record(row)
+
+    def _list(self, states, user_id, limit):
+        clauses, values = [], []
+        if states:
+            clauses.append(f"state IN ({', '.join('?' for _ in states)})")
+            values.extend(states)
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            values.append(user_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._conn.execute(f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*values, limit)).fetchall()
+
+    async def list_jobs(self, states=None, user_id=None, limit=100):
+        return [self._record(row) for row in await self._run(self._list, states, user_id, limit)]
+
+    def _heartbeat(self, owner, progress_by_job):
+        now = time.time()
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND state IN (?, ?)", (now, owner, *ACTIVE_STATES)
+            )
+            if progress_by_job:
+                self._conn.executemany(
+                    "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                    [(_dumps(progress), now, job_id) for job_id, progress in progress_by_job.items()],
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    async def heartbeat(self, owner, progress_by_job=None):
+        await self._run(self._heartbeat, owner, progress_by_job)
+
+    def _claim(self, owner, stale_after):
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE state = ? OR (state IN (?, ?) AND heartbeat_at < ?) ORDER BY created_at",
+                (INTERRUPTED, *ACTIVE_STATES, now - stale_after),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, owner = ?, updated_at = ?, heartbeat_at = ? WHERE id = ?",
+                [(QUEUED, owner, now, now, row["id"]) for row in rows],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    async def claim_resumable(self, owner, stale_after):
+        return [self._record(row) for row in await self._run(self._claim, owner, stale_after)]
+
+    def _append(self, job_id, event_type, data):
+        now = time.time()
+        self._conn.execute("BEGIN")
+        try:
+            seq = self._conn.execute(
+                "UPDATE jobs SET last_seq = last_seq + 1, updated_at = ? WHERE id = ? RETURNING last_seq", (now, job_id)
+            ).fetchone()
+            seq = seq[0] if seq else self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, seq, type, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, seq, event_type, _dumps(data), now),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return seq
+
+    async def append_event(self, job_id, event_type, data):
+        return await self._run(self._append, job_id, event_type, data)
+
+    async def events(self, job_id, after_seq=0, limit=1000):
+        rows = await self._run(lambda: self._conn.execute(
+            "SELECT * FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?", (job_id, after_seq, limit)
+        ).fetchall())
+        return [{**dict(row), "data": json.loads(row["data"])} for row in rows]
+
+    def _purge(self, older_than):
+        self._conn.execute("BEGIN")
+        try:
+            placeholders = ", ".join("?" for _ in FINISHED_STATES)
+            ids = [row[0] for row in self._conn.execute(
+                f"SELECT id FROM jobs WHERE state IN ({placeholders}) AND updated_at < ?", (*FINISHED_STATES, older_than)
+            ).fetchall()]
+            self._conn.executemany("DELETE FROM job_events WHERE job_id = ?", [(i,) for i in ids])
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return len(ids)
+
+    async def purge(self, older_than):
+        return await self._run(self._purge, older_than)
+
+    async def close(self):
+        await self._run(self._conn.close)
+
+
+_job_store = None
+
+
+def get_job_store() -> JobStore:
+    """The configured store: JOB_STORE_BACKEND is "sqlite" or a dotted path to a JobStore subclass"""
+    global _job_store
+    if _job_store is None:
+        backend = settings.JOB_STORE_BACKEND
+        if backend == "sqlite":
+            _job_store = SQLiteJobStore()
+        else:
+            module_name, _, class_name = backend.rpartition(".")
+            _job_store = getattr(importlib.import_module(module_name), class_name)()
+        vcprint(f"[job_store] Using {type(_job_store).__name__} ({WORKER_ID})", color="bright_teal")
+    return _job_store
@@ -0,0 +1,207 @@
+# core\tasks\job_streams.py
+import asyncio
+import logging
+import time
+
+from core import settings
+from core.tasks.job_store import FINISHED_STATES, WORKER_ID, get_job_store
+
+logger = logging.getLogger("app")
+
+END_EVENTS = ("end", "data_final")
+
+# job_id -> set of asyncio.Queue receiving live events from jobs running in this process
+_subscribers = {}
+
+
+def subscribe(job_id):
+    queue = asyncio.Queue()
+    _subscribers.setdefault(job_id, set()).add(queue)
+    return queue
+
+
+def unsubscribe(job_id, queue):
+    queues = _subscribers.get(job_id)
+    if queues is not None:
+        queues.discard(queue)
+        if not queues:
+            del _subscribers[job_id]
+
+
+class JobStream:
+    """stream_handler for a lane task: events go to the job's durable log (if persistent) and to attached sessions.
+
+    `forward` is the stream_handler of the session that started the job; it gets every event as well until it fails.
+    """
+
+    def __init__(self, job_id, persistent=False, forward=None):
+        self.job_id = job_id
+        self.persistent = persistent
+        self.forward = forward
+        self._seq = 0
+
+    async def _emit(self, event_type, data):
+        if self.persistent:
+            try:
+                self._seq = await get_job_store().append_event(self.job_id, event_type, data)
+            except Exception as e:
+                logger.error(f"[job_streams] Failed to persist {event_type} for job {self.job_id}: {e}")
+                self._seq += 1
+        else:
+            self._seq += 1
+        event = {"job_id": self.job_id, "seq": self._seq, "type": event_type, "data": data, "created_at": time.time()}
+        for queue in _subscribers.get(self.job_id, ()):
+            queue.put_nowait(event)
+
+    async def _forward(self, method, *args, **kwargs):
+        if self.forward is None:
+            return
+        try:
+            await getattr(self.forward, method)(*args, **kwargs)
+        except Exception as e:
+            # The session is gone; the job carries on and a reconnecting client re-attaches from the log
+            logger.warning(f"[job_streams] Stopped forwarding job {self.job_id} events: {type(e).__name__}: {e}")
+            self.forward = None
+
+    async def send_chunk(self, chunk):
+        await self._emit("chunk", chunk)
+        await self._forward("send_chunk", chunk)
+
+    async def send_status_update(self, status, system_message=None, user_visible_message=None, metadata=None):
+        await self._emit("status_update", {"status": status, "system_message": system_message,
+                                           "user_visible_message": user_visible_message, "metadata": metadata})
+        await self._forward("send_status_update", status=status, system_message=system_message,
+                            user_visible_message=user_visible_message, metadata=metadata)
+
+    async def send_data(self, data):
+        await self._emit("data", data)
+        await self._forward("send_data", data)
+
+    async def send_data_final(self, data):
+        await self._emit("data_final", data)
+        await self._forward("send_data_final", data)
+
+    async def send_error(self, error_type=None, message=None, user_visible_message=None, details=None, **kwargs):
+        await self._emit("error", {"error_type": error_type, "message": message,
+                                   "user_visible_message": user_visible_message, "details": details, **kwargs})
+        await self._forward("send_error", error_type=error_type, message=message,
+                            user_visible_message=user_visible_message, details=details, **kwargs)
+
+    async def send_end(self):
+        await self._emit("end", None)
+        await self._forward("send_end")
+
+
+async def forward_job_events(job_id, deliver, after_seq=0, is_connected=None):
+    """Replay a job's logged events after `after_seq`, then deliver live ones until the job ends.
+
+    Jobs owned by this process are followed through in-process subscriptions; jobs running on another
+    worker are followed by polling the shared job store.
+    """
+    store = get_job_store()
+    queue = subscribe(job_id)
+    last_seq = after_seq
+    try:
+        while True:
+            for event in await store.events(job_id, after_seq=last_seq):
+                await deliver(event)
+                last_seq = event["seq"]
+                if event["type"] in END_EVENTS:
+                    return last_seq
+
+            job = await store.get(job_id)
+            if job is None or job["state"] in FINISHED_STATES and job["last_seq"] <= last_seq:
+                return last_seq
+            if job["owner"] != WORKER_ID:
+                await asyncio.sleep(settings.JOB_ATTACH_POLL_SECONDS)
+                continue
+
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.JOB_ATTACH_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                if is_connected is not None and not is_connected():
+                    return last_seq
+                continue
+            if event["seq"] <= last_seq:
+                continue
+            if event["seq"] > last_seq + 1:
+                # Missed events between replay and subscribe are read back from the store on the next pass
+                queue.put_nowait(event)
+                continue
+            await deliver(event)
+            last_seq = event["seq"]
+            if event["type"] in END_EVENTS:
+                return last_seq
+    finally:
+        unsubscribe(job_id, queue)
+
+
+def _public(job):
+    return {k: job[k] for k in ("id", "service", "state", "progress", "error", "last_seq", "created_at", "updated_at")}
+
+
+def owns_job(job, user_id):
+    """Whether the authenticated `user_id` started `job`.
+
+    Jobs started without an authenticated user are "anonymous" and can't be read back by anyone: nothing ties a
+    later request to the caller that started them, so a job id alone would be enough to read their results.
+    """
+    return job is not None and user_id is not None and job["user_id"] not in (None, "anonymous") \
+        and job["user_id"] == user_id
+
+
+def register_job_socket_handlers(sio, namespace):
+    """Add `submit_job` and `attach_job` events to the user session namespace.
+
+    submit_job {service, payload} -> {job_id}; the job's events are streamed to the caller as "job_event".
+    attach_job {job_id, after_seq?} -> job status; replays missed events and continues the live stream,
+    so a reconnecting client resumes where it left off instead of starting the job again.
+    Jobs belong to the session's authenticated user (SessionRegistry.identity); other sessions can't attach to
+    them, and jobs submitted without an authenticated user can only be followed by the submitting session.
+    """
+    from core.socket.core.session_registry import get_session_registry
+    from core.tasks.drain import get_resumable_runner
+    from core.tasks.lanes import QueueFullError, get_lane_queue
+
+    forwarders = {}
+
+    def _attach(sid, job_id, after_seq):
+        async def deliver(event):
+            await sio.emit("job_event", event, to=sid, namespace=namespace)
+
+        key = (sid, job_id)
+        existing = forwarders.get(key)
+        if existing is not None and not existing.done():
+            existing.cancel()
+        task = asyncio.create_task(forward_job_events(
+            job_id, deliver, after_seq, is_connected=lambda: sio.manager.is_connected(sid, namespace)
+        ))
+        forwarders[key] = task
+        task.add_done_callback(lambda _: forwarders.pop(key, None) if forwarders.get(key) is task else None)
+
+    async def submit_job(sid, data):
+        data = data or {}
+        service = data.get("service")
+        runner = get_resumable_runner(service)
+        if runner is None:
+            return {"error": f"Service '{service}' does not accept jobs"}
+        try:
+            task = await get_lane_queue().submit(
+                service, runner, user_id=get_session_registry().identity(sid), payload=data.get("payload"),
+                persist=True
+            )
+        except QueueFullError as e:
+            return {"error": str(e), "retry": True}
+        _attach(sid, task.id, 0)
+        return {"job_id": task.id}
+
+    async def attach_job(sid, data):
+        data = data or {}
+        job = await get_job_store().get(data.get("job_id"))
+        if not owns_job(job, get_session_registry().identity(sid)):
+            return {"error": "Unknown job"}
+        _attach(sid, job["id"], int(data.get("after_seq") or 0))
+        return _public(job)
+
+    sio.on("submit_job", submit_job, namespace=namespace)
+    sio.on("attach_job", attach_job, namespace=namespace)
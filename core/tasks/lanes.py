@@ -0,0 +1,349 @@
+# core\tasks\lanes.py
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from matrx_utils import vcprint
+
+from core import settings
+from core.metrics import Timings
+from core.tasks import job_store as jobs
+from core.tasks.job_streams import JobStream
+
+logger = logging.getLogger("app")
+
+LONG_RUNNING_LANE = "long_running"
+INTERACTIVE_LANE = "interactive"
+
+
+class QueueFullError(Exception):
+    """Raised when a lane is at its queue depth limit; callers should surface it as a 503/429"""
+
+    def __init__(self, lane, depth, draining=False):
+        self.lane = lane
+        self.depth = depth
+        self.draining = draining
+        if draining:
+            super().__init__(f"Task lane '{lane}' is draining and not accepting tasks")
+        else:
+            super().__init__(f"Task lane '{lane}' is full ({depth} queued)")
+
+
+class LaneTask:
+    __slots__ = ("id", "service", "user_id", "payload", "progress", "runner", "future",
+                 "enqueued_at", "started_at", "finished_at", "lane", "persistent", "stream", "handle")
+
+    def __init__(self, service, runner, user_id=None, payload=None, progress=None, task_id=None, persistent=False,
+                 stream=None):
+        self.id = task_id or str(uuid.uuid4())
+        self.service = service
+        self.user_id = user_id or "anonymous"
+        self.payload = payload or {}
+        self.progress = progress or {}
+        self.runner = runner
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.lane = None
+        self.persistent = persistent
+        # Runners send results through task.stream (the usual stream_handler methods) so clients can re-attach
+        self.stream = stream or JobStream(self.id, persistent)
+        # asyncio.Task running the runner, set once a worker picks the task up
+        self.handle = None
+
+
+class Lane:
+    """A worker pool with a bounded queue, per-service concurrency caps and round-robin fairness across users"""
+
+    def __init__(self, name, workers, max_depth, service_limits, job_store=None):
+        self.name = name
+        self.job_store = job_store
+        self.workers = workers
+        self.max_depth = max_depth
+        self.service_limits = service_limits
+        self._pending = OrderedDict()
+        self._depth = 0
+        self._running = {}
+        self._running_tasks = {}
+        self._wakeup = asyncio.Condition()
+        self._worker_tasks = []
+        self.accepting = True
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.wait_ms = Timings()
+        self.run_ms = Timings()
+
+    @property
+    def depth(self):
+        return self._depth
+
+    def running_tasks(self):
+        return list(self._running_tasks.values())
+
+    def pending_tasks(self):
+        return [task for queue in self._pending.values() for task in queue]
+
+    def take_pending(self):
+        """Remove and return every queued task that has not started"""
+        tasks = self.pending_tasks()
+        self._pending.clear()
+        self._depth = 0
+        return tasks
+
+    def cancel(self, task):
+        """Cancel a queued or running task without affecting the worker running it"""
+        queue = self._pending.get(task.user_id)
+        if queue is not None and task in queue:
+            queue.remove(task)
+            if not queue:
+                del self._pending[task.user_id]
+            self._depth -= 1
+            self.cancelled += 1
+            task.future.cancel()
+            return True
+        if task.handle is not None and not task.handle.done():
+            task.handle.cancel()
+            return True
+        return False
+
+    async def put(self, task):
+        if not self.accepting:
+            self.rejected += 1
+            raise QueueFullError(self.name, self._depth, draining=True)
+        if self._depth >= self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(self.name, self._depth)
+        task.lane = self.name
+        self._pending.setdefault(task.user_id, deque()).append(task)
+        self._depth += 1
+        self.submitted += 1
+        async with self._wakeup:
+            self._wakeup.notify()
+
+    def _has_capacity(self, service):
+        limit = self.service_limits.get(service)
+        return limit is None or self._running.get(service, 0) < limit
+
+    def _next_task(self):
+        # Round-robin over users: take the first user whose oldest runnable task has service capacity,
+        # then move that user to the back so a single user's burst can't monopolize the workers.
+        for user_id in list(self._pending):
+            queue = self._pending[user_id]
+            for index, task in enumerate(queue):
+                if self._has_capacity(task.service):
+                    del queue[index]
+                    if queue:
+                        self._pending.move_to_end(user_id)
+                    else:
+                        del self._pending[user_id]
+                    self._depth -= 1
+                    return task
+        return None
+
+    async def _worker(self):
+        while True:
+            async with self._wakeup:
+                task = self._next_task()
+                while task is None:
+                    await self._wakeup.wait()
+                    task = self._next_task()
+            await self._run(task)
+
+    async def _run(self, task):
+        self._running[task.service] = self._running.get(task.service, 0) + 1
+        self._running_tasks[task.id] = task
+        task.started_at = time.monotonic()
+        self.wait_ms.add((task.started_at - task.enqueued_at) * 1000)
+        await self._persist(task, state=jobs.RUNNING)
+        task.handle = asyncio.create_task(task.runner(task))
+        try:
+            result = await task.handle
+            self.completed += 1
+            await self._persist(task, state=jobs.COMPLETED, progress=task.progress, result=result)
+            if not task.future.done():
+                task.future.set_result(result)
+        except asyncio.CancelledError:
+            if not task.future.done():
+                task.future.cancel()
+            if asyncio.current_task().cancelling():
+                # The worker itself is stopping; drain decides the job's final state
+                task.handle.cancel()
+                raise
+            self.cancelled += 1
+            await self._persist(task, state=jobs.CANCELLED, progress=task.progress)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"[task_lanes] {self.name} task {task.id} ({task.service}) failed: {e}", exc_info=True)
+            await self._persist(task, state=jobs.FAILED, progress=task.progress, error=str(e))
+            if not task.future.done():
+                task.future.set_exception(e)
+        finally:
+            task.finished_at = time.monotonic()
+            self.run_ms.add((task.finished_at - task.started_at) * 1000)
+            self._running[task.service] -= 1
+            self._running_tasks.pop(task.id, None)
+            async with self._wakeup:
+                self._wakeup.notify_all()
+
+    async def _persist(self, task, **fields):
+        if not task.persistent or self.job_store is None:
+            return
+        try:
+            await self.job_store.update(task.id, **fields)
+        except Exception as e:
+            # The job keeps running; its state catches up on the next heartbeat or transition
+            logger.error(f"[task_lanes] Failed to persist job {task.id}: {e}")
+
+    def start(self):
+        if not self._worker_tasks:
+            self._worker_tasks = [
+                asyncio.create_task(self._worker(), name=f"lane-{self.name}-{i}") for i in range(self.workers)
+            ]
+
+    async def shutdown(self):
+        self.accepting = False
+        for worker in self._worker_tasks:
+            worker.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        for task in self.pending_tasks():
+            if not task.future.done():
+                task.future.cancel()
+        self._pending.clear()
+        self._depth = 0
+
+    def stats(self):
+        return {
+            "lane": self.name,
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "depth": self._depth,
+            "running": sum(self._running.values()),
+            "running_by_service": {k: v for k, v in self._running.items() if v},
+            "queued_users": len(self._pending),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "queue_wait_ms": self.wait_ms.summary(),
+            "run_time_ms": self.run_ms.summary(),
+        }
+
+
+class LaneTaskQueue:
+    """Routes tasks for Settings.LONG_RUNNING_SERVICES to their own lane so long jobs can't starve interactive ones"""
+
+    def __init__(self):
+        limits = dict(settings.TASK_SERVICE_MAX_CONCURRENCY)
+        self.job_store = jobs.get_job_store()
+        self.lanes = {
+            LONG_RUNNING_LANE: Lane(
+                LONG_RUNNING_LANE,
+                workers=settings.TASK_LANE_WORKERS.get(LONG_RUNNING_LANE, 4),
+                max_depth=settings.TASK_LANE_MAX_DEPTH.get(LONG_RUNNING_LANE, 100),
+                service_limits=limits,
+                job_store=self.job_store,
+            ),
+            INTERACTIVE_LANE: Lane(
+                INTERACTIVE_LANE,
+                workers=settings.TASK_LANE_WORKERS.get(INTERACTIVE_LANE, 16),
+                max_depth=settings.TASK_LANE_MAX_DEPTH.get(INTERACTIVE_LANE, 1000),
+                service_limits=limits,
+                job_store=self.job_store,
+            ),
+        }
+        self.started = False
+        self._heartbeat_task = None
+        self._flushed_progress = {}
+
+    @staticmethod
+    def lane_for(service):
+        return LONG_RUNNING_LANE if service in settings.LONG_RUNNING_SERVICES else INTERACTIVE_LANE
+
+    async def submit(self, service, runner, user_id=None, payload=None, progress=None, task_id=None,
+                     persist=None, stream=None) -> LaneTask:
+        """Queue `runner(task)` on the service's lane. Raises QueueFullError when the lane is at its depth limit.
+
+        Tasks for LONG_RUNNING_SERVICES (or with persist=True) are recorded in the job store; task.id is the job ID.
+        `stream` replaces the task's JobStream, e.g. to send events straight to an HTTP response.
+        """
+        if persist is None:
+            persist = service in settings.LONG_RUNNING_SERVICES
+        task = LaneTask(service, runner, user_id=user_id, payload=payload, progress=progress, task_id=task_id,
+                        persistent=persist, stream=stream)
+        if persist:
+            try:
+                await self.job_store.save(task, jobs.QUEUED)
+            except Exception as e:
+                logger.error(f"[task_lanes] Failed to persist job {task.id}: {e}")
+        try:
+            await self.lanes[self.lane_for(service)].put(task)
+        except QueueFullError as e:
+            await self.lanes[self.lane_for(service)]._persist(task, state=jobs.CANCELLED, error=str(e))
+            raise
+        return task
+
+    def cancel(self, task):
+        return task.lane is not None and self.lanes[task.lane].cancel(task)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            changed = {}
+            for lane in self.lanes.values():
+                for task in lane.running_tasks():
+                    if not task.persistent:
+                        continue
+                    snapshot = json.dumps(task.progress, default=str, sort_keys=True)
+                    if self._flushed_progress.get(task.id) != snapshot:
+                        self._flushed_progress[task.id] = snapshot
+                        changed[task.id] = task.progress
+            running_ids = {t.id for lane in self.lanes.values() for t in lane.running_tasks()}
+            for job_id in list(self._flushed_progress):
+                if job_id not in running_ids:
+                    del self._flushed_progress[job_id]
+            try:
+                await self.job_store.heartbeat(jobs.WORKER_ID, changed)
+            except Exception as e:
+                logger.error(f"[task_lanes] Job heartbeat failed: {e}")
+
+    def start(self):
+        for lane in self.lanes.values():
+            lane.start()
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat(), name="lane-job-heartbeat")
+        self.started = True
+        vcprint(
+            f"[task_lanes] Started lanes: "
+            + ", ".join(f"{lane.name}={lane.workers} workers" for lane in self.lanes.values()),
+            color="green",
+        )
+
+    async def shutdown(self):
+        await asyncio.gather(*[lane.shutdown() for lane in self.lanes.values()])
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        self.started = False
+
+    def stats(self):
+        return {"lanes": [lane.stats() for lane in self.lanes.values()]}
+
+
+_lane_queue = None
+
+
+def get_lane_queue() -> LaneTaskQueue:
+    global _lane_queue
+    if _lane_queue is None:
+        _lane_queue = LaneTaskQueue()
+    return _lane_queue
@@ -0,0 +1,9 @@
+# models\request_models.py
+from pydantic import BaseModel, Field
+from typing import Dict, Any
+
+
+class ScrapeStreamRequest(BaseModel):
+    """Scrape task to run and stream back over HTTP"""
+    task: str = "quick_scrape"
+    task_context: Dict[str, Any] = Field(default_factory=dict)
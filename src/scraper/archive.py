@@ -0,0 +1,403 @@
+# src\scraper\archive.py
+import asyncio
+import contextlib
+import fcntl
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from core import settings
+
+logger = logging.getLogger("app")
+
+# Record header: magic, length of the compressed payload, crc32 of the compressed payload
+HEADER = struct.Struct("<4sII")
+MAGIC = b"SRA1"
+
+
+def _segment_name(segment):
+    return f"segment-{segment:08d}.log"
+
+
+def _page_hashes(result):
+    """(sha256, content) hex digests from a result's "hashes" list"""
+    hashes = dict(value.split(":", 1) for value in result.get("hashes") or () if ":" in value)
+    return hashes.get("sha256"), hashes.get("content")
+
+
+class ScrapeArchive:
+    """Append-only archive of successful scrape results.
+
+    Results are zlib-compressed JSON records appended to segment files of up to SCRAPER_ARCHIVE_SEGMENT_BYTES.
+    A WAL-mode SQLite index maps url, unique_page_name and content / sha256 hash to (segment, offset, length),
+    so lookups touch a few index pages instead of holding millions of keys in memory. Segment files are read
+    through read-only mmaps: a lookup decompresses straight from the mapped pages and get_json() hands back the
+    stored JSON without parsing it.
+
+    Archiving a URL again with the same content only refreshes its archived_at; new content appends a record
+    and leaves the old one dead. compact() rewrites sealed segments that are mostly dead.
+
+    Several processes (uvicorn workers) can share one archive directory: every write takes an flock on
+    archive.lock, picks up the active segment and its real end from the index and the file, appends, and
+    commits the index before letting go.
+    """
+
+    def __init__(self, path=None, segment_bytes=None):
+        self.path = Path(path or settings.SCRAPER_ARCHIVE_PATH or Path(settings.TEMP_DIR) / "scrape_archive")
+        self.segment_bytes = segment_bytes or settings.SCRAPER_ARCHIVE_SEGMENT_BYTES
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_fd = os.open(self.path / "archive.lock", os.O_CREAT | os.O_RDWR, 0o600)
+        self._maps = {}
+        self._conn = sqlite3.connect(self.path / "index.sqlite3", check_same_thread=False, isolation_level=None,
+                                     timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                unique_page_name TEXT,
+                sha256 TEXT,
+                content_hash TEXT,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                archived_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_unique_page_name ON records (unique_page_name);
+            CREATE INDEX IF NOT EXISTS records_sha256 ON records (sha256);
+            CREATE INDEX IF NOT EXISTS records_content_hash ON records (content_hash);
+            CREATE INDEX IF NOT EXISTS records_segment ON records (segment);
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                live_bytes INTEGER NOT NULL DEFAULT 0,
+                sealed INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        self.writes = 0
+        self.unchanged = 0
+        self.reads = 0
+        self.compactions = 0
+        self.compacted_bytes = 0
+        self._active = None
+        self._file = None
+        with self._file_lock():
+            self._recover()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive across processes: another process's append and index commit happen before or after, never during"""
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _recover(self):
+        """Open the active segment (another process may have sealed ours) at its real end, cutting off records
+        written after the index was last committed. Called under _file_lock: every writer commits the index before
+        releasing it, so bytes past the indexed end were left by a writer that died mid-write."""
+        row = self._conn.execute("SELECT id, bytes FROM segments WHERE sealed = 0 ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            last = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM segments").fetchone()[0]
+            self._conn.execute("INSERT INTO segments (id) VALUES (?)", (last + 1,))
+            row = (last + 1, 0)
+        active, size = row
+        if self._file is None or active != self._active:
+            if self._file is not None:
+                self._file.close()
+            self._active = active
+            self._file = open(self.path / _segment_name(self._active), "ab+")
+        actual = os.fstat(self._file.fileno()).st_size
+        if actual > size:
+            logger.warning(f"[archive] Dropping {actual - size} unindexed bytes at the end of segment {self._active}")
+            self._file.truncate(size)
+        elif actual < size:
+            # The index got ahead of the file (lost writes after an OS crash): forget records past the end
+            lost = self._conn.execute("DELETE FROM records WHERE segment = ? AND offset + length > ?",
+                                      (self._active, actual)).rowcount
+            logger.warning(f"[archive] Segment {self._active} is shorter than indexed; dropped {lost} records")
+            self._conn.execute("UPDATE segments SET bytes = ?, live_bytes = (SELECT COALESCE(SUM(length), 0) "
+                               "FROM records WHERE segment = ?) WHERE id = ?", (actual, self._active, self._active))
+        self._size = min(actual, size)
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(*args)
+
+    # Writes
+
+    def _append(self, payload):
+        """Append one record to the active segment; returns (segment, offset, length)"""
+        if self._size and self._size + HEADER.size + len(payload) > self.segment_bytes:
+            self._seal()
+        offset = self._size
+        self._file.write(HEADER.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload)
+        self._size += HEADER.size + len(payload)
+        return self._active, offset, HEADER.size + len(payload)
+
+    def _seal(self):
+        self._file.close()
+        self._conn.execute("UPDATE segments SET sealed = 1, bytes = ? WHERE id = ?", (self._size, self._active))
+        self._active += 1
+        self._conn.execute("INSERT INTO segments (id) VALUES (?)", (self._active,))
+        self._file = open(self.path / _segment_name(self._active), "ab+")
+        self._size = 0
+
+    def _store(self, results):
+        with self._file_lock():
+            self._recover()
+            return self._store_locked(results)
+
+    def _store_locked(self, results):
+        now = time.time()
+        written = []
+        for result in results:
+            sha256, content = _page_hashes(result)
+            previous = self._conn.execute("SELECT id, segment, length, sha256, content_hash FROM records WHERE url = ?",
+                                          (result["url"],)).fetchone()
+            if previous is not None and (previous[3], previous[4]) == (sha256, content) and sha256 is not None:
+                self._conn.execute("UPDATE records SET archived_at = ? WHERE id = ?", (now, previous[0]))
+                self.unchanged += 1
+                continue
+            payload = zlib.compress(json.dumps(result, default=str, separators=(",", ":")).encode(),
+                                    settings.SCRAPER_ARCHIVE_COMPRESSION_LEVEL)
+            written.append((result, sha256, content, previous, self._append(payload)))
+        if not written:
+            return 0
+        # Records are on disk (in the page cache) before the index points at them
+        self._file.flush()
+        self._conn.execute("BEGIN")
+        try:
+            for result, sha256, content, previous, (segment, offset, length) in written:
+                if previous is not None:
+                    self._conn.execute("UPDATE segments SET live_bytes = live_bytes - ? WHERE id = ?",
+                                       (previous[2], previous[1]))
+                self._conn.execute(
+                    """
+                    INSERT INTO records (url, unique_page_name, sha256, content_hash, segment, offset, length,
+                                         archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (url) DO UPDATE SET unique_page_name = excluded.unique_page_name,
+                        sha256 = excluded.sha256, content_hash = excluded.content_hash, segment = excluded.segment,
+                        offset = excluded.offset, length = excluded.length, archived_at = excluded.archived_at
+                    """,
+                    (result["url"], (result.get("overview") or {}).get("unique_page_name"), sha256, content,
+                     segment, offset, length, now),
+                )
+                self._conn.execute("UPDATE segments SET live_bytes = live_bytes + ? WHERE id = ?", (length, segment))
+            self._conn.execute("UPDATE segments SET bytes = ? WHERE id = ?", (self._size, self._active))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.writes += len(written)
+        return len(written)
+
+    async def archive(self, results):
+        """Archive the successful results among `results`; returns how many records were written"""
+        latest = {result["url"]: result for result in results if result.get("status") == "success" and result.get("url")}
+        if not latest:
+            return 0
+        return await self._run(self._store, list(latest.values()))
+
+    # Reads
+
+    def _view(self, segment, offset, length):
+        """Record payload as a memoryview into the segment's mmap, remapping the active segment once it has grown"""
+        mapped = self._maps.get(segment)
+        if mapped is None or offset + length > len(mapped):
+            if mapped is not None:
+                mapped.close()
+            if segment == self._active:
+                self._file.flush()
+            with open(self.path / _segment_name(segment), "rb") as f:
+                mapped = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)[offset:offset + length]
+        magic, size, crc = HEADER.unpack_from(view)
+        payload = view[HEADER.size:]
+        if magic != MAGIC or size != len(payload) or zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupt archive record at segment {segment} offset {offset}")
+        return payload
+
+    _LOOKUPS = {
+        "url": "url = ?",
+        "unique_page_name": "unique_page_name = ? ORDER BY archived_at DESC",
+        "sha256": "sha256 = ? ORDER BY archived_at DESC",
+        "content_hash": "content_hash = ? ORDER BY archived_at DESC",
+    }
+
+    def _read(self, column, value):
+        for attempt in range(2):
+            row = self._conn.execute(
+                f"SELECT segment, offset, length FROM records WHERE {self._LOOKUPS[column]} LIMIT 1", (value,)).fetchone()
+            if row is None:
+                return None
+            try:
+                payload = self._view(*row)
+            except FileNotFoundError:
+                # Another process compacted the segment away between the lookup and the read; look up again
+                if attempt:
+                    raise
+                continue
+            self.reads += 1
+            return zlib.decompress(payload)
+
+    def _read_hash(self, value):
+        """A "sha256:..." or "content:..." value from a result's hashes, or a bare digest of either kind"""
+        kind, _, digest = value.rpartition(":")
+        if kind == "sha256":
+            return self._read("sha256", digest)
+        if kind == "content":
+            return self._read("content_hash", digest)
+        return self._read("sha256", digest) or self._read("content_hash", digest)
+
+    async def get_json(self, url=None, unique_page_name=None, content_hash=None):
+        """The archived result's JSON (bytes) by url, unique_page_name or hash, newest first; None when absent"""
+        if url is not None:
+            return await self._run(self._read, "url", url)
+        if unique_page_name is not None:
+            return await self._run(self._read, "unique_page_name", unique_page_name)
+        if content_hash is not None:
+            return await self._run(self._read_hash, content_hash)
+        raise ValueError("Pass url, unique_page_name or content_hash")
+
+    async def get(self, url=None, unique_page_name=None, content_hash=None):
+        data = await self.get_json(url, unique_page_name, content_hash)
+        return json.loads(data) if data is not None else None
+
+    def _entry(self, url):
+        row = self._conn.execute("SELECT url, unique_page_name, sha256, content_hash, archived_at FROM records "
+                                 "WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("url", "unique_page_name", "sha256", "content_hash", "archived_at"), row))
+
+    async def entry(self, url):
+        """Index entry (hashes, archived_at) for `url` without reading the record"""
+        return await self._run(self._entry, url)
+
+    # Compaction
+
+    def _compact(self, max_live_ratio):
+        with self._file_lock():
+            self._recover()
+            return self._compact_locked(max_live_ratio)
+
+    def _compact_locked(self, max_live_ratio):
+        candidates = self._conn.execute(
+            "SELECT id, bytes, live_bytes FROM segments WHERE sealed = 1 AND live_bytes <= bytes * ?",
+            (max_live_ratio,),
+        ).fetchall()
+        reclaimed = 0
+        for segment, size, live in candidates:
+            rows = self._conn.execute("SELECT id, offset, length FROM records WHERE segment = ? ORDER BY offset",
+                                      (segment,)).fetchall()
+            moved = []
+            for record_id, offset, length in rows:
+                # Live records are copied as stored: no decompressing or re-encoding
+                moved.append((record_id, *self._append(bytes(self._view(segment, offset, length)))))
+            self._file.flush()
+            self._conn.execute("BEGIN")
+            try:
+                for record_id, new_segment, new_offset, length in moved:
+                    self._conn.execute("UPDATE records SET segment = ?, offset = ?, length = ? WHERE id = ?",
+                                       (new_segment, new_offset, length, record_id))
+                    self._conn.execute("UPDATE segments SET live_bytes = live_bytes + ? WHERE id = ?",
+                                       (length, new_segment))
+                self._conn.execute("UPDATE segments SET bytes = ? WHERE id = ?", (self._size, self._active))
+                self._conn.execute("DELETE FROM segments WHERE id = ?", (segment,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            mapped = self._maps.pop(segment, None)
+            if mapped is not None:
+                mapped.close()
+            os.remove(self.path / _segment_name(segment))
+            self.compactions += 1
+            self.compacted_bytes += size - live
+            reclaimed += size - live
+        return reclaimed
+
+    async def compact(self, max_live_ratio=None):
+        """Rewrite sealed segments whose live records fill at most `max_live_ratio` (default
+        SCRAPER_ARCHIVE_COMPACT_RATIO) of them; returns the bytes reclaimed"""
+        ratio = settings.SCRAPER_ARCHIVE_COMPACT_RATIO if max_live_ratio is None else max_live_ratio
+        return await self._run(self._compact, ratio)
+
+    def _stats(self):
+        segments, size, live = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(live_bytes), 0) FROM segments").fetchone()
+        return {
+            "path": str(self.path),
+            "records": self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0],
+            "segments": segments,
+            "bytes": size,
+            "live_bytes": live,
+            "writes": self.writes,
+            "unchanged": self.unchanged,
+            "reads": self.reads,
+            "mapped_segments": len(self._maps),
+            "compactions": self.compactions,
+            "compacted_bytes": self.compacted_bytes,
+        }
+
+    async def stats(self):
+        return await self._run(self._stats)
+
+    def _close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        self._file.close()
+        self._conn.close()
+        os.close(self._lock_fd)
+
+    async def close(self):
+        await self._run(self._close)
+
+
+_archive = None
+
+
+def get_scrape_archive() -> ScrapeArchive | None:
+    """The process-wide archive, or None when SCRAPER_ARCHIVE_ENABLED is off"""
+    global _archive
+    if _archive is None and settings.SCRAPER_ARCHIVE_ENABLED:
+        _archive = ScrapeArchive()
+    return _archive
+
+
+async def close_scrape_archive():
+    global _archive
+    if _archive is not None:
+        await _archive.close()
+        _archive = None
+
+
+async def archive_results(results):
+    """Archive scrape results when the archive is enabled. A failing archive (full disk, locked index) is logged
+    and otherwise ignored: the results have been sent either way"""
+    archive = get_scrape_archive()
+    if archive is None:
+        return 0
+    try:
+        return await archive.archive(results)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"[archive] Could not archive {len(results)} results: {type(e).__name__}: {e}")
+        return 0
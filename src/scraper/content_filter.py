@@ -0,0 +1,123 @@
+# src\scraper\content_filter.py
+import re
+
+from core import settings
+
+EXACT = "exact"
+PARTIAL = "partial"
+MATCH_TYPES = (EXACT, PARTIAL)
+
+# Rules on "tag" test the element name; any other attribute is read from the element's attributes. For "class",
+# an exact rule matches one of the space separated class names and a partial rule any part of the attribute.
+TAG = "tag"
+CLASS = "class"
+
+
+def normalize_rule(rule):
+    attribute = str(rule["attribute"]).lower()
+    match_type = str(rule.get("match_type") or EXACT).lower()
+    if match_type not in MATCH_TYPES:
+        raise ValueError(f"Unknown match_type {match_type!r} in content filter rule {rule}")
+    value = str(rule["trigger_value"]).lower()
+    if not value:
+        raise ValueError(f"Empty trigger_value in content filter rule {rule}")
+    return {"attribute": attribute, "match_type": match_type, "trigger_value": value}
+
+
+def rule_matches(rule, tag, attrs):
+    """Whether one normalized rule matches an element; the definition ContentFilter.match compiles"""
+    if rule["attribute"] == TAG:
+        actual = tag
+    else:
+        actual = attrs.get(rule["attribute"])
+        if actual is None:
+            return False
+        actual = actual.lower()
+    if rule["match_type"] == PARTIAL:
+        return rule["trigger_value"] in actual
+    if rule["attribute"] == CLASS:
+        return rule["trigger_value"] in actual.split()
+    return rule["trigger_value"] == actual
+
+
+class _PartialMatcher:
+    """All partial rules of one attribute as one regex.
+
+    The plain alternation answers "does anything match" in one C-level scan, which is all most elements need.
+    Only on a hit does the overlapping form run: a lookahead at every position whose alternatives are in rule
+    order, so each position reports its lowest-index rule, and the smallest of those is the first rule that
+    matches anywhere in the value.
+    """
+
+    def __init__(self, values):
+        self.index = {}
+        for index, value in values:
+            self.index.setdefault(value, index)
+        ordered = sorted(self.index, key=self.index.get)
+        alternation = "|".join(map(re.escape, ordered))
+        self.any = re.compile(alternation)
+        self.overlapping = re.compile(f"(?=({alternation}))")
+
+    def first(self, value):
+        if self.any.search(value) is None:
+            return None
+        return min(self.index[match.group(1)] for match in self.overlapping.finditer(value))
+
+
+class ContentFilter:
+    """Content filter rules compiled for a single pass per element.
+
+    Rules are grouped by attribute: exact values become dict lookups and each attribute's partial values one
+    regex (_PartialMatcher). match() returns the same rule a linear scan calling rule_matches() in rule order
+    would, so removal details don't depend on how the rules were evaluated.
+    """
+
+    def __init__(self, rules):
+        self.rules = [normalize_rule(rule) for rule in rules]
+        self._exact = {}
+        partial = {}
+        for index, rule in enumerate(self.rules):
+            if rule["match_type"] == EXACT:
+                self._exact.setdefault(rule["attribute"], {}).setdefault(rule["trigger_value"], index)
+            else:
+                partial.setdefault(rule["attribute"], []).append((index, rule["trigger_value"]))
+        self._partial = {attribute: _PartialMatcher(values) for attribute, values in partial.items()}
+        self._attributes = (self._exact.keys() | self._partial.keys()) - {TAG}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, tag, attrs):
+        """The first rule matching an element (`attrs` as a dict), or None"""
+        best = None
+        if TAG in self._exact or TAG in self._partial:
+            best = self._first(TAG, tag, best)
+        for attribute, value in attrs.items():
+            if attribute in self._attributes and value:
+                best = self._first(attribute, value.lower(), best)
+        return self.rules[best] if best is not None else None
+
+    def _first(self, attribute, value, best):
+        exact = self._exact.get(attribute)
+        if exact:
+            for candidate in (value.split() if attribute == CLASS else (value,)):
+                index = exact.get(candidate)
+                if index is not None and (best is None or index < best):
+                    best = index
+        matcher = self._partial.get(attribute)
+        if matcher is not None:
+            index = matcher.first(value)
+            if index is not None and (best is None or index < best):
+                best = index
+        return best
+
+
+_content_filter = None
+
+
+def get_content_filter():
+    """ContentFilter compiled from SCRAPER_CONTENT_FILTER_RULES, or None when no rules are configured"""
+    global _content_filter
+    if _content_filter is None and settings.SCRAPER_CONTENT_FILTER_RULES:
+        _content_filter = ContentFilter(settings.SCRAPER_CONTENT_FILTER_RULES)
+    return _content_filter
@@ -0,0 +1,401 @@
+# src\scraper\crawl.py
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import posixpath
+import time
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+from core import settings
+from src.scraper.fetcher import get_fetcher
+from src.scraper.parser import PageStream
+
+logger = logging.getLogger("app")
+
+# Query parameters that only track where a visitor came from; dropped so they don't make duplicate URLs
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref_src", "_hsenc", "_hsmi"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Why a crawl ended
+STOP_EXHAUSTED = "exhausted"
+STOP_MAX_PAGES = "max_pages"
+STOP_TIME = "time_limit"
+
+
+def canonicalize_url(url):
+    """Normal form used for dedup: lowercase scheme and host, no default port, fragment or tracking parameters,
+    dot segments resolved, unreserved characters unescaped and query parameters sorted"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    path = parts.path or "/"
+    if "." in path:
+        resolved = posixpath.normpath(path)
+        path = resolved + "/" if path.endswith("/") and resolved != "/" else resolved
+    path = quote(unquote(path), safe="/:@!$&'()*+,;=-._~%")
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
+
+
+class BloomFilter:
+    """Fixed-size set membership with false positives at about `error_rate` once `capacity` items are in"""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        """Add `item`; False when it was (probably) already present"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        self.count += added
+        return added
+
+    def __contains__(self, item):
+        return all(self.bits[position // 8] & (1 << position % 8) for position in self._positions(item))
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class SeenUrls:
+    """URLs already queued in a crawl.
+
+    Exact (a set) up to `exact_limit` URLs, which covers most crawls; past that the set is folded into a Bloom
+    filter so memory stays bounded. A false positive then skips a URL that was never seen, never the reverse.
+    """
+
+    def __init__(self, exact_limit=None, capacity=None, error_rate=None):
+        self.exact_limit = exact_limit or settings.SCRAPER_CRAWL_EXACT_SEEN_LIMIT
+        self.capacity = capacity or settings.SCRAPER_CRAWL_BLOOM_CAPACITY
+        self.error_rate = error_rate or settings.SCRAPER_CRAWL_BLOOM_ERROR_RATE
+        self._exact = set()
+        self._bloom = None
+
+    def add(self, url):
+        """Record `url`; False when it was seen before"""
+        if self._bloom is not None:
+            return self._bloom.add(url)
+        if url in self._exact:
+            return False
+        self._exact.add(url)
+        if len(self._exact) > self.exact_limit:
+            self._bloom = BloomFilter(self.capacity, self.error_rate)
+            for seen in self._exact:
+                self._bloom.add(seen)
+            self._exact = None
+        return True
+
+    def __contains__(self, url):
+        return url in (self._bloom if self._bloom is not None else self._exact)
+
+    def stats(self):
+        if self._bloom is None:
+            return {"mode": "exact", "urls": len(self._exact)}
+        return {"mode": "bloom", "urls": self._bloom.count, "bytes": self._bloom.nbytes, "hashes": self._bloom.hashes}
+
+
+class RobotsCache:
+    """Parsed robots.txt per host (scheme + netloc), refreshed after `ttl` seconds.
+
+    Concurrent checks for a host share one fetch. Like RobotFileParser.read(), a 401/403 disallows everything
+    and other 4xx allow everything; a 5xx or network error disallows the host for up to ERROR_TTL seconds.
+    """
+
+    ERROR_TTL = 60.0
+
+    def __init__(self, fetcher=None, ttl=None, user_agent=None):
+        self.fetcher = fetcher or get_fetcher()
+        self.ttl = ttl if ttl is not None else settings.SCRAPER_ROBOTS_TTL_SECONDS
+        self.user_agent = user_agent or settings.SCRAPER_USER_AGENT
+        self._entries = {}
+        self._pending = {}
+        self.fetches = 0
+
+    async def get(self, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        entry = self._entries.get(origin)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        pending = self._pending.get(origin)
+        if pending is None:
+            pending = self._pending[origin] = asyncio.ensure_future(self._load(origin))
+            pending.add_done_callback(lambda _: self._pending.pop(origin, None))
+        return await asyncio.shield(pending)
+
+    async def _load(self, origin):
+        self.fetches += 1
+        robots = RobotFileParser(f"{origin}/robots.txt")
+        fetched = await self.fetcher.fetch(f"{origin}/robots.txt")
+        ttl = self.ttl
+        if fetched.status in (401, 403):
+            robots.disallow_all = True
+        elif fetched.status is not None and 400 <= fetched.status < 500:
+            robots.allow_all = True
+        elif not fetched.ok:
+            ttl = min(ttl, self.ERROR_TTL)
+            logger.warning(f"[crawl] robots.txt for {origin} unavailable ({fetched.error or fetched.status}); "
+                           f"not crawling it for {ttl:.0f}s")
+            robots.disallow_all = True
+        else:
+            robots.parse(fetched.text.splitlines())
+        robots.modified()
+        self._entries[origin] = (robots, time.monotonic() + ttl)
+        return robots
+
+    async def allowed(self, url):
+        return (await self.get(url)).can_fetch(self.user_agent, url)
+
+    async def crawl_delay(self, url):
+        return (await self.get(url)).crawl_delay(self.user_agent)
+
+
+class Frontier:
+    """URLs waiting to be crawled, one depth-ordered heap per host.
+
+    pop() serves hosts round-robin, skipping hosts that already have `host_concurrency` pages in flight or
+    fetched one less than their delay ago, so one large site can't starve the rest or be hammered.
+    Holds at most `max_size` URLs; further pushes are dropped and counted.
+    """
+
+    def __init__(self, max_size=None, host_concurrency=None, host_delay=None):
+        self.max_size = max_size or settings.SCRAPER_CRAWL_MAX_FRONTIER
+        self.host_concurrency = host_concurrency or settings.SCRAPER_CRAWL_HOST_CONCURRENCY
+        self.host_delay = host_delay if host_delay is not None else settings.SCRAPER_CRAWL_HOST_DELAY_SECONDS
+        self._queues = {}
+        self._hosts = []
+        self._in_flight = {}
+        self._next_at = {}
+        self._delays = {}
+        self._seq = 0
+        self.size = 0
+        self.dropped = 0
+
+    def push(self, url, depth):
+        if self.size >= self.max_size:
+            self.dropped += 1
+            return False
+        host = urlsplit(url).netloc
+        queue = self._queues.get(host)
+        if queue is None:
+            queue = self._queues[host] = []
+            self._hosts.append(host)
+        self._seq += 1
+        heapq.heappush(queue, (depth, self._seq, url))
+        self.size += 1
+        return True
+
+    def set_delay(self, host, delay):
+        self._delays[host] = max(delay or 0.0, self.host_delay)
+
+    def pop(self, now=None):
+        """(url, depth) from the next host that may be fetched now, or None"""
+        now = time.monotonic() if now is None else now
+        for _ in range(len(self._hosts)):
+            host = self._hosts.pop(0)
+            self._hosts.append(host)
+            queue = self._queues[host]
+            if (not queue or self._in_flight.get(host, 0) >= self.host_concurrency
+                    or self._next_at.get(host, 0.0) > now):
+                continue
+            depth, _, url = heapq.heappop(queue)
+            self.size -= 1
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            self._next_at[host] = now + self._delays.get(host, self.host_delay)
+            return url, depth
+        return None
+
+    def done(self, url):
+        host = urlsplit(url).netloc
+        self._in_flight[host] -= 1
+
+    def items(self):
+        """Queued (url, depth) pairs"""
+        return [(url, depth) for queue in self._queues.values() for depth, _, url in sorted(queue)]
+
+    def wait_time(self, now=None):
+        """Seconds until a waiting host comes off its delay, or None when no queued host is waiting on one"""
+        now = time.monotonic() if now is None else now
+        waits = [self._next_at.get(host, 0.0) - now for host, queue in self._queues.items()
+                 if queue and self._in_flight.get(host, 0) < self.host_concurrency]
+        return max(0.0, min(waits)) if waits else None
+
+
+class Crawler:
+    """Breadth-first-ish crawl from seed URLs, following links found on each page.
+
+    Stops after `max_pages` pages, at `max_depth` links from a seed, or after `max_seconds` (pages in flight
+    are cancelled). Only hosts of the seeds are followed unless `follow_external`. crawl() yields each page
+    result as it completes, with `depth` and `crawl_url` added; stats() says how the crawl went.
+    checkpoint() captures the crawled URLs and the frontier between pages; crawl(resume=...) continues from one.
+    """
+
+    def __init__(self, fetcher=None, robots=None, concurrency=None):
+        self.fetcher = fetcher or get_fetcher()
+        self.robots = robots or RobotsCache(self.fetcher)
+        self.concurrency = concurrency or settings.SCRAPER_CONCURRENCY_PER_TASK
+        self.frontier = None
+        self.seen = None
+        self.pages = 0
+        self.failed = 0
+        self.blocked = 0
+        self.duplicates = 0
+        self.stop_reason = None
+        self._done = []
+        self._running = {}
+        self._dispatched = 0
+
+    def _enqueue(self, url, depth):
+        """Queue a canonical URL unless it was seen before"""
+        if not self.seen.add(url):
+            self.duplicates += 1
+            return
+        self.frontier.push(url, depth)
+
+    async def _crawl_one(self, url, depth):
+        if not await self.robots.allowed(url):
+            self.blocked += 1
+            return {"status": "skipped", "url": url, "error": "Disallowed by robots.txt", "crawl_url": url,
+                    "depth": depth}
+        self.frontier.set_delay(urlsplit(url).netloc, await self.robots.crawl_delay(url))
+        fetched = await self.fetcher.fetch(url, sink=PageStream)
+        if not fetched.ok:
+            self.failed += 1
+            return {"status": "error", "url": url, "error": fetched.error or f"HTTP {fetched.status}",
+                    "crawl_url": url, "depth": depth}
+        page = await fetched.sink.finish()
+        self.pages += 1
+        return {**page, "crawl_url": url, "depth": depth}
+
+    def checkpoint(self):
+        """JSON-serializable crawl state: URLs already yielded, URLs still to crawl (in flight ones included) and
+        the counters, for crawl(resume=...) after a restart"""
+        return {
+            "done": list(self._done),
+            "queued": [list(item) for item in self._running.values()] + [list(item) for item in self.frontier.items()],
+            "dispatched": self._dispatched - len(self._running),
+            "pages": self.pages,
+            "failed": self.failed,
+            "blocked": self.blocked,
+            "duplicates": self.duplicates,
+        }
+
+    def _restore(self, state):
+        self._done = list(state.get("done", ()))
+        for url in self._done:
+            self.seen.add(url)
+        for url, depth in state.get("queued", ()):
+            self.seen.add(url)
+            self.frontier.push(url, depth)
+        self._dispatched = state.get("dispatched", 0)
+        self.pages = state.get("pages", 0)
+        self.failed = state.get("failed", 0)
+        self.blocked = state.get("blocked", 0)
+        self.duplicates = state.get("duplicates", 0)
+
+    async def crawl(self, seeds, max_pages=None, max_depth=None, max_seconds=None, follow_external=False,
+                    resume=None):
+        max_pages = max_pages or settings.SCRAPER_CRAWL_MAX_PAGES
+        max_depth = max_depth if max_depth is not None else settings.SCRAPER_CRAWL_MAX_DEPTH
+        deadline = time.monotonic() + (max_seconds or settings.SCRAPER_CRAWL_MAX_SECONDS)
+        self.frontier = Frontier()
+        self.seen = SeenUrls()
+        self._done = []
+        self._dispatched = 0
+        seeds = [canonicalize_url(seed) for seed in seeds]
+        seed_hosts = {urlsplit(seed).netloc for seed in seeds}
+        if resume:
+            self._restore(resume)
+        else:
+            for seed in seeds:
+                self._enqueue(seed, 0)
+
+        running = self._running = {}
+        try:
+            while True:
+                if time.monotonic() >= deadline:
+                    self.stop_reason = STOP_TIME
+                    break
+                while len(running) < self.concurrency and self._dispatched < max_pages:
+                    item = self.frontier.pop()
+                    if item is None:
+                        break
+                    running[asyncio.create_task(self._crawl_one(*item))] = item
+                    self._dispatched += 1
+                if not running:
+                    if self._dispatched >= max_pages:
+                        self.stop_reason = STOP_MAX_PAGES
+                        break
+                    wait = self.frontier.wait_time()
+                    if wait is None:
+                        self.stop_reason = STOP_EXHAUSTED
+                        break
+                    await asyncio.sleep(min(wait, deadline - time.monotonic()))
+                    continue
+                # Wake for the first finished page, or when a host comes off its delay if a slot is free
+                can_dispatch = len(running) < self.concurrency and self._dispatched < max_pages
+                wait = self.frontier.wait_time() if can_dispatch else None
+                timeout = min(wait if wait is not None else math.inf, deadline - time.monotonic())
+                done, _ = await asyncio.wait(running, timeout=max(0.0, timeout),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, depth = running.pop(task)
+                    self.frontier.done(url)
+                    if task.exception() is not None:
+                        # e.g. a parser error for one page; the rest of the crawl goes on
+                        self.failed += 1
+                        error = task.exception()
+                        result = {"status": "error", "url": url, "error": f"{type(error).__name__}: {error}",
+                                  "crawl_url": url, "depth": depth}
+                    else:
+                        result = task.result()
+                    if result["status"] == "skipped":
+                        # Pages robots.txt keeps us from don't count towards max_pages
+                        self._dispatched -= 1
+                    elif result["status"] == "success" and depth < max_depth:
+                        links = result["links"]["internal"] + (result["links"]["external"] if follow_external else [])
+                        for link in map(canonicalize_url, links):
+                            if follow_external or urlsplit(link).netloc in seed_hosts:
+                                self._enqueue(link, depth + 1)
+                    self._done.append(url)
+                    yield result
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stats(self):
+        return {
+            "pages": self.pages,
+            "failed": self.failed,
+            "blocked_by_robots": self.blocked,
+            "duplicates": self.duplicates,
+            "frontier_queued": self.frontier.size if self.frontier else 0,
+            "frontier_dropped": self.frontier.dropped if self.frontier else 0,
+            "seen": self.seen.stats() if self.seen else None,
+            "robots_fetches": self.robots.fetches,
+            "stop_reason": self.stop_reason,
+        }
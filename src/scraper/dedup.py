@@ -0,0 +1,275 @@
+# src\scraper\dedup.py
+import random
+import re
+import zlib
+
+from core import settings
+
+try:
+    import numpy as np
+except ImportError:  # Signatures fall back to pure Python: same values, far slower on large batches
+    np = None
+
+DROP = "drop"
+GROUP = "group"
+
+MASK32 = 0xFFFFFFFF
+MASK64 = 0xFFFFFFFFFFFFFFFF
+# Multiplier folding consecutive word hashes into one shingle hash
+SHINGLE_BASE = 0x01000193
+# Shingle rows hashed per MinHash matrix (rows x num_perm uint64), keeps a batch's scratch memory near 16 MiB
+BATCH_ROWS = 16384
+
+_word = re.compile(r"\w+")
+
+
+def word_hashes(text, cache=None):
+    """crc32 of each lowercase word of `text`"""
+    cache = {} if cache is None else cache
+    hashes = []
+    for word in _word.findall(text.lower()):
+        value = cache.get(word)
+        if value is None:
+            value = cache[word] = zlib.crc32(word.encode())
+        hashes.append(value)
+    return hashes
+
+
+def _shingle_weights(size):
+    return [pow(SHINGLE_BASE, size - 1 - j, 1 << 32) for j in range(size)]
+
+
+def shingle_hashes(words, size):
+    """Distinct 32-bit hashes of every run of `size` consecutive words (all words when there are fewer)"""
+    if not words:
+        return []
+    size = min(size, len(words))
+    weights = _shingle_weights(size)
+    count = len(words) - size + 1
+    if np is not None:
+        values = np.asarray(words, dtype=np.uint64)
+        combined = np.zeros(count, dtype=np.uint64)
+        for j, weight in enumerate(weights):
+            combined += values[j:j + count] * np.uint64(weight)
+        return np.unique(combined & np.uint64(MASK32))
+    return sorted({sum(words[i + j] * weight for j, weight in enumerate(weights)) & MASK32 for i in range(count)})
+
+
+def _splitmix64(values):
+    if np is not None and isinstance(values, np.ndarray):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+    result = []
+    for value in values:
+        z = (value + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        result.append(z ^ (z >> 31))
+    return result
+
+
+def simhash(shingles):
+    """64-bit SimHash of a document's shingle hashes: bit i is set when most shingles have bit i set"""
+    if len(shingles) == 0:
+        return 0
+    features = _splitmix64(shingles if np is None else np.asarray(shingles, dtype=np.uint64))
+    if np is not None:
+        bits = np.unpackbits(features.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        counts = bits.sum(axis=0, dtype=np.int64)
+        return sum(1 << i for i in np.flatnonzero(counts * 2 > len(features)).tolist())
+    fingerprint = 0
+    for bit in range(64):
+        if sum((feature >> bit) & 1 for feature in features) * 2 > len(features):
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class MinHasher:
+    """MinHash signatures (num_perm 32-bit values) over word shingles.
+
+    Permutation i is the multiply-add-shift hash ((a_i * x + b_i) mod 2^64) >> 32 of each 32-bit shingle, which
+    wraps naturally in uint64 arithmetic. With numpy, a batch of documents is hashed as one (shingles x num_perm)
+    matrix per BATCH_ROWS shingles, reduced per document with np.minimum.reduceat; without it the same values
+    are computed in Python.
+    """
+
+    def __init__(self, num_perm=None, shingle_words=None, seed=1):
+        self.num_perm = num_perm or settings.SCRAPER_DEDUP_NUM_PERM
+        self.shingle_words = shingle_words or settings.SCRAPER_DEDUP_SHINGLE_WORDS
+        rng = random.Random(seed)
+        self.a = [rng.randrange(1 << 64) | 1 for _ in range(self.num_perm)]
+        self.b = [rng.randrange(1 << 64) for _ in range(self.num_perm)]
+        if np is not None:
+            self._a = np.asarray(self.a, dtype=np.uint64)
+            self._b = np.asarray(self.b, dtype=np.uint64)
+        self._words = {}
+
+    def shingles(self, text):
+        return shingle_hashes(word_hashes(text, self._words), self.shingle_words)
+
+    def signatures(self, shingle_sets):
+        """One signature (list of num_perm ints, or None for an empty document) per shingle set"""
+        if np is None:
+            return [self._signature_python(shingles) for shingles in shingle_sets]
+        results = [None] * len(shingle_sets)
+        batch, rows = [], 0
+        for index, shingles in enumerate(shingle_sets):
+            if len(shingles) == 0:
+                continue
+            if rows and rows + len(shingles) > BATCH_ROWS:
+                self._signature_batch(batch, shingle_sets, results)
+                batch, rows = [], 0
+            batch.append(index)
+            rows += len(shingles)
+        if batch:
+            self._signature_batch(batch, shingle_sets, results)
+        return results
+
+    def _signature_batch(self, batch, shingle_sets, results):
+        values = np.concatenate([shingle_sets[index] for index in batch])
+        offsets = np.cumsum([0] + [len(shingle_sets[index]) for index in batch[:-1]])
+        # Only a single document can exceed BATCH_ROWS; it is reduced block by block
+        blocks = [values[start:start + BATCH_ROWS] for start in range(0, len(values), BATCH_ROWS)] \
+            if len(batch) == 1 else [values]
+        minimum = None
+        for block in blocks:
+            hashed = np.outer(block, self._a)
+            hashed += self._b
+            hashed >>= np.uint64(32)
+            reduced = np.minimum.reduceat(hashed, offsets, axis=0)
+            minimum = reduced if minimum is None else np.minimum(minimum, reduced)
+        for row, index in enumerate(batch):
+            results[index] = minimum[row].tolist()
+
+    def _signature_python(self, shingles):
+        if len(shingles) == 0:
+            return None
+        return [min(((a * x + b) & MASK64) >> 32 for x in shingles) for a, b in zip(self.a, self.b)]
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class LshIndex:
+    """MinHash LSH: signatures are cut into `bands` bands and documents sharing any band are candidates"""
+
+    def __init__(self, num_perm, bands=None):
+        self.bands = bands or settings.SCRAPER_DEDUP_BANDS
+        self.rows = num_perm // self.bands
+        self._buckets = [{} for _ in range(self.bands)]
+        self.signatures = {}
+
+    def _keys(self, signature):
+        return [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def candidates(self, signature):
+        found = {}
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            for candidate in bucket.get(key, ()):
+                found[candidate] = None
+        return list(found)
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for bucket, band_key in zip(self._buckets, self._keys(signature)):
+            bucket.setdefault(band_key, []).append(key)
+
+
+class SimHashIndex:
+    """64-bit fingerprints found again within `max_distance` differing bits.
+
+    By pigeonhole two fingerprints that close agree exactly on at least one of max_distance + 1 blocks, so each
+    block is a dict lookup and only those candidates have their Hamming distance checked.
+    """
+
+    def __init__(self, max_distance=None):
+        self.max_distance = max_distance if max_distance is not None else settings.SCRAPER_DEDUP_DESCRIPTION_DISTANCE
+        blocks = self.max_distance + 1
+        edges = [round(64 * i / blocks) for i in range(blocks + 1)]
+        self._masks = [((1 << (end - start)) - 1) << start for start, end in zip(edges, edges[1:])]
+        self._tables = [{} for _ in self._masks]
+
+    def find(self, fingerprint):
+        for mask, table in zip(self._masks, self._tables):
+            for key, candidate in table.get(fingerprint & mask, ()):
+                if (candidate ^ fingerprint).bit_count() <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, key, fingerprint):
+        for mask, table in zip(self._masks, self._tables):
+            table.setdefault(fingerprint & mask, []).append((key, fingerprint))
+
+
+class NearDuplicateDetector:
+    """Near-duplicate pages within one task: MinHash + LSH over text_data, SimHash over search descriptions.
+
+    add_texts() reports, in order, whether each text nearly duplicates (estimated Jaccard >= threshold) one
+    added before it, and keeps the new ones. check_description() does the same for a search result's
+    description, so syndicated copies can be skipped before they are fetched.
+    """
+
+    def __init__(self, threshold=None, num_perm=None, bands=None, shingle_words=None, description_distance=None):
+        self.threshold = threshold or settings.SCRAPER_DEDUP_THRESHOLD
+        self.hasher = MinHasher(num_perm, shingle_words)
+        self.index = LshIndex(self.hasher.num_perm, bands)
+        self.descriptions = SimHashIndex(description_distance)
+        self._description_words = {}
+
+    def add_texts(self, keys, texts):
+        """[(duplicate_of or None, similarity)] per text; duplicates are not added to the index"""
+        return self.add_signatures(keys, self.hasher.signatures([self.hasher.shingles(text or "") for text in texts]))
+
+    def add_signatures(self, keys, signatures):
+        results = []
+        for key, signature in zip(keys, signatures):
+            if signature is None:
+                results.append((None, 0.0))
+                continue
+            best, best_similarity = None, 0.0
+            for candidate in self.index.candidates(signature):
+                score = similarity(signature, self.index.signatures[candidate])
+                if score >= self.threshold and score > best_similarity:
+                    best, best_similarity = candidate, score
+            if best is None:
+                self.index.add(key, signature)
+            results.append((best, best_similarity))
+        return results
+
+    def check_description(self, key, description):
+        """Key of an earlier result with (nearly) the same description, or None after remembering this one"""
+        # Single words: a description is too short for one changed word to leave most of its word pairs intact
+        shingles = shingle_hashes(word_hashes(description or "", self._description_words), 1)
+        if len(shingles) == 0:
+            return None
+        fingerprint = simhash(shingles)
+        match = self.descriptions.find(fingerprint)
+        if match is None:
+            self.descriptions.add(key, fingerprint)
+        return match
+
+
+def collapse_near_duplicates(results, detector, mode, known=None):
+    """Drop (mode DROP) or nest under their original (mode GROUP) results whose text_data nearly duplicates an
+    earlier result's. `known` maps URLs already matched another way (e.g. by description) to their original.
+    Returns the remaining results and how many were removed."""
+    pages = [result for result in results if result["status"] == "success" and result.get("text_data")]
+    verdicts = detector.add_texts([page["url"] for page in pages], [page["text_data"] for page in pages])
+    duplicate_of = {url: (original, None, "description") for url, original in (known or {}).items()}
+    for page, (original, score) in zip(pages, verdicts):
+        if original is not None:
+            duplicate_of[page["url"]] = (original, round(score, 3), "text_data")
+    kept = [result for result in results if result["url"] not in duplicate_of]
+    if mode == GROUP:
+        by_url = {result["url"]: result for result in kept}
+        for url, (original, score, matched_on) in duplicate_of.items():
+            while original in duplicate_of:
+                original = duplicate_of[original][0]
+            if original in by_url:
+                by_url[original].setdefault("duplicates", []).append(
+                    {"url": url, "similarity": score, "matched_on": matched_on})
+    return kept, len(duplicate_of)
@@ -0,0 +1,157 @@
+# src\scraper\fetcher.py
+import contextlib
+import logging
+import time
+
+import httpx
+
+from core import settings
+
+logger = logging.getLogger("app")
+
+# What a request for one page can fail with; InvalidURL (e.g. a control character in the URL) is not an HTTPError
+REQUEST_ERRORS = (httpx.HTTPError, httpx.InvalidURL)
+
+
+class FetchResult:
+    __slots__ = ("url", "final_url", "status", "headers", "body", "encoding", "not_modified", "truncated",
+                 "elapsed_ms", "error", "sink")
+
+    def __init__(self, url, final_url=None, status=None, headers=None, body=b"", encoding=None, not_modified=False,
+                 truncated=False, elapsed_ms=0.0, error=None, sink=None):
+        self.url = url
+        self.final_url = final_url or url
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+        self.encoding = encoding
+        self.not_modified = not_modified
+        self.truncated = truncated
+        self.elapsed_ms = elapsed_ms
+        self.error = error
+        self.sink = sink
+
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and (self.status < 400 or self.not_modified)
+
+    @property
+    def etag(self):
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self):
+        return self.headers.get("last-modified")
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+class Fetcher:
+    """Page fetches over one pooled httpx client.
+
+    Passing the validators from a previous fetch sends If-None-Match / If-Modified-Since, and a 304 comes
+    back as a result with not_modified set and no body. Bodies are cut off at SCRAPER_MAX_BODY_BYTES.
+
+    With `sink`, a successful response's body is not kept: sink(final_url, encoding) is called once the status
+    is known, each chunk is awaited into its feed(), and the sink comes back as the result's `sink` (e.g.
+    PageStream, whose finish() then returns the parsed page).
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        self.requests = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.bytes_received = 0
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.SCRAPER_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=settings.SCRAPER_MAX_CONNECTIONS,
+                                    max_keepalive_connections=settings.SCRAPER_MAX_CONNECTIONS),
+                follow_redirects=True,
+                headers={"user-agent": settings.SCRAPER_USER_AGENT},
+            )
+        return self._client
+
+    async def fetch(self, url, etag=None, last_modified=None, sink=None):
+        headers = {}
+        if etag:
+            headers["if-none-match"] = etag
+        if last_modified:
+            headers["if-modified-since"] = last_modified
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            async with self._get_client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    self.not_modified += 1
+                    return FetchResult(url, str(response.url), 304, dict(response.headers), not_modified=True,
+                                       elapsed_ms=(time.perf_counter() - start) * 1000)
+                if sink is not None and response.status_code < 400:
+                    sink = sink(str(response.url), response.charset_encoding)
+                else:
+                    sink = None
+                chunks = []
+                size = 0
+                truncated = False
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size >= settings.SCRAPER_MAX_BODY_BYTES:
+                        chunk = chunk[:len(chunk) - (size - settings.SCRAPER_MAX_BODY_BYTES)]
+                        truncated = True
+                    if sink is not None:
+                        await sink.feed(chunk)
+                    else:
+                        chunks.append(chunk)
+                    if truncated:
+                        break
+                self.bytes_received += size
+                return FetchResult(
+                    url, str(response.url), response.status_code, dict(response.headers), b"".join(chunks),
+                    response.charset_encoding, truncated=truncated, elapsed_ms=(time.perf_counter() - start) * 1000,
+                    sink=sink,
+                )
+        except REQUEST_ERRORS as e:
+            self.errors += 1
+            return FetchResult(url, error=f"{type(e).__name__}: {e}", elapsed_ms=(time.perf_counter() - start) * 1000)
+
+    @contextlib.asynccontextmanager
+    async def open(self, url):
+        """The response for `url` with its body still unread, for callers that consume it incrementally"""
+        self.requests += 1
+        try:
+            async with self._get_client().stream("GET", url) as response:
+                try:
+                    yield response
+                finally:
+                    self.bytes_received += response.num_bytes_downloaded
+        except REQUEST_ERRORS:
+            self.errors += 1
+            raise
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "bytes_received": self.bytes_received,
+        }
+
+
+_fetcher = None
+
+
+def get_fetcher() -> Fetcher:
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = Fetcher()
+    return _fetcher
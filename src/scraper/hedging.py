@@ -0,0 +1,155 @@
+# src\scraper\hedging.py
+import asyncio
+import collections
+import math
+import time
+from urllib.parse import urlsplit
+
+from core import settings
+from src.scraper.fetcher import FetchResult, get_fetcher
+
+
+class LatencyWindow:
+    """Latencies (seconds) of the last `size` responses, with percentiles recomputed only after new samples"""
+
+    def __init__(self, size=None):
+        self._samples = collections.deque(maxlen=size or settings.SCRAPER_LATENCY_WINDOW)
+        self._sorted = None
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, fraction):
+        if not self._samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        return self._sorted[min(len(self._sorted) - 1, math.ceil(fraction * len(self._sorted)) - 1)]
+
+
+class HedgedFetcher:
+    """Fetcher wrapper that keeps one slow or hung host from setting a task's pace.
+
+    - Timeouts are per host: SCRAPER_TIMEOUT_P99_MULTIPLIER times the host's p99 latency, clamped to
+      [SCRAPER_MIN_TIMEOUT_SECONDS, SCRAPER_TIMEOUT_SECONDS]. A timeout is recorded as a sample at the timeout, so
+      a host that starts hanging pushes its own timeout back up instead of being cut ever shorter.
+    - A GET still running after the host's p95 (SCRAPER_HEDGE_PERCENTILE) gets a duplicate request; the first
+      response wins and the other is cancelled. Hedges are capped at SCRAPER_HEDGE_BUDGET of all requests.
+    - A connection-level failure (e.g. a pooled connection the server had already closed) is retried once
+      right away when no other attempt is running; these are idempotent GETs.
+
+    Hosts with fewer than SCRAPER_LATENCY_MIN_SAMPLES responses use the latencies seen across all hosts. A `sink`
+    factory is passed to every attempt, so each one parses into its own.
+    """
+
+    def __init__(self, fetcher=None):
+        self.fetcher = fetcher or get_fetcher()
+        self._hosts = collections.defaultdict(LatencyWindow)
+        self._all = LatencyWindow()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.timeouts = 0
+
+    def _window(self, host):
+        window = self._hosts.get(host)
+        if window is not None and len(window) >= settings.SCRAPER_LATENCY_MIN_SAMPLES:
+            return window
+        return self._all if len(self._all) >= settings.SCRAPER_LATENCY_MIN_SAMPLES else None
+
+    def timeout_for(self, host):
+        window = self._window(host)
+        if window is None:
+            return settings.SCRAPER_TIMEOUT_SECONDS
+        timeout = window.percentile(0.99) * settings.SCRAPER_TIMEOUT_P99_MULTIPLIER
+        return min(settings.SCRAPER_TIMEOUT_SECONDS, max(settings.SCRAPER_MIN_TIMEOUT_SECONDS, timeout))
+
+    def hedge_delay_for(self, host):
+        window = self._window(host)
+        if window is None:
+            return None
+        return max(settings.SCRAPER_HEDGE_MIN_DELAY_MS / 1000, window.percentile(settings.SCRAPER_HEDGE_PERCENTILE))
+
+    def _record(self, host, seconds):
+        self._hosts[host].record(seconds)
+        self._all.record(seconds)
+
+    def _may_hedge(self):
+        return self.hedges < settings.SCRAPER_HEDGE_BUDGET * self.requests + settings.SCRAPER_HEDGE_BURST
+
+    async def fetch(self, url, etag=None, last_modified=None, sink=None):
+        host = urlsplit(url).netloc
+        timeout = self.timeout_for(host)
+        hedge_delay = self.hedge_delay_for(host)
+        self.requests += 1
+        start = time.monotonic()
+        primary = asyncio.create_task(self.fetcher.fetch(url, etag, last_modified, sink))
+        attempts = [primary]
+        hedged = False
+        retried = False
+        failed = None
+        try:
+            while attempts:
+                now = time.monotonic()
+                remaining = start + timeout - now
+                if remaining <= 0:
+                    break
+                hedge_at = start + hedge_delay if hedge_delay is not None and not hedged else None
+                wait = remaining if hedge_at is None else min(remaining, max(0.0, hedge_at - now))
+                done, _ = await asyncio.wait(attempts, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    attempts.remove(task)
+                    result = task.result()
+                    if result.status is not None:
+                        self._record(host, time.monotonic() - start)
+                        self.hedge_wins += task is not primary
+                        return result
+                    # Connection error on this attempt; another one may still answer
+                    failed = result
+                if failed is not None and not attempts and not retried:
+                    retried = True
+                    self.retries += 1
+                    attempts.append(asyncio.create_task(self.fetcher.fetch(url, etag, last_modified, sink)))
+                    continue
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedged = True
+                    if attempts and self._may_hedge():
+                        self.hedges += 1
+                        attempts.append(asyncio.create_task(self.fetcher.fetch(url, etag, last_modified, sink)))
+            if failed is not None and not attempts:
+                return failed
+        finally:
+            for task in attempts:
+                task.cancel()
+        self.timeouts += 1
+        self._record(host, timeout)
+        return FetchResult(url, error=f"Timeout: no response from {host} within {timeout:.1f}s",
+                           elapsed_ms=(time.monotonic() - start) * 1000)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hosts": {host: {"samples": len(window), "p50_ms": round(window.percentile(0.5) * 1000, 1),
+                             "p99_ms": round(window.percentile(0.99) * 1000, 1),
+                             "timeout_s": round(self.timeout_for(host), 2)}
+                      for host, window in self._hosts.items() if len(window)},
+        }
+
+
+_hedged_fetcher = None
+
+
+def get_hedged_fetcher() -> HedgedFetcher:
+    global _hedged_fetcher
+    if _hedged_fetcher is None:
+        _hedged_fetcher = HedgedFetcher()
+    return _hedged_fetcher
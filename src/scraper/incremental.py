@@ -0,0 +1,280 @@
+# src\scraper\incremental.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from core import settings
+from src.scraper.fetcher import get_fetcher
+from src.scraper.parser import content_hash, parse_page
+
+logger = logging.getLogger("app")
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+# Why a page counted as unchanged, cheapest check first
+NOT_MODIFIED = "not_modified"
+SAME_BODY = "same_body"
+SAME_CONTENT = "same_content"
+
+DIFFED_SECTIONS = ("organized_data", "links")
+
+
+def _dumps(value):
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+class ScrapeStateStore:
+    """Last seen validators, hashes and diffable sections per URL, in a WAL-mode SQLite file"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or settings.SCRAPER_STATE_PATH or Path(settings.TEMP_DIR) / "scrape_state.sqlite3")
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS page_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                content_hash TEXT,
+                modified_time TEXT,
+                canonical_url TEXT,
+                sections TEXT,
+                checked_at REAL NOT NULL,
+                changed_at REAL NOT NULL
+            )
+            """
+        )
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(*args)
+
+    async def get(self, url):
+        row = await self._run(lambda: self._conn.execute("SELECT * FROM page_state WHERE url = ?", (url,)).fetchone())
+        if row is None:
+            return None
+        record = dict(row)
+        record["sections"] = json.loads(record["sections"]) if record["sections"] else {}
+        return record
+
+    def _save(self, record):
+        self._conn.execute(
+            """
+            INSERT INTO page_state (url, etag, last_modified, body_hash, content_hash, modified_time, canonical_url,
+                                    sections, checked_at, changed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified,
+                body_hash = excluded.body_hash, content_hash = excluded.content_hash,
+                modified_time = excluded.modified_time, canonical_url = excluded.canonical_url,
+                sections = excluded.sections, checked_at = excluded.checked_at, changed_at = excluded.changed_at
+            """,
+            (record["url"], record.get("etag"), record.get("last_modified"), record.get("body_hash"),
+             record.get("content_hash"), record.get("modified_time"), record.get("canonical_url"),
+             _dumps(record.get("sections") or {}), record["checked_at"], record["changed_at"]),
+        )
+
+    async def save(self, record):
+        await self._run(self._save, record)
+
+    async def touch(self, url, etag=None, last_modified=None):
+        def _touch():
+            self._conn.execute(
+                "UPDATE page_state SET checked_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), etag, last_modified, url),
+            )
+
+        await self._run(_touch)
+
+    async def forget(self, url):
+        await self._run(lambda: self._conn.execute("DELETE FROM page_state WHERE url = ?", (url,)))
+
+    async def close(self):
+        await self._run(self._conn.close)
+
+
+def diff_sections(old, new):
+    """Added and removed entries per heading of organized_data and per category of links"""
+    diff = {}
+    for section in DIFFED_SECTIONS:
+        before, after = old.get(section) or {}, new.get(section) or {}
+        added, removed = {}, {}
+        for key in after.keys() | before.keys():
+            old_items, new_items = before.get(key) or [], after.get(key) or []
+            old_set, new_set = set(old_items), set(new_items)
+            gained = [item for item in new_items if item not in old_set]
+            lost = [item for item in old_items if item not in new_set]
+            if gained:
+                added[key] = gained
+            if lost:
+                removed[key] = lost
+        if added or removed:
+            diff[section] = {"added": added, "removed": removed}
+    return diff
+
+
+class IncrementalMetrics:
+    def __init__(self):
+        self.pages = 0
+        self.new = 0
+        self.changed = 0
+        self.not_modified = 0
+        self.same_body = 0
+        self.same_content = 0
+        self.failed = 0
+        self.parsed = 0
+        self.parse_ms = 0.0
+
+    def snapshot(self):
+        return {**vars(self), "parse_ms": round(self.parse_ms, 3)}
+
+
+class IncrementalScraper:
+    """Re-scrapes URLs doing only the work a change requires.
+
+    1. Conditional GET with the stored ETag / Last-Modified; a 304 ends there.
+    2. Same body hash as last time: no parse.
+    3. Parsed, but organized_data and links hash the same (markup-only change): reported unchanged.
+    4. Otherwise the page is reported with a diff of organized_data and links against the previous scrape
+       (or in full the first time a URL is seen).
+    """
+
+    def __init__(self, fetcher=None, store=None):
+        self.fetcher = fetcher or get_fetcher()
+        self.store = store or get_scrape_state_store()
+        self.metrics = IncrementalMetrics()
+
+    async def scrape(self, url, full=False):
+        """Result dict for `url`; `full` ignores the stored state and returns the whole page"""
+        self.metrics.pages += 1
+        previous = None if full else await self.store.get(url)
+        fetched = await self.fetcher.fetch(
+            url,
+            etag=previous["etag"] if previous else None,
+            last_modified=previous["last_modified"] if previous else None,
+        )
+        if not fetched.ok:
+            self.metrics.failed += 1
+            return {"status": "error", "change": FAILED, "url": url,
+                    "error": fetched.error or f"HTTP {fetched.status}"}
+        if fetched.not_modified:
+            self.metrics.not_modified += 1
+            await self.store.touch(url, fetched.etag, fetched.last_modified)
+            return self._unchanged(url, previous, NOT_MODIFIED)
+
+        body_hash = hashlib.blake2b(fetched.body, digest_size=16).hexdigest()
+        if previous is not None and body_hash == previous["body_hash"]:
+            self.metrics.same_body += 1
+            await self.store.touch(url, fetched.etag, fetched.last_modified)
+            return self._unchanged(url, previous, SAME_BODY)
+
+        start = time.perf_counter()
+        page = await asyncio.to_thread(parse_page, fetched.final_url, fetched.text)
+        self.metrics.parse_ms += (time.perf_counter() - start) * 1000
+        self.metrics.parsed += 1
+
+        now = time.time()
+        page_hash = content_hash(page)
+        metadata = page["overview"]["metadata"]
+        record = {
+            "url": url,
+            "etag": fetched.etag,
+            "last_modified": fetched.last_modified,
+            "body_hash": body_hash,
+            "content_hash": page_hash,
+            "modified_time": metadata["meta_tags"].get("article:modified_time"),
+            "canonical_url": metadata["canonical_url"],
+            "sections": {section: page[section] for section in DIFFED_SECTIONS},
+            "checked_at": now,
+            "changed_at": now,
+        }
+        if previous is not None and page_hash == previous["content_hash"]:
+            self.metrics.same_content += 1
+            record["changed_at"] = previous["changed_at"]
+            await self.store.save(record)
+            return self._unchanged(url, previous, SAME_CONTENT)
+
+        await self.store.save(record)
+        if previous is None:
+            self.metrics.new += 1
+            return {**page, "change": NEW}
+        self.metrics.changed += 1
+        return {
+            "status": "success",
+            "change": CHANGED,
+            "url": url,
+            "error": None,
+            "overview": page["overview"],
+            "modified_time": record["modified_time"],
+            "previous_modified_time": previous["modified_time"],
+            "diff": diff_sections(previous["sections"], page),
+            "hashes": page["hashes"],
+        }
+
+    @staticmethod
+    def _unchanged(url, previous, reason):
+        return {
+            "status": "success",
+            "change": UNCHANGED,
+            "reason": reason,
+            "url": url,
+            "error": None,
+            "canonical_url": previous["canonical_url"] if previous else None,
+            "modified_time": previous["modified_time"] if previous else None,
+            "changed_at": previous["changed_at"] if previous else None,
+        }
+
+    async def scrape_many(self, urls, concurrency=None, full=False):
+        """Yield results as pages complete, at most `concurrency` fetches at a time"""
+        semaphore = asyncio.Semaphore(concurrency or settings.SCRAPER_CONCURRENCY_PER_TASK)
+
+        async def one(url):
+            async with semaphore:
+                return await self.scrape(url, full=full)
+
+        tasks = [asyncio.create_task(one(url)) for url in dict.fromkeys(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        return {**self.metrics.snapshot(), "fetcher": self.fetcher.stats()}
+
+
+_store = None
+_scraper = None
+
+
+def get_scrape_state_store() -> ScrapeStateStore:
+    global _store
+    if _store is None:
+        _store = ScrapeStateStore()
+    return _store
+
+
+def get_incremental_scraper() -> IncrementalScraper:
+    global _scraper
+    if _scraper is None:
+        _scraper = IncrementalScraper()
+    return _scraper
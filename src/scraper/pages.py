@@ -0,0 +1,61 @@
+# src\scraper\pages.py
+import asyncio
+import logging
+
+from core import settings
+from src.scraper.hedging import get_hedged_fetcher
+from src.scraper.parser import PageStream
+
+logger = logging.getLogger("app")
+
+RESULT_FIELDS = ("overview", "structured_data", "organized_data", "text_data", "main_image", "hashes",
+                 "content_filter_removal_details", "links")
+
+
+def error_result(url, error):
+    """A failed page in the scrape result shape: status "error" and every content field None"""
+    return {"status": "error", "url": url, "error": error, **dict.fromkeys(RESULT_FIELDS)}
+
+
+async def scrape_page(url, fetcher=None):
+    fetched = await (fetcher or get_hedged_fetcher()).fetch(url, sink=PageStream)
+    if not fetched.ok:
+        return error_result(url, fetched.error or f"HTTP {fetched.status}")
+    return await fetched.sink.finish()
+
+
+async def scrape_pages(urls, deadline_seconds=None, fetcher=None, concurrency=None, on_result=None):
+    """Scrape `urls` and return their results in order, by `deadline_seconds` at the latest.
+
+    Pages still being fetched or parsed at the deadline are cancelled and come back as errors, so a task
+    answers with what it has instead of waiting on its slowest host. `on_result(url, result)` is awaited
+    as each page finishes.
+    """
+    deadline_seconds = deadline_seconds or settings.SCRAPER_TASK_DEADLINE_SECONDS
+    semaphore = asyncio.Semaphore(concurrency or settings.SCRAPER_CONCURRENCY_PER_TASK)
+
+    async def one(url):
+        async with semaphore:
+            result = await scrape_page(url, fetcher)
+        if on_result is not None:
+            await on_result(url, result)
+        return result
+
+    tasks = {url: asyncio.create_task(one(url)) for url in dict.fromkeys(urls)}
+    if not tasks:
+        return []
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline_seconds)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.info(f"[scraper] {len(pending)} of {len(tasks)} pages unfinished after the {deadline_seconds:g}s deadline")
+
+    results = []
+    for url, task in tasks.items():
+        if task in pending:
+            results.append(error_result(url, f"Not finished within the {deadline_seconds:g}s task deadline"))
+        elif task.exception() is not None:
+            results.append(error_result(url, f"{type(task.exception()).__name__}: {task.exception()}"))
+        else:
+            results.append(task.result())
+    return results
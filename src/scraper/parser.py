@@ -0,0 +1,515 @@
+# src\scraper\parser.py
+import asyncio
+import codecs
+import hashlib
+import json
+import re
+import uuid
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from core import settings
+from src.scraper.content_filter import get_content_filter
+
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# Elements whose text becomes one entry under the current heading
+BLOCKS = {"p", "li", "blockquote", "pre", "td", "th", "dt", "dd", "figcaption", "caption"}
+# Text outside any block (e.g. directly in a <div>) is collected until the next of these starts or ends
+BLOCK_LEVEL = BLOCKS | HEADINGS | {"div", "section", "article", "main", "header", "footer", "nav", "aside", "body",
+                                   "form", "table", "tr", "ul", "ol", "dl", "figure", "hr", "br"}
+SKIPPED = {"script", "style", "noscript", "template", "svg", "head"}
+VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+UNASSOCIATED = "unassociated"
+LIST_CATEGORIES = {"ol": "Ordered Lists", "ul": "Unordered Lists"}
+# Text kept per removed element in content_filter_removal_details
+REMOVED_TEXT_CHARS = 200
+
+LINK_TYPES = (
+    ("documents", (".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".csv", ".txt", ".rtf", ".odt")),
+    ("images", (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".bmp", ".avif")),
+    ("audio", (".mp3", ".wav", ".ogg", ".m4a", ".flac", ".aac")),
+    ("videos", (".mp4", ".webm", ".mov", ".avi", ".mkv", ".m4v")),
+    ("archives", (".zip", ".tar", ".gz", ".tgz", ".rar", ".7z", ".bz2")),
+)
+LINK_CATEGORIES = ("internal", "external", "images", "documents", "others", "audio", "videos", "archives")
+
+_whitespace = re.compile(r"\s+")
+
+
+def _clean(text):
+    return _whitespace.sub(" ", text).strip()
+
+
+def heading_marker(heading):
+    """Markdown prefix of an outline heading: "H2: Title" -> "## " """
+    return "#" * int(heading[1]) + " "
+
+
+def page_uuid(url, sha256):
+    """Result id: the same for the same url and text, so re-parsing a page (or streaming it) gives the same uuid"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{url}#{sha256}"))
+
+
+def unique_page_name(url):
+    parts = urlsplit(url)
+    return re.sub(r"[^a-zA-Z0-9]+", "_", f"{parts.netloc}{parts.path}").strip("_")
+
+
+class PageParser(HTMLParser):
+    """Single pass over a page collecting the title, meta tags, heading outline, text blocks per heading, lists
+    and links.
+
+    Only the open blocks and lists are held as context, so the page can be fed in pieces as it downloads
+    (PageStream). With `on_text`, each text block is passed to on_text(heading, text) as soon as it is complete
+    instead of being kept in `organized`. Elements matching a `content_filter` rule are dropped with everything
+    inside them and listed in `removals`.
+
+    `structured` holds each ul / ol under the heading it starts in: its items (text without nested lists, links
+    as [text](url)), the last text block completed before it ("Before") and the first block started after it
+    ("After"), both within the same heading. `json_ld` holds the parsed <script type="application/ld+json">
+    blocks; other scripts are skipped.
+    """
+
+    def __init__(self, url, on_text=None, content_filter=None):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.on_text = on_text
+        self.content_filter = content_filter
+        self.removals = []
+        self._removal = None
+        self.host = urlsplit(url).netloc.lower()
+        self.title = ""
+        self.meta_tags = {}
+        self.opengraph = {}
+        self.canonical_url = None
+        self.json_ld = []
+        self._json_ld_parts = None
+        self.organized = {UNASSOCIATED: []}
+        self.outline = {}
+        self.links = {category: [] for category in LINK_CATEGORIES}
+        self._seen_links = set()
+        self._heading = UNASSOCIATED
+        self._skip_depth = 0
+        self._in_title = False
+        self._capture = None
+        self._capture_tag = None
+        self._capture_depth = 0
+        self._capture_lists = 0
+        self._capture_seq = 0
+        self._buffer = []
+        self.structured = {}
+        self._lists = []
+        self._blocks_started = 0
+        self._last_block = ""
+        self._awaiting_after = []
+        self.table_count = 0
+        self.list_count = 0
+        self.code_block_count = 0
+
+    # ---- text capture ------------------------------------------------------------------------------
+
+    def _start_capture(self, tag):
+        self._flush()
+        self._capture = "heading" if tag in HEADINGS else "block"
+        self._capture_tag = tag
+        self._capture_depth = 1
+        self._capture_lists = len(self._lists)
+        self._blocks_started += 1
+        self._capture_seq = self._blocks_started
+
+    def _flush(self):
+        text = _clean("".join(self._buffer))
+        self._buffer = []
+        kind, tag = self._capture, self._capture_tag
+        self._capture = self._capture_tag = None
+        self._capture_depth = 0
+        if not text:
+            return
+        if kind == "heading":
+            self._heading = f"{tag.upper()}: {text}"
+            self.organized.setdefault(self._heading, [])
+            self.outline.setdefault(self._heading, [])
+            self._last_block = ""
+            self._awaiting_after = []
+            return
+        if self.on_text is not None:
+            self.on_text(self._heading, text)
+        else:
+            self.organized[self._heading].append(text)
+        self._last_block = text
+        if self._awaiting_after:
+            waiting = []
+            for entry, ended in self._awaiting_after:
+                if self._capture_seq > ended:
+                    entry["After"] = text
+                else:
+                    waiting.append((entry, ended))
+            self._awaiting_after = waiting
+
+    # ---- lists -------------------------------------------------------------------------------------
+
+    def _open_list(self, tag):
+        if self._lists and self._lists[-1]["item"] is not None:
+            # A nested list is left out of its parent item's text; keep the words around it apart
+            self._lists[-1]["item"].append(" ")
+        entry = {"Before": self._last_block, "List": [], "After": ""}
+        self.structured.setdefault(LIST_CATEGORIES[tag], {}).setdefault(self._heading, []).append(entry)
+        self._lists.append({"tag": tag, "heading": self._heading, "entry": entry, "item": None, "anchors": []})
+
+    def _close_list(self, tag):
+        """Close the innermost open `tag` list and any lists left open inside it; a stray end tag is ignored"""
+        if not any(current["tag"] == tag for current in self._lists):
+            return
+        while True:
+            current = self._lists.pop()
+            self._close_item(current)
+            entry = current["entry"]
+            if entry["List"]:
+                self._awaiting_after.append((entry, self._blocks_started))
+            else:
+                category = LIST_CATEGORIES[current["tag"]]
+                entries = self.structured[category][current["heading"]]
+                del entries[next(i for i in range(len(entries) - 1, -1, -1) if entries[i] is entry)]
+                if not entries:
+                    del self.structured[category][current["heading"]]
+                    if not self.structured[category]:
+                        del self.structured[category]
+            if current["tag"] == tag:
+                if self._lists and self._lists[-1]["item"] is not None:
+                    self._lists[-1]["item"].append(" ")
+                return
+
+    def _open_item(self):
+        current = self._lists[-1]
+        self._close_item(current)
+        current["item"] = []
+        current["anchors"] = []
+
+    @staticmethod
+    def _close_item(current):
+        if current["item"] is None:
+            return
+        text = _clean("".join(current["item"]))
+        current["item"] = None
+        if text:
+            current["entry"]["List"].append(text)
+
+    def _close_anchor(self, current):
+        href, start = current["anchors"].pop()
+        if not href or href.strip().startswith("#"):
+            return
+        raw = "".join(current["item"][start:])
+        text = _clean(raw)
+        absolute = urljoin(self.url, href.strip())
+        if text and urlsplit(absolute).scheme in ("http", "https"):
+            current["item"][start:] = [" " if raw[:1].isspace() else "", f"[{text}]({absolute})",
+                                       " " if raw[-1:].isspace() else ""]
+
+    # ---- links -------------------------------------------------------------------------------------
+
+    def _add_link(self, href, image=False):
+        href = (href or "").strip()
+        if not href or href.startswith("#"):
+            return
+        if href.startswith(("mailto:", "tel:", "javascript:", "data:")):
+            category, absolute = "others", href
+        else:
+            absolute = urljoin(self.url, href).split("#", 1)[0]
+            path = urlsplit(absolute).path.lower()
+            category = "images" if image else None
+            if category is None:
+                for name, extensions in LINK_TYPES:
+                    if path.endswith(extensions):
+                        category = name
+                        break
+            if category is None:
+                category = "internal" if urlsplit(absolute).netloc.lower() == self.host else "external"
+        if (category, absolute) not in self._seen_links:
+            self._seen_links.add((category, absolute))
+            self.links[category].append(absolute)
+
+    # ---- content filter ----------------------------------------------------------------------------
+
+    def _start_removal(self, tag, rule):
+        self._removal = {"rule": rule, "depth": 0 if tag in VOID else 1, "text": [],
+                         "html_length": len(self.get_starttag_text() or "")}
+        if not self._removal["depth"]:
+            self._finish_removal()
+
+    def _finish_removal(self):
+        removal, self._removal = self._removal, None
+        self.removals.append({**removal["rule"], "text": _clean("".join(removal["text"]))[:REMOVED_TEXT_CHARS],
+                              "html_length": removal["html_length"]})
+
+    def _add_json_ld(self):
+        text, self._json_ld_parts = "".join(self._json_ld_parts).strip(), None
+        try:
+            data = json.loads(text)
+        except ValueError:
+            # Invalid JSON-LD is common (trailing commas, unescaped quotes); the page is still usable without it
+            return
+        if isinstance(data, list):
+            self.json_ld.extend(data)
+        else:
+            self.json_ld.append(data)
+
+    # ---- HTMLParser callbacks ----------------------------------------------------------------------
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag == "meta":
+            attributes = dict(attrs)
+            content = attributes.get("content")
+            key = attributes.get("property") or attributes.get("name")
+            if key and content is not None:
+                if key.startswith("og:"):
+                    self.opengraph[key] = content
+                else:
+                    self.meta_tags[key] = content
+            return
+        if tag == "link":
+            attributes = dict(attrs)
+            if "canonical" in (attributes.get("rel") or "").lower().split() and attributes.get("href"):
+                self.canonical_url = urljoin(self.url, attributes["href"])
+            return
+        if tag == "script" and (dict(attrs).get("type") or "").split(";")[0].strip().lower() == "application/ld+json":
+            self._json_ld_parts = []
+        if tag in SKIPPED:
+            if tag not in VOID:
+                self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if self._removal is not None:
+            self._removal["html_length"] += len(self.get_starttag_text() or "")
+            if tag not in VOID:
+                self._removal["depth"] += 1
+            return
+        if self.content_filter is not None:
+            rule = self.content_filter.match(tag, dict(attrs))
+            if rule is not None:
+                self._start_removal(tag, rule)
+                return
+        if self._capture == "loose" and tag in BLOCK_LEVEL:
+            self._flush()
+        item = self._lists[-1] if self._lists and self._lists[-1]["item"] is not None else None
+        if tag == "a":
+            href = dict(attrs).get("href")
+            self._add_link(href)
+            if item is not None:
+                item["anchors"].append((href, len(item["item"])))
+        elif tag == "img":
+            self._add_link(dict(attrs).get("src"), image=True)
+        elif tag in ("audio", "video", "source"):
+            self._add_link(dict(attrs).get("src"))
+        elif tag == "table":
+            self.table_count += 1
+        elif tag in ("ul", "ol"):
+            self.list_count += 1
+            self._open_list(tag)
+        elif tag == "li" and self._lists:
+            self._open_item()
+        elif tag == "pre":
+            self.code_block_count += 1
+        elif tag == "br":
+            if self._capture not in (None, "loose"):
+                self._buffer.append(" ")
+            if item is not None:
+                item["item"].append(" ")
+
+        if tag in HEADINGS or (tag in BLOCKS and self._capture is None) or \
+                (tag == "li" == self._capture_tag and len(self._lists) == self._capture_lists):
+            # A block nested in another block (li > p, li > ul > li) continues the outer one; a sibling li
+            # (end tag optional) ends it
+            self._start_capture(tag)
+        elif tag == self._capture_tag and tag != "li":
+            # Same tag nested in the capturing block (td > table > td): its end tag doesn't end the outer block
+            self._capture_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag == "script" and self._json_ld_parts is not None:
+            self._add_json_ld()
+        if tag in SKIPPED and tag not in VOID:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if self._skip_depth:
+            return
+        if self._removal is not None:
+            if tag not in VOID:
+                self._removal["html_length"] += len(tag) + 3
+                self._removal["depth"] -= 1
+                if not self._removal["depth"]:
+                    self._finish_removal()
+            return
+        if self._lists:
+            current = self._lists[-1]
+            if tag in LIST_CATEGORIES:
+                self._close_list(tag)
+            elif tag == "li":
+                self._close_item(current)
+            elif tag == "a" and current["item"] is not None and current["anchors"]:
+                self._close_anchor(current)
+        if tag == "li" == self._capture_tag:
+            # An item ends with its own list level's </li>, or with its list
+            if len(self._lists) == self._capture_lists:
+                self._flush()
+        elif tag == self._capture_tag:
+            self._capture_depth -= 1
+            if not self._capture_depth:
+                self._flush()
+        elif (self._capture == "loose" and tag in BLOCK_LEVEL) or \
+                (self._capture_tag == "li" and len(self._lists) < self._capture_lists):
+            self._flush()
+
+    def handle_data(self, data):
+        if self._json_ld_parts is not None:
+            self._json_ld_parts.append(data)
+        elif self._in_title:
+            self.title += data
+        elif self._removal is not None:
+            if not self._skip_depth:
+                self._removal["text"].append(data)
+                self._removal["html_length"] += len(data)
+        elif not self._skip_depth:
+            if self._lists and self._lists[-1]["item"] is not None:
+                self._lists[-1]["item"].append(data)
+            if self._capture is None:
+                if not data.strip():
+                    return
+                self._capture = "loose"
+                self._blocks_started += 1
+                self._capture_seq = self._blocks_started
+            self._buffer.append(data)
+
+    def close(self):
+        super().close()
+        if self._removal is not None:
+            self._finish_removal()
+        self._flush()
+        if self._lists:
+            self._close_list(self._lists[0]["tag"])
+
+
+def _hash(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def content_hash(page):
+    """Hash of the parts of a page that matter for change detection: organized text and links"""
+    payload = json.dumps([page.get("organized_data"), page.get("links")], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def build_page(url, parser):
+    organized = {heading: texts for heading, texts in parser.organized.items() if texts}
+    text_data = "\n\n".join(
+        "\n\n".join(([heading.split(": ", 1)[1]] if heading != UNASSOCIATED else []) + texts)
+        for heading, texts in organized.items()
+    )
+    outline = dict(parser.outline)
+    outline[UNASSOCIATED] = []
+    sha256 = _hash(text_data)
+    og_image = parser.opengraph.get("og:image")
+    main_image = urljoin(url, og_image) if og_image else (parser.links["images"][0] if parser.links["images"] else None)
+    page = {
+        "status": "success",
+        "url": url,
+        "error": None,
+        "overview": {
+            "uuid": page_uuid(url, sha256),
+            "website": urlsplit(url).netloc,
+            "url": url,
+            "unique_page_name": unique_page_name(url),
+            "page_title": _clean(parser.title),
+            "has_structured_content": bool(parser.table_count or parser.list_count),
+            "table_count": parser.table_count,
+            "code_block_count": parser.code_block_count,
+            "list_count": parser.list_count,
+            "outline": outline,
+            "char_count": len(text_data),
+            # text_data as markdown: heading lines get their "#" markers
+            "char_count_formatted": len(text_data) + sum(len(heading_marker(heading)) for heading in organized
+                                                         if heading != UNASSOCIATED),
+            "metadata": {
+                "json-ld": parser.json_ld,
+                "opengraph": parser.opengraph,
+                "meta_tags": parser.meta_tags,
+                "canonical_url": parser.canonical_url,
+                "robots_directives": parser.meta_tags.get("robots"),
+            },
+        },
+        "structured_data": parser.structured,
+        "organized_data": organized,
+        "text_data": text_data,
+        "main_image": main_image,
+        "links": parser.links,
+        "content_filter_removal_details": parser.removals if parser.content_filter is not None else None,
+    }
+    page["hashes"] = [f"sha256:{sha256}", f"content:{content_hash(page)}"]
+    return page
+
+
+def parse_page(url, html, content_filter=None):
+    """Scrape result dict (overview, organized_data, text_data, links, hashes...) for one HTML document.
+
+    `content_filter` defaults to the rules configured in SCRAPER_CONTENT_FILTER_RULES.
+    """
+    parser = PageParser(url, content_filter=content_filter or get_content_filter())
+    parser.feed(html)
+    parser.close()
+    return build_page(url, parser)
+
+
+class PageStream:
+    """Parses a page while it downloads, as the `sink` of Fetcher.fetch().
+
+    Chunks are decoded incrementally (a character split across chunks waits for its remaining bytes) and fed to
+    a PageParser in a worker thread, one parse at a time; chunks arriving meanwhile are batched for the next
+    one. Once more than SCRAPER_PARSE_BUFFER_BYTES are waiting, feed() waits for the running parse, which holds
+    back the download instead of buffering the page. finish() returns the same result parse_page() would.
+    """
+
+    def __init__(self, url, encoding=None, content_filter=None):
+        self.url = url
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.parser = PageParser(url, content_filter=content_filter or get_content_filter())
+        self._pending = []
+        self._pending_bytes = 0
+        self._parsing = None
+
+    def _feed(self, data, final=False):
+        self.parser.feed(self._decoder.decode(data, final))
+
+    def _take(self):
+        data = b"".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        return data
+
+    async def feed(self, chunk):
+        self._pending.append(chunk)
+        self._pending_bytes += len(chunk)
+        if self._parsing is not None:
+            if not self._parsing.done() and self._pending_bytes < settings.SCRAPER_PARSE_BUFFER_BYTES:
+                return
+            await self._parsing
+        self._parsing = asyncio.ensure_future(asyncio.to_thread(self._feed, self._take()))
+
+    def _finish(self, data):
+        self._feed(data, final=True)
+        self.parser.close()
+        return build_page(self.url, self.parser)
+
+    async def finish(self):
+        if self._parsing is not None:
+            await self._parsing
+        return await asyncio.to_thread(self._finish, self._take())
@@ -0,0 +1,167 @@
+# src\scraper\text_stream.py
+import hashlib
+import math
+import time
+
+from core import settings
+from src.scraper.content_filter import get_content_filter
+from src.scraper.fetcher import REQUEST_ERRORS, get_fetcher
+from src.scraper.parser import UNASSOCIATED, PageParser, build_page, heading_marker, page_uuid
+
+BLOCK_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / settings.SCRAPER_CHARS_PER_TOKEN)
+
+
+class TextChunker:
+    """Cuts a page's text into chunks of at most `max_tokens` (estimated) that never span two outline headings.
+
+    Text is added block by block as the parser finds it. Joining the chunk texts with a blank line, or with
+    nothing after a chunk marked `partial` (it ends inside a block too long for one chunk), gives the page text
+    in document order: the text_data of a regular scrape, except that text_data groups repeated headings.
+    Counts and the sha256 of that text are kept as blocks arrive, so the full string is never built;
+    formatted_char_count adds the markdown heading markers, as overview.char_count_formatted does.
+    Past `max_chars` further text is dropped and `truncated` is set.
+    """
+
+    def __init__(self, max_tokens=None, max_chars=None):
+        self.max_chunk_chars = max(1, int((max_tokens or settings.SCRAPER_TEXT_CHUNK_TOKENS)
+                                          * settings.SCRAPER_CHARS_PER_TOKEN))
+        self.max_chars = max_chars or settings.SCRAPER_MAX_TEXT_CHARS
+        self.char_count = 0
+        self.heading_marker_chars = 0
+        self.chunk_count = 0
+        self.token_count = 0
+        self.truncated = False
+        self._sha256 = hashlib.sha256()
+        self._heading = None
+        self._parts = []
+        self._size = 0
+        self._ready = []
+
+    def add(self, heading, text):
+        if self.truncated:
+            return
+        if heading != self._heading:
+            self._cut()
+            self._heading = heading
+            if heading != UNASSOCIATED:
+                # Heading text leads its first block, as in text_data; headings without text are skipped
+                before = self.char_count
+                self._add_block(heading.split(": ", 1)[1])
+                if self.char_count > before:
+                    self.heading_marker_chars += len(heading_marker(heading))
+        self._add_block(text)
+
+    def _add_block(self, text):
+        separator = BLOCK_SEPARATOR if self.char_count else ""
+        remaining = self.max_chars - self.char_count - len(separator)
+        if remaining <= 0:
+            self.truncated = True
+            return
+        if len(text) > remaining:
+            text = text[:remaining]
+            self.truncated = True
+        self.char_count += len(separator) + len(text)
+        self._sha256.update((separator + text).encode())
+
+        if self._parts and self._size + len(BLOCK_SEPARATOR) + len(text) > self.max_chunk_chars:
+            self._cut()
+        while len(text) > self.max_chunk_chars:
+            # Only reached with an empty chunk: split the block, at a space when there is one in the second half
+            cut = text.rfind(" ", 0, self.max_chunk_chars) + 1
+            if cut < self.max_chunk_chars // 2:
+                cut = self.max_chunk_chars
+            self._append(text[:cut])
+            self._cut(partial=True)
+            text = text[cut:]
+        if text:
+            self._append(text)
+
+    def _append(self, text):
+        self._size += (len(BLOCK_SEPARATOR) if self._parts else 0) + len(text)
+        self._parts.append(text)
+
+    def _cut(self, partial=False):
+        if not self._parts:
+            return
+        text = BLOCK_SEPARATOR.join(self._parts)
+        tokens = estimate_tokens(text)
+        self._ready.append({"index": self.chunk_count, "heading": self._heading, "text": text, "chars": len(text),
+                            "tokens": tokens, "partial": partial})
+        self.chunk_count += 1
+        self.token_count += tokens
+        self._parts = []
+        self._size = 0
+
+    def drain(self):
+        """Chunks completed since the last call"""
+        ready, self._ready = self._ready, []
+        return ready
+
+    def finish(self):
+        self._cut()
+        return self.drain()
+
+    @property
+    def formatted_char_count(self):
+        return self.char_count + self.heading_marker_chars
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+
+async def stream_page_text(url, send_chunk, fetcher=None, max_tokens=None, max_chars=None):
+    """Fetch and parse `url` incrementally, awaiting send_chunk(chunk) for each text chunk as soon as it is ready.
+
+    Returns the page result with text_data and organized_data left out (their content went out as chunks);
+    overview.char_count, char_count_formatted, uuid and the sha256 hash cover the streamed text, and `text_stream` describes the chunks.
+    """
+    fetcher = fetcher or get_fetcher()
+    chunker = TextChunker(max_tokens, max_chars)
+    start = time.perf_counter()
+    first_chunk_ms = None
+    body_truncated = False
+    try:
+        async with fetcher.open(url) as response:
+            if response.status_code >= 400:
+                return {"status": "error", "url": url, "error": f"HTTP {response.status_code}"}
+            final_url = str(response.url)
+            parser = PageParser(final_url, on_text=chunker.add, content_filter=get_content_filter())
+            async for text in response.aiter_text():
+                parser.feed(text)
+                for chunk in chunker.drain():
+                    if first_chunk_ms is None:
+                        first_chunk_ms = (time.perf_counter() - start) * 1000
+                    await send_chunk(chunk)
+                if chunker.truncated:
+                    break
+                if response.num_bytes_downloaded >= settings.SCRAPER_MAX_BODY_BYTES:
+                    body_truncated = True
+                    break
+    except REQUEST_ERRORS as e:
+        return {"status": "error", "url": url, "error": f"{type(e).__name__}: {e}"}
+    parser.close()
+    for chunk in chunker.finish():
+        if first_chunk_ms is None:
+            first_chunk_ms = (time.perf_counter() - start) * 1000
+        await send_chunk(chunk)
+
+    page = build_page(final_url, parser)
+    page["overview"]["uuid"] = page_uuid(final_url, chunker.sha256)
+    page["overview"]["char_count"] = chunker.char_count
+    page["overview"]["char_count_formatted"] = chunker.formatted_char_count
+    page["text_data"] = None
+    page["organized_data"] = None
+    page["hashes"] = [f"sha256:{chunker.sha256}"]
+    page["text_stream"] = {
+        "chunks": chunker.chunk_count,
+        "tokens": chunker.token_count,
+        "truncated": chunker.truncated or body_truncated,
+        "first_chunk_ms": round(first_chunk_ms, 3) if first_chunk_ms is not None else None,
+        "total_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+    return page
@@ -1,7 +1,23 @@
 # src\scraper_service.py
+import asyncio
+import time
+import uuid
+
 from matrx_utils.socket.core.service_base import SocketServiceBase
 from matrx_utils.database.orm.manager import ScrapeDomainManager
 
+from core import settings
+from core.profiling import get_stack_sampler
+from core.socket.core.session_registry import get_session_registry
+from core.tasks.job_streams import JobStream
+from core.tasks.lanes import QueueFullError, get_lane_queue
+from src.scraper.archive import archive_results, get_scrape_archive
+from src.scraper.crawl import Crawler
+from src.scraper.dedup import NearDuplicateDetector, collapse_near_duplicates
+from src.scraper.incremental import CHANGED, NEW, UNCHANGED, get_incremental_scraper
+from src.scraper.pages import scrape_pages
+from src.scraper.text_stream import stream_page_text
+
 verbose = False
 
 success_search_sample = {
@@ -203,41 +219,289 @@ sample_scrape_failure = {
 
 
 class ScrapeService(SocketServiceBase):
+    # Name registered with the service factory; Settings.LONG_RUNNING_SERVICES and the task lanes use it too
+    service_name = "scraper_service_v2"
+
     _initialized = False
 
+    # Task parameters default at class level so an idle instance only stores what a task actually set;
+    # release_state() drops them again once the session goes idle.
+    keyword = None
+    max_page_read = None
+    keywords = None
+    country_code = None
+    total_results_per_keyword = None
+    search_type = None
+
+    mic_check_message = None
+    stream = None
+    urls = None
+    max_depth = None
+    max_crawl_seconds = None
+    follow_external = None
+    deadline_seconds = None
+    near_duplicates = None
+    search_results = None
+    unique_page_names = None
+    content_hashes = None
+    profile = None
+
+    # Additional parameters
+    get_content_filter_removal_details = None
+    get_links = None
+    get_main_image = None
+    get_text_data = None
+    get_organized_data = None
+    get_structured_data = None
+    get_overview = None
+    include_highlighting_markers = None
+    include_media = None
+    include_media_links = None
+    include_media_description = None
+    include_anchors = None
+    anchor_size = None
+
+    # The attributes above that a task sets; release_state() resets exactly these
+    task_fields = (
+        "keyword", "max_page_read", "keywords", "country_code", "total_results_per_keyword", "search_type",
+        "mic_check_message", "stream", "urls", "max_depth", "max_crawl_seconds", "follow_external",
+        "deadline_seconds", "near_duplicates", "search_results", "unique_page_names", "content_hashes", "profile",
+        "get_content_filter_removal_details", "get_links", "get_main_image", "get_text_data", "get_organized_data",
+        "get_structured_data", "get_overview", "include_highlighting_markers", "include_media",
+        "include_media_links", "include_media_description", "include_anchors", "anchor_size",
+    )
+
+    _active_tasks = 0
+
+    # Tasks that may run as task lane jobs: from socket events, submit_job or POST /api/v1/scrape/stream
+    streamable_tasks = ("mic_check", "quick_scrape", "incremental_scrape", "stream_scrape", "crawl", "scrape_urls",
+                        "archived_pages")
+
     def __init__(
             self,
             stream_handler=None,
+            job=None,
     ):
-        self.keyword = None
-        self.max_page_read = None
-        self.keywords = None
-        self.country_code = None
-        self.total_results_per_keyword = None
-        self.search_type = None
-
-        self.mic_check_message = None
-        self.stream = None
-        self.urls = None
         self.stream_handler = stream_handler
+        # The LaneTask this instance runs, when it was created by run_scrape_job
+        self.job = job
+        get_session_registry().attach_service(self)
 
-        # Additional parameters
-        self.get_content_filter_removal_details = None
-        self.get_links = None
-        self.get_main_image = None
-        self.get_text_data = None
-        self.get_organized_data = None
-        self.get_structured_data = None
-        self.get_overview = None
-        self.include_highlighting_markers = None
-        self.include_media = None
-        self.include_media_links = None
-        self.include_media_description = None
-        self.include_anchors = None
-        self.anchor_size = None
+    def release_state(self):
+        """Drop the task_fields back to the class defaults; refused while a task is running"""
+        if self._active_tasks:
+            return False
+        state = vars(self)
+        for name in self.task_fields:
+            state.pop(name, None)
+        return True
 
     async def process_task(self, task, task_context=None, process=True):
-        return await self.execute_task(task, task_context, process)
+        if self.job is None and self.service_name in settings.LONG_RUNNING_SERVICES and task in self.streamable_tasks:
+            # Socket events land here on the socket task queue; hand the work to the long-running lane
+            return await self._queue_job(task, task_context)
+        self._active_tasks += 1
+        try:
+            if settings.PROFILE_TASKS and (task_context or {}).get("profile"):
+                with get_stack_sampler().profile_task(f"scrape_service.{task}"):
+                    return await self.execute_task(task, task_context, process)
+            return await self.execute_task(task, task_context, process)
+        finally:
+            self._active_tasks -= 1
+
+    def _progress(self):
+        """The running job's progress dict (restored from the job store when the job is resumed), or a throwaway
+        one outside a job. Tasks list the URLs they have finished under "done" as they go."""
+        progress = self.job.progress if self.job is not None else {}
+        progress.setdefault("done", [])
+        return progress
+
+    @staticmethod
+    async def _archived_done(urls, progress):
+        """Archived results of the `urls` a resumed job already scraped"""
+        archive = get_scrape_archive()
+        done = set(progress["done"])
+        reused = {}
+        if archive is None or not done:
+            return reused
+        for url in urls:
+            if url in done:
+                result = await archive.get(url=url)
+                if result is not None:
+                    reused[url] = result
+        return reused
+
+    async def _queue_job(self, task, task_context):
+        """Run `task` as a job on the service's task lane, streaming its events to this service's stream_handler"""
+        job_id = str(uuid.uuid4())
+        # Sent before the job can start so the client has the job_id ahead of the job's own events
+        await self.stream_handler.send_status_update(status="queued", system_message=f"Queued as job {job_id}",
+                                                     user_visible_message="Waiting to start...",
+                                                     metadata={"job_id": job_id})
+        try:
+            await get_lane_queue().submit(
+                self.service_name,
+                run_scrape_job,
+                user_id=get_session_registry().identity(),
+                payload={"task": task, "task_context": task_context or {}},
+                task_id=job_id,
+                stream=JobStream(job_id, persistent=True, forward=self.stream_handler),
+            )
+        except QueueFullError as e:
+            await self.stream_handler.send_error(error_type="queue_full", message=str(e),
+                                                 user_visible_message="The server is busy, please try again shortly")
+            await self.stream_handler.send_end()
+            return None
+        return job_id
+
+    async def scrape_urls(self):
+        """Scrape self.urls (or the URLs of self.search_results) into one scraped_pages result.
+
+        Pages not finished by self.deadline_seconds (default SCRAPER_TASK_DEADLINE_SECONDS) are reported with
+        status "error" instead of holding up the rest. With near_duplicates "drop" or "group" (default
+        SCRAPER_NEAR_DUPLICATES), search results whose description matches an earlier one aren't fetched, and
+        pages whose text nearly duplicates an earlier page are dropped or listed under it as "duplicates".
+        Each page is archived as it finishes; a resumed job takes the pages it already did from the archive.
+        """
+        start = time.perf_counter()
+        progress = self._progress()
+        search_results = list(self.search_results or [])
+        urls = list(self.urls or [result["url"] for result in search_results])
+        mode = self.near_duplicates or settings.SCRAPER_NEAR_DUPLICATES
+        detector = NearDuplicateDetector() if mode else None
+        known = {}
+        if detector is not None:
+            for result in search_results:
+                original = detector.check_description(result["url"], result.get("description"))
+                if original is not None and original != result["url"]:
+                    known[result["url"]] = original
+        await self.stream_handler.send_status_update(status="processing",
+                                                     system_message=f"Scraping {len(urls) - len(known)} pages",
+                                                     user_visible_message="Reading pages...")
+        pending = [url for url in dict.fromkeys(urls) if url not in known]
+        reused = await self._archived_done(pending, progress)
+
+        async def finished(url, result):
+            await archive_results([result])
+            progress["done"].append(url)
+
+        scraped = iter(await scrape_pages([url for url in pending if url not in reused],
+                                          deadline_seconds=self.deadline_seconds, on_result=finished))
+        results = [reused[url] if url in reused else next(scraped) for url in pending]
+        metadata = {}
+        if detector is not None:
+            results, metadata["near_duplicates"] = await asyncio.to_thread(collapse_near_duplicates, results,
+                                                                           detector, mode, known)
+        await self.stream_handler.send_data({
+            "response_type": "scraped_pages",
+            "metadata": {"execution_time_ms": round((time.perf_counter() - start) * 1000), **metadata},
+            "results": results,
+        })
+        await self.stream_handler.send_end()
+
+    async def incremental_scrape(self):
+        """Re-scrape self.urls, sending each page as it completes: unchanged pages as a short notice, changed
+        pages as a diff of organized_data / links, new pages in full"""
+        scraper = get_incremental_scraper()
+        urls = list(self.urls or [])
+        progress = self._progress()
+        done = set(progress["done"])
+        counts = progress.setdefault("counts", {NEW: 0, CHANGED: 0, UNCHANGED: 0})
+        pending = [url for url in urls if url not in done]
+        await self.stream_handler.send_status_update(status="processing",
+                                                     system_message=f"Checking {len(pending)} pages for changes",
+                                                     user_visible_message="Checking pages for changes...")
+        async for result in scraper.scrape_many(pending):
+            progress["done"].append(result["url"])
+            if result["change"] in counts:
+                counts[result["change"]] += 1
+            else:
+                await self.stream_handler.send_error(error_type="scrape_error", message=result["error"],
+                                                     user_visible_message=f"Could not read {result['url']}",
+                                                     details={"url": result["url"]})
+                continue
+            await self.stream_handler.send_data({"response_type": "incremental_scrape", "result": result})
+        await self.stream_handler.send_data({"response_type": "incremental_scrape_summary", "counts": counts,
+                                             "pages": len(urls)})
+        await self.stream_handler.send_end()
+
+    async def stream_scrape(self):
+        """Scrape self.urls sending text as it is parsed: each page's text arrives through send_chunk in chunks
+        aligned to its outline headings, then the page itself (without text_data / organized_data) as data"""
+        urls = list(dict.fromkeys(self.urls or []))
+        semaphore = asyncio.Semaphore(settings.SCRAPER_CONCURRENCY_PER_TASK)
+
+        async def one(url):
+            async def send_chunk(chunk):
+                await self.stream_handler.send_chunk({"response_type": "text_chunk", "url": url, **chunk})
+
+            async with semaphore:
+                page = await stream_page_text(url, send_chunk)
+            if page["status"] == "error":
+                await self.stream_handler.send_error(error_type="scrape_error", message=page["error"],
+                                                     user_visible_message=f"Could not read {url}",
+                                                     details={"url": url})
+            else:
+                await self.stream_handler.send_data({"response_type": "streamed_page", "result": page})
+
+        await self.stream_handler.send_status_update(status="processing",
+                                                     system_message=f"Streaming text of {len(urls)} pages",
+                                                     user_visible_message="Reading pages...")
+        await asyncio.gather(*(one(url) for url in urls))
+        await self.stream_handler.send_end()
+
+    async def crawl(self):
+        """Crawl from self.urls following page links, up to self.max_page_read pages and self.max_depth links
+        deep, sending each page as it completes and a summary of the crawl at the end"""
+        crawler = Crawler()
+        seeds = list(self.urls or [])
+        progress = self._progress()
+        await self.stream_handler.send_status_update(status="processing",
+                                                     system_message=f"Crawling from {len(seeds)} URLs",
+                                                     user_visible_message="Reading pages...")
+        async for result in crawler.crawl(seeds, max_pages=self.max_page_read, max_depth=self.max_depth,
+                                          max_seconds=self.max_crawl_seconds,
+                                          follow_external=bool(self.follow_external),
+                                          resume=progress if progress["done"] else None):
+            progress.update(crawler.checkpoint())
+            if result["status"] == "skipped":
+                # Disallowed by robots.txt: nothing was fetched; crawl_summary counts these as blocked_by_robots
+                continue
+            if result["status"] == "error":
+                await self.stream_handler.send_error(error_type="scrape_error", message=result["error"],
+                                                     user_visible_message=f"Could not read {result['url']}",
+                                                     details={"url": result["url"], "depth": result["depth"]})
+            else:
+                await self.stream_handler.send_data({"response_type": "crawled_page", "depth": result["depth"],
+                                                     "result": result})
+                await archive_results([result])
+        await self.stream_handler.send_data({"response_type": "crawl_summary", **crawler.stats()})
+        await self.stream_handler.send_end()
+
+    async def archived_pages(self):
+        """Results archived by earlier tasks, looked up by self.urls, self.unique_page_names and self.content_hashes
+        (a "sha256:..." / "content:..." value from a result's hashes); lookups with no archived page are listed
+        under "missing" """
+        archive = get_scrape_archive()
+        if archive is None:
+            await self.stream_handler.send_error(error_type="archive_disabled",
+                                                 message="SCRAPER_ARCHIVE_ENABLED is off",
+                                                 user_visible_message="Archived pages are not available")
+            await self.stream_handler.send_end()
+            return
+        lookups = [("url", value) for value in self.urls or []] + \
+                  [("unique_page_name", value) for value in self.unique_page_names or []] + \
+                  [("content_hash", value) for value in self.content_hashes or []]
+        results, missing = [], []
+        for key, value in lookups:
+            result = await archive.get(**{key: value})
+            if result is None:
+                missing.append({key: value})
+            else:
+                results.append(result)
+        await self.stream_handler.send_data({"response_type": "archived_pages", "results": results,
+                                             "missing": missing})
+        await self.stream_handler.send_end()
 
     async def quick_scrape(self):
         manager = ScrapeDomainManager()
@@ -267,3 +531,12 @@ class ScrapeService(SocketServiceBase):
             await self.stream_handler.send_error(**sample_scrape_failure)
 
             await self.stream_handler.send_end()
+
+
+async def run_scrape_job(job):
+    """Task lane runner for ScrapeService jobs: job.payload is {"task": ..., "task_context": {...}}"""
+    task = job.payload.get("task")
+    if task not in ScrapeService.streamable_tasks:
+        raise ValueError(f"Unknown {ScrapeService.service_name} task '{task}'")
+    service = ScrapeService(stream_handler=job.stream, job=job)
+    return await service.process_task(task, job.payload.get("task_context"))
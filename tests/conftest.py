@@ -0,0 +1,25 @@
+# tests\conftest.py
+import socket
+
+import pytest
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def free_port():
+    """A local TCP port nothing listens on, for serving benchmarks/fixture_site.py during a test"""
+    return _free_port()
+
+
+@pytest.fixture
+def other_free_port(free_port):
+    """A second free port, for tests that serve two hosts"""
+    port = _free_port()
+    while port == free_port:
+        port = _free_port()
+    return port
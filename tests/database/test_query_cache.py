@@ -0,0 +1,53 @@
+# tests\database\test_query_cache.py
+from core.database import query_cache
+from core.database.query_cache import CompiledQueryCache, _cached_build_query
+
+
+class Model:
+    pass
+
+
+def build_query(executor):
+    """Builds SQL the way the ORM does: None is IS NULL, a list is IN with one placeholder per value"""
+    query = executor._full_query_dict
+    clauses, params = [], []
+    for field, value in query["filters"].items():
+        if value is None:
+            clauses.append(f"{field} IS NULL")
+        elif isinstance(value, list):
+            clauses.append(f"{field} IN ({', '.join('$' + str(len(params) + i + 1) for i in range(len(value)))})")
+            params.extend(value)
+        else:
+            params.append(value)
+            clauses.append(f"{field} = ${len(params)}")
+    sql = f"SELECT * FROM model WHERE {' AND '.join(clauses)}"
+    if query["limit"] is not None:
+        params.append(query["limit"])
+        sql += f" LIMIT ${len(params)}"
+    return sql, params
+
+
+class Executor:
+    build = _cached_build_query(build_query)
+
+    def __init__(self, filters, limit=None):
+        self._full_query_dict = {"model": Model, "filters": filters, "select": [], "order_by": [],
+                                 "limit": limit, "offset": None}
+
+
+def test_value_kinds_get_their_own_shapes(monkeypatch):
+    cache = CompiledQueryCache(max_size=16)
+    monkeypatch.setattr(query_cache, "_query_cache", cache)
+    queries = [
+        {"id": 1}, {"id": 2},
+        {"id": None}, {"id": None},
+        {"id": [1, 2]}, {"id": [3, 4, 5]},
+    ]
+
+    results = [Executor(filters, limit=10).build() for filters in queries]
+
+    assert results == [build_query(Executor(filters, limit=10)) for filters in queries]
+    assert len({sql for sql, _ in results}) == 4
+    # Scalar filters re-bind; IS NULL and IN lists don't map filter values to parameters, so they are not cached
+    assert (cache.hits, cache.misses, cache.uncacheable) == (1, 5, 4)
+    assert cache.stats()["top_queries"] == [{"model": "Model", "filters": ["id"], "hits": 1}]
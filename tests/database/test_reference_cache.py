@@ -0,0 +1,77 @@
+# tests\database\test_reference_cache.py
+import asyncio
+from types import SimpleNamespace
+
+from core.database import reference_cache
+from core.database.reference_cache import ReferenceTable
+
+
+class Row:
+    _meta = SimpleNamespace(primary_keys=["id"], table_name="rows")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class RowTable(ReferenceTable):
+    """Loads from a list instead of the database"""
+
+    def __init__(self, rows):
+        super().__init__(Row, ["name"])
+        self.source = rows
+
+    async def load(self):
+        self.replace_all(list(self.source))
+
+
+def test_update_in_place_moves_record_to_new_bucket():
+    record = Row(1, "Old")
+    table = RowTable([record])
+    asyncio.run(table.load())
+    cached = table.lookup({"name": "Old"})[0]
+
+    # Model.update() sets the new value on the cached object before the write hook sees it
+    cached.name = "New"
+    table.upsert(cached)
+
+    assert table.lookup({"name": "Old"}) == []
+    assert table.lookup({"name": "New"}) == [record]
+    assert table.lookup({"id": 1}) == [record]
+
+
+def test_remove_after_in_place_change_clears_old_bucket():
+    record = Row(1, "Old")
+    table = RowTable([record, Row(2, "Old")])
+    asyncio.run(table.load())
+    record.name = "Changed"
+    table.remove(record)
+
+    assert [row.id for row in table.lookup({"name": "Old"})] == [2]
+    assert table.lookup({"name": "Changed"}) == []
+    assert table.lookup({"id": 1}) == []
+
+
+def test_query_writes_reload_the_table(monkeypatch):
+    rows = [Row(1, "A"), Row(2, "B")]
+    table = RowTable(rows)
+    asyncio.run(table.load())
+    monkeypatch.setitem(reference_cache._tables, Row, table)
+
+    table.source = [Row(1, "A")]
+    asyncio.run(reference_cache._on_write(Row, "query_delete", None))
+    assert table.lookup({"name": "B"}) == []
+
+    table.source = [Row(1, "A"), Row(3, "B")]
+    asyncio.run(reference_cache._on_write(Row, "query_update", None))
+    assert [row.id for row in table.lookup({"name": "B"})] == [3]
+
+
+def test_single_writes_without_instance_are_ignored(monkeypatch):
+    table = RowTable([Row(1, "A")])
+    asyncio.run(table.load())
+    monkeypatch.setitem(reference_cache._tables, Row, table)
+
+    # update_fields returns None when the row doesn't exist
+    asyncio.run(reference_cache._on_write(Row, "update_fields", None))
+    assert table.write_updates == 0
@@ -0,0 +1,58 @@
+# tests\http\test_admin.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.v1 import endpoints
+from core import settings
+from core.http.admin import admin_key_error
+
+
+@pytest.fixture
+def api():
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    return app
+
+
+def post(app, path, headers=None):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            return await client.post(path, headers=headers)
+
+    return asyncio.run(go())
+
+
+def test_admin_is_closed_without_a_key_even_in_debug(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    monkeypatch.setattr(settings, "DEBUG", True)
+
+    assert admin_key_error(None) == "Admin endpoints are disabled"
+    assert admin_key_error("anything") == "Admin endpoints are disabled"
+
+    monkeypatch.setattr(settings, "ADMIN_OPEN_IN_DEBUG", True)
+    assert admin_key_error(None) is None
+    monkeypatch.setattr(settings, "DEBUG", False)
+    assert admin_key_error(None) == "Admin endpoints are disabled"
+
+
+def test_admin_key_has_to_match(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "s3cret")
+    monkeypatch.setattr(settings, "ADMIN_OPEN_IN_DEBUG", True)
+
+    assert admin_key_error("s3cret") is None
+    for key in (None, "", "s3cre", "s3cret ", "S3CRET", "ключ"):
+        assert admin_key_error(key) == "Invalid admin key"
+
+
+def test_drain_endpoint_refuses_default_settings(api, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    monkeypatch.setattr(settings, "DEBUG", True)
+
+    response = post(api, "/admin/drain")
+
+    assert response.status_code == 403
+    assert endpoints.get_drain_controller().accepting
@@ -0,0 +1,62 @@
+# tests\http\test_profiling.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.v1 import endpoints
+from core import settings
+from core.http.profiling import ProfileMiddleware
+from core.profiling import StackSampler
+
+
+@pytest.fixture
+def profiled(monkeypatch):
+    """The v1 router behind ProfileMiddleware with its own sampler; admin settings left at their defaults"""
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    monkeypatch.setattr(settings, "ADMIN_OPEN_IN_DEBUG", False)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    app = FastAPI()
+    app.include_router(endpoints.router)
+
+    @app.get("/work")
+    async def work():
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    sampler = StackSampler()
+    return ProfileMiddleware(app, sampler), sampler
+
+
+def request(app, method, path, headers=None):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            return await client.request(method, path, headers=headers)
+
+    return asyncio.run(go())
+
+
+def test_profile_header_needs_an_admin_key(profiled, monkeypatch):
+    app, sampler = profiled
+
+    response = request(app, "GET", "/work", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert not sampler.finished
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "s3cret")
+    response = request(app, "GET", "/work", headers={"X-Profile": "1", "X-Admin-Key": "nope"})
+    assert "x-profile-id" not in response.headers
+    response = request(app, "GET", "/work", headers={"X-Profile": "1", "X-Admin-Key": "s3cret"})
+    assert sampler.get(int(response.headers["x-profile-id"])).label == "GET /work"
+
+
+def test_profile_endpoints_refuse_default_settings(profiled):
+    app, _ = profiled
+
+    for method, path in (("POST", "/admin/profile/start?seconds=1"), ("GET", "/admin/profile/capture?seconds=1"),
+                         ("GET", "/admin/profile/collapsed"), ("GET", "/admin/profile")):
+        assert request(app, method, path).status_code == 403
+    assert endpoints.get_stack_sampler().latest() is None
@@ -0,0 +1,88 @@
+# tests\http\test_response_cache.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.api.v1 import endpoints
+from core import settings
+from core.http import response_cache
+from core.http.response_cache import ResponseCache, cache_response
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(response_cache, "_response_cache", ResponseCache())
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/links")
+    @cache_response(ttl=60)
+    async def links():
+        app.state.calls += 1
+        response = Response(b"linked", media_type="text/plain")
+        response.headers.append("link", "</a.css>; rel=preload")
+        response.headers.append("link", "</b.js>; rel=preload")
+        return response
+
+    @app.get("/login")
+    @cache_response(ttl=60)
+    async def login():
+        app.state.calls += 1
+        response = Response(b"welcome", media_type="text/plain")
+        response.set_cookie("session", f"token-{app.state.calls}")
+        return response
+
+    return app
+
+
+def get_twice(app, path):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            return await client.get(path), await client.get(path)
+
+    return asyncio.run(go())
+
+
+def test_repeated_headers_survive_the_cache(app):
+    first, second = get_twice(app, "/links")
+
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert second.headers.get_list("link") == ["</a.css>; rel=preload", "</b.js>; rel=preload"]
+    assert second.headers["content-type"] == first.headers["content-type"]
+    assert second.content == b"linked"
+    assert app.state.calls == 1
+
+
+def test_responses_setting_cookies_are_not_cached(app):
+    first, second = get_twice(app, "/login")
+
+    assert "x-cache" not in second.headers
+    assert first.cookies["session"] == "token-1"
+    assert second.cookies["session"] == "token-2"
+    assert app.state.calls == 2
+
+
+def test_invalidate_endpoint_needs_an_admin_key(app, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    app.include_router(endpoints.router)
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            await client.get("/links")
+            refused = await client.post("/admin/response-cache/invalidate")
+            still_cached = await client.get("/links")
+            monkeypatch.setattr(settings, "ADMIN_API_KEY", "s3cret")
+            allowed = await client.post("/admin/response-cache/invalidate", headers={"X-Admin-Key": "s3cret"})
+            return refused, still_cached, allowed
+
+    refused, still_cached, allowed = asyncio.run(go())
+
+    assert refused.status_code == 403
+    assert still_cached.headers["x-cache"] == "HIT"
+    assert allowed.json() == {"dropped": 1}
@@ -0,0 +1,50 @@
+# tests\http\test_static_files.py
+import asyncio
+import gzip
+import threading
+
+import httpx
+
+from core.http.static_files import StaticFiles
+
+
+def request(app, path, headers=None):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://static") as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(go())
+
+
+def test_not_modified_keeps_vary_for_precompressed_files(tmp_path):
+    (tmp_path / "app.js").write_bytes(b"console.log('hi');" * 50)
+    (tmp_path / "app.js.gz").write_bytes(gzip.compress((tmp_path / "app.js").read_bytes()))
+    app = StaticFiles(tmp_path)
+
+    first = request(app, "/app.js", {"accept-encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["vary"] == "Accept-Encoding"
+
+    again = request(app, "/app.js", {"accept-encoding": "gzip", "if-none-match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["vary"] == "Accept-Encoding"
+    assert again.headers["etag"] == first.headers["etag"]
+
+
+def test_cache_miss_reads_file_off_the_event_loop(tmp_path, monkeypatch):
+    (tmp_path / "index.html").write_bytes(b"<p>hello</p>")
+    app = StaticFiles(tmp_path)
+    readers = []
+    build_entry = app._build_entry
+
+    def recording_build(*args):
+        readers.append(threading.current_thread() is threading.main_thread())
+        return build_entry(*args)
+
+    monkeypatch.setattr(app, "_build_entry", recording_build)
+    assert request(app, "/index.html").content == b"<p>hello</p>"
+    assert request(app, "/index.html").content == b"<p>hello</p>"
+
+    assert readers == [False]
+    assert app.metrics.cache_hits == 1
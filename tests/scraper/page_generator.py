@@ -0,0 +1,129 @@
+# tests\scraper\page_generator.py
+from html import escape
+
+# Random pages for tests/scraper/test_parser.py (headings, inline markup and entities, nested lists, tables, loose
+# text, scripts, elements the test's content filter removes, non-ASCII text); benchmarks/streaming_parse.py serves
+# them too.
+
+WORDS = ("alpha", "beta", "gamma", "delta", "naïve", "café", "smörgåsbord", "中文", "テスト", "🚀", "data",
+         "stream", "token", "parser", "heading", "list", "O'Brien", "x < y", "a & b", "\"quoted\"", "—", "€5")
+
+
+class PageGenerator:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def words(self, low=2, high=9):
+        return " ".join(escape(self.rng.choice(WORDS), quote=False) for _ in range(self.rng.randint(low, high)))
+
+    def href(self):
+        return self.rng.choice(("/docs/a", "b/c?x=1", "https://other.example/p", "#section", "", "mailto:a@b.example",
+                                "../up", "javascript:void(0)", "  /spaced  "))
+
+    def inline(self, depth=0):
+        parts = []
+        for _ in range(self.rng.randint(1, 4)):
+            roll = self.rng.random()
+            if roll < 0.45 or depth > 1:
+                parts.append(self.words())
+            elif roll < 0.6:
+                parts.append(f"<a href=\"{escape(self.href())}\">{self.inline(depth + 1)}</a>")
+            elif roll < 0.7:
+                parts.append(f"<a>{self.words(1, 3)}</a>")
+            elif roll < 0.8:
+                parts.append(f"<b>{self.inline(depth + 1)}</b>")
+            elif roll < 0.86:
+                parts.append("<br>")
+            elif roll < 0.92:
+                parts.append("&amp; &lt;tag&gt; &eacute;&#8212;&#x1F600; &nbsp;")
+            else:
+                parts.append(f"<span class=\"ad-inline\">{self.words()}</span>")
+        return self.rng.choice(("", " ", "\n  ")).join(parts)
+
+    def list_(self, depth=0):
+        tag = self.rng.choice(("ul", "ol"))
+        items = []
+        for _ in range(self.rng.randint(0, 5)):
+            roll = self.rng.random()
+            if roll < 0.1:
+                items.append("<li></li>")
+            elif roll < 0.2:
+                items.append(f"<li><p>{self.inline()}</p> {self.words()}</li>")
+            elif roll < 0.35 and depth < 3:
+                items.append(f"<li>{self.inline()}\n{self.list_(depth + 1)}{self.rng.choice(('', self.words()))}</li>")
+            elif roll < 0.4:
+                items.append(f"<li class=\"ad-item\">{self.words()}</li>")
+            else:
+                items.append(f"<li>{self.inline()}</li>")
+        stray = f"{self.words()}" if self.rng.random() < 0.1 else ""
+        return f"<{tag}>{stray}\n" + "\n".join(items) + f"\n</{tag}>"
+
+    def table(self):
+        rows = []
+        for _ in range(self.rng.randint(1, 4)):
+            cells = []
+            for _ in range(self.rng.randint(1, 3)):
+                inner = self.table() if self.rng.random() < 0.05 else self.inline()
+                tag = self.rng.choice(("td", "th"))
+                cells.append(f"<{tag}>{inner}</{tag}>")
+            rows.append("<tr>" + "".join(cells) + "</tr>")
+        return "<table>" + "".join(rows) + "</table>"
+
+    def block(self):
+        roll = self.rng.random()
+        if roll < 0.3:
+            return f"<p>{self.inline()}</p>"
+        if roll < 0.5:
+            return self.list_()
+        if roll < 0.58:
+            return self.table()
+        if roll < 0.68:
+            return f"<div>{self.words()} <span>{self.words()}</span><div>{self.words()}</div>{self.words()}</div>"
+        if roll < 0.72:
+            return f"<blockquote>{self.inline()}</blockquote>"
+        if roll < 0.75:
+            return f"<pre>  {self.words()}\n  {self.words()}</pre>"
+        if roll < 0.8:
+            return f"<div class=\"ad-banner\"><p>{self.words()}</p>{self.list_()}</div>"
+        if roll < 0.84:
+            return f"<script>var s = '<ul><li>{self.words()}</li></ul>';</script>"
+        if roll < 0.87:
+            return "<hr>"
+        if roll < 0.9:
+            return f"<dl><dt>{self.words()}</dt><dd>{self.inline()}</dd></dl>"
+        return f"<section>{self.words()}</section>"
+
+    def page(self, sections):
+        body = []
+        for _ in range(sections):
+            roll = self.rng.random()
+            if roll < 0.7:
+                level = self.rng.randint(1, 4)
+                heading = self.words(1, 4) if self.rng.random() < 0.95 else " "
+                body.append(f"<h{level}>{heading}</h{level}>")
+            body.extend(self.block() for _ in range(self.rng.randint(1, 6)))
+        return (f"<!doctype html><html><head><title>{self.words()}</title><meta charset=\"utf-8\">"
+                f"<style>p > b {{ color: red; }}</style></head><body>{self.words()}\n" + "\n".join(body) +
+                "</body></html>")
+
+
+# ---- helpers -----------------------------------------------------------------------------------------
+
+def first_difference(expected, actual, path=""):
+    if type(expected) is not type(actual):
+        return f"{path}: {expected!r:.200} != {actual!r:.200}"
+    if isinstance(expected, dict):
+        for key in list(expected) + [key for key in actual if key not in expected]:
+            if key not in expected or key not in actual:
+                return f"{path}/{key}: only in {'reference' if key in expected else 'stream'}"
+            difference = first_difference(expected[key], actual[key], f"{path}/{key}")
+            if difference:
+                return difference
+        return None
+    if isinstance(expected, list):
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            difference = first_difference(left, right, f"{path}[{index}]")
+            if difference:
+                return difference
+        return f"{path}: {len(expected)} != {len(actual)} entries" if len(expected) != len(actual) else None
+    return None if expected == actual else f"{path}: {expected!r:.200} != {actual!r:.200}"
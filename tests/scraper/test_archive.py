@@ -0,0 +1,101 @@
+# tests\scraper\test_archive.py
+import asyncio
+import hashlib
+import multiprocessing
+import os
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.v1 import endpoints
+from core import settings
+from src.scraper import archive
+from src.scraper.archive import ScrapeArchive
+
+SEGMENT_BYTES = 64 * 1024
+BATCHES = 30
+BATCH = 10
+
+
+def make_result(writer, i):
+    # Hex of random bytes barely compresses, so the writers fill and seal segments between them
+    text = os.urandom(600).hex()
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    return {
+        "status": "success",
+        "url": f"https://writer-{writer}.example/page/{i}",
+        "overview": {"unique_page_name": f"writer-{writer}-page-{i}"},
+        "hashes": [f"sha256:{digest}", f"content:{digest[:32]}"],
+        "text_data": text,
+    }
+
+
+def write_results(path, writer, both_writing, expected):
+    async def main():
+        archive = ScrapeArchive(path, segment_bytes=SEGMENT_BYTES)
+        for first in range(0, BATCHES * BATCH, BATCH):
+            batch = [make_result(writer, i) for i in range(first, first + BATCH)]
+            await archive.archive(batch)
+            expected.update({result["url"]: result for result in batch})
+            if first == 0:
+                # The rest of the batches go in while the other process appends too
+                both_writing.wait(30)
+        await archive.close()
+
+    asyncio.run(main())
+
+
+def test_two_writer_processes_share_an_archive(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        expected = manager.dict()
+        both_writing = context.Barrier(2)
+        writers = [context.Process(target=write_results, args=(tmp_path, writer, both_writing, expected))
+                   for writer in range(2)]
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join(60)
+            assert process.exitcode == 0
+        expected = dict(expected)
+
+    async def read_back():
+        archive = ScrapeArchive(tmp_path, segment_bytes=SEGMENT_BYTES)
+        found = {url: await archive.get(url=url) for url in expected}
+        stats = await archive.stats()
+        await archive.close()
+        return found, stats
+
+    found, stats = asyncio.run(read_back())
+
+    assert len(expected) == 2 * BATCHES * BATCH
+    assert [url for url, result in found.items() if result != expected[url]] == []
+    assert stats["records"] == len(expected)
+    assert stats["segments"] > 2
+
+
+def test_compact_endpoint_needs_an_admin_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    monkeypatch.setattr(archive, "_archive", None)
+    monkeypatch.setattr(settings, "SCRAPER_ARCHIVE_PATH", tmp_path)
+    app = FastAPI()
+    app.include_router(endpoints.router)
+
+    async def compact(headers=None):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            return await client.post("/admin/archive/compact", headers=headers)
+
+    async def scenario():
+        refused = await compact()
+        monkeypatch.setattr(settings, "ADMIN_API_KEY", "s3cret")
+        wrong, allowed = await compact({"X-Admin-Key": "nope"}), await compact({"X-Admin-Key": "s3cret"})
+        await archive.close_scrape_archive()
+        return refused, wrong, allowed
+
+    refused, wrong, allowed = asyncio.run(scenario())
+
+    assert (refused.status_code, wrong.status_code) == (403, 403)
+    assert allowed.status_code == 200
+    assert allowed.json()["reclaimed_bytes"] == 0
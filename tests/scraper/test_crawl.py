@@ -0,0 +1,98 @@
+# tests\scraper\test_crawl.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fixture_site import FixtureSite, serve_fixture_site
+from core import settings
+from src.scraper import archive, crawl, fetcher
+from src.scraper.parser import PageStream
+from src.scraper_service import run_scrape_job
+
+ROBOTS = "User-agent: *\nDisallow: /page/3\n"
+
+
+class EventLog:
+    """stream_handler keeping (type, data) for every event a task sends"""
+
+    def __init__(self):
+        self.events = []
+
+    async def send_status_update(self, status, system_message=None, user_visible_message=None, metadata=None):
+        self.events.append(("status_update", status))
+
+    async def send_data(self, data):
+        self.events.append(("data", data))
+
+    async def send_error(self, error_type=None, message=None, user_visible_message=None, details=None, **kwargs):
+        self.events.append(("error", {"message": message, **details}))
+
+    async def send_end(self):
+        self.events.append(("end", None))
+
+    def data(self, response_type):
+        return [data for kind, data in self.events if kind == "data" and data["response_type"] == response_type]
+
+
+@pytest.fixture(autouse=True)
+def task_singletons(monkeypatch):
+    """No archive writes, and a fetcher whose client belongs to the test's event loop"""
+    monkeypatch.setattr(settings, "SCRAPER_ARCHIVE_ENABLED", False)
+    monkeypatch.setattr(archive, "_archive", None)
+    monkeypatch.setattr(fetcher, "_fetcher", None)
+
+
+def run_crawl(site, port, **task_context):
+    async def scenario():
+        async with serve_fixture_site(site, port) as base:
+            job = SimpleNamespace(
+                payload={"task": "crawl", "task_context": {"urls": [f"{base}/page/0"], **task_context}},
+                progress={},
+                stream=EventLog(),
+            )
+            await run_scrape_job(job)
+            await fetcher.get_fetcher().close()
+            return base, job.stream
+
+    return asyncio.run(scenario())
+
+
+def test_crawl_task_over_fixture_site(free_port):
+    site = FixtureSite(pages=10, paragraphs=3, robots=ROBOTS)
+    base, log = run_crawl(site, free_port, max_depth=5)
+
+    crawled = {page["result"]["crawl_url"]: page for page in log.data("crawled_page")}
+    assert set(crawled) == {f"{base}/page/{page}" for page in range(10) if page != 3}
+    assert all(page["result"]["status"] == "success" for page in crawled.values())
+    assert crawled[f"{base}/page/0"]["depth"] == 0
+    assert crawled[f"{base}/page/1"]["depth"] == 1
+    assert 3 not in site.page_requests
+    assert site.robots_requests == 1
+
+    (summary,) = log.data("crawl_summary")
+    assert summary["pages"] == 9
+    assert summary["blocked_by_robots"] == 1
+    assert summary["stop_reason"] == crawl.STOP_EXHAUSTED
+    # The site's home link is a 404; it is reported as an error, not as a crawled page
+    assert [data["url"] for kind, data in log.events if kind == "error"] == [f"{base}/"]
+    assert log.events[-1] == ("end", None)
+
+
+def test_page_that_fails_to_parse_does_not_end_the_crawl(free_port, monkeypatch):
+    class FailingPageStream(PageStream):
+        async def finish(self):
+            if self.url.endswith("/page/2"):
+                raise ValueError("parser exploded")
+            return await super().finish()
+
+    monkeypatch.setattr(crawl, "PageStream", FailingPageStream)
+    site = FixtureSite(pages=6, paragraphs=3)
+    base, log = run_crawl(site, free_port, max_depth=5)
+
+    crawled = {page["result"]["crawl_url"] for page in log.data("crawled_page")}
+    assert crawled == {f"{base}/page/{page}" for page in range(6) if page != 2}
+    errors = {data["url"]: data["message"] for kind, data in log.events if kind == "error"}
+    assert errors[f"{base}/page/2"] == "ValueError: parser exploded"
+    (summary,) = log.data("crawl_summary")
+    assert summary["failed"] == 2
@@ -0,0 +1,97 @@
+# tests\scraper\test_hedging.py
+import asyncio
+import contextlib
+import random
+import time
+
+from benchmarks.fixture_site import serve_fixture_site
+from benchmarks.tail_latency import LatencySite
+from core import settings
+from src.scraper.fetcher import Fetcher
+from src.scraper.hedging import HedgedFetcher
+from src.scraper.pages import scrape_pages
+
+
+class SlowShareSite:
+    """Answers in `fast_ms`, except a `slow_rate` share of requests that take `slow_ms`"""
+
+    def __init__(self, fast_ms=2, slow_ms=80, slow_rate=0.3, seed=0):
+        self.fast = fast_ms / 1000
+        self.slow = slow_ms / 1000
+        self.slow_rate = slow_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        await asyncio.sleep(self.slow if self.rng.random() < self.slow_rate else self.fast)
+        body = f"<html><head><title>{scope['path']}</title></head><body><p>{scope['path']}</p></body></html>".encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def test_hung_host_is_an_error_by_the_deadline(free_port, other_free_port):
+    async def scenario():
+        async with contextlib.AsyncExitStack() as stack:
+            healthy = await stack.enter_async_context(serve_fixture_site(LatencySite(5, 0, 0), free_port))
+            hung = await stack.enter_async_context(serve_fixture_site(LatencySite(0, 0, 0, hung=True), other_free_port))
+            plain = Fetcher()
+            urls = [f"{healthy}/page/{i}" for i in range(5)] + [f"{hung}/page/0"]
+            start = time.monotonic()
+            results = await scrape_pages(urls, deadline_seconds=1.0, fetcher=HedgedFetcher(plain))
+            elapsed = time.monotonic() - start
+            await plain.close()
+            return results, elapsed
+
+    results, elapsed = asyncio.run(scenario())
+
+    assert elapsed < 2.0
+    assert [result["status"] for result in results] == ["success"] * 5 + ["error"]
+    assert "deadline" in results[-1]["error"]
+    assert results[-1]["url"].endswith("/page/0")
+
+
+def test_hung_host_times_out_before_the_deadline(free_port, monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_TIMEOUT_SECONDS", 0.5)
+
+    async def scenario():
+        async with serve_fixture_site(LatencySite(0, 0, 0, hung=True), free_port) as hung:
+            plain = Fetcher()
+            hedged = HedgedFetcher(plain)
+            results = await scrape_pages([f"{hung}/page/0"], deadline_seconds=5.0, fetcher=hedged)
+            await plain.close()
+            return results, hedged.stats()
+
+    results, stats = asyncio.run(scenario())
+
+    assert results[0]["status"] == "error"
+    assert results[0]["error"].startswith("Timeout")
+    assert stats["timeouts"] == 1
+
+
+def test_hedges_stay_within_budget(free_port, monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_LATENCY_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "SCRAPER_HEDGE_PERCENTILE", 0.5)
+    monkeypatch.setattr(settings, "SCRAPER_HEDGE_MIN_DELAY_MS", 20.0)
+    monkeypatch.setattr(settings, "SCRAPER_HEDGE_BUDGET", 0.1)
+    monkeypatch.setattr(settings, "SCRAPER_HEDGE_BURST", 2)
+    site = SlowShareSite()
+
+    async def scenario():
+        async with serve_fixture_site(site, free_port) as base:
+            plain = Fetcher()
+            hedged = HedgedFetcher(plain)
+            results = [await hedged.fetch(f"{base}/page/{i}") for i in range(80)]
+            await plain.close()
+            return results, hedged.stats()
+
+    results, stats = asyncio.run(scenario())
+
+    assert all(result.ok for result in results)
+    # About a third of the requests run past the hedge delay; the budget allows 0.1 * 80 + 2 hedges
+    assert stats["requests"] == 80
+    assert 0 < stats["hedges"] <= 0.1 * 80 + 2
+    assert site.requests <= stats["requests"] + stats["hedges"] + stats["retries"]
@@ -0,0 +1,70 @@
+# tests\scraper\test_incremental.py
+import asyncio
+
+from benchmarks.fixture_site import FixtureSite, serve_fixture_site
+from src.scraper.fetcher import Fetcher
+from src.scraper.incremental import CHANGED, FAILED, NEW, NOT_MODIFIED, SAME_BODY, SAME_CONTENT, UNCHANGED, \
+    IncrementalScraper, ScrapeStateStore
+from src.scraper.text_stream import stream_page_text
+
+EXPECTED_REASON = {"static": NOT_MODIFIED, "plain": SAME_BODY, "noisy": SAME_CONTENT}
+
+
+def scrape_rounds(site, port, state_path, rounds, extra_urls=()):
+    """Results by URL for a first scrape of every page and for `rounds` more after site.advance()"""
+
+    async def scenario():
+        async with serve_fixture_site(site, port) as base:
+            scraper = IncrementalScraper(Fetcher(), ScrapeStateStore(state_path))
+            urls = site.urls(base) + list(extra_urls)
+            all_results = []
+            for round_number in range(rounds + 1):
+                if round_number:
+                    site.advance()
+                all_results.append({result["url"]: result async for result in scraper.scrape_many(urls)})
+            await scraper.store.close()
+            return base, all_results
+
+    return asyncio.run(scenario())
+
+
+def test_rescrape_of_mutating_site_classifies_every_page(free_port, tmp_path):
+    site = FixtureSite(pages=8, paragraphs=3)
+    base, (first, *later) = scrape_rounds(site, free_port, tmp_path / "state.sqlite3", rounds=2)
+
+    assert {result["change"] for result in first.values()} == {NEW}
+    for round_number, results in enumerate(later, start=1):
+        for page, url in enumerate(site.urls(base)):
+            result = results[url]
+            kind = site.kind(page)
+            if kind in EXPECTED_REASON:
+                assert (result["change"], result["reason"]) == (UNCHANGED, EXPECTED_REASON[kind]), url
+                continue
+            assert result["change"] == CHANGED, url
+            assert result["diff"] == {
+                "organized_data": {"added": {"H2: Updates": [f"Update {round_number} for page {page}, details."]},
+                                   "removed": {}},
+                "links": {"added": {"internal": [f"{base}/updates/{page}/{round_number}"]}, "removed": {}},
+            }
+    # Static and mutating pages answer conditional requests; only changed pages are downloaded in full again
+    assert site.not_modified == 2 * 2
+
+
+def test_invalid_url_fails_one_page_not_the_batch(free_port, tmp_path):
+    site = FixtureSite(pages=4, paragraphs=2)
+    bad_url = "http://127.0.0.1/page\x01"
+    _, (results,) = scrape_rounds(site, free_port, tmp_path / "state.sqlite3", rounds=0, extra_urls=[bad_url])
+
+    assert results[bad_url]["change"] == FAILED
+    assert results[bad_url]["error"].startswith("InvalidURL")
+    assert sorted(result["change"] for url, result in results.items() if url != bad_url) == [NEW] * 4
+
+
+def test_stream_page_text_reports_invalid_url():
+    async def send_chunk(chunk):
+        raise AssertionError("no text expected")
+
+    page = asyncio.run(stream_page_text("http://127.0.0.1/page\x01", send_chunk, fetcher=Fetcher()))
+
+    assert page["status"] == "error"
+    assert page["error"].startswith("InvalidURL")
@@ -0,0 +1,383 @@
+# tests\scraper\test_parser.py
+import asyncio
+import random
+import re
+import uuid
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+import pytest
+
+from src.scraper.content_filter import ContentFilter
+from src.scraper.parser import PageStream, parse_page
+from src.scraper_service import sample_successful_scrapes
+from tests.scraper.page_generator import PageGenerator, first_difference
+
+# Generated pages (headings, paragraphs with inline markup and entities, nested ul/ol with links and line breaks,
+# tables, loose text in divs, scripts, elements the content filter removes, non-ASCII text) are parsed three ways:
+#   - a DOM reference below: the whole document built into a tree first, then outline, organized_data and
+#     structured_data read off the tree with the rules spelled out here (what a tree-based extractor would produce);
+#   - parse_page() on the whole document;
+#   - PageStream fed the UTF-8 bytes in pieces cut at random points, including inside multi-byte characters.
+
+URL = "https://pages.example/docs/guide"
+FILTER_RULES = [{"attribute": "class", "match_type": "partial", "trigger_value": "ad-"}]
+PAGES = 60
+SECTIONS = 12
+SPLITS = 60
+
+# The reference's own copy of the extraction rules, so a changed rule in the parser shows up as a failure here
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+BLOCKS = {"p", "li", "blockquote", "pre", "td", "th", "dt", "dd", "figcaption", "caption"}
+BLOCK_LEVEL = BLOCKS | HEADINGS | {"div", "section", "article", "main", "header", "footer", "nav", "aside", "body",
+                                   "form", "table", "tr", "ul", "ol", "dl", "figure", "hr", "br"}
+SKIPPED = {"script", "style", "noscript", "template", "svg", "head"}
+VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+UNASSOCIATED = "unassociated"
+LIST_CATEGORIES = {"ol": "Ordered Lists", "ul": "Unordered Lists"}
+
+
+def clean(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TreeBuilder(HTMLParser):
+    """Whole document as nested dicts; generated pages close every element, so no implied end tags"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = {"tag": "#root", "attrs": {}, "children": []}
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = {"tag": tag, "attrs": dict(attrs), "children": []}
+        self.stack[-1]["children"].append(node)
+        if tag not in VOID:
+            self.stack.append(node)
+
+    def handle_endtag(self, tag):
+        if tag in VOID:
+            return
+        for index in range(len(self.stack) - 1, 0, -1):
+            if self.stack[index]["tag"] == tag:
+                del self.stack[index:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1]["children"].append(data)
+
+
+class DomExtractor:
+    """outline, organized_data and structured_data read off a built tree.
+
+    Every element and text node gets a position in document order; blocks and lists remember where they start
+    and end, and a list's heading, Before and After are looked up from those positions afterwards.
+    """
+
+    def __init__(self, url, content_filter):
+        self.url = url
+        self.content_filter = content_filter
+        self.position = 0
+        self.blocks = []
+        self.lists = []
+        self.loose = None
+        self.title = ""
+
+    def find_title(self, node):
+        for child in node["children"]:
+            if isinstance(child, str):
+                continue
+            if child["tag"] == "title":
+                return "".join(text for text in child["children"] if isinstance(text, str))
+            title = self.find_title(child)
+            if title is not None:
+                return title
+        return None
+
+    def hidden(self, node):
+        if node["tag"] in SKIPPED or node["tag"] in ("meta", "link"):
+            return True
+        return self.content_filter.match(node["tag"], node["attrs"]) is not None
+
+    def tick(self):
+        self.position += 1
+        return self.position
+
+    def end_loose(self):
+        if self.loose is not None:
+            self.blocks.append({"kind": "block", "start": self.loose["start"], "end": self.tick(),
+                                "text": clean("".join(self.loose["parts"]))})
+            self.loose = None
+
+    def text(self, node):
+        parts = []
+        for child in node["children"]:
+            if isinstance(child, str):
+                parts.append(child)
+            elif child["tag"] == "br":
+                parts.append(" ")
+            elif not self.hidden(child):
+                parts.append(self.text(child))
+        return "".join(parts)
+
+    def item_text(self, node):
+        parts = []
+        for child in node["children"]:
+            if isinstance(child, str):
+                parts.append(child)
+            elif child["tag"] == "br":
+                parts.append(" ")
+            elif self.hidden(child):
+                continue
+            elif child["tag"] in LIST_CATEGORIES:
+                parts.append("  ")
+            elif child["tag"] == "a" and (child["attrs"].get("href") or "").strip()[:1] not in ("", "#"):
+                raw = self.item_text(child)
+                absolute = urljoin(self.url, child["attrs"]["href"].strip())
+                if clean(raw) and urlsplit(absolute).scheme in ("http", "https"):
+                    lead, trail = (" " if raw[:1].isspace() else ""), (" " if raw[-1:].isspace() else "")
+                    raw = f"{lead}[{clean(raw)}]({absolute}){trail}"
+                parts.append(raw)
+            else:
+                parts.append(self.item_text(child))
+        return "".join(parts)
+
+    def items(self, node):
+        """Items of the list `node`: li elements whose closest list is this one"""
+        found = []
+        for child in node["children"]:
+            if isinstance(child, str) or self.hidden(child) or child["tag"] in LIST_CATEGORIES:
+                continue
+            if child["tag"] == "li":
+                found.append(clean(self.item_text(child)))
+            else:
+                found.extend(self.items(child))
+        return [item for item in found if item]
+
+    def walk(self, node, in_block=False):
+        for child in node["children"]:
+            if isinstance(child, str):
+                self.tick()
+                if not in_block:
+                    if self.loose is None and child.strip():
+                        self.loose = {"start": self.position, "parts": []}
+                    if self.loose is not None:
+                        self.loose["parts"].append(child)
+                continue
+            if self.hidden(child):
+                continue
+            tag = child["tag"]
+            if tag in BLOCK_LEVEL:
+                self.end_loose()
+            start = self.tick()
+            record = None
+            if tag in LIST_CATEGORIES:
+                record = {"tag": tag, "start": start, "items": self.items(child)}
+                self.lists.append(record)
+            block = not in_block and (tag in HEADINGS or tag in BLOCKS)
+            self.walk(child, in_block or block)
+            end = self.tick()
+            if record is not None:
+                record["end"] = end
+            if block:
+                self.blocks.append({"kind": "heading" if tag in HEADINGS else "block", "start": start, "end": end,
+                                    "text": clean(self.text(child)),
+                                    "heading": f"{tag.upper()}: {clean(self.text(child))}"})
+            if tag in BLOCK_LEVEL and tag not in VOID:
+                self.end_loose()
+
+    def extract(self, html):
+        builder = TreeBuilder()
+        builder.feed(html)
+        builder.close()
+        self.title = self.find_title(builder.root) or ""
+        self.walk(builder.root)
+        self.end_loose()
+        blocks = sorted((block for block in self.blocks if block["text"]), key=lambda block: block["end"])
+
+        organized = {UNASSOCIATED: []}
+        outline = {}
+        heading = UNASSOCIATED
+        for block in blocks:
+            if block["kind"] == "heading":
+                heading = block["heading"]
+                organized.setdefault(heading, [])
+                outline.setdefault(heading, [])
+            else:
+                organized[heading].append(block["text"])
+
+        structured = {}
+        for record in sorted(self.lists, key=lambda record: record["start"]):
+            if not record["items"]:
+                continue
+            heading, before = UNASSOCIATED, ""
+            for block in blocks:
+                if block["end"] > record["start"]:
+                    break
+                if block["kind"] == "heading":
+                    heading, before = block["heading"], ""
+                else:
+                    before = block["text"]
+            after = ""
+            for block in blocks:
+                if block["end"] < record["end"]:
+                    continue
+                if block["kind"] == "heading":
+                    break
+                if block["start"] > record["end"]:
+                    after = block["text"]
+                    break
+            entries = structured.setdefault(LIST_CATEGORIES[record["tag"]], {}).setdefault(heading, [])
+            entries.append({"Before": before, "List": record["items"], "After": after})
+
+        outline[UNASSOCIATED] = []
+        return {"title": clean(self.title), "outline": outline, "structured_data": structured,
+                "organized_data": {heading: texts for heading, texts in organized.items() if texts}}
+
+
+def sections(page):
+    return {"title": page["overview"]["page_title"], "outline": page["overview"]["outline"],
+            "structured_data": page["structured_data"], "organized_data": page["organized_data"]}
+
+
+async def stream_bytes(data, splits, content_filter):
+    stream = PageStream(URL, "utf-8", content_filter=content_filter)
+    previous = 0
+    for cut in splits + [len(data)]:
+        await stream.feed(data[previous:cut])
+        previous = cut
+    return await stream.finish()
+
+
+def generated_pages(seed):
+    rng = random.Random(seed)
+    generator = PageGenerator(rng)
+    return [generator.page(rng.randint(1, SECTIONS)) for _ in range(PAGES)]
+
+
+@pytest.mark.parametrize("seed", [7, 8, 9])
+def test_parse_page_matches_dom_reference(seed):
+    content_filter = ContentFilter(FILTER_RULES)
+    failures = []
+    lists = 0
+    for index, html in enumerate(generated_pages(seed)):
+        expected = DomExtractor(URL, content_filter).extract(html)
+        lists += sum(len(entries) for category in expected["structured_data"].values() for entries in category.values())
+        difference = first_difference(expected, sections(parse_page(URL, html, content_filter=content_filter)))
+        if difference:
+            failures.append(f"page {index}: DOM reference vs parse_page at {difference}")
+
+    assert lists > PAGES
+    assert failures == []
+
+
+@pytest.mark.parametrize("seed", [7, 8, 9])
+def test_streamed_pieces_match_parse_page(seed):
+    content_filter = ContentFilter(FILTER_RULES)
+    rng = random.Random(seed)
+    failures = []
+    for index, html in enumerate(generated_pages(seed)):
+        whole = parse_page(URL, html, content_filter=content_filter)
+        data = html.encode()
+        splits = sorted(rng.sample(range(1, len(data)), min(len(data) - 1, rng.randint(1, SPLITS))))
+        streamed = asyncio.run(stream_bytes(data, splits, content_filter))
+        if streamed != whole:
+            failures.append(f"page {index}: streamed ({len(splits) + 1} pieces) vs parse_page at "
+                            f"{first_difference(whole, streamed)}")
+
+    assert failures == []
+
+
+def key_paths(value, path=""):
+    """Every dict key path in `value`, with the keys of free-form dicts (outline, organized_data...) left out"""
+    if not isinstance(value, dict):
+        return set()
+    paths = set()
+    for key, child in value.items():
+        paths.add(f"{path}/{key}")
+        if key in FIXED_KEY_DICTS:
+            paths |= key_paths(child, f"{path}/{key}")
+    return paths
+
+
+# Dicts whose keys are part of the result shape; the others are keyed by heading, meta name, category...
+FIXED_KEY_DICTS = {"overview", "metadata"}
+
+SAMPLE_PAGE = """<!doctype html><html><head><title>Sample page</title>
+<meta name="description" content="A page for the result shape">
+<meta property="og:image" content="/cover.jpg">
+<link rel="canonical" href="https://pages.example/docs/guide">
+<script type="application/ld+json">{"@context": "https://schema.org", "@type": "Article", "headline": "Sample"}</script>
+<script type="application/ld+json">[{"@type": "BreadcrumbList"}, {"@type": "Organization", "name": "Ex"}]</script>
+<script type="application/ld+json">{"broken": </script>
+<script>var ignored = {"@type": "Nope"};</script>
+</head><body><h1>Sample page</h1><p>Intro with <a href="/docs/other">a link</a>.</p>
+<h2>Details</h2><ul><li>One</li><li>Two</li></ul><p>After the list.</p></body></html>"""
+
+
+def test_result_has_the_sample_result_shape():
+    sample = sample_successful_scrapes["results"][0]
+    page = parse_page(URL, SAMPLE_PAGE, content_filter=ContentFilter(FILTER_RULES))
+
+    assert set(page) == set(sample)
+    assert key_paths(page) == key_paths(sample)
+    overview = page["overview"]
+    assert overview["metadata"]["json-ld"] == [
+        {"@context": "https://schema.org", "@type": "Article", "headline": "Sample"},
+        {"@type": "BreadcrumbList"}, {"@type": "Organization", "name": "Ex"},
+    ]
+    assert str(uuid.UUID(overview["uuid"])) == overview["uuid"]
+    assert parse_page(URL, SAMPLE_PAGE)["overview"]["uuid"] == overview["uuid"]
+    # "# Sample page" and "## Details" in the markdown text
+    assert overview["char_count_formatted"] == overview["char_count"] + len("# ") + len("## ")
+
+
+SAMPLE_TEXT = "Sample page\n\nIntro with a link.\n\nDetails\n\nOne\n\nTwo\n\nAfter the list."
+SAMPLE_RESULT = {
+    "status": "success",
+    "url": URL,
+    "error": None,
+    "overview": {
+        "uuid": "fd975bb8-5f3a-55eb-8228-4bc8216b9c0d",
+        "website": "pages.example",
+        "url": URL,
+        "unique_page_name": "pages_example_docs_guide",
+        "page_title": "Sample page",
+        "has_structured_content": True,
+        "table_count": 0,
+        "code_block_count": 0,
+        "list_count": 1,
+        "outline": {"H1: Sample page": [], "H2: Details": [], "unassociated": []},
+        "char_count": 67,
+        "char_count_formatted": 72,
+        "metadata": {
+            "json-ld": [
+                {"@context": "https://schema.org", "@type": "Article", "headline": "Sample"},
+                {"@type": "BreadcrumbList"},
+                {"@type": "Organization", "name": "Ex"},
+            ],
+            "opengraph": {"og:image": "/cover.jpg"},
+            "meta_tags": {"description": "A page for the result shape"},
+            "canonical_url": "https://pages.example/docs/guide",
+            "robots_directives": None,
+        },
+    },
+    "structured_data": {
+        "Unordered Lists": {"H2: Details": [{"Before": "", "List": ["One", "Two"], "After": "After the list."}]},
+    },
+    "organized_data": {"H1: Sample page": ["Intro with a link."], "H2: Details": ["One", "Two", "After the list."]},
+    "text_data": SAMPLE_TEXT,
+    "main_image": "https://pages.example/cover.jpg",
+    "links": {"internal": ["https://pages.example/docs/other"], "external": [], "images": [], "documents": [],
+              "others": [], "audio": [], "videos": [], "archives": []},
+    "content_filter_removal_details": [],
+    "hashes": ["sha256:07d47b900e328bd8731a60af817ebe539f43292c122267d629c9ba505a19cd25",
+               "content:9d21eb74db0539b6c6c116244a77a94d"],
+}
+
+
+def test_sample_page_gives_the_golden_result():
+    page = parse_page(URL, SAMPLE_PAGE, content_filter=ContentFilter(FILTER_RULES))
+
+    assert first_difference(SAMPLE_RESULT, page) is None
+    assert page == SAMPLE_RESULT
@@ -0,0 +1,33 @@
+# tests\scraper\test_text_stream.py
+import asyncio
+
+from benchmarks.fixture_site import FixtureSite, serve_fixture_site
+from src.scraper.fetcher import Fetcher
+from src.scraper.parser import parse_page
+from src.scraper.text_stream import stream_page_text
+
+
+def test_streamed_overview_counts_match_a_regular_scrape(free_port):
+    site = FixtureSite(pages=2, paragraphs=9, kinds=("static",))
+
+    async def scenario():
+        async with serve_fixture_site(site, free_port) as base:
+            fetcher = Fetcher()
+            url = f"{base}/page/1"
+            chunks = []
+
+            async def send_chunk(chunk):
+                chunks.append(chunk)
+
+            buffered = await fetcher.fetch(url)
+            streamed = await stream_page_text(url, send_chunk, fetcher=fetcher, max_chars=2 ** 62)
+            await fetcher.close()
+            return buffered, streamed, chunks
+
+    buffered, streamed, chunks = asyncio.run(scenario())
+    page = parse_page(buffered.final_url, buffered.text)
+
+    assert chunks
+    for key in ("uuid", "char_count", "char_count_formatted"):
+        assert streamed["overview"][key] == page["overview"][key], key
+    assert streamed["overview"]["char_count_formatted"] > streamed["overview"]["char_count"]
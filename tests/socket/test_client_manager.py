@@ -0,0 +1,84 @@
+# tests\socket\test_client_manager.py
+import asyncio
+import json
+import os
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import socketio
+
+from benchmarks.fixture_site import wait_for_port
+from core.socket.client_manager import BatchingPubSubManager, decode_batch, encode_batch
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_batches_round_trip_as_json():
+    batch = [
+        {"method": "emit", "event": "chunk", "data": (b"\x00\xff", {"n": [1, 2]}), "namespace": "/UserSession",
+         "room": "sid-1", "skip_sid": None, "callback": ("sid-1", "/UserSession", 3), "host_id": "a"},
+        {"method": "emit", "event": "data", "data": ["one argument"], "host_id": "a"},
+        {"method": "disconnect", "sid": "sid-2", "namespace": "/", "host_id": "a"},
+    ]
+
+    decoded = decode_batch(encode_batch(batch))
+
+    assert json.loads(encode_batch(batch))[0]["data"][0] == {"__bytes__": "AP8="}
+    assert decoded[0]["data"] == (b"\x00\xff", {"n": [1, 2]})
+    assert decoded[0]["callback"] == ["sid-1", "/UserSession", 3]
+    assert decoded[1]["data"] == ["one argument"]
+    assert decoded[2] == batch[2]
+
+
+def test_bus_frames_are_never_unpickled():
+    with pytest.raises(ValueError):
+        decode_batch(pickle.dumps([{"method": "emit"}]))
+    with pytest.raises(TypeError):
+        BatchingPubSubManager()
+
+
+def test_emit_reaches_a_client_on_another_worker(tmp_path, free_port, other_free_port):
+    env = dict(os.environ, SOCKETIO_MANAGER="unix", SOCKETIO_MANAGER_URL=f"unix://{tmp_path}/socketio.sock")
+    ports = [free_port, other_free_port]
+    workers = [subprocess.Popen([sys.executable, "-m", "benchmarks.socketio_fanout", "--worker-port", str(port)],
+                                cwd=ROOT, env=env) for port in ports]
+
+    async def scenario():
+        listener, sender = socketio.AsyncClient(), socketio.AsyncClient()
+        ticks = []
+        all_received = asyncio.Event()
+
+        @listener.on("tick")
+        async def tick(data):
+            ticks.append(data["i"])
+            if len(ticks) == 5:
+                all_received.set()
+
+        try:
+            await asyncio.gather(*(wait_for_port(port) for port in ports))
+            await listener.connect(f"http://127.0.0.1:{ports[0]}", transports=["websocket"])
+            await listener.call("join")
+            await sender.connect(f"http://127.0.0.1:{ports[1]}", transports=["websocket"])
+            # The second worker emits to the room; only the first worker has a client in it
+            await sender.call("burst", {"count": 5, "size": 0})
+            await asyncio.wait_for(all_received.wait(), 10)
+            return ticks, await listener.call("bus_stats")
+        finally:
+            for client in (listener, sender):
+                if client.connected:
+                    await client.disconnect()
+
+    try:
+        ticks, stats = asyncio.run(scenario())
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+    assert ticks == [0, 1, 2, 3, 4]
+    assert stats["manager"] == "unix"
+    assert stats["received"] >= 5
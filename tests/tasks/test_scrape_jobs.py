@@ -0,0 +1,255 @@
+# tests\tasks\test_scrape_jobs.py
+import asyncio
+import contextlib
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Request
+from starlette.authentication import SimpleUser
+
+import core.socket.core.app_factory  # registers the scrape service's resumable runner
+from app.api.v1 import endpoints
+from benchmarks.fixture_site import FixtureSite, serve_fixture_site
+from core import settings
+from core.socket.core import session_registry
+from core.socket.core.session_registry import SessionRegistry
+from core.tasks import job_store, lanes
+from core.tasks.job_store import SQLiteJobStore
+from core.tasks.job_streams import register_job_socket_handlers
+from core.tasks.lanes import LONG_RUNNING_LANE, get_lane_queue
+from src.scraper import incremental
+from src.scraper.crawl import Crawler
+from src.scraper.fetcher import Fetcher
+from src.scraper.incremental import IncrementalScraper, ScrapeStateStore
+from src.scraper_service import ScrapeService, run_scrape_job
+
+
+class RecordingHandler:
+    """Stands in for the socket stream handler a service event is answered through"""
+
+    def __init__(self):
+        self.events = []
+        self.ended = asyncio.Event()
+
+    async def send_chunk(self, chunk):
+        self.events.append(("chunk", chunk))
+
+    async def send_status_update(self, status, system_message=None, user_visible_message=None, metadata=None):
+        self.events.append(("status_update", {"status": status, "metadata": metadata}))
+
+    async def send_data(self, data):
+        self.events.append(("data", data))
+
+    async def send_data_final(self, data):
+        self.events.append(("data_final", data))
+
+    async def send_error(self, error_type=None, message=None, user_visible_message=None, details=None, **kwargs):
+        self.events.append(("error", {"error_type": error_type, "message": message}))
+
+    async def send_end(self):
+        self.events.append(("end", None))
+        self.ended.set()
+
+
+@pytest.fixture
+def job_queue(tmp_path, monkeypatch):
+    """A fresh job store and lane queue per test; the lanes are started inside the test's event loop"""
+    store = SQLiteJobStore(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(job_store, "_job_store", store)
+    monkeypatch.setattr(lanes, "_lane_queue", None)
+    monkeypatch.setattr(settings, "JOB_HEARTBEAT_SECONDS", 0.05)
+    yield store
+    store._conn.close()
+
+
+def run_with_lanes(coro_fn):
+    async def main():
+        queue = get_lane_queue()
+        queue.start()
+        try:
+            return await coro_fn(queue)
+        finally:
+            await queue.shutdown()
+
+    return asyncio.run(main())
+
+
+def test_socket_task_runs_on_long_running_lane(job_queue):
+    handler = RecordingHandler()
+
+    async def scenario(queue):
+        job_id = await ScrapeService(stream_handler=handler).process_task("mic_check")
+        await asyncio.wait_for(handler.ended.wait(), 5)
+        await asyncio.sleep(0.1)
+        return job_id, queue.lanes[LONG_RUNNING_LANE].stats()
+
+    job_id, lane = run_with_lanes(scenario)
+
+    assert handler.events[0] == ("status_update", {"status": "queued", "metadata": {"job_id": job_id}})
+    assert [event[0] for event in handler.events].count("data") == 2
+    assert lane["completed"] == 1
+
+    job = asyncio.run(job_queue.get(job_id))
+    assert job["service"] == ScrapeService.service_name
+    assert job["state"] == job_store.COMPLETED
+    logged = asyncio.run(job_queue.events(job_id))
+    assert [event["type"] for event in logged] == [event[0] for event in handler.events[1:]]
+
+
+def test_crawl_resumes_from_checkpoint(free_port):
+    site = FixtureSite(pages=12, paragraphs=2)
+
+    async def scenario():
+        async with serve_fixture_site(site, free_port) as base:
+            seeds = [f"{base}/page/0"]
+            full = [result["crawl_url"] async for result in Crawler(fetcher=Fetcher()).crawl(seeds, max_depth=5)]
+
+            first = Crawler(fetcher=Fetcher())
+            before = []
+            async with contextlib.aclosing(first.crawl(seeds, max_depth=5)) as results:
+                async for result in results:
+                    before.append(result["crawl_url"])
+                    if len(before) == 4:
+                        state = json.loads(json.dumps(first.checkpoint()))
+                        break
+
+            resumed = Crawler(fetcher=Fetcher())
+            after = [result["crawl_url"] async for result in resumed.crawl(seeds, max_depth=5, resume=state)]
+            return full, before, after, resumed.stats()
+
+    full, before, after, stats = asyncio.run(scenario())
+
+    assert sum("/page/" in url for url in full) == 12
+    assert not set(before) & set(after)
+    assert sorted(before + after) == sorted(full)
+    assert stats["pages"] == 12
+
+
+def test_resumed_incremental_job_skips_done_urls(free_port, tmp_path, monkeypatch):
+    site = FixtureSite(pages=6, paragraphs=2)
+    store = ScrapeStateStore(tmp_path / "state.sqlite3")
+    monkeypatch.setattr(incremental, "_scraper", IncrementalScraper(fetcher=Fetcher(), store=store))
+
+    async def scenario():
+        async with serve_fixture_site(site, free_port) as base:
+            urls = site.urls(base)
+            job = SimpleNamespace(
+                payload={"task": "incremental_scrape", "task_context": {"urls": urls}},
+                progress={"done": urls[:2], "counts": {"new": 2, "changed": 0, "unchanged": 0}},
+                stream=RecordingHandler(),
+            )
+            await run_scrape_job(job)
+            return urls, job
+
+    urls, job = asyncio.run(scenario())
+    store._conn.close()
+
+    assert set(site.page_requests) == {2, 3, 4, 5}
+    assert job.progress["done"][:2] == urls[:2]
+    assert sorted(job.progress["done"]) == sorted(urls)
+    summary = [data for kind, data in job.stream.events if kind == "data"][-1]
+    assert summary["counts"] == {"new": 6, "changed": 0, "unchanged": 0}
+
+
+class FakeSocketServer:
+    """Collects the handlers register_job_socket_handlers adds and the events they emit"""
+
+    def __init__(self):
+        self.handlers = {}
+        self.emitted = []
+        self.manager = SimpleNamespace(is_connected=lambda sid, namespace: True)
+
+    def on(self, event, handler, namespace=None):
+        self.handlers[event] = handler
+
+    async def emit(self, event, data, to=None, namespace=None):
+        self.emitted.append((to, event, data))
+
+
+def authenticated_request(user_id=None):
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    if user_id is not None:
+        scope["user"] = SimpleUser(user_id)
+    return Request(scope)
+
+
+def test_jobs_are_only_visible_to_their_user(job_queue, monkeypatch):
+    registry = SessionRegistry()
+    monkeypatch.setattr(session_registry, "_registry", registry)
+    registry.connect("sid-a", "user-a", identity="user-a")
+    registry.connect("sid-b", "user-b", identity="user-b")
+    # Claims user-a in its auth dict without authenticating
+    registry.connect("sid-c", "user-a")
+    sio = FakeSocketServer()
+    register_job_socket_handlers(sio, "/UserSession")
+
+    async def scenario(queue):
+        submitted = await sio.handlers["submit_job"](
+            "sid-a", {"service": ScrapeService.service_name, "payload": {"task": "mic_check"}}
+        )
+        job_id = submitted["job_id"]
+        while (await job_queue.get(job_id))["state"] != job_store.COMPLETED:
+            await asyncio.sleep(0.02)
+        answers = {sid: await sio.handlers["attach_job"](sid, {"job_id": job_id})
+                   for sid in ("sid-a", "sid-b", "sid-c")}
+        refused = []
+        for request in (authenticated_request("user-b"), authenticated_request()):
+            with pytest.raises(HTTPException) as error:
+                await endpoints.get_job_events(job_id, request)
+            refused.append(error.value.status_code)
+        return job_id, answers, await endpoints.get_job(job_id, authenticated_request("user-a")), refused
+
+    job_id, answers, job, refused = run_with_lanes(scenario)
+
+    assert job["user_id"] == "user-a"
+    assert answers["sid-a"]["id"] == job_id
+    assert answers["sid-b"] == answers["sid-c"] == {"error": "Unknown job"}
+    assert refused == [404, 404]
+
+
+def test_anonymous_jobs_cannot_be_read_back(job_queue, monkeypatch):
+    registry = SessionRegistry()
+    monkeypatch.setattr(session_registry, "_registry", registry)
+    registry.connect("sid-a")
+    registry.connect("sid-b")
+    sio = FakeSocketServer()
+    register_job_socket_handlers(sio, "/UserSession")
+
+    async def scenario(queue):
+        submitted = await sio.handlers["submit_job"](
+            "sid-a", {"service": ScrapeService.service_name, "payload": {"task": "mic_check"}}
+        )
+        job_id = submitted["job_id"]
+        while (await job_queue.get(job_id))["state"] != job_store.COMPLETED:
+            await asyncio.sleep(0.02)
+        with pytest.raises(HTTPException) as error:
+            await endpoints.get_job(job_id, authenticated_request())
+        return (await job_queue.get(job_id), await sio.handlers["attach_job"]("sid-b", {"job_id": job_id}),
+                error.value.status_code)
+
+    job, attached, status = run_with_lanes(scenario)
+
+    assert job["user_id"] == "anonymous"
+    # The submitting session still got the job's events through submit_job
+    assert any(event == "job_event" for _, event, _ in sio.emitted)
+    assert attached == {"error": "Unknown job"}
+    assert status == 404
+
+
+def test_release_state_resets_only_task_fields():
+    handler = object()
+    service = ScrapeService(stream_handler=handler)
+    service.urls = ["https://pages.example/"]
+    service.get_links = True
+    service.cached_client = "kept"
+
+    service._active_tasks = 1
+    refused = service.release_state()
+    service._active_tasks = 0
+
+    assert refused is False and service.urls == ["https://pages.example/"]
+    assert service.release_state() is True
+    assert (service.urls, service.get_links) == (None, None)
+    assert "urls" not in vars(service)
+    assert (service.stream_handler, service.job, service.cached_client) == (handler, None, "kept")